@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+"""
+Async Polite Crawler
+
+Fetches many pages concurrently with httpx while staying inside a per-host
+request budget:
+
+    TokenBucket / HostRateLimiter   at most `rate` requests per second per host
+                                    (bursts of `burst`); a 429/503 Retry-After
+                                    pauses the whole host
+    CrawlFrontier                   SQLite table of every URL seen, its state and
+                                    its ETag / Last-Modified, so an interrupted
+                                    crawl resumes where it stopped and a re-crawl
+                                    sends conditional GETs
+    Crawler                         `concurrency` workers draining the frontier
+
+Concurrency only hides latency: requests still leave no faster than the
+bucket allows, so a crawl spends the same politeness budget as sleeping
+between sequential requests without sitting idle while each response
+arrives.
+
+Bodies are saved to each item's path. On 304 Not Modified the saved body is
+handed to the handler again, so links can be re-derived from an unchanged
+listing page without transferring it.
+
+Usage:
+    frontier = CrawlFrontier(OUTPUT_DIR / "crawl_frontier.db")
+    frontier.begin_run(requeue_kinds=['listing'])
+    frontier.add(CrawlItem(url, 'listing', path=str(html_dir / 'listing.html')))
+    stats = asyncio.run(Crawler(frontier, handle, rate=2.0, concurrency=8).run())
+
+    def handle(entry, body, changed):    # -> new CrawlItems to enqueue (or None)
+        ...
+
+    python3 scripts/async_crawler.py --self-test    # crawl a local fixture server
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Sequence, Union
+from urllib.parse import urljoin, urlsplit
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Worth retrying: rate limited, or the server is having a bad moment
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 120.0
+
+
+class CrawlItem(NamedTuple):
+    """A URL to fetch. path is where the body is saved; data is free-form JSON for the handler."""
+    url: str
+    kind: str = 'page'
+    path: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+    priority: int = 0
+
+
+class FrontierEntry(NamedTuple):
+    """A claimed frontier row: the item plus its fetch history."""
+    url: str
+    kind: str
+    path: Optional[str]
+    data: Dict[str, Any]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    attempts: int
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------------
+
+class TokenBucket:
+    """At most `rate` acquisitions per second on average, in bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # Waiters queue on the lock, so tokens are handed out first come, first served
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Hand out nothing for the next `seconds` (server asked us to back off)."""
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class HostRateLimiter:
+    """One TokenBucket per host."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    async def acquire(self, url: str) -> None:
+        await self.bucket(url).acquire()
+
+    def pause(self, url: str, seconds: float) -> None:
+        self.bucket(url).pause(seconds)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (it may be a delay or an HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# ---------------------------------------------------------------------------
+# Frontier
+# ---------------------------------------------------------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    path TEXT,
+    data TEXT NOT NULL DEFAULT '{}',
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',   -- pending / in_progress / done / failed
+    run INTEGER NOT NULL,                    -- run that discovered the URL
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,      -- retry backoff (unix time)
+    etag TEXT,
+    last_modified TEXT,
+    status INTEGER,
+    error TEXT,
+    fetched_at TEXT
+);
+CREATE INDEX IF NOT EXISTS frontier_pending ON frontier(state, priority);
+CREATE TABLE IF NOT EXISTS crawl_runs (
+    run INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+"""
+
+
+class CrawlFrontier:
+    """Persistent crawl state: every URL seen, its state and its cache validators."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        row = self.conn.execute("SELECT MAX(run) FROM crawl_runs").fetchone()
+        self.run = row[0] or 0
+
+    def begin_run(self, requeue_kinds: Sequence[str] = ()) -> bool:
+        """
+        Resume the last run if it never finished, otherwise start a new one.
+
+        A new run puts failed URLs and finished URLs of requeue_kinds back in
+        the queue (they are revalidated with conditional GETs). Returns True
+        when an interrupted run was resumed.
+        """
+        row = self.conn.execute("SELECT run, finished_at FROM crawl_runs ORDER BY run DESC LIMIT 1").fetchone()
+        with self.conn:
+            if row and row['finished_at'] is None:
+                self.run = row['run']
+                self.conn.execute("UPDATE frontier SET state = 'pending' WHERE state = 'in_progress'")
+                return True
+            self.run = self.conn.execute("INSERT INTO crawl_runs (started_at) VALUES (?)",
+                                         (datetime.now().isoformat(),)).lastrowid
+            marks = ','.join('?' * len(requeue_kinds))
+            self.conn.execute(f"UPDATE frontier SET state = 'pending', attempts = 0, not_before = 0 "
+                              f"WHERE state IN ('failed', 'in_progress') OR (state = 'done' AND kind IN ({marks}))",
+                              list(requeue_kinds))
+        return False
+
+    def finish_run(self) -> bool:
+        """Mark the run finished if nothing is left to fetch."""
+        if self.conn.execute("SELECT 1 FROM frontier WHERE state IN ('pending', 'in_progress') LIMIT 1").fetchone():
+            return False
+        with self.conn:
+            self.conn.execute("UPDATE crawl_runs SET finished_at = ? WHERE run = ?",
+                              (datetime.now().isoformat(), self.run))
+        return True
+
+    def add(self, item: CrawlItem, state: str = 'pending') -> bool:
+        """Queue a URL unless it is already known. True if it was new."""
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO frontier (url, kind, path, data, priority, state, run) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (item.url, item.kind, item.path, json.dumps(item.data or {}), item.priority, state, self.run))
+        return cursor.rowcount > 0
+
+    def claim(self) -> Optional[FrontierEntry]:
+        """Next URL that is due, marked in_progress (None when nothing is due)."""
+        row = self.conn.execute(
+            "SELECT url, kind, path, data, etag, last_modified, attempts FROM frontier "
+            "WHERE state = 'pending' AND not_before <= ? ORDER BY priority, rowid LIMIT 1",
+            (time.time(),)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE frontier SET state = 'in_progress' WHERE url = ?", (row['url'],))
+        return FrontierEntry(row['url'], row['kind'], row['path'], json.loads(row['data']),
+                             row['etag'], row['last_modified'], row['attempts'])
+
+    def next_due_in(self) -> Optional[float]:
+        """Seconds until the next backed-off URL is due (None when nothing is pending)."""
+        row = self.conn.execute("SELECT MIN(not_before) FROM frontier WHERE state = 'pending'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def complete(self, url: str, status: int, etag: Optional[str], last_modified: Optional[str]) -> None:
+        with self.conn:
+            self.conn.execute(
+                "UPDATE frontier SET state = 'done', status = ?, etag = ?, last_modified = ?, error = NULL, "
+                "attempts = 0, fetched_at = ? WHERE url = ?",
+                (status, etag, last_modified, datetime.now().isoformat(), url))
+
+    def retry(self, url: str, error: str, delay: float, max_attempts: int) -> bool:
+        """Back the URL off for delay seconds, or fail it once max_attempts are used. True if it will retry."""
+        row = self.conn.execute("SELECT attempts FROM frontier WHERE url = ?", (url,)).fetchone()
+        attempts = (row['attempts'] if row else 0) + 1
+        if attempts >= max_attempts:
+            self.fail(url, None, error, attempts)
+            return False
+        with self.conn:
+            self.conn.execute("UPDATE frontier SET state = 'pending', attempts = ?, not_before = ?, error = ? "
+                              "WHERE url = ?", (attempts, time.time() + delay, error, url))
+        return True
+
+    def fail(self, url: str, status: Optional[int], error: str, attempts: Optional[int] = None) -> None:
+        with self.conn:
+            self.conn.execute("UPDATE frontier SET state = 'failed', status = COALESCE(?, status), error = ?, "
+                              "attempts = COALESCE(?, attempts), fetched_at = ? WHERE url = ?",
+                              (status, error, attempts, datetime.now().isoformat(), url))
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state").fetchall())
+
+    def entries(self, kind: Optional[str] = None) -> Iterable[sqlite3.Row]:
+        if kind is None:
+            return self.conn.execute("SELECT * FROM frontier ORDER BY rowid")
+        return self.conn.execute("SELECT * FROM frontier WHERE kind = ? ORDER BY rowid", (kind,))
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Crawler
+# ---------------------------------------------------------------------------
+
+Handler = Callable[[FrontierEntry, str, bool], Optional[Iterable[CrawlItem]]]
+
+
+def _write_body(path: Path, body: str) -> None:
+    """Write via a temp file so an interrupted crawl never leaves a truncated page."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+class Crawler:
+    """Bounded pool of async workers draining a CrawlFrontier under a per-host rate limit."""
+
+    def __init__(self, frontier: CrawlFrontier, handler: Handler, rate: float = 2.0, burst: int = 1,
+                 concurrency: int = 8, headers: Optional[Dict[str, str]] = None, timeout: float = 30.0,
+                 max_attempts: int = 3, max_requests: Optional[int] = None, progress_every: int = 50):
+        """
+        Args:
+            handler: handler(entry, body, changed) -> CrawlItems to enqueue.
+                changed is False when the server answered 304 and body is
+                the copy saved by an earlier run.
+            rate: Requests per second per host.
+            burst: Requests a host may receive back to back after idling.
+            concurrency: Requests in flight at once (across hosts).
+            max_requests: Stop after this many requests (the run stays
+                unfinished and resumes next time).
+        """
+        self.frontier = frontier
+        self.handler = handler
+        self.limiter = HostRateLimiter(rate, burst)
+        self.concurrency = max(1, concurrency)
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.max_requests = max_requests
+        self.progress_every = progress_every
+        self.stats: Counter = Counter()
+        self._active = 0
+        self._claimed = 0
+
+    async def run(self) -> Counter:
+        """Fetch until the frontier is drained (or max_requests is reached)."""
+        if httpx is None:
+            raise RuntimeError("async_crawler needs httpx: pip install httpx")
+        self.stats = Counter()
+        self._claimed = 0
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(headers=self.headers, timeout=self.timeout, limits=limits,
+                                     follow_redirects=True) as client:
+            await asyncio.gather(*(self._worker(client) for _ in range(self.concurrency)))
+        self.stats['finished'] = int(self.frontier.finish_run())
+        return self.stats
+
+    async def _worker(self, client: "httpx.AsyncClient") -> None:
+        while True:
+            if self.max_requests is not None and self._claimed >= self.max_requests:
+                return
+            entry = self.frontier.claim()
+            if entry is None:
+                due_in = self.frontier.next_due_in()
+                if due_in is None and self._active == 0:
+                    return  # Drained, and nobody in flight can add more
+                # Wait for in-flight pages to add URLs, or for a backed-off URL to come due
+                await asyncio.sleep(0.05 if due_in is None else min(due_in, 0.05))
+                continue
+            self._claimed += 1
+            self._active += 1
+            try:
+                await self._fetch(client, entry)
+            finally:
+                self._active -= 1
+            done = self.stats['fetched'] + self.stats['not_modified'] + self.stats['failed']
+            if done and done % self.progress_every == 0:
+                print(f"  {done} done ({self.stats['fetched']} fetched, {self.stats['not_modified']} unchanged, "
+                      f"{self.stats['failed']} failed), {self.stats['discovered']} discovered")
+
+    def _backoff(self, entry: FrontierEntry, error: str, delay: Optional[float] = None) -> None:
+        delay = delay if delay is not None else min(MAX_BACKOFF, 2.0 ** (entry.attempts + 1))
+        if self.frontier.retry(entry.url, error, delay, self.max_attempts):
+            self.stats['retried'] += 1
+        else:
+            self.stats['failed'] += 1
+            print(f"  ❌ {entry.url}: {error}")
+
+    async def _fetch(self, client: "httpx.AsyncClient", entry: FrontierEntry) -> None:
+        saved = Path(entry.path) if entry.path else None
+        conditional = {}
+        if saved is not None and saved.exists():
+            if entry.etag:
+                conditional['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                conditional['If-Modified-Since'] = entry.last_modified
+
+        await self.limiter.acquire(entry.url)
+        self.stats['requests'] += 1
+        try:
+            response = await client.get(entry.url, headers=conditional)
+        except httpx.HTTPError as e:
+            self._backoff(entry, f"{type(e).__name__}: {e}")
+            return
+
+        status = response.status_code
+        if status == 304 and conditional:
+            body, changed = saved.read_text(encoding='utf-8'), False
+        elif status in RETRY_STATUSES:
+            retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                self.limiter.pause(entry.url, retry_after)
+            self._backoff(entry, f"HTTP {status}", retry_after)
+            return
+        elif response.is_success:
+            body, changed = response.text, True
+            if saved is not None:
+                _write_body(saved, body)
+        else:
+            self.frontier.fail(entry.url, status, f"HTTP {status}")
+            self.stats['failed'] += 1
+            print(f"  ❌ {entry.url}: HTTP {status}")
+            return
+
+        try:
+            new_items = list(self.handler(entry, body, changed) or ())
+        except Exception:
+            self.frontier.fail(entry.url, status, traceback.format_exc(limit=3).strip().splitlines()[-1])
+            self.stats['failed'] += 1
+            print(f"  ❌ {entry.url}: handler failed\n{traceback.format_exc(limit=3)}")
+            return
+        for item in new_items:
+            if self.frontier.add(item):
+                self.stats['discovered'] += 1
+        # A 304 may omit the validators; keep the ones it was revalidated against
+        self.frontier.complete(entry.url, status,
+                               response.headers.get('ETag') or entry.etag,
+                               response.headers.get('Last-Modified') or entry.last_modified)
+        self.stats['fetched' if changed else 'not_modified'] += 1
+
+
+# ---------------------------------------------------------------------------
+# Fixture server self-test
+# ---------------------------------------------------------------------------
+
+FIXTURE_LAST_MODIFIED = 'Wed, 01 Oct 2025 00:00:00 GMT'
+
+
+class FixtureSite(BaseHTTPRequestHandler):
+    """
+    A tiny site: /list/ and /list/p2/ link to /item/1.html .. /item/8.html.
+    Every page has an ETag and Last-Modified and honours conditional GETs;
+    /item/3.html is rate limited once, /item/7.html does not exist.
+    """
+
+    requests_seen: Counter = Counter()
+    throttled: set = set()
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _page(self, path: str) -> Optional[str]:
+        if path == '/list/':
+            links = ''.join(f'<a href="/item/{n}.html">Item {n}</a>' for n in range(1, 6))
+            return f'<html><body>{links}<a href="/list/p2/">2</a></body></html>'
+        if path == '/list/p2/':
+            return ''.join(f'<a href="/item/{n}.html">Item {n}</a>' for n in range(6, 9))
+        match = re.fullmatch(r'/item/(\d+)\.html', path)
+        if match and match.group(1) != '7':
+            return f'<html><body><h1>Item {match.group(1)}</h1></body></html>'
+        return None
+
+    def do_GET(self) -> None:
+        self.requests_seen[self.path] += 1
+        if self.path == '/item/3.html' and self.path not in self.throttled:
+            self.throttled.add(self.path)
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        body = self._page(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"' + hashlib.md5(body.encode('utf-8')).hexdigest()[:16] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', FIXTURE_LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve_fixture() -> ThreadingHTTPServer:
+    """Start FixtureSite on a free localhost port (in a daemon thread)."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def self_test() -> bool:
+    server = serve_fixture()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    seen_bodies = Counter()
+
+    def handle(entry: FrontierEntry, body: str, changed: bool):
+        seen_bodies[entry.url] += 1
+        if entry.kind == 'list':
+            for href in re.findall(r'href="([^"]+)"', body):
+                kind = 'list' if href.startswith('/list/') else 'item'
+                url = urljoin(base, href)
+                yield CrawlItem(url, kind, path=str(html_dir / (href.strip('/').replace('/', '_') or 'index')),
+                                priority=0 if kind == 'list' else 1)
+
+    checks = []
+
+    def check(name: str, ok: bool) -> None:
+        checks.append(ok)
+        print(f"  {'✓' if ok else '✗'} {name}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        html_dir = Path(tmp) / 'html'
+        frontier = CrawlFrontier(Path(tmp) / 'frontier.db')
+        frontier.begin_run(requeue_kinds=['list'])
+        frontier.add(CrawlItem(f"{base}/list/", 'list', path=str(html_dir / 'list')))
+
+        # Interrupted after 3 requests, then resumed
+        stats = asyncio.run(Crawler(frontier, handle, rate=50, concurrency=4, max_requests=3).run())
+        check("interrupted run stays unfinished", not stats['finished'] and frontier.counts().get('pending', 0) > 0)
+        check("resume picks up the interrupted run", frontier.begin_run(requeue_kinds=['list']))
+        start = time.monotonic()
+        stats = asyncio.run(Crawler(frontier, handle, rate=20, concurrency=4).run())
+        elapsed = time.monotonic() - start
+        counts = frontier.counts()
+        check("resumed run drains the frontier", stats['finished'] == 1 and counts == {'done': 9, 'failed': 1})
+        check("every page fetched once (the throttled one twice)",
+              all(n == (2 if path == '/item/3.html' else 1) for path, n in FixtureSite.requests_seen.items()))
+        check("rate limit holds under concurrency", elapsed >= (stats['requests'] - 1) / 20 * 0.9)
+
+        # New run: everything revalidated, nothing re-transferred
+        FixtureSite.requests_seen.clear()
+        check("finished run starts fresh", not frontier.begin_run(requeue_kinds=['list', 'item']))
+        stats = asyncio.run(Crawler(frontier, handle, rate=50, concurrency=4).run())
+        check("re-crawl answers 304 for every saved page", stats['not_modified'] == 9 and stats['fetched'] == 0)
+        check("the failed page is retried", FixtureSite.requests_seen['/item/7.html'] == 1)
+        check("unchanged listings still reach the handler", seen_bodies[f"{base}/list/"] == 2)
+        frontier.close()
+    server.shutdown()
+    print(f"{sum(checks)}/{len(checks)} checks passed")
+    return all(checks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Async polite crawler (library); run the fixture self-test')
+    parser.add_argument('--self-test', action='store_true', help='Crawl a local fixture server and check the results')
+    parser.add_argument('--status', type=Path, metavar='FRONTIER', help='Show the state counts of a frontier database')
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+    if args.status:
+        frontier = CrawlFrontier(args.status)
+        print(f"Run {frontier.run}: {frontier.counts()}")
+        return
+    parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+HTML Parser Backend Benchmark
+
+Parses the gdrive_exports corpus with every parsed_dossier backend and
+reports throughput plus output equivalence against html.parser (the
+reference the extractors were written against).
+
+Equivalence is checked on the pattern the extractors rely on:
+find_all(['h1', 'h2', 'h3', 'p', 'ul', 'ol', 'li', 'table']) and the
+get_text() of each match, both exactly and with whitespace collapsed.
+
+Usage:
+    python3 scripts/benchmark_html_parsers.py
+    python3 scripts/benchmark_html_parsers.py --limit 100 --parsers html.parser lxml
+    python3 scripts/benchmark_html_parsers.py --output data/parser_benchmark.json
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from parsed_dossier import GDRIVE_EXPORTS, PARSER_BACKENDS, parse_html
+
+BLOCK_TAGS = ['h1', 'h2', 'h3', 'p', 'ul', 'ol', 'li', 'table']
+
+
+def block_signature(doc, collapse: bool):
+    """(tag, text) for every block element, the unit the extractors consume."""
+    blocks = []
+    for node in doc.root.find_all(BLOCK_TAGS):
+        text = node.get_text()
+        if collapse:
+            text = ' '.join(text.split())
+        blocks.append((node.name, text))
+    return blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML parser backends on the dossier corpus')
+    parser.add_argument('--input', '-i', default=str(GDRIVE_EXPORTS), help='Input directory')
+    parser.add_argument('--limit', '-l', type=int, default=0, help='Limit documents to benchmark')
+    parser.add_argument('--parsers', nargs='+', default=list(PARSER_BACKENDS), choices=list(PARSER_BACKENDS))
+    parser.add_argument('--output', '-o', help='Write results as JSON')
+    args = parser.parse_args()
+
+    html_files = sorted(Path(args.input).glob("**/*.html"))
+    if args.limit > 0:
+        html_files = html_files[:args.limit]
+    documents = [(f, f.read_text(encoding='utf-8', errors='ignore')) for f in html_files]
+    total_mb = sum(len(content.encode('utf-8')) for _, content in documents) / 1e6
+    print(f"Benchmarking {len(documents)} documents ({total_mb:.1f} MB)")
+
+    parsers = ['html.parser'] + [p for p in args.parsers if p != 'html.parser']
+    stats = {name: {'seconds': 0.0, 'exact': 0, 'normalized': 0, 'errors': 0, 'mismatches': []}
+             for name in parsers}
+
+    for filepath, content in documents:
+        reference = None
+        for name in parsers:
+            start = time.perf_counter()
+            try:
+                doc = parse_html(content, str(filepath), parser=name)
+            except Exception as e:
+                stats[name]['errors'] += 1
+                stats[name]['mismatches'].append(f"{filepath.name}: {type(e).__name__}: {e}")
+                continue
+            stats[name]['seconds'] += time.perf_counter() - start
+
+            signature = (block_signature(doc, False), block_signature(doc, True))
+            if name == 'html.parser':
+                reference = signature
+            elif reference is None:
+                # html.parser failed on this document: nothing to be equivalent to
+                if len(stats[name]['mismatches']) < 10:
+                    stats[name]['mismatches'].append(f"{filepath.name}: html.parser failed, no reference")
+                continue
+            if signature[0] == reference[0]:
+                stats[name]['exact'] += 1
+            if signature[1] == reference[1]:
+                stats[name]['normalized'] += 1
+            elif len(stats[name]['mismatches']) < 10:
+                stats[name]['mismatches'].append(filepath.name)
+
+    baseline = stats['html.parser']['seconds'] or 1e-9
+    print(f"\n{'Backend':<14}{'Seconds':>9}{'MB/s':>8}{'Speedup':>9}{'Exact':>8}{'Normalized':>12}{'Errors':>8}")
+    for name in parsers:
+        s = stats[name]
+        n = len(documents) or 1
+        print(f"{name:<14}{s['seconds']:>9.2f}{total_mb / (s['seconds'] or 1e-9):>8.2f}"
+              f"{baseline / (s['seconds'] or 1e-9):>8.1f}x{s['exact'] / n:>8.1%}"
+              f"{s['normalized'] / n:>12.1%}{s['errors']:>8}")
+    for name in parsers:
+        if stats[name]['mismatches']:
+            print(f"\n{name} mismatches (first {len(stats[name]['mismatches'])}):")
+            for item in stats[name]['mismatches']:
+                print(f"  - {item}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'documents': len(documents), 'megabytes': round(total_mb, 2), 'backends': stats}, f, indent=2)
+        print(f"\nSaved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Technical Spec Extraction Benchmark
+
+Runs OBDII365Parser._extract_technical_specs over the scraped product
+corpus twice: with the single-pass PatternTable scan it uses now, and with
+the original one-re.finditer-per-pattern loop. Reports throughput for both
+and every product whose TechnicalSpecs differ (there should be none).
+
+Texts come from the scraped HTML pages (name + full description, as
+parse_file builds them) or, with --products, from a parsed_products.json
+written by an earlier run.
+
+Usage:
+    python3 scripts/benchmark_spec_extraction.py --html-dir data/obdii365_scraped/html
+    python3 scripts/benchmark_spec_extraction.py --products data/obdii365_parsed/parsed_products.json
+    python3 scripts/benchmark_spec_extraction.py --limit 200 --repeat 3 --output data/spec_benchmark.json
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from bs4 import BeautifulSoup
+
+from parse_obdii365_products import OBDII365Parser
+
+DEFAULT_HTML_DIR = Path('/Users/jeremysamuels/Documents/study-dashboard/data/obdii365_scraped/html')
+
+
+class PerPatternParser(OBDII365Parser):
+    """The reference: every pattern of every category scanned on its own."""
+
+    def _category_matches(self, text: str) -> Dict[str, List[str]]:
+        found = {}
+        for label, patterns in self.SPEC_TABLE.tables.items():
+            matches = set()
+            for pattern in patterns:
+                for match in re.finditer(pattern, text, re.IGNORECASE):
+                    matches.add(re.sub(r'[- ]+', '', match.group(0).strip().upper()))
+            found[label] = sorted(matches)
+        return found
+
+
+def load_texts(args) -> List[Tuple[str, str, str]]:
+    """(source, name, description) for every product."""
+    if args.products:
+        with open(args.products, 'r', encoding='utf-8') as f:
+            products = json.load(f)
+        texts = [(p.get('source_file') or p.get('sku', ''), p.get('name') or '', p.get('description_full') or '')
+                 for p in products]
+    else:
+        # Only the helpers that read the soup are used, so no output directory is created
+        reader = OBDII365Parser.__new__(OBDII365Parser)
+        texts = []
+        for html_file in sorted(Path(args.html_dir).glob("*.html")):
+            soup = BeautifulSoup(html_file.read_text(encoding='utf-8', errors='ignore'), 'html.parser')
+            name = reader._extract_meta(soup, 'name') or reader._extract_title(soup)
+            if name:
+                texts.append((html_file.name, name, reader._extract_full_description(soup)))
+    return texts[:args.limit] if args.limit > 0 else texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark single-pass technical spec extraction')
+    parser.add_argument('--html-dir', type=Path, default=DEFAULT_HTML_DIR, help='Scraped product HTML directory')
+    parser.add_argument('--products', type=Path, help='Read texts from a parsed_products.json instead')
+    parser.add_argument('--limit', '-l', type=int, default=0, help='Limit products to benchmark')
+    parser.add_argument('--repeat', type=int, default=1, help='Timed passes over the corpus per engine')
+    parser.add_argument('--output', '-o', help='Write results as JSON')
+    args = parser.parse_args()
+
+    texts = load_texts(args)
+    total_mb = sum(len(f"{name} {description}".encode('utf-8')) for _, name, description in texts) / 1e6
+    print(f"Benchmarking {len(texts)} products ({total_mb:.2f} MB of text)")
+
+    engines = {
+        'per-pattern': PerPatternParser.__new__(PerPatternParser),
+        'pattern-table': OBDII365Parser.__new__(OBDII365Parser),
+    }
+    outputs = {}
+    seconds = {}
+    for label, engine in engines.items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            outputs[label] = [asdict(engine._extract_technical_specs(name, description))
+                              for _, name, description in texts]
+        seconds[label] = (time.perf_counter() - start) / args.repeat
+
+    mismatches = []
+    for (source, _, _), reference, specs in zip(texts, outputs['per-pattern'], outputs['pattern-table']):
+        fields = [field for field in reference if reference[field] != specs[field]]
+        if fields:
+            mismatches.append({'source': source, 'fields': fields})
+
+    baseline = seconds['per-pattern'] or 1e-9
+    print(f"\n{'Engine':<16}{'Seconds':>9}{'MB/s':>8}{'Speedup':>9}")
+    for label in engines:
+        print(f"{label:<16}{seconds[label]:>9.2f}{total_mb / (seconds[label] or 1e-9):>8.2f}"
+              f"{baseline / (seconds[label] or 1e-9):>8.1f}x")
+    print(f"\nIdentical TechnicalSpecs: {len(texts) - len(mismatches)}/{len(texts)}")
+    for item in mismatches[:10]:
+        print(f"  - {item['source']}: {', '.join(item['fields'])}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'products': len(texts), 'megabytes': round(total_mb, 3), 'seconds': seconds,
+                       'mismatches': mismatches}, f, indent=2)
+        print(f"\nSaved: {args.output}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
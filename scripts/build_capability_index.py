@@ -15,21 +15,16 @@ import os
 from pathlib import Path
 from datetime import datetime
 
+from entity_scanner import find_entities, load_vocabulary
+
 MANIFEST_FILE = "data/dossier_extraction_manifest.json"
 PEARL_DIR = "data/pearl_extraction"
 OUTPUT_FILE = "data/dossier_capability_index.json"
 
-TOOL_MARKERS = {
-    'autel': ['autel', 'im608', 'im508', 'maxiim'],
-    'xhorse': ['xhorse', 'vvdi', 'condor'],
-    'smartpro': ['smartpro', 'smart pro', 'smart-pro'],
-    'lonsdor': ['lonsdor', 'k518'],
-    'obdstar': ['obdstar', 'x300'],
-    'xtool': ['xtool', 'x100'],
-    'yanhua': ['yanhua', 'acdp'],
-    'lishi': ['lishi'],
-    'zed-full': ['zed-full', 'zed full', 'zedfull']
-}
+# Tool slug -> marker spellings, from the shared entity vocabulary. The index
+# keeps its original nine tools; the vocabulary's newer ones are left out
+INDEX_TOOLS = ['autel', 'xhorse', 'smartpro', 'lonsdor', 'obdstar', 'xtool', 'yanhua', 'lishi', 'zed-full']
+TOOL_MARKERS = {tool: load_vocabulary()['tools']['entities'][tool] for tool in INDEX_TOOLS}
 
 def load_manifest():
     """Load dossier extraction manifest."""
@@ -55,15 +50,12 @@ def detect_tools_in_dossier(filepath: str) -> list:
     """Detect which tools are mentioned in a dossier."""
     try:
         with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read().lower()
+            content = f.read()
     except:
         return []
     
-    tools = []
-    for tool, markers in TOOL_MARKERS.items():
-        if any(m in content for m in markers):
-            tools.append(tool)
-    return tools
+    found = set(find_entities(content, 'tools'))
+    return [tool for tool in TOOL_MARKERS if tool in found]
 
 def build_capability_index():
     """Build complete capability index."""
@@ -1,6 +1,8 @@
 import json
 import re
 
+from coverage_index import CoverageIndex
+
 def load_json(path):
     with open(path, 'r') as f:
         return json.load(f)
@@ -31,35 +33,11 @@ def parse_year_range(year_str):
 def check_coverage(tool_vehicles, target_make, target_models, target_years):
     """
     Checks if a tool's capabilities cover the target vehicle group.
+    (One-off helper; main() queries a CoverageIndex built once for all tools.)
     """
     target_start, target_end = parse_year_range(target_years)
-    
-    covered_models = []
-    
-    for v in tool_vehicles:
-        # Check Make (fuzzy)
-        if target_make.lower() not in v['make'].lower() and v['make'].lower() not in target_make.lower():
-            continue
-            
-        # Check Model (fuzzy) -- tricky if target_models is a list
-        # We want to see if this tool covers ANY of the target models
-        model_match = False
-        for tm in target_models:
-            if tm.lower() in v['model'].lower() or v['model'].lower() in tm.lower():
-                model_match = True
-                break
-        if not model_match:
-            continue
-            
-        # Check Year Overlap
-        tool_start = v.get('year_start', 0)
-        tool_end = v.get('year_end', 2026)
-        
-        # Simple overlap check
-        if (tool_start <= target_end) and (tool_end >= target_start):
-             covered_models.append(v)
-             
-    return covered_models
+    index = CoverageIndex(('', v) for v in tool_vehicles)
+    return index.coverage('', target_make, target_models, target_start, target_end)
 
 def main():
     semantic_path = '/Users/jeremysamuels/Documents/study-dashboard/data/coverage_matrix/unified_semantic_coverage.json'
@@ -68,6 +46,9 @@ def main():
     semantic_data = load_json(semantic_path)
     tools_data = load_json(tools_path)
     
+    # Interval trees per tool under each make/model, built once for every group
+    index = CoverageIndex.from_tools_data(tools_data)
+    
     matrix = []
     
     # Iterate through semantic architectures (The "Requirements")
@@ -82,31 +63,22 @@ def main():
             "gap_assessment": ""
         }
         
-        # Check all tools against this group
-        for tool_name, tool_info in tools_data.get('coverage', {}).items():
-            coverage_list = tool_info.get('derived_vehicle_coverage', [])
-            if not coverage_list:
-                continue
-                
-            matches = check_coverage(
-                coverage_list, 
-                group.get('make', ''), 
-                group.get('models', []), 
-                group.get('years', '')
-            )
+        # Check all tools against this group (one index query instead of a scan per tool)
+        target_start, target_end = parse_year_range(group.get('years', ''))
+        coverage = index.lookup(group.get('make', ''), group.get('models', []), target_start, target_end)
+        for tool_name, matches in coverage.items():
+            tool_info = tools_data['coverage'][tool_name]
+            # Deduplicate functions
+            funcs = list(set(tool_info.get('functions', [])))
+            # Extract chip source if possible
+            chips = list(set([m.get('via_chip', 'unknown') for m in matches]))
             
-            if matches:
-                # Deduplicate functions
-                funcs = list(set(tool_info.get('functions', [])))
-                # Extract chip source if possible
-                chips = list(set([m.get('via_chip', 'unknown') for m in matches]))
-                
-                entry["tools_claiming_coverage"].append({
-                    "tool_name": tool_name.strip(), # Clean up long names if needed?
-                    "matched_models": len(matches),
-                    "via_chips": chips,
-                    "functions": funcs
-                })
+            entry["tools_claiming_coverage"].append({
+                "tool_name": tool_name.strip(), # Clean up long names if needed?
+                "matched_models": len(matches),
+                "via_chips": chips,
+                "functions": funcs
+            })
         
         # Compute Assessment
         tool_count = len(entry["tools_claiming_coverage"])
@@ -8,33 +8,19 @@ Usage:
 """
 
 import json
-import subprocess
 import re
 from pathlib import Path
 from collections import defaultdict
 
+from d1_client import D1Error, connect
+
 
 def run_d1_query(query, remote=True):
     """Execute a D1 query and return results."""
-    cmd = [
-        "wrangler", "d1", "execute", "locksmith-db",
-        "--remote" if remote else "--local",
-        "--command", query,
-        "--json"
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True, cwd="/Users/jeremysamuels/Documents/study-dashboard/api")
-    if result.returncode != 0:
-        print(f"Error: {result.stderr}")
-        return None
-    
     try:
-        # Parse the JSON output
-        data = json.loads(result.stdout)
-        if isinstance(data, list) and len(data) > 0:
-            return data[0].get('results', [])
-        return []
-    except json.JSONDecodeError:
-        print(f"Failed to parse JSON: {result.stdout[:500]}")
+        return connect(remote=remote).query(query)
+    except D1Error as e:
+        print(f"Error: {e}")
         return None
 
 
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Tool x Vehicle x Year Coverage Index
+
+Answers coverage questions against the derived tool coverage matrix without
+rescanning every vehicle entry of every tool:
+
+    which tools cover make/model/year       index.tools_covering('BMW', 'X5', 2021)
+    which vehicles does tool X cover        index.vehicles_for_tool('Autel IM608')
+    gap list for tool X                     index.year_gaps('Autel IM608', 'BMW', 'X5', 2010, 2025)
+
+Entries are grouped by canonical (lowercased) make and model, with one
+static interval tree over year ranges per tool under each model, so a year
+query is O(log n + k). Make and model lookups keep the fuzzy rule the gap
+analysis has always used (either string contains the other); the fuzzy
+resolution runs once over the distinct keys and is cached per query string.
+
+Usage:
+    python3 scripts/coverage_index.py --make BMW --model X5 --year 2021
+    python3 scripts/coverage_index.py --tool "Autel IM608" --make BMW --model X5 --gaps 2010-2025
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+BASE_DIR = Path(__file__).parent.parent
+TOOLS_PATH = BASE_DIR / "data" / "coverage_matrix" / "aks_derived_coverage.json"
+
+# Defaults the gap analysis applies to entries without a year range
+DEFAULT_YEAR_START = 0
+DEFAULT_YEAR_END = 2026
+
+
+def canonical_key(name: str) -> str:
+    return name.lower()
+
+
+def fuzzy_match(query: str, key: str) -> bool:
+    """The coverage matrix's make/model rule: either string contains the other."""
+    return query in key or key in query
+
+
+class IntervalTree:
+    """
+    Static interval tree over closed [start, end] ranges.
+
+    Intervals are sorted by start and laid out as an implicit balanced tree
+    (the middle of each slice is the node), each node carrying the largest
+    end in its subtree, so subtrees that end before the query are skipped.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, Any]]):
+        items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self.starts = [item[0] for item in items]
+        self.ends = [item[1] for item in items]
+        self.values = [item[2] for item in items]
+        self.max_end = list(self.ends)
+        self._build(0, len(items))
+
+    def _build(self, lo: int, hi: int) -> Optional[int]:
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        best = self.ends[mid]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > best:
+                best = child
+        self.max_end[mid] = best
+        return best
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def positions(self, start: int, end: int) -> List[int]:
+        """Sorted positions of every interval overlapping [start, end]."""
+        found = []
+        stack = [(0, len(self.starts))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_end[mid] < start:
+                continue
+            # The right subtree starts no earlier than mid, so it is pruned with it
+            if self.starts[mid] <= end:
+                stack.append((mid + 1, hi))
+                if self.ends[mid] >= start:
+                    found.append(mid)
+            stack.append((lo, mid))
+        found.sort()
+        return found
+
+    def overlapping(self, start: int, end: int) -> List[Any]:
+        """Values of every interval overlapping [start, end], in start order."""
+        return [self.values[i] for i in self.positions(start, end)]
+
+    def stab(self, year: int) -> List[Any]:
+        return self.overlapping(year, year)
+
+    def ranges(self, start: int, end: int) -> List[Tuple[int, int]]:
+        """(start, end) of every interval overlapping [start, end], in start order."""
+        return [(self.starts[i], self.ends[i]) for i in self.positions(start, end)]
+
+
+def year_holes(ranges: Iterable[Tuple[int, int]], start: int, end: int) -> List[Tuple[int, int]]:
+    """Sub-ranges of [start, end] not covered by any of the ranges (integer years)."""
+    holes = []
+    cursor = start
+    for range_start, range_end in sorted(ranges):
+        if range_start > cursor:
+            holes.append((cursor, min(range_start - 1, end)))
+        cursor = max(cursor, range_end + 1)
+        if cursor > end:
+            break
+    if cursor <= end:
+        holes.append((cursor, end))
+    return holes
+
+
+class CoverageIndex:
+    """Per-tool interval trees over year ranges, keyed by canonical make and model."""
+
+    def __init__(self, records: Iterable[Tuple[str, dict]],
+                 make_key: Callable[[str], str] = canonical_key,
+                 model_key: Callable[[str], str] = canonical_key,
+                 default_start: int = DEFAULT_YEAR_START, default_end: int = DEFAULT_YEAR_END):
+        """
+        Args:
+            records: (tool, vehicle entry) pairs; entries carry make, model,
+                     year_start and year_end like derived_vehicle_coverage
+        """
+        self.make_key = make_key
+        self.model_key = model_key
+        self.entries: List[dict] = []
+        self.tools: List[str] = []
+        intervals = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        by_tool = defaultdict(list)
+
+        for tool, entry in records:
+            position = len(self.entries)
+            self.entries.append(entry)
+            if tool not in by_tool:
+                self.tools.append(tool)
+            by_tool[tool].append(position)
+            make = make_key(entry['make'])
+            model = model_key(entry['model'])
+            start = entry.get('year_start', default_start)
+            end = entry.get('year_end', default_end)
+            intervals[make][model][tool].append((start, end, position))
+
+        # make -> model -> tool -> IntervalTree of entry positions
+        self._trees: Dict[str, Dict[str, Dict[str, IntervalTree]]] = {
+            make: {model: {tool: IntervalTree(items) for tool, items in tools.items()}
+                   for model, tools in models.items()}
+            for make, models in intervals.items()
+        }
+        self._by_tool: Dict[str, List[int]] = dict(by_tool)
+        self._match_cache: Dict[Tuple[Optional[str], str], List[str]] = {}
+
+    @classmethod
+    def from_tools_data(cls, tools_data: dict, **kwargs) -> 'CoverageIndex':
+        """Index an aks_derived_coverage.json document."""
+        return cls(((tool_name, v)
+                    for tool_name, tool_info in tools_data.get('coverage', {}).items()
+                    for v in tool_info.get('derived_vehicle_coverage', []) or []), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # ------------------------------------------------------------------
+    # Fuzzy key resolution (cached per query string)
+    # ------------------------------------------------------------------
+
+    def _makes(self, make: str) -> List[str]:
+        query = self.make_key(make)
+        cache_key = (None, query)
+        if cache_key not in self._match_cache:
+            self._match_cache[cache_key] = [k for k in self._trees if fuzzy_match(query, k)]
+        return self._match_cache[cache_key]
+
+    def _models(self, make_key: str, model: str) -> List[str]:
+        query = self.model_key(model)
+        cache_key = (make_key, query)
+        if cache_key not in self._match_cache:
+            self._match_cache[cache_key] = [k for k in self._trees[make_key] if fuzzy_match(query, k)]
+        return self._match_cache[cache_key]
+
+    def _trees_for(self, make: str, models: Sequence[str]):
+        """(tool, tree) for every make/model key matching the query."""
+        for make_key in self._makes(make):
+            seen = set()
+            for model in models:
+                for model_key in self._models(make_key, model):
+                    if model_key in seen:
+                        continue
+                    seen.add(model_key)
+                    yield from self._trees[make_key][model_key].items()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def lookup(self, make: str, models: Sequence[str], year_start: int,
+               year_end: int) -> Dict[str, List[dict]]:
+        """
+        Entries overlapping the target group, per tool.
+
+        Returns:
+            dict: tool -> matching entries, tools and entries both in input order
+        """
+        positions = defaultdict(set)
+        for tool, tree in self._trees_for(make, models):
+            positions[tool].update(tree.overlapping(year_start, year_end))
+        return {tool: [self.entries[p] for p in sorted(positions[tool])]
+                for tool in self.tools if positions.get(tool)}
+
+    def coverage(self, tool: str, make: str, models: Sequence[str],
+                 year_start: int, year_end: int) -> List[dict]:
+        """Entries of one tool overlapping the target group."""
+        return self.lookup(make, models, year_start, year_end).get(tool, [])
+
+    def tools_covering(self, make: str, model: str, year: int) -> List[str]:
+        """Tools with any entry covering make/model in the given year."""
+        return list(self.lookup(make, [model], year, year))
+
+    def vehicles_for_tool(self, tool: str) -> List[dict]:
+        """Every vehicle entry of a tool."""
+        return [self.entries[p] for p in self._by_tool.get(tool, [])]
+
+    def year_gaps(self, tool: str, make: str, model: str,
+                  year_start: int, year_end: int) -> List[Tuple[int, int]]:
+        """Year ranges within [year_start, year_end] the tool does not cover for make/model."""
+        ranges = [r for t, tree in self._trees_for(make, [model]) if t == tool
+                  for r in tree.ranges(year_start, year_end)]
+        return year_holes(ranges, year_start, year_end)
+
+    def uncovered(self, tool: str, targets: Iterable[Tuple[str, Sequence[str], int, int]]) -> List[Tuple]:
+        """Gap list for a tool: the (make, models, start, end) targets it has no entry for."""
+        return [target for target in targets if not self.coverage(tool, *target)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query tool x vehicle x year coverage')
+    parser.add_argument('--input', '-i', default=str(TOOLS_PATH), help='aks_derived_coverage.json')
+    parser.add_argument('--tool', '-t', help='Restrict to one tool (required for --gaps)')
+    parser.add_argument('--make', help='Vehicle make')
+    parser.add_argument('--model', help='Vehicle model')
+    parser.add_argument('--year', type=int, help='Model year')
+    parser.add_argument('--gaps', help='Year range to check for gaps, e.g. 2010-2025')
+    args = parser.parse_args()
+
+    with open(args.input, 'r') as f:
+        index = CoverageIndex.from_tools_data(json.load(f))
+    print(f"Indexed {len(index)} vehicle entries across {len(index.tools)} tools")
+
+    if args.gaps:
+        if not (args.tool and args.make and args.model):
+            parser.error('--gaps needs --tool, --make and --model')
+        start, end = (int(y) for y in args.gaps.split('-'))
+        holes = index.year_gaps(args.tool, args.make, args.model, start, end)
+        print(f"{args.tool} gaps for {args.make} {args.model} {start}-{end}:")
+        for hole_start, hole_end in holes:
+            print(f"  {hole_start}-{hole_end}")
+        if not holes:
+            print("  none")
+    elif args.make and args.model and args.year:
+        tools = index.tools_covering(args.make, args.model, args.year)
+        if args.tool:
+            tools = [t for t in tools if t == args.tool]
+        print(f"{len(tools)} tools cover {args.make} {args.model} {args.year}:")
+        for tool in tools:
+            print(f"  {tool}")
+    elif args.tool:
+        vehicles = index.vehicles_for_tool(args.tool)
+        print(f"{args.tool} covers {len(vehicles)} vehicle entries:")
+        for v in vehicles:
+            print(f"  {v['make']} {v['model']} {v.get('year_start', '?')}-{v.get('year_end', '?')}")
+    else:
+        parser.error('give --tool, or --make/--model/--year')
+
+
+if __name__ == "__main__":
+    main()
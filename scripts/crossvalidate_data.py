@@ -8,6 +8,8 @@ Combines data from all authoritative sources:
 4. temp_transponder.txt - Chip types, clonability, tools
 """
 
+import argparse
+import heapq
 import json
 import csv
 import re
@@ -16,6 +18,8 @@ from pathlib import Path
 from collections import defaultdict
 from datetime import datetime
 
+from vehicle_identity import get_resolver
+
 # Paths
 BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / "data"
@@ -23,97 +27,125 @@ IMPORTS_DIR = DATA_DIR / "imports"
 SCRAPED_DIR = DATA_DIR / "scraped_sources"
 OUTPUT_DIR = DATA_DIR / "migrations"
 
-def normalize_make(make: str) -> str:
-    """Normalize make names for cross-referencing."""
-    if not make:
-        return ""
-    make = make.strip().lower()
-    # Handle common variations
-    normalizations = {
-        "mercedes-benz": "mercedes",
-        "mercedes benz": "mercedes",
-        "mercedes": "mercedes",
-        "chevy": "chevrolet",
-        "gmc": "gmc",
-        "cadillac": "cadillac",
-        "lincoln": "lincoln",
-        "infiniti": "infiniti",
-        "mitsubishi": "mitsubishi",
-        "mltsubishi": "mitsubishi",  # typo fix
-    }
-    return normalizations.get(make, make)
+# Raw make/model strings resolve to canonical vehicle ids once; every join below is on ids
+RESOLVER = get_resolver()
 
-def normalize_model(model: str) -> str:
-    """Normalize model names."""
-    if not model:
-        return ""
-    model = model.strip()
-    # Remove year suffixes like "RAV4 2013 -"
-    model = re.sub(r'\s+\d{4}\s*-?\s*$', '', model)
-    # Remove trim suffixes for matching
-    model = re.sub(r'\s+(EX|LX|Sport|Limited|SE|XLE|SR|SV|SL)$', '', model, flags=re.IGNORECASE)
-    return model
+# Output keeps the spellings of the string-keyed merge: the lower-cased make
+# (these variants folded) and model with year/trim suffixes dropped, title-cased
+DISPLAY_MAKES = {
+    "mercedes-benz": "mercedes",
+    "mercedes benz": "mercedes",
+    "chevy": "chevrolet",
+    "mltsubishi": "mitsubishi",  # typo fix
+}
+_display_keys = {}
 
-def load_fcc_data():
+def resolve_vehicle(make, model):
+    """Vehicle id of a raw make/model; the first spelling seen becomes its display key."""
+    vehicle_id = RESOLVER.resolve(make or '', model or '')
+    if vehicle_id not in _display_keys:
+        make_key = (make or '').strip().lower()
+        model_key = re.sub(r'\s+\d{4}\s*-?\s*$', '', (model or '').strip())
+        model_key = re.sub(r'\s+(EX|LX|Sport|Limited|SE|XLE|SR|SV|SL)$', '', model_key, flags=re.IGNORECASE)
+        _display_keys[vehicle_id] = (DISPLAY_MAKES.get(make_key, make_key), model_key.lower())
+    return vehicle_id
+
+def display_key(vehicle_id):
+    """(make, model) as the string-keyed merge spelled them (lower-case)."""
+    return _display_keys[vehicle_id]
+
+# ============================================================
+# Source loaders
+#
+# Each loader keeps records as vehicle id -> [(year_start, year_end, entry)]
+# in file order instead of copying every entry under each year of its range.
+# explode() rebuilds the per-year (vehicle id, year) index when it is needed.
+# ============================================================
+
+def add_interval(indexed, vehicle_id, year_start, year_end, entry):
+    """Record an entry for an inclusive year range (empty ranges are dropped, as before)."""
+    if year_start <= year_end:
+        indexed[vehicle_id].append((year_start, year_end, entry))
+
+def explode(intervals):
+    """Per-year index (vehicle id, year) -> [entries] of an interval index."""
+    indexed = defaultdict(list)
+    for vehicle_id, ranges in intervals.items():
+        for year_start, year_end, entry in ranges:
+            for year in range(year_start, year_end + 1):
+                indexed[(vehicle_id, year)].append(entry)
+    return indexed
+
+def count_vehicle_years(intervals):
+    """Number of distinct vehicle-years covered by an interval index."""
+    total = 0
+    for ranges in intervals.values():
+        covered_to = None
+        for year_start, year_end, _ in sorted(ranges, key=lambda r: (r[0], r[1])):
+            if covered_to is not None and year_start <= covered_to:
+                if year_end > covered_to:
+                    total += year_end - covered_to
+                    covered_to = year_end
+            else:
+                total += year_end - year_start + 1
+                covered_to = year_end
+    return total
+
+def load_fcc_intervals():
     """Load FCC cross-reference data."""
     fcc_path = IMPORTS_DIR / "fcc_cross_reference.json"
     with open(fcc_path, 'r') as f:
         data = json.load(f)
     
-    # Index by (make, model, year)
+    # Index by vehicle id -> year ranges
     indexed = defaultdict(list)
     for record in data.get('cross_references', []):
-        make = normalize_make(record.get('make', ''))
-        model = normalize_model(record.get('model', ''))
+        vehicle_id = resolve_vehicle(record.get('make', ''), record.get('model', ''))
         year_start = record.get('year_start', 0)
         year_end = record.get('year_end', 0)
         
-        for year in range(year_start, year_end + 1):
-            key = (make, model.lower(), year)
-            indexed[key].append({
-                'fcc_id': record.get('fcc_id', '').split('\n')[0],  # Take first if multiple
-                'frequency': record.get('frequency'),
-                'battery': record.get('battery'),
-                'chip': record.get('chip'),
-                'product_item_num': record.get('product_item_num'),
-            })
+        add_interval(indexed, vehicle_id, year_start, year_end, {
+            'fcc_id': record.get('fcc_id', '').split('\n')[0],  # Take first if multiple
+            'frequency': record.get('frequency'),
+            'battery': record.get('battery'),
+            'chip': record.get('chip'),
+            'product_item_num': record.get('product_item_num'),
+        })
     
     print(f"Loaded {len(data.get('cross_references', []))} FCC records")
     return indexed
 
-def load_aks_data():
+def load_aks_intervals():
     """Load AKS vehicle specs data."""
     aks_path = IMPORTS_DIR / "aks_vehicles.json"
     with open(aks_path, 'r') as f:
         data = json.load(f)
     
-    # Index by (make, model, year)
+    # Index by vehicle id -> year ranges
     indexed = defaultdict(list)
     for record in data.get('vehicle_enrichments', []):
-        make = normalize_make(record.get('make', ''))
-        model = normalize_model(record.get('model', ''))
+        vehicle_id = resolve_vehicle(record.get('make', ''), record.get('model', ''))
         specs = record.get('specs', {})
+        entry = {
+            'lishi': specs.get('lishi'),
+            'mechanical_key': specs.get('mechanical_key'),
+            'transponder_key': specs.get('transponder_key'),
+            'ilco_ref': specs.get('ilco_ref'),
+            'jma_ref': specs.get('jma_ref'),
+            'silca_ref': specs.get('silca_ref'),
+            'code_series': specs.get('code_series'),
+            'spaces': specs.get('spaces'),
+            'depths': specs.get('depths'),
+        }
         
         for year_range in record.get('year_ranges', []):
             year_start, year_end = year_range
-            for year in range(year_start, year_end + 1):
-                key = (make, model.lower(), year)
-                indexed[key].append({
-                    'lishi': specs.get('lishi'),
-                    'mechanical_key': specs.get('mechanical_key'),
-                    'transponder_key': specs.get('transponder_key'),
-                    'ilco_ref': specs.get('ilco_ref'),
-                    'jma_ref': specs.get('jma_ref'),
-                    'silca_ref': specs.get('silca_ref'),
-                    'code_series': specs.get('code_series'),
-                    'spaces': specs.get('spaces'),
-                    'depths': specs.get('depths'),
-                })
+            add_interval(indexed, vehicle_id, year_start, year_end, entry)
     
     print(f"Loaded {len(data.get('vehicle_enrichments', []))} AKS records")
     return indexed
 
-def load_transponder_data():
+def load_transponder_intervals():
     """Load transponder chip data from CSV-like TXT."""
     transponder_path = SCRAPED_DIR / "raw_research" / "temp_transponder.txt"
     indexed = defaultdict(list)
@@ -122,34 +154,24 @@ def load_transponder_data():
         with open(transponder_path, 'r') as f:
             content = f.read()
         
-        # Parse CSV-like format (all on one line, space-separated)
-        lines = content.strip().split('\n')
-        for line in lines:
-            if not line.strip():
-                continue
-            # Parse the structured data
-            parts = line.split(' ')
-            # The file has a specific format - extract key fields
-            import re
-            records = re.findall(r'(\w+),([^,]+),(\d{4}),(\d{4}),([^,]+),([^,]+),(\w+)', content)
-            for record in records:
-                make, model, year_start, year_end, chip_type, chip_family, clonable = record[:7]
-                make = normalize_make(make)
-                model_norm = normalize_model(model)
-                for year in range(int(year_start), int(year_end) + 1):
-                    key = (make.lower(), model_norm.lower(), year)
-                    indexed[key].append({
-                        'chip_type': chip_type,
-                        'chip_family': chip_family,
-                        'clonable': clonable.lower() == 'yes',
-                    })
+        # Parse CSV-like format; the records are matched across the whole file
+        # (once - matching it again per line only appended duplicates that the
+        # merge never reads, since it takes the first entry per vehicle-year)
+        records = re.findall(r'(\w+),([^,]+),(\d{4}),(\d{4}),([^,]+),([^,]+),(\w+)', content)
+        for record in records:
+            make, model, year_start, year_end, chip_type, chip_family, clonable = record[:7]
+            add_interval(indexed, resolve_vehicle(make, model), int(year_start), int(year_end), {
+                'chip_type': chip_type,
+                'chip_family': chip_family,
+                'clonable': clonable.lower() == 'yes',
+            })
     except FileNotFoundError:
         print("Transponder file not found, skipping...")
     
-    print(f"Loaded transponder data for {len(indexed)} vehicle-years")
+    print(f"Loaded transponder data for {count_vehicle_years(indexed)} vehicle-years")
     return indexed
 
-def load_crossref_research():
+def load_crossref_intervals():
     """Load OEM→Aftermarket crossref research tables."""
     crossref_path = SCRAPED_DIR / "oem_research" / "crossref_research.txt"
     indexed = defaultdict(list)
@@ -167,112 +189,179 @@ def load_crossref_research():
         
         for match in table_pattern.finditer(content):
             make, model, year_start, year_end, key_type, oem_part, ilco, strattec, jma, keydiy, fcc_id = match.groups()
-            make = normalize_make(make)
-            model_norm = normalize_model(model)
-            for year in range(int(year_start), int(year_end) + 1):
-                key = (make.lower(), model_norm.lower(), year)
-                indexed[key].append({
-                    'key_type': key_type.strip(),
-                    'oem_part_number': oem_part.strip(),
-                    'ilco_part': ilco.strip() if ilco.strip() != '--' else None,
-                    'strattec_part': strattec.strip() if strattec.strip() != '--' else None,
-                    'jma_part': jma.strip() if jma.strip() != '--' else None,
-                    'keydiy_part': keydiy.strip() if keydiy.strip() != '--' else None,
-                    'fcc_id': fcc_id.strip(),
-                })
+            add_interval(indexed, resolve_vehicle(make, model), int(year_start), int(year_end), {
+                'key_type': key_type.strip(),
+                'oem_part_number': oem_part.strip(),
+                'ilco_part': ilco.strip() if ilco.strip() != '--' else None,
+                'strattec_part': strattec.strip() if strattec.strip() != '--' else None,
+                'jma_part': jma.strip() if jma.strip() != '--' else None,
+                'keydiy_part': keydiy.strip() if keydiy.strip() != '--' else None,
+                'fcc_id': fcc_id.strip(),
+            })
     except FileNotFoundError:
         print("Crossref research file not found, skipping...")
     
-    print(f"Loaded crossref data for {len(indexed)} vehicle-years")
+    print(f"Loaded crossref data for {count_vehicle_years(indexed)} vehicle-years")
     return indexed
 
-def merge_all_sources():
-    """Merge all data sources into unified records."""
-    print("\n=== Loading Data Sources ===")
-    fcc_data = load_fcc_data()
-    aks_data = load_aks_data()
-    transponder_data = load_transponder_data()
-    crossref_data = load_crossref_research()
+def load_fcc_data():
+    """FCC data indexed by (vehicle id, year)."""
+    return explode(load_fcc_intervals())
+
+def load_aks_data():
+    """AKS data indexed by (vehicle id, year)."""
+    return explode(load_aks_intervals())
+
+def load_transponder_data():
+    """Transponder data indexed by (vehicle id, year)."""
+    return explode(load_transponder_intervals())
+
+def load_crossref_research():
+    """Crossref research data indexed by (vehicle id, year)."""
+    return explode(load_crossref_intervals())
+
+
+# ============================================================
+# Merge
+# ============================================================
+
+def sweep_segments(sources):
+    """
+    Sweep-line join of per-source year ranges for one vehicle.
+
+    Args:
+        sources: one [(year_start, year_end, entry)] list per source, in file order
+
+    Yields:
+        (segment_start, segment_end, [first entry per source covering the
+        segment, or None]) for every maximal year span where that choice is
+        constant and at least one source has data. "First" is file order,
+        matching what the per-year index's entries[0] used to return.
+    """
+    boundaries = sorted({y for ranges in sources for r in ranges for y in (r[0], r[1] + 1)})
+    ordered = [sorted(((r[0], i, r[1], r[2]) for i, r in enumerate(ranges)), key=lambda r: (r[0], r[1]))
+               for ranges in sources]
+    cursors = [0] * len(sources)
+    active = [[] for _ in sources]  # heaps of (file position, year_end, entry)
+    
+    for segment_start, next_boundary in zip(boundaries, boundaries[1:]):
+        chosen = []
+        for s, ranges in enumerate(ordered):
+            while cursors[s] < len(ranges) and ranges[cursors[s]][0] <= segment_start:
+                _, position, year_end, entry = ranges[cursors[s]]
+                heapq.heappush(active[s], (position, year_end, entry))
+                cursors[s] += 1
+            # Lazily drop ranges that ended before this segment
+            while active[s] and active[s][0][1] < segment_start:
+                heapq.heappop(active[s])
+            chosen.append(active[s][0][2] if active[s] else None)
+        if any(entry is not None for entry in chosen):
+            yield segment_start, next_boundary - 1, chosen
+
+def merge_record(key, fcc, aks, trans, cross):
+    """Merged record (and fcc_id conflict, if any) for one (vehicle id, year)."""
+    vehicle_id, year = key
+    make, model = display_key(vehicle_id)
+    
+    merged = {
+        'make': make.title(),
+        'model': model.title(),
+        'year_start': year,
+        'year_end': year,
+        # From FCC (primary for electronics)
+        'fcc_id': fcc.get('fcc_id') or cross.get('fcc_id'),
+        'frequency': fcc.get('frequency'),
+        'battery': fcc.get('battery'),
+        # From AKS (primary for mechanical)
+        'lishi_tool': aks.get('lishi'),
+        'key_blank': aks.get('mechanical_key'),
+        'ilco_ref': aks.get('ilco_ref') or cross.get('ilco_part'),
+        'jma_ref': aks.get('jma_ref') or cross.get('jma_part'),
+        'silca_ref': aks.get('silca_ref'),
+        'code_series': aks.get('code_series'),
+        # From Transponder data (primary for chip info)
+        'chip_type': fcc.get('chip') or trans.get('chip_type'),
+        'chip_family': trans.get('chip_family'),
+        'clonable': trans.get('clonable'),
+        # From Crossref (primary for OEM parts)
+        'oem_part_number': cross.get('oem_part_number'),
+        'strattec_part': cross.get('strattec_part'),
+        'keydiy_part': cross.get('keydiy_part'),
+        'key_type': cross.get('key_type'),
+        # Source tracking
+        'sources': [],
+    }
     
-    # Collect all unique keys
-    all_keys = set()
-    all_keys.update(fcc_data.keys())
-    all_keys.update(aks_data.keys())
-    all_keys.update(transponder_data.keys())
-    all_keys.update(crossref_data.keys())
+    # Track conflicting data
+    conflict = None
+    if fcc.get('fcc_id') and cross.get('fcc_id') and fcc.get('fcc_id') != cross.get('fcc_id'):
+        conflict = {
+            'key': (make, model, year),
+            'field': 'fcc_id',
+            'fcc_value': fcc.get('fcc_id'),
+            'crossref_value': cross.get('fcc_id'),
+        }
     
-    print(f"\n=== Merging {len(all_keys)} unique vehicle-year combinations ===")
+    # Track sources
+    if fcc:
+        merged['sources'].append('fcc_cross_reference')
+    if aks.get('lishi'):
+        merged['sources'].append('aks_vehicles')
+    if trans.get('chip_type'):
+        merged['sources'].append('transponder_data')
+    if cross.get('oem_part_number'):
+        merged['sources'].append('crossref_research')
+    
+    merged['source_count'] = len(merged['sources'])
+    merged['sources'] = ','.join(merged['sources'])
+    
+    return merged, conflict
+
+def merge_all_sources(join='range'):
+    """
+    Merge all data sources into unified records.
+    
+    join='range' (default) sweeps each vehicle's year ranges across the four
+    sources; join='exploded' is the original per-year index merge. Both emit
+    the same records in the same make/model/year order.
+    """
+    print("\n=== Loading Data Sources ===")
+    sources = [load_fcc_intervals(), load_aks_intervals(),
+               load_transponder_intervals(), load_crossref_intervals()]
     
     merged_records = []
     conflicts = []
     
-    for key in sorted(all_keys):
-        make, model, year = key
-        
-        # Get data from each source
-        fcc_entries = fcc_data.get(key, [{}])
-        aks_entries = aks_data.get(key, [{}])
-        transponder_entries = transponder_data.get(key, [{}])
-        crossref_entries = crossref_data.get(key, [{}])
-        
+    def emit(key, fcc, aks, trans, cross):
         # Priority merge: FCC > AKS > Transponder > Crossref
-        fcc = fcc_entries[0] if fcc_entries else {}
-        aks = aks_entries[0] if aks_entries else {}
-        trans = transponder_entries[0] if transponder_entries else {}
-        cross = crossref_entries[0] if crossref_entries else {}
-        
-        merged = {
-            'make': make.title(),
-            'model': model.title(),
-            'year_start': year,
-            'year_end': year,
-            # From FCC (primary for electronics)
-            'fcc_id': fcc.get('fcc_id') or cross.get('fcc_id'),
-            'frequency': fcc.get('frequency'),
-            'battery': fcc.get('battery'),
-            # From AKS (primary for mechanical)
-            'lishi_tool': aks.get('lishi'),
-            'key_blank': aks.get('mechanical_key'),
-            'ilco_ref': aks.get('ilco_ref') or cross.get('ilco_part'),
-            'jma_ref': aks.get('jma_ref') or cross.get('jma_part'),
-            'silca_ref': aks.get('silca_ref'),
-            'code_series': aks.get('code_series'),
-            # From Transponder data (primary for chip info)
-            'chip_type': fcc.get('chip') or trans.get('chip_type'),
-            'chip_family': trans.get('chip_family'),
-            'clonable': trans.get('clonable'),
-            # From Crossref (primary for OEM parts)
-            'oem_part_number': cross.get('oem_part_number'),
-            'strattec_part': cross.get('strattec_part'),
-            'keydiy_part': cross.get('keydiy_part'),
-            'key_type': cross.get('key_type'),
-            # Source tracking
-            'sources': [],
-        }
-        
-        # Track conflicting data
-        if fcc.get('fcc_id') and cross.get('fcc_id') and fcc.get('fcc_id') != cross.get('fcc_id'):
-            conflicts.append({
-                'key': key,
-                'field': 'fcc_id',
-                'fcc_value': fcc.get('fcc_id'),
-                'crossref_value': cross.get('fcc_id'),
-            })
-        
-        # Track sources
-        if fcc:
-            merged['sources'].append('fcc_cross_reference')
-        if aks.get('lishi'):
-            merged['sources'].append('aks_vehicles')
-        if trans.get('chip_type'):
-            merged['sources'].append('transponder_data')
-        if cross.get('oem_part_number'):
-            merged['sources'].append('crossref_research')
+        merged, conflict = merge_record(key, fcc, aks, trans, cross)
+        merged_records.append(merged)
+        if conflict:
+            conflicts.append(conflict)
+    
+    if join == 'exploded':
+        per_year = [explode(intervals) for intervals in sources]
+        all_keys = set()
+        for indexed in per_year:
+            all_keys.update(indexed.keys())
         
-        merged['source_count'] = len(merged['sources'])
-        merged['sources'] = ','.join(merged['sources'])
+        print(f"\n=== Merging {len(all_keys)} unique vehicle-year combinations ===")
+        for key in sorted(all_keys, key=lambda k: (display_key(k[0]), k[1])):
+            emit(key, *(indexed[key][0] if key in indexed else {} for indexed in per_year))
+    else:
+        vehicles = set()
+        for intervals in sources:
+            vehicles.update(intervals.keys())
+        segments = [(vehicle, segment)
+                    for vehicle in sorted(vehicles, key=display_key)
+                    for segment in sweep_segments([intervals.get(vehicle, []) for intervals in sources])]
         
-        merged_records.append(merged)
+        total = sum(end - start + 1 for _, (start, end, _) in segments)
+        print(f"\n=== Merging {total} unique vehicle-year combinations ({len(segments)} year spans) ===")
+        for vehicle_id, (start, end, chosen) in segments:
+            entries = [entry if entry is not None else {} for entry in chosen]
+            for year in range(start, end + 1):
+                emit((vehicle_id, year), *entries)
     
     print(f"Created {len(merged_records)} merged records")
     print(f"Found {len(conflicts)} data conflicts requiring review")
@@ -391,12 +480,18 @@ def generate_summary_report(records, conflicts):
             print(f"  ... and {len(conflicts) - 10} more")
 
 def main():
+    parser = argparse.ArgumentParser(description='Cross-validate and merge vehicle data sources')
+    parser.add_argument('--join', choices=['range', 'exploded'], default='range',
+                        help='range: sweep-line join over year ranges (default); '
+                             'exploded: original per-year index merge')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("ULTIMATE DATABASE CROSS-VALIDATION")
     print("=" * 60)
     
     # Merge all sources
-    records, conflicts = merge_all_sources()
+    records, conflicts = merge_all_sources(join=args.join)
     
     # Generate SQL migration
     sql_path = generate_sql_migration(records)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Batched D1 Client
+
+Runs SQL against the locksmith-db D1 database in as few round trips as
+possible instead of spawning one `npx wrangler d1 execute` per statement.
+Statements are packed into size-capped multi-statement payloads (one
+wrangler process per payload), transient failures (timeouts, network
+errors, 429/5xx from the API, busy database) are retried with exponential
+backoff, and a payload that fails outright is split in half until the bad
+statement is isolated, so one broken row never costs the rest of the batch.
+
+The sqlite backend runs the same calls against a local SQLite file. By
+default that is the mirror maintained by d1_mirror.py (data/locksmith.db),
+so scripts run offline against pulled D1 data and their writes are pushed
+back later with `d1_mirror.py push`.
+
+Backends:
+    wrangler   npx wrangler d1 execute locksmith-db --remote   (default)
+    sqlite     local SQLite database (D1_SQLITE_PATH, default data/locksmith.db)
+
+The backend can also be picked with D1_BACKEND=wrangler|sqlite.
+
+Usage:
+    from d1_client import connect
+
+    d1 = connect()
+    rows = d1.query("SELECT COUNT(*) AS cnt FROM vehicles")
+    results, failures = d1.execute_many(statements)
+"""
+
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+BASE_DIR = Path(__file__).parent.parent
+API_DIR = BASE_DIR / "api"
+DATABASE_NAME = "locksmith-db"
+SQLITE_PATH = BASE_DIR / "data" / "locksmith.db"
+WRANGLER_CMD = ["npx", "wrangler"]
+
+# D1 rejects SQL payloads over 100 KB, and Linux caps a single argv entry at 128 KB.
+MAX_BATCH_BYTES = 90_000
+MAX_BATCH_STATEMENTS = 200
+
+TRANSIENT_ERRORS = re.compile(
+    r"timed? ?out|ETIMEDOUT|ECONNRESET|ECONNREFUSED|ENOTFOUND|EAI_AGAIN|fetch failed|"
+    r"socket hang up|network|rate.?limit|too many requests|\b(?:429|500|502|503|504)\b|"
+    r"overloaded|internal error|SQLITE_BUSY|database is locked",
+    re.IGNORECASE,
+)
+
+Rows = List[dict]
+
+
+class D1Error(Exception):
+    """A D1 call failed. transient=True means retrying may succeed."""
+
+    def __init__(self, message: str, transient: bool = False):
+        super().__init__(message)
+        self.transient = transient
+
+
+def split_batches(statements: Sequence[str], max_bytes: int = MAX_BATCH_BYTES,
+                  max_statements: int = MAX_BATCH_STATEMENTS) -> List[List[int]]:
+    """
+    Group statement indexes into payloads under the byte and statement caps.
+
+    Order is preserved, so statements run in the order they were given. A
+    single statement larger than the cap gets a payload of its own.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    size = 0
+    for i, sql in enumerate(statements):
+        length = len(sql.encode('utf-8')) + 2
+        if current and (size + length > max_bytes or len(current) >= max_statements):
+            batches.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += length
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _clean(sql: str) -> str:
+    return sql.strip().rstrip(';').strip()
+
+
+class D1Client:
+    """Backend-independent batching, retry and failure isolation."""
+
+    backend = "base"
+
+    def __init__(self, max_batch_bytes: int = MAX_BATCH_BYTES,
+                 max_batch_statements: int = MAX_BATCH_STATEMENTS,
+                 retries: int = 3, backoff: float = 1.0):
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_statements = max_batch_statements
+        self.retries = retries
+        self.backoff = backoff
+        self.round_trips = 0
+
+    def _run_batch(self, statements: List[str]) -> List[Rows]:
+        """Run statements as one payload and return the rows of each. Raises D1Error."""
+        raise NotImplementedError
+
+    def _run_with_retry(self, statements: List[str]) -> List[Rows]:
+        attempt = 0
+        while True:
+            self.round_trips += 1
+            try:
+                return self._run_batch(statements)
+            except D1Error as e:
+                if not e.transient or attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                attempt += 1
+                print(f"  D1 transient error, retry {attempt}/{self.retries} in {delay:.1f}s: "
+                      f"{str(e)[-200:]}", file=sys.stderr)
+                time.sleep(delay)
+
+    def _run_isolating(self, indexes: List[int], statements: List[str],
+                       results: List[Optional[Rows]], failures: List[Tuple[int, str]],
+                       prefix: Sequence[str] = ()) -> None:
+        """Run a payload; on failure bisect it so only the bad statements are dropped."""
+        try:
+            rows = self._run_with_retry(list(prefix) + [statements[i] for i in indexes])[len(prefix):]
+        except D1Error as e:
+            if len(indexes) == 1:
+                failures.append((indexes[0], str(e)))
+                return
+            mid = len(indexes) // 2
+            self._run_isolating(indexes[:mid], statements, results, failures, prefix)
+            self._run_isolating(indexes[mid:], statements, results, failures, prefix)
+            return
+        for i, value in zip(indexes, rows):
+            results[i] = value
+
+    def execute_many(self, statements: Iterable[str],
+                     prefix: Sequence[str] = ()) -> Tuple[List[Optional[Rows]], List[Tuple[str, str]]]:
+        """
+        Run many single statements in size-capped batches.
+
+        prefix statements (connection settings such as PRAGMA
+        defer_foreign_keys) are sent at the head of every payload, bisected
+        ones included; they count against the caps and return no rows.
+
+        Returns:
+            tuple: (rows per statement aligned with statements - None where it failed,
+                    list of (statement, error) for every failure)
+        """
+        statements = [_clean(sql) for sql in statements]
+        prefix = [_clean(sql) for sql in prefix]
+        prefix_bytes = sum(len(sql.encode('utf-8')) + 2 for sql in prefix)
+        results: List[Optional[Rows]] = [None] * len(statements)
+        failures: List[Tuple[int, str]] = []
+        for indexes in split_batches(statements, self.max_batch_bytes - prefix_bytes,
+                                     max(1, self.max_batch_statements - len(prefix))):
+            self._run_isolating(indexes, statements, results, failures, prefix)
+        failures.sort()
+        return results, [(statements[i], error) for i, error in failures]
+
+    def query(self, sql: str) -> Rows:
+        """Run one statement and return its rows. Raises D1Error."""
+        return self._run_with_retry([_clean(sql)])[0]
+
+    def execute(self, sql: str) -> bool:
+        """Run one write statement, reporting (not raising) a failure."""
+        try:
+            self.query(sql)
+            return True
+        except D1Error as e:
+            print(f"  D1 ERROR: {str(e)[-300:]}", file=sys.stderr)
+            return False
+
+
+class WranglerD1Client(D1Client):
+    """D1 over `wrangler d1 execute --command`, one process per payload."""
+
+    backend = "wrangler"
+
+    def __init__(self, database: str = DATABASE_NAME, remote: bool = True,
+                 cwd: Path = API_DIR, timeout: int = 120, **kwargs):
+        super().__init__(**kwargs)
+        self.database = database
+        self.remote = remote
+        self.cwd = Path(cwd)
+        self.timeout = timeout
+
+    def _run_batch(self, statements: List[str]) -> List[Rows]:
+        args = WRANGLER_CMD + ["d1", "execute", self.database,
+                               "--remote" if self.remote else "--local",
+                               "--json", "--command", ";\n".join(statements) + ";"]
+        try:
+            result = subprocess.run(args, cwd=str(self.cwd), capture_output=True,
+                                    text=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            raise D1Error(f"wrangler timed out after {self.timeout}s", transient=True)
+        except FileNotFoundError:
+            raise D1Error("wrangler not found (install Node.js and run npm install in api/)")
+
+        if result.returncode != 0:
+            message = (result.stderr.strip() or result.stdout.strip() or 'unknown error')[-1000:]
+            raise D1Error(message, transient=bool(TRANSIENT_ERRORS.search(message)))
+        try:
+            data = json.loads(result.stdout)
+        except json.JSONDecodeError:
+            raise D1Error(f"unparseable wrangler output: {result.stdout[:300]}")
+        if isinstance(data, dict):
+            data = [data]
+
+        rows = [entry.get('results') or [] for entry in data if isinstance(entry, dict)]
+        return rows + [[] for _ in range(len(statements) - len(rows))]
+
+
+class SQLiteD1Client(D1Client):
+    """Offline stand-in: the same calls against a local SQLite database."""
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = ":memory:", **kwargs):
+        super().__init__(**kwargs)
+        self.path = str(path)
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+
+    def _run_batch(self, statements: List[str]) -> List[Rows]:
+        # D1 rolls back a batch if any statement in it fails; mirror that here.
+        rows: List[Rows] = []
+        self.conn.execute("BEGIN")
+        try:
+            for sql in statements:
+                cursor = self.conn.execute(sql)
+                rows.append([dict(r) for r in cursor.fetchall()] if cursor.description else [])
+        except sqlite3.Error as e:
+            self.conn.execute("ROLLBACK")
+            raise D1Error(f"{type(e).__name__}: {e}", transient=bool(TRANSIENT_ERRORS.search(str(e))))
+        self.conn.execute("COMMIT")
+        return rows
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def connect(backend: Optional[str] = None, **kwargs) -> D1Client:
+    """
+    Client for the requested backend (default: D1_BACKEND env var, else wrangler).
+
+    Wrangler-only options (database, remote, cwd, timeout) are ignored by the
+    sqlite backend, so callers can pass them unconditionally.
+    """
+    backend = backend or os.environ.get("D1_BACKEND", "wrangler")
+    if backend == "sqlite":
+        for key in ("database", "remote", "cwd", "timeout"):
+            kwargs.pop(key, None)
+        kwargs.setdefault("path", os.environ.get("D1_SQLITE_PATH", str(SQLITE_PATH)))
+        return SQLiteD1Client(**kwargs)
+    if backend == "wrangler":
+        return WranglerD1Client(**kwargs)
+    raise ValueError(f"Unknown D1 backend: {backend} (expected wrangler or sqlite)")
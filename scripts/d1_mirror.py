@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Local SQLite Mirror of locksmith-db
+
+Pulls D1 tables into data/locksmith.db so audit, dedup and reconcile passes
+run real SQL against a local file in milliseconds instead of paying a
+wrangler round trip per query, and keeps working offline. Edits made to
+the mirror are pushed back as a minimal diff: only rows whose content
+changed since the last pull become INSERT / UPDATE / DELETE statements.
+
+Each pull records a content hash per row (and the column list per table)
+in two bookkeeping tables next to the data:
+
+    _mirror_tables   table -> key columns, columns, row count, pulled_at
+    _mirror_rows     (table, key) -> row hash as of the last pull or push
+
+A row's key is its primary key, or its rowid for tables without one.
+Tables that exist only locally (populate_mock_db.py's) are never touched.
+
+The mirror is also the sqlite backend of d1_client, so scripts built on
+connect() run against it with D1_BACKEND=sqlite, and their writes are then
+pushed with `d1_mirror.py push`.
+
+Usage:
+    python3 scripts/d1_mirror.py pull                    # every D1 table
+    python3 scripts/d1_mirror.py pull refined_pearls     # just some
+    python3 scripts/d1_mirror.py status
+    python3 scripts/d1_mirror.py diff --sql data/migrations/mirror_push.sql
+    python3 scripts/d1_mirror.py push [--dry-run]
+    python3 scripts/d1_mirror.py query "SELECT make, COUNT(*) FROM refined_pearls GROUP BY make"
+
+    from d1_mirror import open_mirror, iter_rows
+    conn = open_mirror()
+    conn.execute("SELECT ...")
+    for pearl in iter_rows('refined_pearls', fallback_export=EXPORT_PATH):
+        ...
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from d1_client import SQLITE_PATH, D1Client, connect
+from sql_writer import sql_literal
+
+MIRROR_PATH = SQLITE_PATH
+
+# Rows per page when pulling, and pages per wrangler call
+PAGE_ROWS = 1000
+PAGES_PER_CALL = 10
+
+TABLES_TABLE = "_mirror_tables"
+ROWS_TABLE = "_mirror_rows"
+
+# D1/SQLite internals and our own bookkeeping are never mirrored
+SKIP_PREFIXES = ("sqlite_", "_cf_", "d1_", "_mirror_")
+
+# Extra indexes for local analysis, created on every mirrored table that has
+# all the columns (D1's own indexes are copied as well)
+ANALYSIS_INDEXES = [
+    ("make", "model", "year_start"),
+    ("make", "model"),
+    ("vehicle_key",),
+    ("fcc_id",),
+    ("source_doc",),
+    ("duplicate_of",),
+    ("category",),
+]
+
+
+class MirrorError(Exception):
+    """The mirror cannot do what was asked without losing data (e.g. unpushed edits)."""
+
+
+class Change(NamedTuple):
+    table: str
+    op: str                      # insert | update | delete
+    key_columns: Tuple[str, ...]
+    key: Tuple[Any, ...]
+    row: Optional[Dict[str, Any]]  # None for deletes
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def row_hash(row: Dict[str, Any]) -> str:
+    """
+    Content hash of a row. NULL columns are left out, so adding a column
+    locally does not make every existing row look changed.
+    """
+    values = {name: value for name, value in row.items() if value is not None}
+    payload = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode()).hexdigest()[:16]
+
+
+def _key_text(key: Sequence[Any]) -> str:
+    return json.dumps(list(key), default=str)
+
+
+def open_mirror(path: Union[str, Path] = MIRROR_PATH, readonly: bool = False) -> sqlite3.Connection:
+    """Connection to the mirror with dict-like rows."""
+    path = Path(path)
+    if readonly:
+        if not path.exists():
+            raise MirrorError(f"No mirror at {path} (run: python3 scripts/d1_mirror.py pull)")
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path))
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLES_TABLE} ("
+                     "name TEXT PRIMARY KEY, key_columns TEXT NOT NULL, columns TEXT NOT NULL, "
+                     "row_count INTEGER, pulled_at TEXT)")
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {ROWS_TABLE} ("
+                     "tbl TEXT NOT NULL, key TEXT NOT NULL, hash TEXT NOT NULL, "
+                     "PRIMARY KEY (tbl, key)) WITHOUT ROWID")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def mirrored_tables(conn: sqlite3.Connection) -> Dict[str, dict]:
+    """table -> {'key_columns', 'columns', 'row_count', 'pulled_at'} for every mirrored table."""
+    try:
+        rows = conn.execute(f"SELECT * FROM {TABLES_TABLE} ORDER BY name").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {r['name']: {'key_columns': tuple(json.loads(r['key_columns'])),
+                        'columns': json.loads(r['columns']),
+                        'row_count': r['row_count'], 'pulled_at': r['pulled_at']}
+            for r in rows}
+
+
+def _local_columns(conn: sqlite3.Connection, table: str) -> List[dict]:
+    return [dict(r) for r in conn.execute(f"PRAGMA table_info({_quote(table)})").fetchall()]
+
+
+# ----------------------------------------------------------------------
+# Pull
+# ----------------------------------------------------------------------
+
+def remote_tables(client: D1Client) -> List[dict]:
+    """name and CREATE statement of every user table in D1."""
+    rows = client.query("SELECT name, sql FROM sqlite_master WHERE type = 'table' ORDER BY name")
+    return [r for r in rows if r.get('sql') and not r['name'].startswith(SKIP_PREFIXES)]
+
+
+def _analysis_indexes(table: str, columns: Iterable[str]) -> List[str]:
+    present = set(columns)
+    created: List[Tuple[str, ...]] = []
+    statements = []
+    for index_columns in ANALYSIS_INDEXES:
+        if not present.issuperset(index_columns):
+            continue
+        if any(existing[:len(index_columns)] == index_columns for existing in created):
+            continue  # already covered by a longer index with the same prefix
+        created.append(index_columns)
+        name = f"idx_mirror_{table}_{'_'.join(index_columns)}"
+        statements.append(f"CREATE INDEX IF NOT EXISTS {_quote(name)} ON {_quote(table)} "
+                          f"({', '.join(_quote(c) for c in index_columns)})")
+    return statements
+
+
+def pull_table(client: D1Client, conn: sqlite3.Connection, table: str, create_sql: str,
+               page_rows: int = PAGE_ROWS, force: bool = False) -> int:
+    """Replace the local copy of one table with D1's. Returns the row count."""
+    if not force and table in mirrored_tables(conn):
+        pending = diff_table(conn, table)
+        if pending:
+            raise MirrorError(f"{table} has {len(pending)} unpushed local changes "
+                              f"(push them first, or pull with --force to discard)")
+
+    info = client.query(f"PRAGMA table_info({_quote(table)})")
+    columns = [c['name'] for c in info]
+    pk = tuple(c['name'] for c in sorted((c for c in info if c.get('pk')), key=lambda c: c['pk']))
+    key_columns = pk or ('rowid',)
+    indexes = client.query(f"SELECT sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+                           f"AND tbl_name = {sql_literal(table)}")
+
+    bounds = client.query(f"SELECT MIN(rowid) AS lo, MAX(rowid) AS hi FROM {_quote(table)}")[0]
+    pages = []
+    if bounds.get('lo') is not None:
+        for start in range(bounds['lo'], bounds['hi'] + 1, page_rows):
+            pages.append(f"SELECT rowid AS __rowid, * FROM {_quote(table)} "
+                         f"WHERE rowid BETWEEN {start} AND {start + page_rows - 1} ORDER BY rowid")
+
+    insert_sql = (f"INSERT INTO {_quote(table)} (rowid, {', '.join(_quote(c) for c in columns)}) "
+                  f"VALUES ({', '.join('?' * (len(columns) + 1))})")
+    count = 0
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+        conn.execute(create_sql)
+        conn.execute(f"DELETE FROM {ROWS_TABLE} WHERE tbl = ?", (table,))
+        for i in range(0, len(pages), PAGES_PER_CALL):
+            results, failures = client.execute_many(pages[i:i + PAGES_PER_CALL])
+            if failures:
+                raise MirrorError(f"Pulling {table} failed: {failures[0][1][-300:]}")
+            for rows in results:
+                conn.executemany(insert_sql, ([r['__rowid']] + [r.get(c) for c in columns] for r in rows))
+                count += len(rows)
+        # Hash rows as SQLite stored them: column affinity turns D1's JSON 1 into 1.0
+        # in a REAL column and '7' into 7 in an INTEGER one, and diff reads them that way
+        conn.executemany(f"INSERT INTO {ROWS_TABLE} (tbl, key, hash) VALUES (?, ?, ?)", (
+            (table, _key_text(key), row_hash(row)) for key, row in _local_rows(conn, table, key_columns, columns)))
+        for index in indexes:
+            conn.execute(index['sql'].replace("CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1)
+                         .replace("CREATE UNIQUE INDEX ", "CREATE UNIQUE INDEX IF NOT EXISTS ", 1))
+        for statement in _analysis_indexes(table, columns):
+            conn.execute(statement)
+        conn.execute(f"INSERT OR REPLACE INTO {TABLES_TABLE} (name, key_columns, columns, row_count, pulled_at) "
+                     f"VALUES (?, ?, ?, ?, ?)",
+                     (table, json.dumps(list(key_columns)), json.dumps(columns), count,
+                      datetime.now().isoformat(timespec='seconds')))
+    return count
+
+
+def pull(client: D1Client, conn: sqlite3.Connection, tables: Optional[Sequence[str]] = None,
+         force: bool = False) -> Dict[str, int]:
+    """Pull the given tables (default: every D1 table). Returns rows per table."""
+    available = {t['name']: t['sql'] for t in remote_tables(client)}
+    wanted = list(tables) if tables else sorted(available)
+    missing = [t for t in wanted if t not in available]
+    if missing:
+        raise MirrorError(f"Not in D1: {', '.join(missing)}")
+    counts = {}
+    for table in wanted:
+        counts[table] = pull_table(client, conn, table, available[table], force=force)
+        print(f"  {table}: {counts[table]} rows")
+    return counts
+
+
+# ----------------------------------------------------------------------
+# Diff and push
+# ----------------------------------------------------------------------
+
+def _schema_changes(conn: sqlite3.Connection, table: str, recorded: List[str]) -> List[str]:
+    """ALTER TABLE statements for columns added locally since the pull."""
+    local = _local_columns(conn, table)
+    names = [c['name'] for c in local]
+    dropped = [c for c in recorded if c not in names]
+    if dropped:
+        raise MirrorError(f"{table}: columns dropped locally ({', '.join(dropped)}); "
+                          f"D1 schema changes like that need a hand-written migration")
+    statements = []
+    for column in local:
+        if column['name'] in recorded:
+            continue
+        definition = f"{_quote(column['name'])} {column['type'] or ''}".rstrip()
+        if column['dflt_value'] is not None:
+            definition += f" DEFAULT {column['dflt_value']}"
+        statements.append(f"ALTER TABLE {_quote(table)} ADD COLUMN {definition}")
+    return statements
+
+
+def _local_rows(conn: sqlite3.Connection, table: str, key_columns: Sequence[str],
+                columns: Sequence[str]) -> Iterator[Tuple[Tuple[Any, ...], Dict[str, Any]]]:
+    """(key, row) for every row of a mirrored table, as stored locally."""
+    cursor = conn.execute(f"SELECT rowid AS __rowid, * FROM {_quote(table)} ORDER BY rowid")
+    for r in cursor:
+        row = {c: r[c] for c in columns}
+        yield (r['__rowid'],) if tuple(key_columns) == ('rowid',) else tuple(row[c] for c in key_columns), row
+
+
+def diff_table(conn: sqlite3.Connection, table: str) -> List[Change]:
+    """Rows of one mirrored table that differ from the last pulled/pushed state."""
+    meta = mirrored_tables(conn)[table]
+    key_columns = meta['key_columns']
+    columns = [c['name'] for c in _local_columns(conn, table)]
+    snapshot = {r['key']: r['hash'] for r in
+                conn.execute(f"SELECT key, hash FROM {ROWS_TABLE} WHERE tbl = ?", (table,))}
+
+    changes = []
+    for key, row in _local_rows(conn, table, key_columns, columns):
+        previous = snapshot.pop(_key_text(key), None)
+        if previous is None:
+            changes.append(Change(table, 'insert', key_columns, key, row))
+        elif previous != row_hash(row):
+            changes.append(Change(table, 'update', key_columns, key, row))
+    for key_text in snapshot:
+        changes.append(Change(table, 'delete', key_columns, tuple(json.loads(key_text)), None))
+    return changes
+
+
+def diff(conn: sqlite3.Connection, tables: Optional[Sequence[str]] = None) -> Tuple[List[str], List[Change]]:
+    """(schema statements, row changes) for the given mirrored tables (default: all)."""
+    mirrored = mirrored_tables(conn)
+    wanted = list(tables) if tables else list(mirrored)
+    unknown = [t for t in wanted if t not in mirrored]
+    if unknown:
+        raise MirrorError(f"Not mirrored: {', '.join(unknown)} (pull them first)")
+    schema, changes = [], []
+    for table in wanted:
+        schema.extend(_schema_changes(conn, table, mirrored[table]['columns']))
+        changes.extend(diff_table(conn, table))
+    return schema, changes
+
+
+def change_sql(change: Change) -> str:
+    """The D1 statement that applies one change."""
+    table = _quote(change.table)
+    where = ' AND '.join(f"{_quote(c)} = {sql_literal(v)}" for c, v in zip(change.key_columns, change.key))
+    if change.op == 'delete':
+        return f"DELETE FROM {table} WHERE {where}"
+    row = dict(change.row)
+    if change.key_columns == ('rowid',):
+        row = {'rowid': change.key[0], **row}
+    if change.op == 'insert':
+        return (f"INSERT INTO {table} ({', '.join(_quote(c) for c in row)}) "
+                f"VALUES ({', '.join(sql_literal(v) for v in row.values())})")
+    assignments = ', '.join(f"{_quote(c)} = {sql_literal(v)}" for c, v in row.items()
+                            if c not in change.key_columns)
+    return f"UPDATE {table} SET {assignments} WHERE {where}"
+
+
+def _record_pushed(conn: sqlite3.Connection, changes: Iterable[Change]) -> None:
+    """Move the snapshot forward for changes that reached D1."""
+    with conn:
+        for change in changes:
+            key = _key_text(change.key)
+            if change.op == 'delete':
+                conn.execute(f"DELETE FROM {ROWS_TABLE} WHERE tbl = ? AND key = ?", (change.table, key))
+            else:
+                conn.execute(f"INSERT OR REPLACE INTO {ROWS_TABLE} (tbl, key, hash) VALUES (?, ?, ?)",
+                             (change.table, key, row_hash(change.row)))
+
+
+def _record_schema(conn: sqlite3.Connection, tables: Iterable[str]) -> None:
+    with conn:
+        for table in tables:
+            columns = [c['name'] for c in _local_columns(conn, table)]
+            conn.execute(f"UPDATE {TABLES_TABLE} SET columns = ? WHERE name = ?", (json.dumps(columns), table))
+
+
+def push(client: D1Client, conn: sqlite3.Connection, tables: Optional[Sequence[str]] = None) -> Tuple[int, int]:
+    """
+    Apply the local diff to D1 in batched round trips.
+
+    Returns:
+        tuple: (statements applied, statements failed). Failed changes stay in the diff.
+    """
+    schema, changes = diff(conn, tables)
+    wanted = list(tables) if tables else list(mirrored_tables(conn))
+    if schema:
+        _, failures = client.execute_many(schema)
+        if failures:
+            raise MirrorError(f"Schema change failed: {failures[0][1][-300:]}\n  in: {failures[0][0]}")
+        _record_schema(conn, wanted)
+    if not changes:
+        return len(schema), 0
+    statements = [change_sql(change) for change in changes]
+    results, failures = client.execute_many(statements)
+    _record_pushed(conn, (change for change, result in zip(changes, results) if result is not None))
+    for sql, error in failures:
+        print(f"  ERROR: {error[-200:]}\n    in: {sql[:120]}", file=sys.stderr)
+    return len(schema) + len(changes) - len(failures), len(failures)
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+
+def iter_rows(table: str, fallback_export: Optional[Union[str, Path]] = None,
+              path: Union[str, Path] = MIRROR_PATH) -> Iterator[dict]:
+    """
+    Rows of a mirrored table as dicts, one at a time.
+
+    When the mirror does not have the table yet, falls back to a JSON export
+    of it (streamed through pearl_store.iter_pearls) if one is given.
+    """
+    if Path(path).exists():
+        conn = open_mirror(path, readonly=True)
+        try:
+            if table in mirrored_tables(conn):
+                for row in conn.execute(f"SELECT * FROM {_quote(table)} ORDER BY rowid"):
+                    yield dict(row)
+                return
+        finally:
+            conn.close()
+    if fallback_export is None:
+        raise MirrorError(f"{table} is not mirrored at {path} (run: python3 scripts/d1_mirror.py pull {table})")
+    from pearl_store import iter_pearls
+    yield from iter_pearls(fallback_export)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local SQLite mirror of the locksmith-db D1 database')
+    parser.add_argument('--mirror', default=str(MIRROR_PATH), help='Mirror database path')
+    parser.add_argument('--local', action='store_true', help='Use the local wrangler D1 instead of --remote')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    pull_parser = sub.add_parser('pull', help='Copy D1 tables into the mirror')
+    pull_parser.add_argument('tables', nargs='*', help='Tables to pull (default: all)')
+    pull_parser.add_argument('--force', action='store_true', help='Discard unpushed local changes')
+
+    sub.add_parser('status', help='Mirrored tables and pending changes')
+
+    diff_parser = sub.add_parser('diff', help='Show local changes not yet in D1')
+    diff_parser.add_argument('tables', nargs='*')
+    diff_parser.add_argument('--sql', help='Write the statements to this file')
+
+    push_parser = sub.add_parser('push', help='Apply local changes to D1')
+    push_parser.add_argument('tables', nargs='*')
+    push_parser.add_argument('--dry-run', action='store_true', help='Only print what would be pushed')
+
+    query_parser = sub.add_parser('query', help='Run SQL against the mirror')
+    query_parser.add_argument('sql')
+    args = parser.parse_args()
+
+    conn = open_mirror(args.mirror)
+    tables = getattr(args, 'tables', None) or None
+
+    if args.command == 'pull':
+        client = connect('wrangler', remote=not args.local)
+        counts = pull(client, conn, tables, force=args.force)
+        print(f"Pulled {sum(counts.values())} rows from {len(counts)} tables "
+              f"in {client.round_trips} D1 round trips into {args.mirror}")
+
+    elif args.command == 'status':
+        for table, meta in mirrored_tables(conn).items():
+            changes = diff_table(conn, table)
+            counts = {op: sum(1 for c in changes if c.op == op) for op in ('insert', 'update', 'delete')}
+            pending = ', '.join(f"{n} {op}s" for op, n in counts.items() if n) or 'clean'
+            print(f"  {table:<36} {meta['row_count']:>8} rows  pulled {meta['pulled_at']}  {pending}")
+
+    elif args.command in ('diff', 'push'):
+        schema, changes = diff(conn, tables)
+        statements = schema + [change_sql(c) for c in changes]
+        by_table: Dict[str, Dict[str, int]] = {}
+        for change in changes:
+            counts = by_table.setdefault(change.table, {})
+            counts[change.op] = counts.get(change.op, 0) + 1
+        for table, counts in by_table.items():
+            print(f"  {table}: " + ', '.join(f"{n} {op}s" for op, n in counts.items()))
+        for statement in schema:
+            print(f"  {statement}")
+        if args.command == 'diff':
+            if args.sql:
+                Path(args.sql).parent.mkdir(parents=True, exist_ok=True)
+                with open(args.sql, 'w') as f:
+                    f.write(f"-- Mirror diff: {len(statements)} statements\n")
+                    f.write(''.join(s + ';\n' for s in statements))
+                print(f"Wrote {len(statements)} statements to {args.sql}")
+            else:
+                print(f"{len(statements)} statements pending")
+        elif args.dry_run or not statements:
+            print(f"{len(statements)} statements would be pushed")
+        else:
+            client = connect('wrangler', remote=not args.local)
+            applied, failed = push(client, conn, tables)
+            print(f"Pushed {applied} statements in {client.round_trips} D1 round trips ({failed} failed)")
+
+    elif args.command == 'query':
+        cursor = conn.execute(args.sql)
+        rows = cursor.fetchall()
+        if cursor.description:
+            print(json.dumps([dict(r) for r in rows], indent=2, default=str))
+        conn.commit()
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 import json
 import re
 import os
+import sys
+
+# Shared text extractors live one level up in scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_patterns import fcc_ids, first_year_range
 
 # Define the set of known makes to help with parsing the title
 KNOWN_MAKES = [
@@ -12,6 +17,10 @@ KNOWN_MAKES = [
     'Maserati', 'Aston Martin', 'Bentley', 'Ferrari', 'Lamborghini', 'Lotus', 'McLaren'
 ]
 
+FCC_LOOSE_PATTERN = re.compile(r'FCC\s*([A-Z0-9-]+)')
+YEAR_SPAN_PATTERN = re.compile(r'^\d{4}-\d{4}$')
+PAREN_ID_PATTERN = re.compile(r'\(([A-Z0-9]{5,})\)')
+
 def clean_sql(val):
     if val is None:
         return 'NULL'
@@ -21,24 +30,9 @@ def clean_sql(val):
 
 def parse_year_range(range_str):
     """Parses strings like '2017-2022' or '2024' or '2022 onwards'"""
-    range_str = range_str.lower().strip()
-    
-    # Handle '2022-2025'
-    match = re.search(r'(\d{4})\s*-\s*(\d{4})', range_str)
-    if match:
-        return int(match.group(1)), int(match.group(2))
-    
-    # Handle single year '2024'
-    match = re.search(r'^(\d{4})$', range_str)
-    if match:
-        return int(match.group(1)), int(match.group(1))
-    
-    # Handle '2022 onwards' or '2022-present'
-    match = re.search(r'(\d{4})\s*(?:onwards|present|\+)', range_str)
-    if match:
-        return int(match.group(1)), 2026 
-    
-    return None, None
+    range_str = range_str.strip()
+    # A lone year only counts when it is the whole string
+    return first_year_range(range_str, single=range_str.isdigit()) or (None, None)
 
 def extract_fcc_id(text):
     if not text:
@@ -46,42 +40,29 @@ def extract_fcc_id(text):
     
     text = text.upper()
     
-    # Prioritize known FCC prefixes
-    fcc_patterns = [
-        r'FCC\s*ID:\s*([A-Z0-9-]+)',
-        r'FCC\s*([A-Z0-9-]+)',
-        r'(HYQ[A-Z0-9]+)',
-        r'(NBG[A-Z0-9]+)',
-        r'(N5F[A-Z0-9]+)',
-        r'(SY5[A-Z0-9]+)',
-        r'(CWTWB[A-Z0-9]+)',
-        r'(M3N[A-Z0-9]+)',
-        r'(KR5[A-Z0-9]+)',
-        r'(GQ4[A-Z0-9]+)',
-        r'(OUC[A-Z0-9]+)',
-        r'(MYT[A-Z0-9]+)',
-        r'(HLIK[A-Z0-9]+)'
-    ]
-    
     blacklist = [
         'PHILIPS', 'MAXELL', 'XHORSE', 'STRATTEC', 'DURACELL', 'ENERGIZER', 
         'HONDA', 'ACURA', 'CHEVY', 'TOYOTA', 'FORD', 'NISSAN', 'HYUNDAI', 'KIA',
         'SMART', 'REMOTE', 'KEYLESS', 'BATTERY', 'BUTTON', 'MECHANICAL'
     ]
 
-    for pattern in fcc_patterns:
-        match = re.search(pattern, text)
-        if match:
-            fcc = match.group(1).strip('-')
-            # Avoid matching year ranges like '2013-2015'
-            if re.match(r'^\d{4}-\d{4}$', fcc):
-                continue
-            if fcc in blacklist:
-                continue
-            return fcc
+    # "FCC ID: ..." values and known grantee prefixes, in order of appearance
+    candidates = fcc_ids(text)
+    match = FCC_LOOSE_PATTERN.search(text)
+    if match:
+        candidates.append(match.group(1))
+
+    for fcc in candidates:
+        fcc = fcc.strip('-')
+        # Avoid matching year ranges like '2013-2015'
+        if YEAR_SPAN_PATTERN.match(fcc):
+            continue
+        if fcc in blacklist:
+            continue
+        return fcc
             
     # Fallback to general pattern but avoid year ranges and blacklist
-    match = re.search(r'\(([A-Z0-9]{5,})\)', text) # (KR5434760)
+    match = PAREN_ID_PATTERN.search(text) # (KR5434760)
     if match:
         fcc = match.group(1)
         if fcc not in blacklist:
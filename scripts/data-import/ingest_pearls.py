@@ -5,35 +5,13 @@ import os
 import glob
 import sys
 
+# Shared vehicle identity resolver lives one level up in scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vehicle_identity import canonical_make, parse_model
+
 # D1 DB Path (Local for testing, or we generate SQL)
 # For this script we will generate SQL migrations that can be applied to D1
 
-# Model name normalization - removes chassis codes, suffixes, and variants
-MODEL_NORMALIZE_MAP = {
-    'Escalade': ['Escalade', 'K2XL', 'GMT K2XL'],
-    'Silverado': ['Silverado', 'GMT T1XX', 'Silverado 1500'],
-    'Sierra': ['Sierra', 'Sierra 1500'],
-    'Equinox': ['Equinox'],
-    'Bronco': ['Bronco', 'Bronco Sport'],
-    'F-150': ['F-150', 'F150'],
-    'CR-V': ['CR-V', 'CRV'],
-    'Civic': ['Civic'],
-    'Tucson': ['Tucson'],
-    'Santa Fe': ['Santa Fe'],
-    'Grand Cherokee': ['Grand Cherokee', 'Grand Cherokee L', 'WL'],
-    'Outback': ['Outback', 'BT'],
-    'X5': ['X5', 'G05'],
-    'X3': ['X3', 'G01'],
-    'GV70': ['GV70'],
-    'Q7': ['Q7'],
-    'Rogue': ['Rogue', 'T32'],
-    'Atlas': ['Atlas'],
-    'RX 350': ['RX', 'RX 350', 'XU70'],
-    'Highlander': ['Highlander', 'XU70'],
-    'Tundra': ['Tundra'],
-    'Range Rover Sport': ['Range Rover', 'L494', 'L405'],
-}
-
 # Platform to security architecture mapping
 PLATFORM_ARCHITECTURE = {
     'T1XX': 'Global B', 'K2XL': 'Global A', 'Global B': 'Global B', 'Global A': 'Global A',
@@ -47,28 +25,15 @@ PLATFORM_ARCHITECTURE = {
 
 def normalize_model(raw_model, make):
     """Clean up model name and return tuple (clean_model, platform_code, architecture)"""
-    platform_code = None
     architecture = None
     
-    # Extract platform code if present (e.g., "(K2XL)", "(G05)")
-    platform_match = re.search(r'\(([A-Z0-9]+)\)', raw_model)
-    if platform_match:
-        platform_code = platform_match.group(1)
-        raw_model = re.sub(r'\s*\([^)]+\)', '', raw_model)  # Remove from model
-    
     # Remove common suffixes
     raw_model = re.sub(r'\s+(Forensic|Intelligence|Dossier|Report|Security|Locksmith|Technical).*$', '', raw_model, flags=re.IGNORECASE)
-    raw_model = raw_model.strip()
     
-    # Normalize known models
-    clean_model = raw_model
-    for canonical, variants in MODEL_NORMALIZE_MAP.items():
-        for variant in variants:
-            if variant.lower() in raw_model.lower():
-                clean_model = canonical
-                if variant.upper() in PLATFORM_ARCHITECTURE:
-                    platform_code = variant.upper()
-                break
+    # Canonical model; chassis codes ("(K2XL)", "G05") come back as the platform code
+    parsed = parse_model(canonical_make(make), raw_model.strip())
+    clean_model = parsed.model
+    platform_code = parsed.chassis
     
     # Determine architecture from platform
     if platform_code and platform_code in PLATFORM_ARCHITECTURE:
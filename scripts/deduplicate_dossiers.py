@@ -3,7 +3,11 @@
 Dossier Deduplication Script
 
 Removes duplicate documents and pearls from all_pearls_v8.json.
-Detects duplicates by normalizing filenames (removing underscores, 'Copy of' prefix).
+The export is streamed twice (once to decide, once to write the kept
+documents) so only document metadata and pearl text are held in memory.
+Detects duplicates by normalizing filenames (removing underscores, 'Copy of' prefix),
+then drops near-duplicate pearls repeated across the remaining documents
+(MinHash/LSH index from near_duplicates.py).
 
 Outputs:
 - all_pearls_v8_deduped.json: Deduplicated version
@@ -15,9 +19,13 @@ import re
 from pathlib import Path
 from collections import defaultdict
 
+from near_duplicates import NearDuplicateIndex
+from pearl_store import JsonExportWriter, iter_json_items, read_json_field
+
 INPUT_FILE = Path("data/pearl_extraction/all_pearls_v8.json")
 OUTPUT_FILE = Path("data/pearl_extraction/all_pearls_v8_deduped.json")
 REPORT_FILE = Path("data/pearl_extraction/deduplication_report.json")
+PEARL_SIMILARITY_THRESHOLD = 0.9
 
 
 def normalize_filename(fn: str) -> str:
@@ -95,15 +103,53 @@ def deduplicate_documents(documents: list) -> tuple:
     return deduped_docs, report
 
 
+def deduplicate_pearls(documents: list, threshold: float = PEARL_SIMILARITY_THRESHOLD) -> list:
+    """
+    Drop near-duplicate pearls across documents, keeping the first occurrence.
+    
+    Documents are modified in place.
+    
+    Returns:
+        list: One entry per removed pearl with the kept pearl's location
+    """
+    index = NearDuplicateIndex(threshold=threshold)
+    for d, doc in enumerate(documents):
+        for p, pearl in enumerate(doc.get('pearls', [])):
+            index.add((d, p), pearl.get('content', ''))
+    
+    removed = []
+    drop = defaultdict(set)
+    for cluster in index.clusters():
+        kept_doc, kept_pearl = cluster.representative
+        for d, p in cluster.duplicates:
+            drop[d].add(p)
+            removed.append({
+                'filename': documents[d]['document'].get('filename'),
+                'kept_in': documents[kept_doc]['document'].get('filename'),
+                'similarity': round(cluster.scores[(d, p)], 3),
+                'preview': documents[d]['pearls'][p].get('content', '')[:80]
+            })
+    
+    for d, indexes in drop.items():
+        pearls = documents[d]['pearls']
+        documents[d]['pearls'] = [pearl for p, pearl in enumerate(pearls) if p not in indexes]
+    
+    return removed
+
+
 def main():
     print("=== Dossier Deduplication ===\n")
     
-    # Load original
-    print(f"Loading {INPUT_FILE}...")
-    with open(INPUT_FILE) as f:
-        data = json.load(f)
-    
-    documents = data.get('documents', [])
+    # Pass 1: stream the documents, keeping only their metadata and pearl text
+    print(f"Streaming {INPUT_FILE}...")
+    documents = []
+    for position, doc in enumerate(iter_json_items(INPUT_FILE, 'documents')):
+        documents.append({
+            'position': position,
+            'document': doc.get('document', {}),
+            'pearls': [{'index': p, 'content': pearl.get('content', '')}
+                       for p, pearl in enumerate(doc.get('pearls', []))]
+        })
     print(f"Original documents: {len(documents)}")
     print(f"Original pearls: {sum(len(d.get('pearls', [])) for d in documents)}")
     
@@ -111,18 +157,26 @@ def main():
     print("\nDeduplicating...")
     deduped_docs, report = deduplicate_documents(documents)
     
-    # Create output
-    output_data = {
-        'extraction_version': data.get('extraction_version', 'v8') + '-deduped',
-        'total_documents': len(deduped_docs),
-        'total_pearls': report['pearls_after'],
-        'documents': deduped_docs
-    }
+    print("Removing near-duplicate pearls across documents...")
+    near_duplicates = deduplicate_pearls(deduped_docs)
+    report['near_duplicate_pearls'] = near_duplicates
+    report['pearls_after'] -= len(near_duplicates)
+    report['pearls_removed'] += len(near_duplicates)
     
-    # Save deduplicated file
+    # Pass 2: stream the documents again, writing the kept ones with their kept pearls
+    kept = {doc['position']: {pearl['index'] for pearl in doc['pearls']} for doc in deduped_docs}
     print(f"\nSaving {OUTPUT_FILE}...")
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(output_data, f, indent=2)
+    writer = JsonExportWriter(OUTPUT_FILE, 'documents')
+    for position, doc in enumerate(iter_json_items(INPUT_FILE, 'documents')):
+        if position not in kept:
+            continue
+        doc['pearls'] = [pearl for p, pearl in enumerate(doc.get('pearls', [])) if p in kept[position]]
+        writer.write(doc)
+    writer.close(summary={
+        'extraction_version': read_json_field(INPUT_FILE, 'extraction_version', 'v8') + '-deduped',
+        'total_documents': len(deduped_docs),
+        'total_pearls': report['pearls_after'],
+    })
     
     # Save report
     print(f"Saving {REPORT_FILE}...")
@@ -134,6 +188,7 @@ def main():
     print(f"Documents: {report['total_before']} → {report['total_after']} (-{report['duplicates_removed']})")
     print(f"Pearls: {report['pearls_before']} → {report['pearls_after']} (-{report['pearls_removed']})")
     print(f"Duplicate groups: {len(report['duplicate_groups'])}")
+    print(f"Near-duplicate pearls removed: {len(near_duplicates)}")
     
     # Show some examples
     print("\n=== SAMPLE DUPLICATES REMOVED ===")
@@ -12,6 +12,8 @@ from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
+from entity_scanner import KeywordScanner, find_entities
+
 DOSSIERS_DIR = "data/gdrive_plaintext"
 OUTPUT_MANIFEST = "data/dossier_extraction_manifest.json"
 
@@ -39,21 +41,9 @@ MARKERS = {
     }
 }
 
-MAKES_MAP = {
-    'toyota': 'Toyota', 'lexus': 'Lexus', 'scion': 'Scion',
-    'honda': 'Honda', 'acura': 'Acura',
-    'nissan': 'Nissan', 'infiniti': 'Infiniti',
-    'ford': 'Ford', 'lincoln': 'Lincoln',
-    'chevrolet': 'Chevrolet', 'gmc': 'GMC', 'cadillac': 'Cadillac', 'buick': 'Buick',
-    'dodge': 'Dodge', 'jeep': 'Jeep', 'ram': 'RAM', 'chrysler': 'Chrysler',
-    'bmw': 'BMW', 'mercedes': 'Mercedes-Benz', 'audi': 'Audi',
-    'volkswagen': 'Volkswagen', 'vw': 'Volkswagen', 'porsche': 'Porsche',
-    'volvo': 'Volvo', 'mazda': 'Mazda', 'subaru': 'Subaru',
-    'hyundai': 'Hyundai', 'kia': 'Kia', 'genesis': 'Genesis',
-    'mitsubishi': 'Mitsubishi', 'jaguar': 'Jaguar', 'land rover': 'Land Rover',
-    'tesla': 'Tesla', 'rivian': 'Rivian', 'alfa romeo': 'Alfa Romeo',
-    'stellantis': 'Stellantis', 'fca': 'FCA'
-}
+MARKER_SCANNER = KeywordScanner(
+    (marker for marker_levels in MARKERS.values() for markers in marker_levels.values() for marker in markers)
+)
 
 
 def file_hash(path: str) -> str:
@@ -64,20 +54,20 @@ def file_hash(path: str) -> str:
 
 def fingerprint_content(content: str) -> Dict[str, float]:
     """Score content for each extraction type based on marker presence."""
-    content_lower = content.lower()
+    found = MARKER_SCANNER.found(content)
     scores = {}
     
     for extract_type, marker_levels in MARKERS.items():
         score = 0
         # High markers = 3 points each, Medium = 2, Low = 1
         for marker in marker_levels['high']:
-            if marker.lower() in content_lower:
+            if marker.lower() in found:
                 score += 3
         for marker in marker_levels['medium']:
-            if marker.lower() in content_lower:
+            if marker.lower() in found:
                 score += 2
         for marker in marker_levels['low']:
-            if marker.lower() in content_lower:
+            if marker.lower() in found:
                 score += 1
         
         # Normalize to 0-1 (cap at 20 points)
@@ -88,12 +78,7 @@ def fingerprint_content(content: str) -> Dict[str, float]:
 
 def detect_makes_mentioned(content: str) -> List[str]:
     """Find automotive makes mentioned in content."""
-    content_lower = content.lower()
-    makes = []
-    for key, val in MAKES_MAP.items():
-        if key in content_lower and val not in makes:
-            makes.append(val)
-    return makes
+    return find_entities(content, 'makes')
 
 
 def extract_procedure_segments(content: str, lines: List[str]) -> List[Dict]:
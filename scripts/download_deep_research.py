@@ -14,6 +14,8 @@ from pathlib import Path
 from bs4 import BeautifulSoup
 import re
 
+from http_cache import HttpCacheError, shared_cache
+
 # Paths
 CREDS_PATH = Path("gdrive_token.json")
 DOCS_FILE = Path("data/glossary_batches/deep_research_docs.json")
@@ -62,7 +64,12 @@ def download_doc_as_html(access_token: str, file_id: str, title: str) -> str:
     headers = {"Authorization": f"Bearer {access_token}"}
     params = {"mimeType": "text/html"}
     
-    response = requests.get(url, headers=headers, params=params)
+    # Keyed on the export URL only, so a refreshed token still hits the cache
+    try:
+        response = shared_cache().get(url, headers=headers, params=params)
+    except HttpCacheError as e:
+        print(f"  ❌ Error downloading {title}: {e}")
+        return None
     
     if response.status_code != 200:
         print(f"  ❌ Error downloading {title}: {response.status_code}")
@@ -109,13 +116,17 @@ def main():
     
     print(f"📋 Found {len(docs)} documents to download\n")
     
-    # Get access token
-    try:
-        access_token = get_access_token()
-        print(f"✅ Got access token\n")
-    except Exception as e:
-        print(f"❌ Failed to get access token: {e}")
-        return
+    # Get access token (a replay from the HTTP cache needs none)
+    if shared_cache().offline:
+        access_token = None
+        print("📼 Offline: replaying exports from the HTTP cache\n")
+    else:
+        try:
+            access_token = get_access_token()
+            print(f"✅ Got access token\n")
+        except Exception as e:
+            print(f"❌ Failed to get access token: {e}")
+            return
     
     # Download each document
     downloaded = []
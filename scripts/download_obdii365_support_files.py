@@ -9,12 +9,12 @@ import re
 import json
 import time
 import glob
-import urllib.request
-import urllib.error
 from pathlib import Path
 from bs4 import BeautifulSoup
 from collections import defaultdict
 
+from http_cache import HttpCacheError, shared_cache
+
 HTML_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/obdii365_scraped/html")
 DOWNLOAD_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/obdii365_scraped/support_files")
 BASE_URL = "https://www.obdii365.com"
@@ -98,7 +98,7 @@ def extract_download_links(html_path):
 
 
 def download_file(url, dest_path, retries=2):
-    """Download a file with retries."""
+    """Download a file with retries (through the shared HTTP cache)."""
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
         'Accept': '*/*',
@@ -107,28 +107,30 @@ def download_file(url, dest_path, retries=2):
     
     for attempt in range(retries + 1):
         try:
-            req = urllib.request.Request(url, headers=headers)
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                content = resp.read()
-                
-                # Verify it's not an HTML error page
-                if len(content) < 100:
-                    return False, "File too small"
-                
-                with open(dest_path, 'wb') as f:
-                    f.write(content)
-                
-                return True, f"{len(content)} bytes"
-        except urllib.error.HTTPError as e:
-            if e.code == 404:
-                return False, "404 Not Found"
+            resp = shared_cache().get(url, headers=headers, timeout=30)
+        except HttpCacheError as e:
             if attempt < retries:
                 time.sleep(2)
-        except Exception as e:
+                continue
+            return False, str(e)[:100]
+        
+        if resp.status == 404:
+            return False, "404 Not Found"
+        if resp.status != 200:
             if attempt < retries:
                 time.sleep(2)
-            else:
-                return False, str(e)[:100]
+            continue
+        
+        content = resp.content
+        
+        # Verify it's not an HTML error page
+        if len(content) < 100:
+            return False, "File too small"
+        
+        with open(dest_path, 'wb') as f:
+            f.write(content)
+        
+        return True, f"{len(content)} bytes"
     
     return False, "Max retries exceeded"
 
@@ -10,12 +10,12 @@ import re
 import json
 import time
 import glob
-import urllib.request
-import urllib.error
 from pathlib import Path
 from bs4 import BeautifulSoup
 from collections import defaultdict
 
+from http_cache import HttpCacheError, shared_cache
+
 HTML_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/obdii365_scraped/html")
 DOWNLOAD_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/obdii365_scraped/support_files")
 OUTPUT_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/obdii365_scraped/parsed")
@@ -92,7 +92,7 @@ def extract_excel_links():
 
 
 def download_file(url, dest_path, retries=2):
-    """Download a file."""
+    """Download a file (through the shared HTTP cache)."""
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
         'Accept': '*/*',
@@ -101,24 +101,23 @@ def download_file(url, dest_path, retries=2):
     
     for attempt in range(retries + 1):
         try:
-            req = urllib.request.Request(url, headers=headers)
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                content = resp.read()
-                if len(content) < 100:
-                    return False, "File too small"
-                with open(dest_path, 'wb') as f:
-                    f.write(content)
-                return True, len(content)
-        except urllib.error.HTTPError as e:
-            if e.code == 404:
-                return False, "404"
+            resp = shared_cache().get(url, headers=headers, timeout=30)
+        except HttpCacheError as e:
             if attempt < retries:
                 time.sleep(1)
-        except Exception as e:
+                continue
+            return False, str(e)[:80]
+        if resp.status == 404:
+            return False, "404"
+        if resp.status != 200:
             if attempt < retries:
                 time.sleep(1)
-            else:
-                return False, str(e)[:80]
+            continue
+        if len(resp.content) < 100:
+            return False, "File too small"
+        with open(dest_path, 'wb') as f:
+            f.write(resp.content)
+        return True, len(resp.content)
     return False, "retries exceeded"
 
 
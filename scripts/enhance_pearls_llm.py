@@ -16,8 +16,12 @@ import json
 import re
 import hashlib
 import time
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
+
+from migration_planner import MigrationPlanner
+from pearl_store import PearlWriter, iter_pearls
 
 # --- Configuration ---
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
@@ -298,127 +302,123 @@ def enhance_pearls_heuristic(pearls: list) -> list:
     return enhanced
 
 
-def process_pearls(input_path: Path, output_path: Path, use_llm: bool = True):
-    """Main processing function."""
-    print(f"Loading pearls from {input_path}...")
-    
-    with open(input_path, 'r') as f:
-        data = json.load(f)
+def process_pearls(input_path: Path, output_path: Path, use_llm: bool = True, chunk_size: int = 200) -> int:
+    """
+    Main processing function.
     
-    pearls = data.get("pearls", [])
-    print(f"Loaded {len(pearls)} pearls")
+    Pearls stream from input_path in chunks and go straight to output_path
+    (a pearl store, or a legacy .json export); only content hashes and
+    counters stay in memory.
     
-    # Phase 1: Category consolidation
-    print("\nPhase 1: Consolidating categories...")
-    for pearl in pearls:
-        old_cat = pearl.get("category", "insight")
-        pearl["category"] = consolidate_category(old_cat)
+    Returns:
+        int: Number of unique pearls written
+    """
+    print(f"Streaming pearls from {input_path}...")
     
-    # Count categories after consolidation
     cat_counts = {}
-    for pearl in pearls:
-        cat = pearl.get("category", "insight")
-        cat_counts[cat] = cat_counts.get(cat, 0) + 1
-    print(f"  Categories after consolidation: {cat_counts}")
-    
-    # Phase 2: Vehicle attribution
-    print("\nPhase 2: Enhancing vehicle attribution...")
-    if use_llm:
-        enhanced_pearls = enhance_pearl_batch_llm(pearls)
-    else:
-        enhanced_pearls = enhance_pearls_heuristic(pearls)
-    
-    # Phase 3: Deduplication
-    print("\nPhase 3: Deduplicating...")
     seen_hashes = set()
-    unique_pearls = []
+    loaded = 0
     duplicates = 0
-    
-    for pearl in enhanced_pearls:
-        content = pearl.get("paragraph") or pearl.get("content", "")
-        content_hash = compute_content_hash(content)
-        
-        if content_hash not in seen_hashes:
+    with_make = 0
+    writer = PearlWriter(output_path)
+    
+    def unique_pearls():
+        # Phase 1 (category consolidation) and Phase 3 (deduplication) per pearl;
+        # the content hash does not change during enhancement, so dedup runs first
+        nonlocal loaded, duplicates
+        for pearl in iter_pearls(input_path):
+            loaded += 1
+            pearl["category"] = consolidate_category(pearl.get("category", "insight"))
+            cat_counts[pearl["category"]] = cat_counts.get(pearl["category"], 0) + 1
+            
+            content = pearl.get("paragraph") or pearl.get("content", "")
+            content_hash = compute_content_hash(content)
+            if content_hash in seen_hashes:
+                duplicates += 1
+                continue
             seen_hashes.add(content_hash)
             pearl["content_hash"] = content_hash
-            unique_pearls.append(pearl)
-        else:
-            duplicates += 1
-    
-    print(f"  Removed {duplicates} duplicates, {len(unique_pearls)} unique pearls remain")
-    
-    # Count attribution stats
-    with_make = sum(1 for p in unique_pearls if p.get("vehicle", {}).get("make"))
-    print(f"\nAttribution: {with_make}/{len(unique_pearls)} pearls have make ({100*with_make/len(unique_pearls):.1f}%)")
+            yield pearl
+    
+    # Phase 2: Vehicle attribution, one chunk at a time
+    print("Enhancing vehicle attribution...")
+    pearls = unique_pearls()
+    while True:
+        chunk = list(islice(pearls, chunk_size))
+        if not chunk:
+            break
+        enhanced = enhance_pearl_batch_llm(chunk) if use_llm else enhance_pearls_heuristic(chunk)
+        for pearl in enhanced:
+            if pearl.get("vehicle", {}).get("make"):
+                with_make += 1
+            writer.write(pearl)
+    
+    print(f"Loaded {loaded} pearls")
+    print(f"  Categories after consolidation: {cat_counts}")
+    print(f"  Removed {duplicates} duplicates, {writer.count} unique pearls remain")
+    if writer.count:
+        print(f"\nAttribution: {with_make}/{writer.count} pearls have make ({100*with_make/writer.count:.1f}%)")
     
-    # Save output
-    output_data = {
-        "total": len(unique_pearls),
+    writer.close(summary={
+        "total": writer.count,
         "with_attribution": with_make,
         "categories": cat_counts,
-        "pearls": unique_pearls
+    })
+    
+    print(f"\nSaved {writer.describe()}")
+    return writer.count
+
+
+def refined_pearl_row(pearl: dict, index: int) -> dict:
+    """refined_pearls columns for one enhanced pearl."""
+    vehicle = pearl.get("vehicle", {})
+    tags = pearl.get("tags", [])
+    quality = pearl.get("llm_quality", 5)
+    
+    # Determine risk level
+    is_gotcha = pearl.get("quality", {}).get("is_gotcha", False)
+    if is_gotcha:
+        risk = "critical"
+    elif quality >= 7:
+        risk = "high"
+    elif quality >= 5:
+        risk = "medium"
+    else:
+        risk = "low"
+    
+    return {
+        "id": pearl.get("id", f"llm_pearl_{index}"),
+        "content": pearl.get("paragraph") or pearl.get("content", ""),
+        "category": pearl.get("category", "insight"),
+        "make": vehicle.get("make") or None,
+        "model": vehicle.get("model") or None,
+        "year_start": vehicle.get("year_start") or None,
+        "year_end": vehicle.get("year_end") or None,
+        "risk": risk,
+        "tags": json.dumps(tags) if isinstance(tags, list) else str(tags),
+        "source_doc": pearl.get("source_doc", ""),
+        "action": "KEEP",
     }
-    
-    with open(output_path, 'w') as f:
-        json.dump(output_data, f, indent=2)
-    
-    print(f"\nSaved {len(unique_pearls)} enhanced pearls to {output_path}")
-    return unique_pearls
 
 
-def generate_d1_migration(pearls: list, output_path: Path):
-    """Generate SQL migration for D1."""
+def generate_d1_migration(pearls: Iterable[dict], output_path: Path, total: int,
+                          full: bool = False, complete: bool = True):
+    """
+    Generate a D1 migration with only the pearls that changed since the last
+    one. complete=False (a --limit run) never deletes pearls it did not see.
+    """
     print(f"\nGenerating D1 migration to {output_path}...")
     
-    def escape_sql(text):
-        if text is None:
-            return "NULL"
-        return "'" + str(text).replace("'", "''") + "'"
-    
-    sql_lines = [
+    planner = MigrationPlanner("llm_enhanced_pearls", "refined_pearls", ["id"], full=full)
+    header = [
         "-- LLM-Enhanced Pearls Migration",
-        f"-- Total: {len(pearls)} pearls",
+        f"-- Total: {total} pearls",
         f"-- Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}",
-        "",
     ]
+    planner.write((refined_pearl_row(p, i) for i, p in enumerate(pearls)), output_path,
+                  header=header, complete=complete)
     
-    for i, pearl in enumerate(pearls):
-        pearl_id = pearl.get("id", f"llm_pearl_{i}")
-        content = pearl.get("paragraph") or pearl.get("content", "")
-        category = pearl.get("category", "insight")
-        
-        vehicle = pearl.get("vehicle", {})
-        make = vehicle.get("make")
-        model = vehicle.get("model")
-        year_start = vehicle.get("year_start")
-        year_end = vehicle.get("year_end")
-        
-        tags = pearl.get("tags", [])
-        tags_json = json.dumps(tags) if isinstance(tags, list) else str(tags)
-        
-        source_doc = pearl.get("source_doc", "")
-        quality = pearl.get("llm_quality", 5)
-        
-        # Determine risk level
-        is_gotcha = pearl.get("quality", {}).get("is_gotcha", False)
-        if is_gotcha:
-            risk = "critical"
-        elif quality >= 7:
-            risk = "high"
-        elif quality >= 5:
-            risk = "medium"
-        else:
-            risk = "low"
-        
-        sql = f"""INSERT OR REPLACE INTO refined_pearls (id, content, category, make, model, year_start, year_end, risk, tags, source_doc, action)
-VALUES ({escape_sql(pearl_id)}, {escape_sql(content)}, {escape_sql(category)}, {escape_sql(make) if make else 'NULL'}, {escape_sql(model) if model else 'NULL'}, {year_start if year_start else 'NULL'}, {year_end if year_end else 'NULL'}, {escape_sql(risk)}, {escape_sql(tags_json)}, {escape_sql(source_doc)}, 'KEEP');"""
-        
-        sql_lines.append(sql)
-    
-    with open(output_path, 'w') as f:
-        f.write('\n'.join(sql_lines))
-    
-    print(f"Generated migration with {len(pearls)} INSERT statements")
+    print(f"Generated migration: {planner.summary()}")
 
 
 def main():
@@ -426,15 +426,17 @@ def main():
     
     parser = argparse.ArgumentParser(description='LLM-Enhanced Pearl Processing')
     parser.add_argument('--input', '-i', default='data/final_curated_pearls.json',
-                        help='Input JSON file with pearls')
-    parser.add_argument('--output', '-o', default='data/llm_enhanced_pearls.json',
-                        help='Output JSON file')
+                        help='Input pearls: JSON export, JSONL file or pearl store directory')
+    parser.add_argument('--output', '-o', default='data/pearls',
+                        help='Output pearl store directory (or a .json path for a legacy export)')
     parser.add_argument('--migration', '-m', default='data/migrations/llm_enhanced_pearls.sql',
                         help='Output SQL migration file')
     parser.add_argument('--no-llm', action='store_true',
                         help='Skip LLM processing, use heuristics only')
     parser.add_argument('--limit', '-l', type=int, default=0,
                         help='Limit number of pearls to process (0 = all)')
+    parser.add_argument('--full', action='store_true',
+                        help='Emit every pearl, not just the ones changed since the last migration')
     args = parser.parse_args()
     
     input_path = Path(args.input)
@@ -446,7 +448,7 @@ def main():
         return
     
     # Process pearls
-    enhanced_pearls = process_pearls(
+    total = process_pearls(
         input_path,
         output_path,
         use_llm=not args.no_llm
@@ -454,11 +456,12 @@ def main():
     
     # Limit if requested
     if args.limit > 0:
-        enhanced_pearls = enhanced_pearls[:args.limit]
+        total = min(total, args.limit)
     
-    # Generate migration
+    # Generate migration, streaming the pearls back out of the output
     migration_path.parent.mkdir(parents=True, exist_ok=True)
-    generate_d1_migration(enhanced_pearls, migration_path)
+    generate_d1_migration(islice(iter_pearls(output_path), total), migration_path, total,
+                          full=args.full, complete=not args.limit)
     
     print("\n" + "="*50)
     print("To upload to D1:")
@@ -15,15 +15,13 @@ For each image in the manifest:
 import os
 import re
 import json
+from bisect import bisect_left
 from pathlib import Path
 from collections import defaultdict
 
-try:
-    from bs4 import BeautifulSoup
-except ImportError:
-    import subprocess, sys
-    subprocess.run([sys.executable, "-m", "pip", "install", "beautifulsoup4"], check=True)
-    from bs4 import BeautifulSoup
+from parsed_dossier import load_dossier
+from entity_scanner import KeywordScanner
+from vehicle_identity import MAKE_ALIASES, find_make
 
 # Paths
 BASE_DIR = Path(__file__).parent.parent
@@ -36,27 +34,6 @@ PUBLIC_MANIFEST = BASE_DIR / "public" / "data" / "image_gallery_manifest.json"
 # Vehicle parsing from folder names
 # ============================================================
 
-MAKE_ALIASES = {
-    'vw': 'Volkswagen', 'volkswagen': 'Volkswagen',
-    'bmw': 'BMW', 'mercedes': 'Mercedes-Benz', 'merc': 'Mercedes-Benz',
-    'gm': 'GM', 'chevy': 'Chevrolet', 'chevrolet': 'Chevrolet',
-    'cadillac': 'Cadillac', 'gmc': 'GMC', 'buick': 'Buick',
-    'ford': 'Ford', 'lincoln': 'Lincoln',
-    'toyota': 'Toyota', 'lexus': 'Lexus', 'scion': 'Scion',
-    'honda': 'Honda', 'acura': 'Acura',
-    'nissan': 'Nissan', 'infiniti': 'Infiniti',
-    'hyundai': 'Hyundai', 'kia': 'Kia', 'genesis': 'Genesis',
-    'stellantis': 'Stellantis', 'chrysler': 'Chrysler', 'dodge': 'Dodge',
-    'jeep': 'Jeep', 'ram': 'Ram', 'fiat': 'Fiat',
-    'alfa': 'Alfa Romeo',
-    'subaru': 'Subaru', 'mazda': 'Mazda', 'mitsubishi': 'Mitsubishi',
-    'volvo': 'Volvo', 'jaguar': 'Jaguar', 'jlr': 'Jaguar Land Rover',
-    'land': 'Land Rover', 'porsche': 'Porsche',
-    'audi': 'Audi', 'vag': 'VAG',
-    'tesla': 'Tesla', 'rivian': 'Rivian', 'lucid': 'Lucid',
-    'polestar': 'Polestar', 'mini': 'MINI',
-}
-
 MODEL_PATTERNS = {
     # Chevrolet
     'silverado': ('Chevrolet', 'Silverado'), 'camaro': ('Chevrolet', 'Camaro'),
@@ -223,11 +200,7 @@ def parse_vehicle_from_name(name):
     
     # 3. If no model match, try make patterns (must be exact token)
     if not result['make']:
-        tokens = name_lower.split('_')
-        for alias, make in MAKE_ALIASES.items():
-            if alias in tokens:
-                result['make'] = make
-                break
+        result['make'] = find_make(name_lower)
     
     # 4. If no year found, check for platform-era defaults
     if not result['year_start']:
@@ -244,11 +217,63 @@ def parse_vehicle_from_name(name):
 # HTML context extraction
 # ============================================================
 
+class SlugDirIndex:
+    """
+    Manifest doc_slug → export directory lookup.
+    
+    Exact slugs hit the dict directly. Otherwise a slug matches when the two
+    share their first SLUG_PREFIX_LEN characters (or one is a shorter prefix
+    of the other), answered from a sorted key list instead of scanning every
+    slug. When the candidates point at more than one directory the match is
+    ambiguous; the first directory (in map order) is still used, and the
+    alternatives are returned so the caller can report them.
+    """
+    
+    SLUG_PREFIX_LEN = 30
+    
+    def __init__(self, slug_map):
+        self.slug_map = slug_map
+        self._rank = {slug: i for i, slug in enumerate(slug_map)}
+        self._sorted = sorted(slug_map)
+    
+    def __len__(self):
+        return len(self.slug_map)
+    
+    def get(self, slug, default=None):
+        return self.slug_map.get(slug, default)
+    
+    def resolve(self, doc_slug):
+        """(export_dir or None, list of all candidate dirs when ambiguous else [])."""
+        export_dir = self.slug_map.get(doc_slug)
+        if export_dir:
+            return export_dir, []
+        
+        prefix = doc_slug[:self.SLUG_PREFIX_LEN]
+        matches = set()
+        # Slugs that start with the doc_slug's prefix
+        i = bisect_left(self._sorted, prefix)
+        while i < len(self._sorted) and self._sorted[i].startswith(prefix):
+            matches.add(self._sorted[i])
+            i += 1
+        # Short slugs that are themselves a prefix of the doc_slug
+        for k in range(min(self.SLUG_PREFIX_LEN, len(doc_slug))):
+            if doc_slug[:k] in self.slug_map:
+                matches.add(doc_slug[:k])
+        if not matches:
+            return None, []
+        
+        dirs = []
+        for slug in sorted(matches, key=self._rank.get):
+            if self.slug_map[slug] not in dirs:
+                dirs.append(self.slug_map[slug])
+        return dirs[0], (dirs if len(dirs) > 1 else [])
+
+
 def build_slug_to_dir_map():
-    """Build a map from manifest doc_slugs to filesystem directory paths."""
+    """Build an index from manifest doc_slugs to filesystem directory paths."""
     slug_map = {}
     
-    for d in GDRIVE_EXPORTS.iterdir():
+    for d in sorted(GDRIVE_EXPORTS.iterdir()):
         if not d.is_dir() or d.name in ['html', 'images', '.DS_Store']:
             continue
         # Create slug the same way sync_gallery_images.py does
@@ -261,85 +286,120 @@ def build_slug_to_dir_map():
         full_slug = d.name.lower().replace(' ', '_')
         slug_map[full_slug] = d
     
-    return slug_map
+    return SlugDirIndex(slug_map)
 
 
-def extract_context_from_html(html_path, image_filename):
-    """Extract context for a specific image from its HTML file."""
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+CAPTION_TAGS = {'p', 'figcaption', 'span'}
+MAX_HEADINGS_BACK = 15    # Give up on a heading after this many too-short ones
+
+
+def extract_image_contexts(html_path):
+    """
+    Context for every <img> in one HTML export, from a single walk of the document.
+    
+    Returns a list in document order of dicts with src, stem, position
+    (1-based) and the combined context string (heading | preceding text |
+    [alt], falling back to the caption).
+    """
     try:
-        with open(html_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
+        doc = load_dossier(html_path)
     except Exception:
-        return None
+        return []
     
-    soup = BeautifulSoup(content, 'html.parser')
-    
-    # Find the img tag that matches the filename
-    target_img = None
-    for img in soup.find_all('img'):
-        src = img.get('src', '')
-        if image_filename in src or Path(src).stem == Path(image_filename).stem:
-            target_img = img
-            break
-    
-    if not target_img:
-        # Try matching by position (imageN.png → Nth image)
-        match = re.match(r'image(\d+)', Path(image_filename).stem)
-        if match:
-            idx = int(match.group(1)) - 1
-            all_imgs = soup.find_all('img')
-            if 0 <= idx < len(all_imgs):
-                target_img = all_imgs[idx]
-    
-    if not target_img:
-        return None
-    
-    # Extract heading
+    images = []
     heading = None
-    prev = target_img
-    for _ in range(15):
-        prev = prev.find_previous(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        if prev:
-            heading_text = prev.get_text(strip=True)
+    headings_since = 0        # Too-short headings seen since `heading`
+    prev_para = None          # Nearest preceding <p>/<li> (may be the image's own parent)
+    awaiting_caption = []
+    
+    for node in doc.root.find_all():
+        name = node.name
+        
+        if name in CAPTION_TAGS and awaiting_caption:
+            caption_text = node.get_text(strip=True)
+            caption = caption_text[:200] if 5 < len(caption_text) < 300 else None
+            for entry in awaiting_caption:
+                entry['caption'] = caption
+            awaiting_caption = []
+        
+        if name in HEADING_TAGS:
+            heading_text = node.get_text(strip=True)
             if heading_text and len(heading_text) > 3:
                 heading = heading_text[:150]
-                break
-    
-    # Extract preceding paragraph
-    preceding = None
-    prev_p = target_img.find_previous(['p', 'li'])
-    if prev_p:
-        para_text = prev_p.get_text(strip=True)
-        if para_text and len(para_text) > 15:
-            preceding = para_text[:300]
-    
-    # Extract caption (following text)
-    caption = None
-    next_elem = target_img.find_next(['p', 'figcaption', 'span'])
-    if next_elem:
-        caption_text = next_elem.get_text(strip=True)
-        if caption_text and len(caption_text) > 5 and len(caption_text) < 300:
-            caption = caption_text[:200]
-    
-    # Alt text
-    alt = target_img.get('alt', '')
-    if alt and alt.lower() in ['image', '', 'img', 'screenshot']:
-        alt = None
-    
-    # Combine into context string
+                headings_since = 0
+            else:
+                headings_since += 1
+        elif name in ('p', 'li'):
+            prev_para = node
+        elif name == 'img':
+            preceding = None
+            if prev_para:
+                para_text = prev_para.get_text(strip=True)
+                if para_text and len(para_text) > 15:
+                    preceding = para_text[:300]
+            
+            alt = node.get('alt', '')
+            if alt and alt.lower() in ['image', '', 'img', 'screenshot']:
+                alt = None
+            
+            src = node.get('src', '')
+            entry = {
+                'src': src,
+                'stem': Path(src).stem,
+                'position': len(images) + 1,
+                'heading': heading if headings_since < MAX_HEADINGS_BACK else None,
+                'preceding': preceding,
+                'alt': alt,
+                'caption': None,
+            }
+            images.append(entry)
+            awaiting_caption.append(entry)
+    
+    for entry in images:
+        entry['context'] = _combine_context(entry)
+    return images
+
+
+def _combine_context(entry):
+    """Combine heading, preceding text and alt text into one context string."""
+    heading = entry['heading']
+    alt = entry['alt']
     parts = []
     if heading:
         parts.append(heading)
-    if preceding:
+    if entry['preceding']:
         # Truncate at sentence boundary
-        text = preceding[:150]
+        text = entry['preceding'][:150]
         if '.' in text:
             text = text[:text.rindex('.') + 1]
         parts.append(text)
     if alt and alt not in (heading or ''):
         parts.append(f"[{alt}]")
     
-    return ' | '.join(parts) if parts else caption
+    return ' | '.join(parts) if parts else entry['caption']
+
+
+def match_image_context(image_contexts, image_filename):
+    """Pick the context for image_filename from a document's extract_image_contexts()."""
+    stem = Path(image_filename).stem
+    for entry in image_contexts:
+        if image_filename in entry['src'] or entry['stem'] == stem:
+            return entry['context']
+    
+    # Try matching by position (imageN.png → Nth image)
+    match = re.match(r'image(\d+)', stem)
+    if match:
+        idx = int(match.group(1)) - 1
+        if 0 <= idx < len(image_contexts):
+            return image_contexts[idx]['context']
+    
+    return None
+
+
+def extract_context_from_html(html_path, image_filename):
+    """Extract context for a specific image from its HTML file."""
+    return match_image_context(extract_image_contexts(html_path), image_filename)
 
 
 # ============================================================
@@ -401,6 +461,9 @@ CONTENT_TYPE_PATTERNS = {
     'connector': 'Connector Diagram', 'location': 'Component Location',
 }
 
+# Substring patterns of both tables (short topic patterns go through the token check instead)
+TAG_SCANNER = KeywordScanner([p for p in TOPIC_TAG_PATTERNS if len(p) >= 4] + list(CONTENT_TYPE_PATTERNS))
+
 
 def generate_tags(img, vehicle, doc_slug):
     """Generate a complete, clean set of tags for an image.
@@ -428,7 +491,8 @@ def generate_tags(img, vehicle, doc_slug):
     combined_text = (doc_slug + ' ' + context).lower()
     
     # Use token-safe matching for short patterns
-    tokens = combined_text.replace('-', '_').replace(' ', '_').split('_')
+    tokens = set(combined_text.replace('-', '_').replace(' ', '_').split('_'))
+    found = TAG_SCANNER.found(combined_text)
     
     for pattern, tag in TOPIC_TAG_PATTERNS.items():
         if tag in tags:
@@ -439,14 +503,14 @@ def generate_tags(img, vehicle, doc_slug):
                 tags.append(tag)
         else:
             # Longer patterns: safe substring match
-            if pattern in combined_text:
+            if pattern in found:
                 tags.append(tag)
     
     # 5. Content type tags from context
     for pattern, tag in CONTENT_TYPE_PATTERNS.items():
         if tag in tags:
             continue
-        if pattern in combined_text:
+        if pattern in found:
             tags.append(tag)
     
     # 6. Fallback: if no topic tags at all, add 'Locksmith'
@@ -482,9 +546,11 @@ def main():
     slug_map = build_slug_to_dir_map()
     print(f"📁 Built slug map: {len(slug_map)} entries")
     
-    # Process each image
+    # Process each image; each export's HTML is walked once for all of its images
     context_count = 0
     vehicle_count = 0
+    doc_contexts = {}
+    ambiguous = {}
     
     for img in images:
         path = img.get('path', '')
@@ -516,19 +582,18 @@ def main():
         img.pop('context', None)
         
         # 2. Extract context from HTML
-        export_dir = slug_map.get(doc_slug)
-        
-        if not export_dir:
-            for slug, d in slug_map.items():
-                if slug.startswith(doc_slug[:30]) or doc_slug.startswith(slug[:30]):
-                    export_dir = d
-                    break
+        export_dir, candidates = slug_map.resolve(doc_slug)
+        if candidates:
+            ambiguous[doc_slug] = candidates
         
         if export_dir:
-            html_files = list(export_dir.glob('*.html')) + list(export_dir.glob('*.htm'))
+            if export_dir not in doc_contexts:
+                html_files = list(export_dir.glob('*.html')) + list(export_dir.glob('*.htm'))
+                doc_contexts[export_dir] = extract_image_contexts(html_files[0]) if html_files else None
+            image_contexts = doc_contexts[export_dir]
             
-            if html_files:
-                context = extract_context_from_html(html_files[0], filename)
+            if image_contexts is not None:
+                context = match_image_context(image_contexts, filename)
                 if context:
                     vehicle_prefix = ""
                     if vehicle['year_start'] and vehicle['make']:
@@ -560,6 +625,11 @@ def main():
         img['tags'] = generate_tags(img, vehicle, doc_slug)
     
     print(f"\n📊 Results:")
+    print(f"   Documents parsed:  {sum(1 for c in doc_contexts.values() if c is not None)}")
+    if ambiguous:
+        print(f"   ⚠️  Ambiguous slug matches: {len(ambiguous)} (used first candidate)")
+        for doc_slug, candidates in sorted(ambiguous.items())[:10]:
+            print(f"      {doc_slug} → {', '.join(d.name for d in candidates)}")
     print(f"   Context extracted: {context_count}/{len(images)} ({context_count*100//len(images)}%)")
     print(f"   Vehicle matched:   {vehicle_count}/{len(images)} ({vehicle_count*100//len(images)}%)")
     
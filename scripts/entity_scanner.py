@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Multi-Pattern Entity Scanner
+
+One Aho-Corasick automaton per keyword set, so entity detection is a single
+pass over the text whatever the vocabulary size, instead of one substring
+search per keyword per document.
+
+The shared vocabulary (tools, chips, platforms, makes, FCC grantee
+prefixes) lives in scripts/entity_vocabulary.json. Each category picks how
+strictly a hit has to stand on its own:
+
+    none    plain substring, same as `keyword in text`
+    word    no letter or digit directly before or after the hit
+    prefix  no letter or digit before, and the hit continues into an ID
+            (HYQ14FBA, M3N-40821302)
+
+Detectors with their own keyword tables (section types, pearl markers,
+image tags) build a KeywordScanner from them once at import time.
+
+Matching is case-insensitive; hit offsets index the lowercased text, which
+lines up with the input for everything except the few characters whose
+lowercase form has a different length. When pyahocorasick is installed it
+runs the scan, otherwise a pure-Python automaton does.
+
+Usage:
+    from entity_scanner import KeywordScanner, find_entities
+
+    find_entities(text)                  # {'tools': ['autel'], 'chips': ['8A'], ...}
+    find_entities(text, 'makes')         # ['Toyota', 'Lexus']
+
+    SECTION_SCANNER = KeywordScanner(SECTION_TYPES)
+    SECTION_SCANNER.labels(heading)      # ['procedure', 'tools']
+    SECTION_SCANNER.found(heading)       # {'akl', 'autel'}
+"""
+
+import argparse
+import json
+import sys
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple, Union
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+VOCABULARY_PATH = Path(__file__).parent / "entity_vocabulary.json"
+
+BOUNDARIES = ("none", "word", "prefix")
+
+
+class Hit(NamedTuple):
+    start: int
+    end: int
+    pattern: str
+    label: Any
+
+
+def _is_word_char(text: str, index: int) -> bool:
+    return 0 <= index < len(text) and text[index].isalnum()
+
+
+def _bounded(text: str, start: int, end: int, boundary: str) -> bool:
+    if boundary == "none":
+        return True
+    if _is_word_char(text, start - 1):
+        return False
+    if boundary == "word":
+        return not _is_word_char(text, end)
+    return end < len(text) and (text[end].isalnum() or text[end] == '-')
+
+
+class KeywordScanner:
+    """
+    Aho-Corasick automaton over (pattern, label) pairs.
+
+    Patterns can be given as {label: [patterns]} or as a plain list of
+    patterns (each its own label). The same pattern may carry several labels.
+    """
+
+    def __init__(self, patterns: Union[Mapping[Any, Iterable[str]], Iterable[str], None] = None,
+                 boundary: str = "none"):
+        self._patterns: List[Tuple[str, Any, str]] = []
+        self._automaton = None
+        if isinstance(patterns, Mapping):
+            for label, words in patterns.items():
+                for word in words:
+                    self.add(word, label, boundary)
+        elif patterns is not None:
+            for word in patterns:
+                self.add(word, boundary=boundary)
+
+    def add(self, pattern: str, label: Any = None, boundary: str = "none") -> None:
+        if boundary not in BOUNDARIES:
+            raise ValueError(f"Unknown boundary: {boundary} (expected one of {', '.join(BOUNDARIES)})")
+        pattern = pattern.lower()
+        if not pattern:
+            return
+        self._patterns.append((pattern, pattern if label is None else label, boundary))
+        self._automaton = None
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    # ------------------------------------------------------------------
+    # Automaton
+    # ------------------------------------------------------------------
+
+    def _build(self):
+        by_pattern: Dict[str, List[int]] = {}
+        for i, (pattern, _, _) in enumerate(self._patterns):
+            by_pattern.setdefault(pattern, []).append(i)
+
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for pattern, indexes in by_pattern.items():
+                automaton.add_word(pattern, (len(pattern), indexes))
+            if by_pattern:
+                automaton.make_automaton()
+            return automaton
+
+        # Trie, then breadth-first failure links folded into a full transition
+        # table, so the scan loop is one dict lookup per character.
+        goto: List[Dict[str, int]] = [{}]
+        output: List[List[Tuple[int, List[int]]]] = [[]]
+        for pattern, indexes in by_pattern.items():
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    output.append([])
+                    goto[state][ch] = nxt
+                state = nxt
+            output[state].append((len(pattern), indexes))
+
+        delta: List[Dict[str, int]] = [dict() for _ in goto]
+        delta[0] = dict(goto[0])
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            output[state] = output[state] + output[fail[state]]
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                queue.append(nxt)
+        return delta, output
+
+    def _raw_hits(self, text: str) -> Iterator[Tuple[int, int, List[int]]]:
+        """(start, end, pattern indexes) for every occurrence, before boundary checks."""
+        if self._automaton is None:
+            self._automaton = self._build()
+        if ahocorasick is not None:
+            if len(self._automaton) == 0:
+                return
+            for last, (length, indexes) in self._automaton.iter(text):
+                yield last + 1 - length, last + 1, indexes
+            return
+
+        delta, output = self._automaton
+        state = 0
+        for i, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            if output[state]:
+                for length, indexes in output[state]:
+                    yield i + 1 - length, i + 1, indexes
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def scan(self, text: str) -> List[Hit]:
+        """Every hit (overlapping ones included) in one pass, ordered by end offset."""
+        text = text.lower()
+        hits = []
+        for start, end, indexes in self._raw_hits(text):
+            for i in indexes:
+                pattern, label, boundary = self._patterns[i]
+                if _bounded(text, start, end, boundary):
+                    hits.append(Hit(start, end, pattern, label))
+        return hits
+
+    def starts(self, text: str) -> Iterator[Tuple[int, Any]]:
+        """
+        (start, label) for every hit, ordered by end offset, without building
+        Hit tuples. The text must already be lowercased.
+        """
+        for start, end, indexes in self._raw_hits(text):
+            for i in indexes:
+                _, label, boundary = self._patterns[i]
+                if boundary == "none" or _bounded(text, start, end, boundary):
+                    yield start, label
+
+    def found(self, text: str) -> Set[str]:
+        """Distinct patterns present in the text."""
+        text = text.lower()
+        found = set()
+        for start, end, indexes in self._raw_hits(text):
+            for i in indexes:
+                pattern, _, boundary = self._patterns[i]
+                if pattern not in found and _bounded(text, start, end, boundary):
+                    found.add(pattern)
+        return found
+
+    def labels(self, text: str) -> List[Any]:
+        """Distinct labels present in the text, in order of first occurrence."""
+        seen = {}
+        for hit in sorted(self.scan(text), key=lambda h: (h.start, h.end)):
+            seen.setdefault(hit.label, None)
+        return list(seen)
+
+
+def load_vocabulary(path: Union[str, Path] = VOCABULARY_PATH) -> Dict[str, dict]:
+    """The vocabulary file: category -> {'boundary': ..., 'entities': {entity: [patterns]}}."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def vocabulary_scanner(path: str = str(VOCABULARY_PATH)) -> KeywordScanner:
+    """Scanner over the whole vocabulary, labelled (category, entity). Built once per path."""
+    scanner = KeywordScanner()
+    for category, spec in load_vocabulary(path).items():
+        boundary = spec.get('boundary', 'none')
+        for entity, patterns in spec['entities'].items():
+            for pattern in patterns:
+                scanner.add(pattern, (category, entity), boundary)
+    return scanner
+
+
+def find_entities(text: str, category: Optional[str] = None,
+                  path: Union[str, Path] = VOCABULARY_PATH) -> Union[Dict[str, List[str]], List[str]]:
+    """
+    Vocabulary entities mentioned in the text, in order of first occurrence.
+
+    Returns:
+        list of entities for one category, else dict: category -> entities
+    """
+    found: Dict[str, List[str]] = {}
+    for hit_category, entity in vocabulary_scanner(str(path)).labels(text):
+        found.setdefault(hit_category, []).append(entity)
+    if category is not None:
+        return found.get(category, [])
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan text files for vocabulary entities')
+    parser.add_argument('files', nargs='*', help='Files to scan (default: stdin)')
+    parser.add_argument('--vocabulary', default=str(VOCABULARY_PATH), help='Vocabulary JSON')
+    parser.add_argument('--hits', action='store_true', help='Print every hit with its offsets')
+    args = parser.parse_args()
+
+    sources = [(name, Path(name).read_text(encoding='utf-8', errors='replace')) for name in args.files]
+    if not sources:
+        sources = [('<stdin>', sys.stdin.read())]
+
+    scanner = vocabulary_scanner(args.vocabulary)
+    for name, text in sources:
+        print(f"== {name}")
+        if args.hits:
+            for hit in sorted(scanner.scan(text), key=lambda h: (h.start, h.end)):
+                category, entity = hit.label
+                span = f"{hit.start}-{hit.end}"
+                print(f"  {span:<14} {category:<13} {entity:<16} {hit.pattern!r}")
+        else:
+            for category, entities in find_entities(text, path=args.vocabulary).items():
+                print(f"  {category}: {', '.join(entities)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,9 +21,10 @@ import re
 import json
 import hashlib
 from pathlib import Path
-from bs4 import BeautifulSoup
 from collections import defaultdict
 
+from parsed_dossier import load_dossier
+
 # Paths
 HTML_DIR = Path("gdrive_exports/html")
 OUTPUT_JSON = Path("data/focused_pearls.json")
@@ -136,10 +137,7 @@ def get_paragraph_context(element):
 
 def extract_pearls_from_html(filepath):
     """Extract focused pearls from a single HTML file."""
-    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
-    
-    soup = BeautifulSoup(content, 'html.parser')
+    soup = load_dossier(filepath).root
     
     # Get vehicle context
     vehicle = extract_vehicle_context(filepath.name, soup)
@@ -14,7 +14,8 @@ import os
 import re
 import json
 from pathlib import Path
-from bs4 import BeautifulSoup
+
+from parsed_dossier import load_dossier
 
 # Use correct paths based on actual directory structure
 BASE_DIR = Path(__file__).parent.parent
@@ -95,10 +96,7 @@ def extract_image_context(soup, img_tag):
 
 def process_dossier_html(html_path, dossier_name):
     """Process HTML file and return dict mapping image filename to context."""
-    with open(html_path, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
-    
-    soup = BeautifulSoup(content, 'html.parser')
+    soup = load_dossier(html_path).root
     vehicle_info = extract_vehicle_from_dossier_name(dossier_name)
     
     # Find all images
@@ -7,9 +7,10 @@ Creates a JSON inventory of all images with their source files and suggested tag
 import os
 import json
 import re
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, unquote
 
+from parsed_dossier import load_dossier
+
 HTML_DIR = "/Users/jeremysamuels/Documents/study-dashboard/gdrive_exports/html"
 OUTPUT_JSON = "/Users/jeremysamuels/Documents/study-dashboard/data/image_catalog.json"
 
@@ -41,14 +42,11 @@ def extract_images_from_file(filepath):
     filename = os.path.basename(filepath)
     
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+        soup = load_dossier(filepath).root
     except Exception as e:
         print(f"Error reading {filepath}: {e}")
         return images
     
-    soup = BeautifulSoup(content, 'html.parser')
-    
     # Find all images
     for img in soup.find_all('img'):
         src = img.get('src', '')
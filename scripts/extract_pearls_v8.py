@@ -16,10 +16,14 @@ import re
 import json
 import hashlib
 from pathlib import Path
-from bs4 import BeautifulSoup
 from typing import Optional, Dict, List, Tuple
 from collections import defaultdict
 
+from entity_scanner import KeywordScanner
+from parallel_runner import add_workers_argument, run_parallel
+from parsed_dossier import DossierNode, load_dossier
+from text_patterns import extract_all
+
 # ============================================
 # CONFIGURATION
 # ============================================
@@ -102,13 +106,12 @@ MODEL_PATTERNS = {
 }
 
 # Entity extraction patterns
+# FCC IDs, chips and part numbers come from text_patterns.extract_all();
+# these are the entity types it does not cover.
 ENTITY_PATTERNS = {
-    "fcc_id": r"\b(HYQ[A-Z0-9]+|M3N[-]?[A-Z0-9]+|KR5[A-Z0-9]+|N5F[-]?[A-Z0-9]+|GQ4[-]?[A-Z0-9]+|OHT[A-Z0-9]+|CWTWB[A-Z0-9]+)\b",
-    "chip": r"\b(ID46|ID47|ID49|8A[-]?BA|8A|H[-]?Chip|G[-]?Chip|HITAG[\s-]?(PRO|AES|2)?|PCF\d+|NCF\d+|4A|4D|Texas Crypto)\b",
-    "lishi": r"\b(HU\d+|TOY\d+|HON\d+|MIT\d+|VA\d+|NE\d+|B111|SIP22|HY\d+|NSN14|DAT17)\b",
-    "platform": r"\b(TNGA-[CFKL]|T1XX|K2XX|GMT[T\d]+|MQB|MLB|CAS[34]|FEM|BDC|Epsilon|Alpha|Giorgio|SGW|RF Hub)\b",
-    "frequency": r"\b(315\s*MHz|433\s*MHz|902\s*MHz|UHF|LF)\b",
-    "part_number": r"\b(\d{5}[-]\d{3,}|\d{2}[-]\d{4}[-]\d+)\b",
+    "lishi": re.compile(r"\b(HU\d+|TOY\d+|HON\d+|MIT\d+|VA\d+|NE\d+|B111|SIP22|HY\d+|NSN14|DAT17)\b", re.IGNORECASE),
+    "platform": re.compile(r"\b(TNGA-[CFKL]|T1XX|K2XX|GMT[T\d]+|MQB|MLB|CAS[34]|FEM|BDC|Epsilon|Alpha|Giorgio|SGW|RF Hub)\b", re.IGNORECASE),
+    "frequency": re.compile(r"\b(315\s*MHz|433\s*MHz|902\s*MHz|UHF|LF)\b", re.IGNORECASE),
 }
 
 # Keywords for pearl quality scoring
@@ -119,12 +122,15 @@ QUALITY_KEYWORDS = {
     "gotcha": ["trap", "gotcha", "mistake", "common error", "watch out", "beware", "pitfall"],
 }
 
+SECTION_SCANNER = KeywordScanner(SECTION_TYPES)
+QUALITY_SCANNER = KeywordScanner(QUALITY_KEYWORDS)
+
 
 # ============================================
 # LEVEL 1: DOCUMENT METADATA EXTRACTION
 # ============================================
 
-def extract_document_metadata(filepath: Path, soup: BeautifulSoup) -> Dict:
+def extract_document_metadata(filepath: Path, soup: DossierNode) -> Dict:
     """Extract vehicle info from filename, title, and H1."""
     filename = filepath.stem
     
@@ -178,16 +184,16 @@ def extract_document_metadata(filepath: Path, soup: BeautifulSoup) -> Dict:
 
 def classify_section_type(heading_text: str) -> str:
     """Classify section heading into type."""
-    heading_lower = heading_text.lower()
+    found = set(SECTION_SCANNER.labels(heading_text))
     
-    for section_type, keywords in SECTION_TYPES.items():
-        if any(kw in heading_lower for kw in keywords):
+    for section_type in SECTION_TYPES:
+        if section_type in found:
             return section_type
     
     return "general"
 
 
-def extract_sections(soup: BeautifulSoup) -> List[Dict]:
+def extract_sections(soup: DossierNode) -> List[Dict]:
     """Build section map from H2/H3 headers."""
     sections = []
     section_id = 0
@@ -241,11 +247,14 @@ def extract_entities(text: str) -> Dict[str, List[str]]:
     """Pre-scan for technical entities."""
     entities = defaultdict(set)
     
-    for entity_type, pattern in ENTITY_PATTERNS.items():
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    found = extract_all(text)
+    for entity_type, matches in (("fcc_id", found.fcc_ids), ("chip", found.chips)):
         for match in matches:
-            if isinstance(match, tuple):
-                match = match[0]
+            if len(match) > 2:
+                entities[entity_type].add(match)
+    
+    for entity_type, pattern in ENTITY_PATTERNS.items():
+        for match in pattern.findall(text):
             if len(match) > 2:
                 entities[entity_type].add(match.upper())
     
@@ -271,12 +280,12 @@ def clean_text(text: str) -> str:
 
 def score_pearl_quality(text: str) -> Tuple[int, Dict]:
     """Score pearl quality based on keywords."""
-    text_lower = text.lower()
+    found = QUALITY_SCANNER.found(text)
     score = 0
     scores = {}
     
     for category, keywords in QUALITY_KEYWORDS.items():
-        category_score = sum(1 for kw in keywords if kw in text_lower)
+        category_score = sum(1 for kw in keywords if kw in found)
         scores[category] = category_score
         
         # Weight by category
@@ -320,7 +329,7 @@ def get_context(element, direction: str, max_chars: int = 300) -> str:
     return combined
 
 
-def extract_pearl_candidates(soup: BeautifulSoup, sections: List[Dict], doc_entities: Dict) -> List[Dict]:
+def extract_pearl_candidates(soup: DossierNode, sections: List[Dict], doc_entities: Dict) -> List[Dict]:
     """Extract pearl candidates with full context."""
     candidates = []
     seen_hashes = set()
@@ -382,10 +391,7 @@ def extract_pearl_candidates(soup: BeautifulSoup, sections: List[Dict], doc_enti
 def process_document(filepath: Path) -> Optional[Dict]:
     """Process a single HTML document."""
     try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        soup = BeautifulSoup(content, 'html.parser')
+        soup = load_dossier(filepath).root
         full_text = soup.get_text()
         
         # Level 1: Document metadata
@@ -427,6 +433,7 @@ def main():
     parser.add_argument('--input', '-i', default='gdrive_exports', help='Input directory')
     parser.add_argument('--output', '-o', default='data/pearl_extraction/extracted_pearls_v8.json')
     parser.add_argument('--limit', '-l', type=int, default=0, help='Limit documents to process')
+    add_workers_argument(parser)
     args = parser.parse_args()
     
     input_dir = Path(args.input)
@@ -434,25 +441,17 @@ def main():
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
     # Find all HTML files in subdirectories
-    html_files = list(input_dir.glob("**/*.html"))
+    html_files = sorted(input_dir.glob("**/*.html"))
     print(f"Found {len(html_files)} HTML files")
     
     if args.limit > 0:
         html_files = html_files[:args.limit]
         print(f"Limited to {args.limit} files")
     
-    # Process documents
-    all_results = []
-    total_pearls = 0
-    
-    for i, filepath in enumerate(html_files):
-        result = process_document(filepath)
-        if result:
-            all_results.append(result)
-            total_pearls += len(result["pearls"])
-            
-            if (i + 1) % 50 == 0:
-                print(f"  Processed {i + 1}/{len(html_files)} files, {total_pearls} pearls...")
+    # Process documents (results come back in file order for any worker count)
+    results, _ = run_parallel(process_document, html_files, workers=args.workers)
+    all_results = [result for result in results if result]
+    total_pearls = sum(len(result["pearls"]) for result in all_results)
     
     # Compile output
     output_data = {
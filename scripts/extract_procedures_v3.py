@@ -15,6 +15,8 @@ from bs4 import BeautifulSoup
 from collections import defaultdict
 import hashlib
 
+from entity_scanner import KeywordScanner, find_entities
+
 HTML_DIR = Path("gdrive_exports/html")
 OUTPUT_JSON = Path("data/procedures.json")
 
@@ -31,34 +33,15 @@ TOOLS = {
     'topdon': (['topdon', 't-ninja'], 'Topdon', 'Topdon'),
 }
 
-MAKES_MAP = {
-    'chevy': 'Chevrolet', 'chevrolet': 'Chevrolet',
-    'gmc': 'GMC', 'cadillac': 'Cadillac',
-    'ford': 'Ford', 'lincoln': 'Lincoln',
-    'toyota': 'Toyota', 'lexus': 'Lexus', 'scion': 'Scion',
-    'honda': 'Honda', 'acura': 'Acura',
-    'nissan': 'Nissan', 'infiniti': 'Infiniti',
-    'hyundai': 'Hyundai', 'kia': 'Kia', 'genesis': 'Genesis',
-    'bmw': 'BMW', 'mercedes': 'Mercedes', 'benz': 'Mercedes',
-    'audi': 'Audi', 'volkswagen': 'Volkswagen', 'vw': 'Volkswagen',
-    'porsche': 'Porsche', 'volvo': 'Volvo',
-    'jeep': 'Jeep', 'dodge': 'Dodge', 'ram': 'Ram', 'chrysler': 'Chrysler',
-    'subaru': 'Subaru', 'mazda': 'Mazda', 'mitsubishi': 'Mitsubishi',
-    'land rover': 'Land Rover', 'jaguar': 'Jaguar',
-    'tesla': 'Tesla', 'rivian': 'Rivian',
-    'alfa romeo': 'Alfa Romeo',
-}
+TOOL_SCANNER = KeywordScanner({tid: patterns for tid, (patterns, _, _) in TOOLS.items()})
 
 
 def detect_vehicle(text, filename):
     """Detect vehicle from text/filename."""
     combined = f"{text} {filename}".lower()
     
-    make = None
-    for pattern, make_name in MAKES_MAP.items():
-        if pattern in combined:
-            make = make_name
-            break
+    makes = find_entities(combined, 'makes')
+    make = makes[0] if makes else None
     
     # Model detection
     model_patterns = [
@@ -78,7 +61,7 @@ def detect_vehicle(text, filename):
         (r'\b(q[578]|a[468]|e[-\s]?tron)\b', 'Audi'),
         (r'\b(atlas|tiguan|jetta|passat|golf|id\.?4)\b', 'Volkswagen'),
         (r'\b(x[357]|[357]\s*series)\b', 'BMW'),
-        (r'\b(gle|glc|gls|[ces][-\s]?class)\b', 'Mercedes'),
+        (r'\b(gle|glc|gls|[ces][-\s]?class)\b', 'Mercedes-Benz'),
         (r'\b(rx|nx|es|gx|lx|is|ls)\b', 'Lexus'),
         (r'\b(gv[78]0|g[789]0)\b', 'Genesis'),
         (r'\b(outback|forester|crosstrek|ascent|impreza|wrx)\b', 'Subaru'),
@@ -115,14 +98,9 @@ def detect_vehicle(text, filename):
 
 def detect_tools(text):
     """Detect tools in text."""
-    text_lower = text.lower()
-    found = []
-    for tid, (patterns, name, short) in TOOLS.items():
-        for p in patterns:
-            if p in text_lower:
-                found.append({'id': tid, 'name': name, 'short': short})
-                break
-    return found
+    found = set(TOOL_SCANNER.labels(text))
+    return [{'id': tid, 'name': name, 'short': short}
+            for tid, (patterns, name, short) in TOOLS.items() if tid in found]
 
 
 def classify_type(text):
@@ -9,10 +9,13 @@ classifies them, and filters out non-procedure content (citations, etc.)
 import json
 import re
 from pathlib import Path
-from bs4 import BeautifulSoup
 from collections import defaultdict
 import hashlib
 
+from entity_scanner import KeywordScanner, find_entities
+from parallel_runner import add_workers_argument, run_parallel
+from parsed_dossier import load_dossier
+
 HTML_DIR = Path("gdrive_exports/html")
 OUTPUT_JSON = Path("data/procedures_v4.json")
 
@@ -38,20 +41,7 @@ TOOLS = {
     'topdon': (['topdon', 't-ninja'], 'Topdon', 'Topdon'),
 }
 
-MAKES_MAP = {
-    'chevy': 'Chevrolet', 'chevrolet': 'Chevrolet', 'gmc': 'GMC', 
-    'cadillac': 'Cadillac', 'ford': 'Ford', 'lincoln': 'Lincoln',
-    'toyota': 'Toyota', 'lexus': 'Lexus', 'scion': 'Scion',
-    'honda': 'Honda', 'acura': 'Acura', 'nissan': 'Nissan', 
-    'infiniti': 'Infiniti', 'hyundai': 'Hyundai', 'kia': 'Kia', 
-    'genesis': 'Genesis', 'bmw': 'BMW', 'mercedes': 'Mercedes', 
-    'benz': 'Mercedes', 'audi': 'Audi', 'volkswagen': 'Volkswagen', 
-    'vw': 'Volkswagen', 'porsche': 'Porsche', 'volvo': 'Volvo',
-    'jeep': 'Jeep', 'dodge': 'Dodge', 'ram': 'Ram', 'chrysler': 'Chrysler',
-    'subaru': 'Subaru', 'mazda': 'Mazda', 'mitsubishi': 'Mitsubishi',
-    'land rover': 'Land Rover', 'jaguar': 'Jaguar', 'tesla': 'Tesla',
-    'alfa romeo': 'Alfa Romeo', 'fiat': 'Fiat',
-}
+TOOL_SCANNER = KeywordScanner({tid: patterns for tid, (patterns, _, _) in TOOLS.items()})
 
 
 def is_citation_list(items):
@@ -114,11 +104,8 @@ def detect_vehicle(text, filename):
     """Detect vehicle from text/filename."""
     combined = f"{text} {filename}".lower()
     
-    make = None
-    for pattern, make_name in MAKES_MAP.items():
-        if pattern in combined:
-            make = make_name
-            break
+    makes = find_entities(combined, 'makes')
+    make = makes[0] if makes else None
     
     # Model patterns
     model_patterns = [
@@ -140,7 +127,7 @@ def detect_vehicle(text, filename):
         (r'\b(q[5678]|a[4683]|e[-\s]?tron|rs|tt)\b', 'Audi'),
         (r'\b(atlas|tiguan|jetta|passat|golf|id\.?4|taos)\b', 'Volkswagen'),
         (r'\b(x[13567]|[3457]\s*series|m[345]|i[x48])\b', 'BMW'),
-        (r'\b(gle|glc|gls|[cesag][-\s]?class|amg|eqs|eqe)\b', 'Mercedes'),
+        (r'\b(gle|glc|gls|[cesag][-\s]?class|amg|eqs|eqe)\b', 'Mercedes-Benz'),
         (r'\b(rx|nx|es|gx|lx|is|ls|ux|rc)\b', 'Lexus'),
         (r'\b(outback|forester|crosstrek|ascent|impreza|wrx|brz)\b', 'Subaru'),
         (r'\b(cx[-\s]?[3579]0?|mazda[36]|mx[-\s]?5)\b', 'Mazda'),
@@ -172,20 +159,14 @@ def detect_vehicle(text, filename):
 
 def detect_tools(text):
     """Detect tools in text."""
-    text_lower = text.lower()
-    found = []
-    for tid, (patterns, name, short) in TOOLS.items():
-        for p in patterns:
-            if p in text_lower:
-                found.append({'id': tid, 'name': name, 'short': short})
-                break
-    return found
+    found = set(TOOL_SCANNER.labels(text))
+    return [{'id': tid, 'name': name, 'short': short}
+            for tid, (patterns, name, short) in TOOLS.items() if tid in found]
 
 
 def extract_from_file(filepath):
     """Extract all procedure lists from file."""
-    content = filepath.read_text(encoding='utf-8', errors='ignore')
-    soup = BeautifulSoup(content, 'html.parser')
+    soup = load_dossier(filepath).root
     full_text = soup.get_text()
     filename = filepath.stem
     
@@ -270,7 +251,7 @@ def extract_from_file(filepath):
             'step_count': len(steps),
             'time_minutes': time_mins,
             'source_doc': filepath.name,
-            'tags': list(set(tags))
+            'tags': sorted(set(tags))
         }
         
         procedures.append(procedure)
@@ -279,18 +260,24 @@ def extract_from_file(filepath):
 
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Procedure Extraction V4')
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
     print("=" * 70)
     print("📋 PROCEDURE EXTRACTION V4 - AGGRESSIVE LIST CAPTURE")
     print("=" * 70)
     
-    html_files = list(HTML_DIR.glob("*.html"))
+    html_files = sorted(HTML_DIR.glob("*.html"))
     print(f"\n📂 Processing {len(html_files)} HTML files...")
     
     all_procedures = []
     files_with_procedures = 0
     
-    for filepath in html_files:
-        procs = extract_from_file(filepath)
+    results, failures = run_parallel(extract_from_file, html_files, workers=args.workers)
+    for procs in results:
         if procs:
             files_with_procedures += 1
             all_procedures.extend(procs)
@@ -313,6 +300,8 @@ def main():
     print(f"\n  Total lists found: {len(all_procedures)}")
     print(f"  AKL/ADD_KEY/Procedure: {len(relevant)}")
     print(f"  Files with procedures: {files_with_procedures}")
+    if failures:
+        print(f"  Files failed: {len(failures)}")
     
     print("\n  By Type:")
     for t, c in sorted(by_type.items(), key=lambda x: -x[1]):
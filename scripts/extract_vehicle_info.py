@@ -3,7 +3,8 @@ import os
 import glob
 import re
 import json
-from bs4 import BeautifulSoup
+
+from parsed_dossier import load_dossier
 
 # Configuration
 HTML_DIR = '/Users/jeremysamuels/Documents/study-dashboard/gdrive_exports/html'
@@ -64,8 +65,7 @@ class VehicleExtractor:
 
     def process_file(self, file_path):
         filename = os.path.basename(file_path)
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-            soup = BeautifulSoup(f, 'html.parser')
+        soup = load_dossier(file_path).root
 
         # Extract Vehicle Class/Name
         # Try <title>, then first <h1>, then filename
@@ -17,6 +17,8 @@ from pathlib import Path
 from collections import defaultdict
 from typing import Optional
 
+from text_patterns import first_year_range
+
 # Paths
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_ROOT = SCRIPT_DIR.parent
@@ -56,24 +58,9 @@ TOOLS = ["Autel", "IM608", "IM508", "Smart Pro", "SmartPro", "VVDI", "Xhorse",
 
 
 def extract_year_from_title(title: str) -> tuple[Optional[int], Optional[int]]:
-    """Extract year or year range from video title."""
-    # Look for patterns like "2020-2024", "2020 - 2024", "2020+"
-    range_match = re.search(r'(\d{4})\s*[-–]\s*(\d{4})', title)
-    if range_match:
-        return int(range_match.group(1)), int(range_match.group(2))
-    
-    # Look for "2020+" pattern
-    plus_match = re.search(r'(\d{4})\+', title)
-    if plus_match:
-        return int(plus_match.group(1)), None  # None means "current"
-    
-    # Single year
-    year_match = re.search(r'\b(20\d{2})\b', title)
-    if year_match:
-        year = int(year_match.group(1))
-        return year, year
-    
-    return None, None
+    """Extract year or year range from video title ("2020-2024", "2020+", "2021")."""
+    # An open-ended "2020+" comes back as (2020, None), None meaning "current"
+    return first_year_range(title, open_end=None) or (None, None)
 
 
 def extract_make_from_title(title: str) -> Optional[str]:
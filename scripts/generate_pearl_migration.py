@@ -1,17 +1,19 @@
 #!/usr/bin/env python3
 """
-Generate SQL INSERT statements from refined_pearls_unified.jsonl
+Generate a refined_pearls migration from refined_pearls_unified.jsonl
+
+Only pearls that changed since the last generated migration are emitted
+(see migration_planner.py); pearls marked DELETE or dropped from the file
+become DELETEs. Use --full to re-emit every pearl.
 """
 
+import argparse
 import json
 import re
+from datetime import date
 from pathlib import Path
 
-def escape_sql(s):
-    """Escape single quotes for SQL."""
-    if s is None:
-        return 'NULL'
-    return "'" + str(s).replace("'", "''") + "'"
+from migration_planner import MigrationPlanner
 
 def extract_category(tags):
     """Extract primary category from tags."""
@@ -28,25 +30,19 @@ def extract_display_tags(tags):
             display.append(tag)
     return display
 
-def main():
-    input_file = Path('data/refined_pearls_unified.jsonl')
-    output_file = Path('data/migrations/import_refined_pearls.sql')
-    
-    inserts = []
-    skipped = 0
-    count = 0
-    
+def read_rows(input_file, stats):
+    """refined_pearls rows from the unified JSONL, counting skipped entries in stats."""
     with open(input_file, 'r') as f:
         for line in f:
             try:
                 pearl = json.loads(line.strip())
             except json.JSONDecodeError:
-                skipped += 1
+                stats['skipped'] += 1
                 continue
             
             # Skip DELETE entries
             if pearl.get('action') == 'DELETE':
-                skipped += 1
+                stats['skipped'] += 1
                 continue
             
             tags = pearl.get('tags', [])
@@ -58,8 +54,8 @@ def main():
             elif not isinstance(vehicle, dict):
                 vehicle = {}
             
-            # Build the INSERT
-            values = {
+            stats['rows'] += 1
+            yield {
                 'id': pearl.get('id'),
                 'original_id': pearl.get('id'),
                 'content': pearl.get('content'),
@@ -67,8 +63,8 @@ def main():
                 'category': extract_category(tags),
                 'make': vehicle.get('make'),
                 'model': vehicle.get('model'),
-                'year_start': vehicle.get('year_start'),
-                'year_end': vehicle.get('year_end'),
+                'year_start': vehicle.get('year_start') or None,
+                'year_end': vehicle.get('year_end') or None,
                 'risk': pearl.get('risk', 'reference'),
                 'tags': json.dumps(tags),
                 'display_tags': json.dumps(extract_display_tags(tags)),
@@ -76,23 +72,24 @@ def main():
                 'duplicate_of': pearl.get('duplicate_of'),
                 'issues_found': pearl.get('issues_found')
             }
-            
-            sql = f"""INSERT OR REPLACE INTO refined_pearls 
-(id, original_id, content, action, category, make, model, year_start, year_end, risk, tags, display_tags, source_doc, duplicate_of, issues_found)
-VALUES ({escape_sql(values['id'])}, {escape_sql(values['original_id'])}, {escape_sql(values['content'])}, {escape_sql(values['action'])}, {escape_sql(values['category'])}, {escape_sql(values['make'])}, {escape_sql(values['model'])}, {values['year_start'] or 'NULL'}, {values['year_end'] or 'NULL'}, {escape_sql(values['risk'])}, {escape_sql(values['tags'])}, {escape_sql(values['display_tags'])}, {escape_sql(values['source_doc'])}, {escape_sql(values['duplicate_of'])}, {escape_sql(values['issues_found'])});"""
-            
-            inserts.append(sql)
-            count += 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the refined_pearls migration')
+    parser.add_argument('--full', action='store_true', help='Emit every pearl, not just changed ones')
+    args = parser.parse_args()
+    
+    input_file = Path('data/refined_pearls_unified.jsonl')
+    output_file = Path('data/migrations/import_refined_pearls.sql')
     
-    with open(output_file, 'w') as f:
-        f.write(f"-- Refined Pearls Import\n")
-        f.write(f"-- Generated: 2026-01-16\n")
-        f.write(f"-- Total inserts: {count}\n")
-        f.write(f"-- Skipped (DELETE/invalid): {skipped}\n\n")
-        f.write('\n'.join(inserts))
+    stats = {'rows': 0, 'skipped': 0}
+    planner = MigrationPlanner('refined_pearls_unified', 'refined_pearls', ['id'], full=args.full)
+    planner.write(read_rows(input_file, stats), output_file, header=[
+        "-- Refined Pearls Import",
+        f"-- Generated: {date.today().isoformat()}",
+    ])
     
-    print(f"Generated {count} INSERT statements -> {output_file}")
-    print(f"Skipped {skipped} entries (DELETE or invalid)")
+    print(f"Read {stats['rows']} pearls: {planner.summary()} -> {output_file}")
+    print(f"Skipped {stats['skipped']} entries (DELETE or invalid)")
 
 if __name__ == '__main__':
     main()
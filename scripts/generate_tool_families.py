@@ -10,6 +10,8 @@ import re
 from pathlib import Path
 from collections import defaultdict
 
+from vehicle_identity import canonical_make
+
 DATA_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/obdii365_scraped/parsed")
 OUTPUT_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/public/data")
 
@@ -180,22 +182,8 @@ FAMILY_DEFS = [
 
 
 def normalize_make(make):
-    """Normalize vehicle make names."""
-    make = make.strip()
-    upper = {'GM', 'BMW', 'VW', 'JAC', 'BYD', 'GAC', 'MG', 'KTM', 'DS', 'BAIC', 'SAIC', 'MAN'}
-    if make.upper() in upper:
-        return make.upper()
-    make = make.title()
-    fixes = {
-        'mercedes-benz': 'Mercedes-Benz', 'mercedes benz': 'Mercedes-Benz',
-        'land rover': 'Land Rover', 'alfa romeo': 'Alfa Romeo',
-        'rolls royce': 'Rolls-Royce', 'rolls-royce': 'Rolls-Royce',
-        'aston martin': 'Aston Martin', 'volkswagen': 'Volkswagen',
-    }
-    for k, v in fixes.items():
-        if make.lower() == k:
-            return v
-    return make
+    """Normalize vehicle make names (shared canonical names)."""
+    return canonical_make(make)
 
 
 def parse_year_range(year_str):
@@ -11,6 +11,8 @@ import re
 from pathlib import Path
 from collections import defaultdict
 
+from vehicle_identity import canonical_make
+
 DATA_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/obdii365_scraped/parsed")
 OUTPUT_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/public/data")
 
@@ -77,32 +79,8 @@ FUNCTION_LABELS = {
 }
 
 def normalize_make(make):
-    """Normalize vehicle make names."""
-    make = make.strip()
-    # Uppercase common makes
-    upper_makes = {'GM', 'BMW', 'VW', 'JAC', 'BYD', 'GAC', 'MG', 'KTM', 'DS', 'BAIC', 'SAIC', 'MAN'}
-    if make.upper() in upper_makes:
-        return make.upper()
-    # Title case
-    make = make.title()
-    # Fix specific names
-    fixes = {
-        'Mercedes-Benz': 'Mercedes-Benz', 'Mercedes Benz': 'Mercedes-Benz',
-        'Land Rover': 'Land Rover', 'Alfa Romeo': 'Alfa Romeo',
-        'Great Wall': 'Great Wall', 'Aston Martin': 'Aston Martin',
-        'Rolls Royce': 'Rolls-Royce', 'Rolls-Royce': 'Rolls-Royce',
-        'Citroën': 'Citroen', 'Citroen': 'Citroen',
-        'Dongfeng': 'Dongfeng', 'Changan': 'Changan',
-        'Foton': 'Foton', 'Geely': 'Geely', 'Chery': 'Chery',
-        'Roewe': 'Roewe', 'Haima': 'Haima', 'Wuling': 'Wuling',
-        'Mitsubishi Fuso': 'Mitsubishi Fuso',
-        'Volvo Penta': 'Volvo Penta',
-        'Volkswagen': 'Volkswagen',
-    }
-    for k, v in fixes.items():
-        if make.lower() == k.lower():
-            return v
-    return make
+    """Normalize vehicle make names (shared canonical names)."""
+    return canonical_make(make)
 
 
 def parse_year_range(year_str):
@@ -2,27 +2,34 @@
 """
 Grokipedia Batch Extractor for Automotive Glossary Terms
 Pulls structured content from Grokipedia API and caches locally.
+Pages are fetched concurrently under one shared rate limit; each entry is
+journaled as it arrives, so an interrupted run resumes where it stopped.
 
 Usage:
     python scripts/grokipedia_batch.py
     python scripts/grokipedia_batch.py --terms "FBS4,DST-AES,PATS"
     python scripts/grokipedia_batch.py --file terms.txt
+    python scripts/grokipedia_batch.py --concurrency 8
 """
 
 import argparse
+import asyncio
 import json
 import os
-import time
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 from urllib.parse import quote
-import requests
+
+from async_crawler import TokenBucket, retry_after_seconds
+from http_cache import HttpCacheError, shared_cache
 
 # Configuration
 API_BASE = "https://grokipedia-api.com/page"
 OUTPUT_DIR = Path(__file__).parent.parent / "data" / "glossary_batches" / "grokipedia_cache"
 RATE_LIMIT_DELAY = 0.7  # seconds between requests (stay under 100/min)
 MAX_RETRIES = 3
+CONCURRENCY = 4  # requests in flight; they still start no faster than RATE_LIMIT_DELAY apart
 
 # Automotive glossary terms to search
 DEFAULT_TERMS = [
@@ -89,35 +96,49 @@ DEFAULT_TERMS = [
     "Scalable_Product_Architecture",
 ]
 
-def fetch_grokipedia_page(slug: str, include_refs: bool = True) -> dict | None:
-    """Fetch a single page from Grokipedia API."""
+async def fetch_page(slug: str, bucket: TokenBucket, include_refs: bool = True) -> dict | None:
+    """Fetch a single page, taking a token from `bucket` before every request."""
     url = f"{API_BASE}/{quote(slug)}"
     params = {"refs": "true"} if include_refs else {}
     
     for attempt in range(MAX_RETRIES):
+        await bucket.acquire()
         try:
-            response = requests.get(url, params=params, timeout=30)
-            
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 404:
-                print(f"  ⚠️  Not found: {slug}")
-                return None
-            elif response.status_code == 429:
-                print(f"  ⏳ Rate limited, waiting 60s...")
-                time.sleep(60)
-                continue
-            else:
-                print(f"  ❌ Error {response.status_code}: {slug}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
+            response = await asyncio.to_thread(shared_cache().get, url, params=params, timeout=30)
+        except HttpCacheError as e:
             print(f"  ❌ Request failed (attempt {attempt + 1}): {e}")
             if attempt < MAX_RETRIES - 1:
-                time.sleep(5)
+                await asyncio.sleep(5)
+            continue
+        
+        if response.status_code == 200:
+            try:
+                return response.json()
+            except ValueError as e:
+                # Truncated or non-JSON body: don't keep serving it from the cache
+                shared_cache().forget(url, params=params)
+                print(f"  ❌ Request failed (attempt {attempt + 1}): {e}")
+                if attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(5)
+                continue
+        elif response.status_code == 404:
+            print(f"  ⚠️  Not found: {slug}")
+            return None
+        elif response.status_code == 429:
+            wait = retry_after_seconds(response.headers.get("retry-after")) or 60
+            print(f"  ⏳ Rate limited, pausing all requests for {wait:.0f}s...")
+            bucket.pause(wait)
+            continue
+        else:
+            print(f"  ❌ Error {response.status_code}: {slug}")
+            return None
                 
     return None
 
+def fetch_grokipedia_page(slug: str, include_refs: bool = True) -> dict | None:
+    """Fetch a single page from Grokipedia API."""
+    return asyncio.run(fetch_page(slug, TokenBucket(1 / RATE_LIMIT_DELAY), include_refs))
+
 def extract_glossary_entry(page_data: dict) -> dict:
     """Transform Grokipedia response into glossary entry format."""
     content = page_data.get("content_text", "")
@@ -145,90 +166,143 @@ def extract_glossary_entry(page_data: dict) -> dict:
         "source": "grokipedia"
     }
 
-def load_existing_cache() -> dict:
-    """Load existing cached entries."""
-    cache_file = OUTPUT_DIR / "grokipedia_glossary.json"
-    if cache_file.exists():
-        with open(cache_file, "r") as f:
-            return json.load(f)
-    return {"entries": [], "metadata": {"last_updated": None, "total_fetched": 0}}
-
-def save_cache(cache: dict):
-    """Save cache to disk."""
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    cache_file = OUTPUT_DIR / "grokipedia_glossary.json"
+class GlossaryStore:
+    """
+    Cached entries keyed by slug. grokipedia_glossary.json is the compacted
+    snapshot; every entry fetched since is appended to a journal as it
+    arrives, so an interrupted run loses nothing and the next one resumes
+    from the last entry written.
+    """
+    
+    def __init__(self, output_dir: Path = OUTPUT_DIR):
+        self.snapshot_path = output_dir / "grokipedia_glossary.json"
+        self.journal_path = output_dir / "grokipedia_glossary.journal.jsonl"
+        self.entries: dict[str, dict] = {}
+        self.metadata = {"last_updated": None, "total_fetched": 0}
+        self.journaled: set[str] = set()   # slugs written since the last snapshot
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+        self._journal = open(self.journal_path, "a")
     
-    cache["metadata"]["last_updated"] = datetime.now().isoformat()
-    cache["metadata"]["total_fetched"] = len(cache["entries"])
+    def _load(self):
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, "r") as f:
+                cache = json.load(f)
+            self.metadata = cache.get("metadata", self.metadata)
+            self.entries = {e["slug"]: e for e in cache.get("entries", [])}
+        if self.journal_path.exists():
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final line from a crash mid-write
+                    self.entries[entry["slug"]] = entry
+                    self.journaled.add(entry["slug"])
     
-    with open(cache_file, "w") as f:
-        json.dump(cache, f, indent=2)
+    def __contains__(self, slug: str) -> bool:
+        return slug in self.entries
     
-    print(f"\n✅ Saved {len(cache['entries'])} entries to {cache_file}")
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def put(self, entry: dict):
+        """Add or replace an entry and append it to the journal."""
+        self.entries[entry["slug"]] = entry
+        self.journaled.add(entry["slug"])
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+    
+    def compact(self):
+        """Rewrite the snapshot with every entry, then start an empty journal."""
+        self.metadata["last_updated"] = datetime.now().isoformat()
+        self.metadata["total_fetched"] = len(self.entries)
+        
+        tmp_path = self.snapshot_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"entries": list(self.entries.values()), "metadata": self.metadata}, f, indent=2)
+        os.replace(tmp_path, self.snapshot_path)
+        
+        # A crash before this point just replays the journal onto the new snapshot
+        self._journal.close()
+        self.journal_path.unlink(missing_ok=True)
+        self.journaled.clear()
+        self._journal = open(self.journal_path, "a")
+        
+        print(f"\n✅ Saved {len(self.entries)} entries to {self.snapshot_path}")
+    
+    def close(self):
+        self._journal.close()
+
+async def fetch_all(pending: list[tuple[int, str, str]], store: GlossaryStore, total: int,
+                    concurrency: int) -> Counter:
+    """Fetch (index, term, slug) items with `concurrency` workers sharing one rate limit."""
+    bucket = TokenBucket(1 / RATE_LIMIT_DELAY)
+    queue = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+    counts = Counter()
+    
+    async def worker():
+        while not queue.empty():
+            i, term, slug = queue.get_nowait()
+            print(f"[{i}/{total}] 📥 Fetching: {term}")
+            page_data = await fetch_page(slug, bucket)
+            if page_data:
+                entry = extract_glossary_entry(page_data)
+                store.put(entry)
+                counts["fetched"] += 1
+                print(f"   ✅ {term}: {entry['word_count']} words, {entry['references_count']} refs")
+            else:
+                counts["failed"] += 1
+    
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(pending))))))
+    return counts
 
-def run_batch(terms: list[str], skip_existing: bool = True):
+def run_batch(terms: list[str], skip_existing: bool = True, concurrency: int = CONCURRENCY):
     """Run batch extraction for given terms."""
     print(f"🚀 Grokipedia Batch Extractor")
     print(f"   Terms to fetch: {len(terms)}")
     print(f"   Output: {OUTPUT_DIR}")
-    print(f"   Rate limit: {1/RATE_LIMIT_DELAY:.1f} req/sec\n")
+    print(f"   Rate limit: {1/RATE_LIMIT_DELAY:.1f} req/sec, {concurrency} concurrent\n")
     
-    cache = load_existing_cache()
-    existing_slugs = {e["slug"] for e in cache["entries"]}
+    store = GlossaryStore(OUTPUT_DIR)
+    if store.journaled:
+        print(f"   Resuming: {len(store.journaled)} entries recovered from the last checkpoint\n")
     
-    fetched = 0
+    # --force still keeps what an interrupted forced run already re-fetched
+    done = store if skip_existing else store.journaled
+    pending = []
     skipped = 0
-    failed = 0
-    
     for i, term in enumerate(terms, 1):
         slug = term.replace(" ", "_")
-        
-        # Skip if already cached
-        if skip_existing and slug in existing_slugs:
+        if slug in done:
             print(f"[{i}/{len(terms)}] ⏭️  Skipping (cached): {term}")
             skipped += 1
-            continue
-        
-        print(f"[{i}/{len(terms)}] 📥 Fetching: {term}")
-        
-        page_data = fetch_grokipedia_page(slug)
-        
-        if page_data:
-            entry = extract_glossary_entry(page_data)
-            
-            # Update or add to cache
-            existing_idx = next(
-                (i for i, e in enumerate(cache["entries"]) if e["slug"] == slug), 
-                None
-            )
-            if existing_idx is not None:
-                cache["entries"][existing_idx] = entry
-            else:
-                cache["entries"].append(entry)
-            
-            fetched += 1
-            print(f"   ✅ Got {entry['word_count']} words, {entry['references_count']} refs")
         else:
-            failed += 1
-        
-        # Rate limiting
-        if i < len(terms):
-            time.sleep(RATE_LIMIT_DELAY)
+            pending.append((i, term, slug))
     
-    # Save results
-    save_cache(cache)
+    try:
+        counts = asyncio.run(fetch_all(pending, store, len(terms), concurrency))
+    finally:
+        # Also on Ctrl-C: every entry fetched so far is already in the journal
+        store.compact()
+        store.close()
     
     print(f"\n📊 Summary:")
-    print(f"   Fetched: {fetched}")
+    print(f"   Fetched: {counts['fetched']}")
     print(f"   Skipped: {skipped}")
-    print(f"   Failed:  {failed}")
-    print(f"   Total cached: {len(cache['entries'])}")
+    print(f"   Failed:  {counts['failed']}")
+    print(f"   Total cached: {len(store)}")
 
 def main():
     parser = argparse.ArgumentParser(description="Fetch Grokipedia pages for glossary")
     parser.add_argument("--terms", type=str, help="Comma-separated list of terms")
     parser.add_argument("--file", type=str, help="File with terms (one per line)")
     parser.add_argument("--force", action="store_true", help="Re-fetch even if cached")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="Requests in flight at once (the rate limit still applies)")
     args = parser.parse_args()
     
     if args.terms:
@@ -239,7 +313,7 @@ def main():
     else:
         terms = DEFAULT_TERMS
     
-    run_batch(terms, skip_existing=not args.force)
+    run_batch(terms, skip_existing=not args.force, concurrency=args.concurrency)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Conditional-GET HTTP Cache
+
+On-disk cache shared by the downloaders. Bodies are stored once per content
+hash; a SQLite index maps each URL to its body, status and validators:
+
+    <cache_dir>/index.db                       url -> body hash, status, ETag,
+                                               Last-Modified, headers, when
+                                               last confirmed current
+    <cache_dir>/bodies/<hh>/<sha256>           response bodies (content-addressed,
+                                               so identical files are stored once)
+
+A get() is answered, in order:
+    fresh entry (confirmed < `ttl` seconds ago)         from disk, no request
+    offline mode                                        from disk, stale or not;
+                                                        a URL never recorded
+                                                        raises OfflineMiss
+    entry with validators                               If-None-Match /
+                                                        If-Modified-Since; a 304
+                                                        re-serves the stored body
+    otherwise                                           plain GET, stored
+
+Only the URL (with its query parameters) keys an entry; request headers such
+as a rotating OAuth token do not. Offline mode (offline=True or
+HTTP_CACHE_OFFLINE=1) never touches the network, so a run can be replayed
+from what an earlier run recorded.
+
+Usage:
+    from http_cache import shared_cache, HttpCacheError
+
+    response = shared_cache().get(url, params={'refs': 'true'}, timeout=30)
+    if response.status == 200:
+        data = response.json()
+
+    python3 scripts/http_cache.py --stats
+    python3 scripts/http_cache.py --prune-days 90
+    python3 scripts/http_cache.py --self-test    # against a local fixture server
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Union
+from urllib.parse import urlencode, urlsplit, urlunsplit
+
+BASE = Path(__file__).resolve().parent.parent
+DEFAULT_CACHE_DIR = Path(os.environ.get('HTTP_CACHE_DIR', BASE / 'data' / 'cache' / 'http'))
+
+# Worth keeping: the resource itself, or a definitive "it is not there"
+CACHEABLE_STATUSES = {200, 203, 404, 410}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    final_url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    body_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    headers TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    validated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_body ON responses(body_hash);
+"""
+
+
+class HttpCacheError(Exception):
+    """A request failed without a response (network error, timeout)."""
+
+
+class OfflineMiss(HttpCacheError):
+    """Offline mode was asked for a URL no earlier run recorded."""
+
+
+def cache_key(url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    """The URL with `params` merged into its query string (the index key)."""
+    if not params:
+        return url
+    parts = urlsplit(url)
+    query = '&'.join(q for q in (parts.query, urlencode(params)) if q)
+    return urlunsplit(parts._replace(query=query))
+
+
+class CachedResponse:
+    """The parts of a response the downloaders use (a subset of requests.Response)."""
+
+    def __init__(self, url: str, status: int, headers: Dict[str, str], content: bytes,
+                 from_cache: bool = False, revalidated: bool = False):
+        self.url = url
+        self.status = status
+        self.headers = headers            # lower-cased names
+        self.content = content
+        self.from_cache = from_cache      # body came from disk
+        self.revalidated = revalidated    # ... after a 304 from the server
+
+    @property
+    def status_code(self) -> int:
+        return self.status
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def encoding(self) -> str:
+        content_type = self.headers.get('content-type', '')
+        for param in content_type.split(';')[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                return value.strip('"')
+        return 'utf-8'
+
+    @property
+    def text(self) -> str:
+        try:
+            return self.content.decode(self.encoding, errors='replace')
+        except LookupError:
+            return self.content.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def __repr__(self) -> str:
+        source = 'revalidated' if self.revalidated else 'cache' if self.from_cache else 'network'
+        return f"<CachedResponse {self.status} {self.url} ({source}, {len(self.content)} bytes)>"
+
+
+class _NoErrorProcessor(urllib.request.HTTPErrorProcessor):
+    """Hand 304s and error statuses back as responses instead of raising."""
+
+    def http_response(self, request, response):
+        if response.status == 304 or response.status >= 400:
+            return response
+        return super().http_response(request, response)    # redirects are still followed
+
+    https_response = http_response
+
+
+_opener = urllib.request.build_opener(_NoErrorProcessor)
+
+
+def _fetch(url: str, headers: Mapping[str, str], timeout: float):
+    """(status, final url, lower-cased headers, body) for a GET; redirects are followed."""
+    request = urllib.request.Request(url, headers=dict(headers))
+    try:
+        with _opener.open(request, timeout=timeout) as resp:
+            body = resp.read()
+            return resp.status, resp.geturl(), {k.lower(): v for k, v in resp.headers.items()}, body
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        raise HttpCacheError(f"GET {url} failed: {e}") from e
+
+
+class HttpCache:
+    """Content-addressed response store with conditional revalidation."""
+
+    def __init__(self, cache_dir: Union[str, Path] = DEFAULT_CACHE_DIR, ttl: float = 0,
+                 offline: Optional[bool] = None):
+        self.cache_dir = Path(cache_dir)
+        self.body_dir = self.cache_dir / 'bodies'
+        self.ttl = ttl
+        if offline is None:
+            offline = os.environ.get('HTTP_CACHE_OFFLINE', '') not in ('', '0')
+        self.offline = offline
+        self.stats = {'fresh': 0, 'revalidated': 0, 'fetched': 0, 'offline': 0, 'uncached': 0}
+        self.body_dir.mkdir(parents=True, exist_ok=True)
+        # One connection shared by every thread; the lock serializes index access
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.cache_dir / 'index.db'), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def _body_path(self, body_hash: str) -> Path:
+        return self.body_dir / body_hash[:2] / body_hash
+
+    def _store_body(self, content: bytes) -> str:
+        body_hash = hashlib.sha256(content).hexdigest()
+        path = self._body_path(body_hash)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Unique temp name: two threads may store the same body at once
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return body_hash
+
+    def lookup(self, url: str, params: Optional[Mapping[str, Any]] = None) -> Optional[sqlite3.Row]:
+        """The index row for a URL, or None."""
+        with self._lock:
+            return self.conn.execute("SELECT * FROM responses WHERE url = ?",
+                                     (cache_key(url, params),)).fetchone()
+
+    def forget(self, url: str, params: Optional[Mapping[str, Any]] = None) -> None:
+        """Drop a URL's entry (e.g. a body that failed to parse) so the next get refetches it."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses WHERE url = ?", (cache_key(url, params),))
+
+    def _cached(self, row: sqlite3.Row, revalidated: bool = False) -> Optional[CachedResponse]:
+        path = self._body_path(row['body_hash'])
+        if not path.exists():
+            return None
+        return CachedResponse(row['final_url'], row['status'], json.loads(row['headers']),
+                              path.read_bytes(), from_cache=True, revalidated=revalidated)
+
+    def get(self, url: str, params: Optional[Mapping[str, Any]] = None,
+            headers: Optional[Mapping[str, str]] = None, ttl: Optional[float] = None,
+            timeout: float = 30) -> CachedResponse:
+        """
+        GET through the cache. `ttl` (seconds, default the cache's) is how long
+        a stored response is served without asking the server; 0 revalidates
+        every time. Raises HttpCacheError when no response arrives at all.
+        """
+        key = cache_key(url, params)
+        ttl = self.ttl if ttl is None else ttl
+        row = self.lookup(key)
+
+        if row is not None and (self.offline or time.time() - row['validated_at'] < ttl):
+            cached = self._cached(row)
+            if cached is not None:
+                self.stats['offline' if self.offline else 'fresh'] += 1
+                return cached
+            row = None                 # body file lost: fetch it again
+        if self.offline:
+            raise OfflineMiss(f"not in the HTTP cache (offline mode): {key}")
+
+        request_headers = dict(headers or {})
+        if row is not None:
+            if row['etag']:
+                request_headers['If-None-Match'] = row['etag']
+            if row['last_modified']:
+                request_headers['If-Modified-Since'] = row['last_modified']
+
+        status, final_url, response_headers, content = _fetch(key, request_headers, timeout)
+        now = time.time()
+
+        if status == 304 and row is not None:
+            with self._lock, self.conn:
+                self.conn.execute("UPDATE responses SET validated_at = ?, etag = COALESCE(?, etag) WHERE url = ?",
+                                  (now, response_headers.get('etag'), key))
+            cached = self._cached(row, revalidated=True)
+            if cached is not None:
+                self.stats['revalidated'] += 1
+                return cached
+            # Body vanished between lookup and now: ask again without validators
+            return self.get(url, params, headers, ttl=ttl, timeout=timeout)
+
+        response = CachedResponse(final_url, status, response_headers, content)
+        if status not in CACHEABLE_STATUSES or 'no-store' in response_headers.get('cache-control', ''):
+            self.stats['uncached'] += 1
+            return response
+
+        body_hash = self._store_body(content)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (url, final_url, status, body_hash, size, etag, last_modified, "
+                "headers, fetched_at, validated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, final_url, status, body_hash, len(content), response_headers.get('etag'),
+                 response_headers.get('last-modified'), json.dumps(response_headers), now, now))
+        self.stats['fetched'] += 1
+        return response
+
+    def summary(self) -> Dict[str, int]:
+        """Entry count, distinct bodies and bytes on disk."""
+        with self._lock:
+            entries, bodies = self.conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT body_hash) FROM responses").fetchone()
+        size = sum(p.stat().st_size for p in self.body_dir.glob('*/*') if p.is_file())
+        return {'entries': entries, 'bodies': bodies, 'bytes': size}
+
+    def prune(self, max_age_days: float) -> int:
+        """Drop entries not validated for `max_age_days`, then every unreferenced body."""
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock, self.conn:
+            dropped = self.conn.execute("DELETE FROM responses WHERE validated_at < ?", (cutoff,)).rowcount
+            live = {row[0] for row in self.conn.execute("SELECT DISTINCT body_hash FROM responses")}
+        for path in self.body_dir.glob('*/*'):
+            if path.name not in live:
+                path.unlink()
+        return dropped
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+_shared: Optional[HttpCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache() -> HttpCache:
+    """The process-wide cache at DEFAULT_CACHE_DIR (created on first use)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpCache()
+        return _shared
+
+
+# ---------------------------------------------------------------------------
+# Fixture server self-test
+# ---------------------------------------------------------------------------
+
+class FixtureFiles(BaseHTTPRequestHandler):
+    """
+    /etag/<name> answers with an ETag, /dated/<name> with Last-Modified only,
+    /plain/<name> with no validators; all honour conditional GETs. `versions`
+    bumps a page's content; every /same/ page has one body, /missing/ is a 404
+    and /redirect/ a 302 to /etag/r.
+    """
+
+    requests_seen: list = []
+    versions: Dict[str, int] = {}
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.requests_seen.append((self.path, self.headers.get('If-None-Match'),
+                                   self.headers.get('If-Modified-Since')))
+        path = self.path.split('?')[0]
+        if path.startswith('/redirect/'):
+            self.send_response(302)
+            self.send_header('Location', '/etag/r')
+            self.end_headers()
+            return
+        if path.startswith('/missing/'):
+            self.send_error(404)
+            return
+        version = self.versions.get(path, 1)
+        body = (b"shared" if path.startswith('/same/') else f"{self.path} v{version}".encode('utf-8')) * 20
+        etag = f'"{version}"'
+        last_modified = f"Wed, 0{version} Oct 2025 00:00:00 GMT"
+        if path.startswith('/etag/') and self.headers.get('If-None-Match') == etag or \
+                path.startswith('/dated/') and self.headers.get('If-Modified-Since') == last_modified:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if path.startswith('/etag/'):
+            self.send_header('ETag', etag)
+        if path.startswith('/dated/'):
+            self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def self_test() -> bool:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureFiles)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    seen = FixtureFiles.requests_seen
+    checks = []
+
+    def check(name: str, ok: bool) -> None:
+        checks.append(ok)
+        print(f"  {'✓' if ok else '✗'} {name}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = HttpCache(tmp)
+        first = cache.get(f"{base}/etag/a", params={'refs': 'true'})
+        check("first GET goes to the network", first.status == 200 and not first.from_cache)
+        again = cache.get(f"{base}/etag/a", params={'refs': 'true'})
+        check("ETag revalidation answers 304 and re-serves the body",
+              again.revalidated and again.content == first.content and seen[-1][1] == '"1"')
+        check("query parameters are part of the key", not cache.get(f"{base}/etag/a").from_cache)
+
+        cache.get(f"{base}/dated/b")
+        dated = cache.get(f"{base}/dated/b")
+        check("Last-Modified revalidation sends If-Modified-Since", dated.revalidated and seen[-1][2] is not None)
+
+        FixtureFiles.versions['/etag/a'] = 2
+        changed = cache.get(f"{base}/etag/a", params={'refs': 'true'})
+        check("a changed resource is transferred again", not changed.from_cache and b'v2' in changed.content)
+
+        cache.get(f"{base}/plain/c")
+        requests_before = len(seen)
+        fresh = cache.get(f"{base}/plain/c", ttl=3600)
+        check("a fresh entry is served without a request", fresh.from_cache and len(seen) == requests_before)
+        cache.get(f"{base}/plain/c")
+        check("an entry without validators is refetched once stale", len(seen) == requests_before + 1)
+
+        missing = cache.get(f"{base}/missing/d")
+        redirected = cache.get(f"{base}/redirect/e")
+        check("404s are recorded and redirects keep the final URL",
+              missing.status == 404 and redirected.url == f"{base}/etag/r")
+
+        cache.get(f"{base}/same/1")
+        cache.get(f"{base}/same/2")
+        summary = cache.summary()
+        check("identical bodies are stored once", summary['bodies'] == summary['entries'] - 1)
+
+        # Replay: a second cache over the same directory, network forbidden
+        server.shutdown()
+        server.server_close()
+        replay = HttpCache(tmp, offline=True)
+        replayed = [replay.get(f"{base}/etag/a", params={'refs': 'true'}), replay.get(f"{base}/missing/d"),
+                    replay.get(f"{base}/redirect/e")]
+        check("offline mode replays recorded responses",
+              b'v2' in replayed[0].content and replayed[1].status == 404 and replayed[2].url.endswith('/etag/r'))
+        try:
+            replay.get(f"{base}/etag/never-seen")
+            check("offline mode raises OfflineMiss for unrecorded URLs", False)
+        except OfflineMiss:
+            check("offline mode raises OfflineMiss for unrecorded URLs", True)
+        try:
+            cache.get(f"{base}/etag/a")
+            check("a dead server raises HttpCacheError", False)
+        except HttpCacheError:
+            check("a dead server raises HttpCacheError", True)
+
+        check("prune drops old entries and their bodies",
+              replay.prune(-1) == summary['entries'] and replay.summary() == {'entries': 0, 'bodies': 0, 'bytes': 0})
+        cache.close()
+        replay.close()
+    print(f"{sum(checks)}/{len(checks)} checks passed")
+    return all(checks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared conditional-GET HTTP cache (library)')
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR, help='Cache directory')
+    parser.add_argument('--stats', action='store_true', help='Show entry count and disk usage')
+    parser.add_argument('--prune-days', type=float, help='Drop entries not validated for this many days')
+    parser.add_argument('--self-test', action='store_true', help='Exercise the cache against a local fixture server')
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+    if args.stats or args.prune_days is not None:
+        cache = HttpCache(args.cache_dir)
+        if args.prune_days is not None:
+            print(f"Pruned {cache.prune(args.prune_days)} entries")
+        summary = cache.summary()
+        print(f"{summary['entries']} entries, {summary['bodies']} bodies, {summary['bytes'] / 1e6:.1f} MB")
+        return
+    parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
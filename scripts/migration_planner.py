@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Diff-Based Migration Planner
+
+Compares a generator's current rows for a D1 table against a snapshot of
+what its last migration contained (row key -> content hash) and emits SQL
+only for rows that changed: INSERT for new keys, UPDATE for changed
+content, DELETE for keys the generator no longer produces. Re-running a
+generator on unchanged data produces an empty migration instead of
+rewriting the whole table.
+
+Snapshots live in data/migrations/snapshots/<name>.json, one per generator,
+so two generators feeding the same table never delete each other's rows.
+The snapshot describes what D1 holds, so it only advances once changes are
+applied: apply() advances it directly, while write() leaves a pending
+snapshot (<name>.pending.json) next to it that is promoted when the file
+is applied with split_migration.py --apply or marked applied by hand.
+Until then every re-run diffs against the applied state, so regenerating
+a migration before applying it re-emits the same changes instead of
+losing them. --full style runs ignore the snapshot and re-emit every row.
+New rows are written as INSERT OR REPLACE so a first run against an
+already populated table does not fail on existing keys.
+
+Migration files pack new rows into multi-row INSERTs and deleted keys into
+DELETE ... IN (...) (sql_writer.py), written in batches under d1_client's
+byte/statement caps so any batch can be sent as one D1 payload.
+
+Usage:
+    planner = MigrationPlanner('llm_enhanced_pearls', 'refined_pearls', ['id'], full=args.full)
+    counts = planner.write(rows, migration_path, header=["-- LLM-Enhanced Pearls Migration"])
+    # or: planner.apply(rows, connect())
+
+    python3 scripts/migration_planner.py --status
+    python3 scripts/migration_planner.py --mark-applied llm_enhanced_pearls    # or a migration file
+"""
+
+import argparse
+import json
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from d1_client import D1Client
+from pipeline_cache import row_hash
+from sql_writer import (MAX_STATEMENT_ROWS, MigrationFile, delete_statements, insert_statements,
+                        quote_identifier as _quote, sql_literal)
+
+BASE_DIR = Path(__file__).parent.parent
+SNAPSHOT_DIR = BASE_DIR / "data" / "migrations" / "snapshots"
+
+
+class MigrationPlanner:
+    """Row-level diff of one generator's output for one table."""
+
+    def __init__(self, name: str, table: str, key_columns: Sequence[str], full: bool = False,
+                 insert_defaults: Optional[Dict[str, str]] = None,
+                 snapshot_dir: Union[str, Path] = SNAPSHOT_DIR):
+        """
+        Args:
+            name: Snapshot name (one per generator).
+            table: Target D1 table.
+            key_columns: Columns that identify a row (primary key or natural key).
+            full: Ignore the snapshot and emit every row.
+            insert_defaults: column -> SQL expression added to INSERTs only and
+                left out of the content hash (e.g. created_at = datetime('now')).
+        """
+        self.name = name
+        self.table = table
+        self.key_columns = tuple(key_columns)
+        self.full = full
+        self.insert_defaults = insert_defaults or {}
+        self.snapshot_path = Path(snapshot_dir) / f"{name}.json"
+        self.pending_path = _pending_path(self.snapshot_path)
+        self.snapshot = {} if full else self._load()
+        self._next: Dict[str, str] = {}
+        self.counts: Counter = Counter()
+
+    @property
+    def is_fresh(self) -> bool:
+        """True when there is nothing to diff against (first run or full)."""
+        return not self.snapshot
+
+    def _load(self) -> Dict[str, str]:
+        if not self.snapshot_path.exists():
+            return {}
+        with open(self.snapshot_path, 'r') as f:
+            data = json.load(f)
+        if data.get('table') != self.table or tuple(data.get('key_columns', ())) != self.key_columns:
+            return {}  # Generator was re-targeted; start over with a full emit
+        return data.get('rows', {})
+
+    def _dump(self, path: Path, **extra: Any) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'table': self.table, 'key_columns': list(self.key_columns),
+                       'rows': self._next, **extra}, f)
+        os.replace(tmp_path, path)
+
+    def save(self) -> None:
+        """Advance the snapshot to the rows of the last plan (they are in D1 now)."""
+        self._dump(self.snapshot_path)
+        self.pending_path.unlink(missing_ok=True)
+        self.snapshot = dict(self._next)
+
+    def save_pending(self, migration_path: Union[str, Path]) -> None:
+        """Record the rows of the last plan as waiting on `migration_path` being applied."""
+        self._dump(self.pending_path, migration=str(Path(migration_path).resolve()))
+
+    def mark_applied(self) -> bool:
+        """Promote the pending snapshot (the last written migration was applied)."""
+        return mark_applied(self.name, self.snapshot_path.parent)
+
+    def _where(self, key: Sequence[Any]) -> str:
+        return ' AND '.join(f"{_quote(c)} IS NULL" if v is None else f"{_quote(c)} = {sql_literal(v)}"
+                            for c, v in zip(self.key_columns, key))
+
+    def statement(self, op: str, key: Sequence[Any], row: Optional[Dict[str, Any]]) -> str:
+        """Single-row SQL for one change."""
+        if op == 'insert':
+            return next(insert_statements(self.table, list(row), [row], raw=self.insert_defaults))
+        if op == 'update':
+            assignments = ', '.join(f"{_quote(c)} = {sql_literal(v)}" for c, v in row.items()
+                                    if c not in self.key_columns)
+            return f"UPDATE {_quote(self.table)} SET {assignments} WHERE {self._where(key)}"
+        return f"DELETE FROM {_quote(self.table)} WHERE {self._where(key)}"
+
+    def changes(self, rows: Iterable[Dict[str, Any]], complete: bool = True) -> Iterator[Tuple[str, Any, Optional[dict]]]:
+        """
+        Yield (op, key, row) for every row that differs from the snapshot
+        (row is None for deletes).
+
+        Args:
+            rows: Column dicts for the target table, one per row.
+            complete: rows is the generator's whole output, so snapshot keys
+                missing from it are deleted. Pass False for partial runs.
+        """
+        self._next = {} if complete else dict(self.snapshot)
+        self.counts = Counter()
+        seen = set()
+        for row in rows:
+            key = tuple(row.get(c) for c in self.key_columns)
+            key_text = json.dumps(list(key), default=str)
+            if key_text in seen:
+                self.counts['duplicate'] += 1
+                continue
+            seen.add(key_text)
+            digest = row_hash(row)
+            self._next[key_text] = digest
+            previous = self.snapshot.get(key_text)
+            if previous is None:
+                op = 'insert'
+            elif previous != digest:
+                op = 'update'
+            else:
+                self.counts['unchanged'] += 1
+                continue
+            self.counts[op] += 1
+            yield op, key, row
+        if complete:
+            for key_text in self.snapshot:
+                if key_text not in seen:
+                    key = json.loads(key_text)
+                    self.counts['delete'] += 1
+                    yield 'delete', key, None
+
+    def write(self, rows: Iterable[Dict[str, Any]], output_path: Union[str, Path],
+              header: Iterable[str] = (), complete: bool = True) -> Counter:
+        """
+        Write the changed rows as a migration file. The snapshot advances
+        once the file is applied (see mark_applied); until then the rows
+        wait in the pending snapshot.
+
+        New rows go out as multi-row INSERTs and deleted keys as grouped
+        DELETEs; updates stay one statement per row. Returns the per-op
+        counts (insert/update/delete/unchanged).
+        """
+        inserts: List[Dict[str, Any]] = []
+        deletes: List[Sequence[Any]] = []
+
+        def flush_inserts():
+            if inserts:
+                out.write_all(insert_statements(self.table, list(inserts[0]), inserts, raw=self.insert_defaults))
+                inserts.clear()
+
+        with MigrationFile(output_path, header=header) as out:
+            for op, key, row in self.changes(rows, complete=complete):
+                if op == 'insert':
+                    if inserts and (list(row) != list(inserts[0]) or len(inserts) >= MAX_STATEMENT_ROWS):
+                        flush_inserts()
+                    inserts.append(row)
+                elif op == 'update':
+                    out.write(self.statement(op, key, row))
+                else:
+                    deletes.append(key)
+            flush_inserts()
+            if len(self.key_columns) == 1:
+                out.write_all(delete_statements(self.table, self.key_columns[0], (k[0] for k in deletes)))
+            else:
+                out.write_all(self.statement('delete', key, None) for key in deletes)
+        if self.counts['insert'] or self.counts['update'] or self.counts['delete']:
+            self.save_pending(output_path)
+        else:
+            self.pending_path.unlink(missing_ok=True)  # D1 already matches; nothing to wait for
+        self.counts['statements'] = out.statements
+        self.counts['batches'] = out.batches
+        return self.counts
+
+    def apply(self, rows: Iterable[Dict[str, Any]], client: D1Client, complete: bool = True) -> Counter:
+        """
+        Execute the changed rows against D1 directly and advance the snapshot.
+
+        One statement per row, so a bad row only fails itself.
+        Rows whose statement failed keep their old snapshot entry, so the
+        next run retries them.
+        """
+        planned = list(self.changes(rows, complete=complete))
+        results, failures = client.execute_many([self.statement(*change) for change in planned])
+        for (op, key, _), result in zip(planned, results):
+            if result is not None:
+                continue
+            key_text = json.dumps(list(key), default=str)
+            if key_text in self.snapshot:
+                self._next[key_text] = self.snapshot[key_text]
+            else:
+                self._next.pop(key_text, None)
+        self.save()
+        self.counts['failed'] = len(failures)
+        return self.counts
+
+    def summary(self) -> str:
+        parts = [f"{self.counts[op]} {op}s" for op in ('insert', 'update', 'delete') if self.counts[op]]
+        return (', '.join(parts) or 'no changes') + f" ({self.counts['unchanged']} unchanged)"
+
+
+def _pending_path(snapshot_path: Path) -> Path:
+    return snapshot_path.with_name(snapshot_path.stem + '.pending.json')
+
+
+def mark_applied(name: str, snapshot_dir: Union[str, Path] = SNAPSHOT_DIR) -> bool:
+    """Promote a generator's pending snapshot. False if nothing was pending."""
+    snapshot_path = Path(snapshot_dir) / f"{name}.json"
+    pending_path = _pending_path(snapshot_path)
+    if not pending_path.exists():
+        return False
+    with open(pending_path, 'r') as f:
+        data = json.load(f)
+    data.pop('migration', None)
+    tmp_path = snapshot_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, snapshot_path)
+    pending_path.unlink()
+    return True
+
+
+def pending_snapshots(snapshot_dir: Union[str, Path] = SNAPSHOT_DIR) -> Dict[str, str]:
+    """Generator name -> migration file its pending snapshot waits on."""
+    pending = {}
+    for path in sorted(Path(snapshot_dir).glob('*.pending.json')):
+        with open(path, 'r') as f:
+            pending[path.name[:-len('.pending.json')]] = json.load(f).get('migration', '')
+    return pending
+
+
+def mark_migration_applied(migration_path: Union[str, Path],
+                           snapshot_dir: Union[str, Path] = SNAPSHOT_DIR) -> List[str]:
+    """Promote every pending snapshot written for this migration file; returns their names."""
+    target = str(Path(migration_path).resolve())
+    return [name for name, migration in pending_snapshots(snapshot_dir).items()
+            if migration == target and mark_applied(name, snapshot_dir)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show or promote pending migration snapshots')
+    parser.add_argument('--status', action='store_true', help='List snapshots waiting on a migration')
+    parser.add_argument('--mark-applied', nargs='+', metavar='NAME_OR_FILE',
+                        help='Generator names or migration files that have been applied')
+    parser.add_argument('--snapshot-dir', type=Path, default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    if args.mark_applied:
+        for target in args.mark_applied:
+            if target.endswith('.sql'):
+                names = mark_migration_applied(target, args.snapshot_dir)
+            else:
+                names = [target] if mark_applied(target, args.snapshot_dir) else []
+            print(f"{target}: {', '.join(names) + ' advanced' if names else 'nothing pending'}")
+    elif args.status:
+        pending = pending_snapshots(args.snapshot_dir)
+        for name, migration in pending.items():
+            print(f"{name}: waiting on {migration}")
+        if not pending:
+            print("No pending snapshots")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
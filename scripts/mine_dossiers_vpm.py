@@ -12,9 +12,11 @@ Outputs: data/vpm_dossier_extractions.json
 import os
 import re
 import json
-import sys
 from pathlib import Path
 
+from parallel_runner import add_workers_argument, run_parallel
+from text_patterns import year_ranges, years
+
 DOSSIER_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/gdrive_exports")
 OUTPUT_FILE = Path("/Users/jeremysamuels/Documents/study-dashboard/data/vpm_dossier_extractions.json")
 
@@ -81,14 +83,17 @@ VIN_KEYWORDS = [
     'VIN decode', 'VIN decod',
 ]
 
+# Compiled once at import rather than once per keyword per dossier
+PLATFORM_PATTERNS = [re.compile(r'\b' + kw + r'\b', re.IGNORECASE) for kw in PLATFORM_KEYWORDS]
+DEALER_PATTERNS = [re.compile(kw, re.IGNORECASE) for kw in DEALER_KEYWORDS]
+TRANSITION_PATTERNS = [re.compile(kw, re.IGNORECASE) for kw in TRANSITION_KEYWORDS]
+VIN_PATTERNS = [re.compile(kw, re.IGNORECASE) for kw in VIN_KEYWORDS]
+
 # Chassis code patterns
 CHASSIS_PATTERN = re.compile(
     r'\b([A-Z]\d{2,3}|[A-Z]{2}\d{2}|[A-Z]\d[A-Z])\b'  # E60, F30, W205, G11, etc.
 )
 
-# Year range pattern
-YEAR_PATTERN = re.compile(r'\b(19[89]\d|20[0-2]\d)\s*[-–—to]+\s*(19[89]\d|20[0-2]\d|present|current)\b', re.IGNORECASE)
-SINGLE_YEAR = re.compile(r'\b(19[89]\d|20[0-2]\d)\b')
 
 # Make patterns
 MAKE_PATTERNS = {
@@ -131,8 +136,7 @@ def find_platform_mentions(text, filename):
     """Find all platform/immobilizer system mentions with context"""
     mentions = []
     
-    for kw in PLATFORM_KEYWORDS:
-        pattern = re.compile(r'\b' + kw + r'\b', re.IGNORECASE)
+    for pattern in PLATFORM_PATTERNS:
         for m in pattern.finditer(text):
             ctx = extract_context_window(text, m.start(), 400)
             mentions.append({
@@ -146,8 +150,7 @@ def find_platform_mentions(text, filename):
 def find_dealer_constraints(text):
     """Find dealer-only / AKL constraint mentions"""
     constraints = []
-    for kw in DEALER_KEYWORDS:
-        pattern = re.compile(kw, re.IGNORECASE)
+    for pattern in DEALER_PATTERNS:
         for m in pattern.finditer(text):
             ctx = extract_context_window(text, m.start(), 300)
             constraints.append({
@@ -159,15 +162,13 @@ def find_dealer_constraints(text):
 def find_transitions(text):
     """Find transition year / split-year mentions"""
     transitions = []
-    for kw in TRANSITION_KEYWORDS:
-        pattern = re.compile(kw, re.IGNORECASE)
+    for pattern in TRANSITION_PATTERNS:
         for m in pattern.finditer(text):
             ctx = extract_context_window(text, m.start(), 400)
             # Extract years from context
-            years = SINGLE_YEAR.findall(ctx)
             transitions.append({
                 'keyword': m.group(),
-                'years_mentioned': sorted(set(years)),
+                'years_mentioned': sorted(str(y) for y in years(ctx)),
                 'context': ctx.replace('\n', ' ').strip()[:500],
             })
     return transitions
@@ -175,8 +176,7 @@ def find_transitions(text):
 def find_vin_data(text):
     """Find VIN-specific decoding info"""
     vin_data = []
-    for kw in VIN_KEYWORDS:
-        pattern = re.compile(kw, re.IGNORECASE)
+    for pattern in VIN_PATTERNS:
         for m in pattern.finditer(text):
             ctx = extract_context_window(text, m.start(), 400)
             vin_data.append({
@@ -196,13 +196,7 @@ def detect_makes(text, filename):
 
 def extract_year_ranges(text):
     """Extract all year ranges mentioned"""
-    ranges = []
-    for m in YEAR_PATTERN.finditer(text):
-        start = int(m.group(1))
-        end_str = m.group(2).lower()
-        end = 2026 if end_str in ('present', 'current') else int(end_str)
-        ranges.append((start, end))
-    return sorted(set(ranges))
+    return sorted(year_ranges(text))
 
 def extract_chassis_codes(text):
     """Extract chassis codes (E60, F30, W205, etc.)"""
@@ -306,6 +300,12 @@ def process_dossier(filepath):
 
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Mine dossier .txt files for VPM data')
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
     # Find all .txt dossier files
     dossier_files = []
     for root, dirs, files in os.walk(DOSSIER_DIR):
@@ -315,18 +315,9 @@ def main():
     
     print(f"Found {len(dossier_files)} dossier files")
     
-    results = []
-    skipped = 0
-    
-    for i, filepath in enumerate(sorted(dossier_files)):
-        if (i + 1) % 50 == 0:
-            print(f"  Processing {i+1}/{len(dossier_files)}...", file=sys.stderr)
-        
-        result = process_dossier(filepath)
-        if result:
-            results.append(result)
-        else:
-            skipped += 1
+    processed, _ = run_parallel(process_dossier, sorted(dossier_files), workers=args.workers)
+    results = [result for result in processed if result]
+    skipped = len(processed) - len(results)
     
     # Summary stats
     with_dealer = sum(1 for r in results if r['has_dealer_constraints'])
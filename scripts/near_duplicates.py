@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Near-Duplicate Index (MinHash + LSH)
+
+Finds near-duplicate pearls across a whole export without comparing every
+pair. Each text is normalized, split into 4-character shingles and reduced to a
+MinHash signature. Signatures are bucketed by LSH bands so only texts that
+share a band are compared, and each candidate is verified with an exact
+similarity score before it is reported.
+
+ContainmentIndex covers the other half of the audit: truncated fragments
+whose text is a strict substring of a longer pearl.
+
+Usage:
+    from near_duplicates import NearDuplicateIndex
+
+    index = NearDuplicateIndex(threshold=0.85)
+    for pearl in pearls:
+        index.add(pearl['id'], pearl['content'])
+    for cluster in index.clusters():
+        print(cluster.representative, cluster.scores)
+
+    # Or incrementally, keeping only the first of each near-duplicate group
+    matches = index.query(text)
+
+    fragments = ContainmentIndex()
+    fragments.add_many((p['id'], p['content']) for p in pearls)
+    for short_id, long_id in fragments.containment_pairs():
+        ...
+"""
+
+import operator
+import zlib
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+NUM_PERM = 96          # MinHash signature length (bins)
+BANDS = 24             # LSH bands (NUM_PERM must be divisible by BANDS)
+SHINGLE_SIZE = 4       # Characters per shingle
+MIN_ESTIMATE = 0.45    # Skip candidates whose signature-estimated Jaccard is below this
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_EMPTY = _MASK64
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and lowercase for comparison."""
+    return ' '.join((text or '').split()).lower()
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> set:
+    """64-bit hashed character k-shingles of already-normalized text."""
+    data = text.encode()
+    if not data:
+        return set()
+    if len(data) <= k:
+        grams = [data]
+    else:
+        grams = [data[i:i + k] for i in range(len(data) - k + 1)]
+    # crc32 is stable across runs (unlike hash()); the multiply spreads it over 64 bits
+    return {(zlib.crc32(g) * _GOLDEN) & _MASK64 for g in grams}
+
+
+def minhash(hashes: Iterable[int], num_perm: int = NUM_PERM) -> List[int]:
+    """
+    One-permutation MinHash with rotation densification.
+
+    Each shingle hash is dropped into one of num_perm bins and only the
+    minimum per bin is kept, so a signature costs one pass over the
+    shingles instead of num_perm passes. Empty bins borrow the value of the
+    next non-empty bin (offset by distance) so short texts still band well.
+    """
+    sig = [_EMPTY] * num_perm
+    for h in hashes:
+        b = h % num_perm
+        v = h // num_perm
+        if v < sig[b]:
+            sig[b] = v
+    if _EMPTY in sig and any(v != _EMPTY for v in sig):
+        dense = list(sig)
+        for i, v in enumerate(sig):
+            if v != _EMPTY:
+                continue
+            for dist in range(1, num_perm):
+                j = (i + dist) % num_perm
+                if sig[j] != _EMPTY:
+                    dense[i] = sig[j] + ((dist * _GOLDEN) & 0xFFFFFFFF)
+                    break
+        sig = dense
+    return sig
+
+
+def sequence_similarity(a: str, b: str) -> float:
+    """Exact similarity used to verify LSH candidates."""
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def _char_overlap_bound(a: Counter, b: Counter, length: int) -> float:
+    """Upper bound on SequenceMatcher.ratio() from shared character counts."""
+    return 2.0 * sum((a & b).values()) / length if length else 1.0
+
+
+@dataclass
+class DuplicateCluster:
+    """A representative item and the near-duplicates that map onto it."""
+    representative: Hashable
+    members: List[Hashable] = field(default_factory=list)
+    scores: Dict[Hashable, float] = field(default_factory=dict)
+
+    @property
+    def duplicates(self) -> List[Hashable]:
+        return [m for m in self.members if m != self.representative]
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index over short texts with exact candidate verification."""
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = NUM_PERM, bands: int = BANDS,
+                 shingle_size: int = SHINGLE_SIZE, min_estimate: float = MIN_ESTIMATE,
+                 scorer: Callable[[str, str], float] = sequence_similarity):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_matches = int(min_estimate * num_perm)
+        self.scorer = scorer
+        self._keys: List[Hashable] = []
+        self._order: Dict[Hashable, int] = {}
+        self._texts: Dict[Hashable, str] = {}
+        self._signatures: Dict[Hashable, List[int]] = {}
+        self._char_counts: Dict[Hashable, Counter] = {}
+        self._exact: Dict[str, List[Hashable]] = defaultdict(list)
+        self._buckets: List[Dict[Tuple[int, ...], List[Hashable]]] = [defaultdict(list) for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._texts
+
+    def signature(self, normalized: str) -> List[int]:
+        """MinHash signature of normalized text."""
+        return minhash(shingles(normalized, self.shingle_size), self.num_perm)
+
+    def add(self, key: Hashable, text: str) -> None:
+        """Index a text under a unique key."""
+        if key in self._texts:
+            raise KeyError(f"Duplicate key: {key!r}")
+        normalized = normalize_text(text)
+        sig = self.signature(normalized)
+        self._order[key] = len(self._keys)
+        self._keys.append(key)
+        self._texts[key] = normalized
+        self._signatures[key] = sig
+        self._exact[normalized].append(key)
+        r = self.rows
+        for band in range(self.bands):
+            self._buckets[band][tuple(sig[band * r:(band + 1) * r])].append(key)
+
+    def add_many(self, items: Iterable[Tuple[Hashable, str]]) -> None:
+        for key, text in items:
+            self.add(key, text)
+
+    def _candidates(self, normalized: str, sig: List[int]) -> List[Hashable]:
+        """
+        Exact matches plus keys sharing an LSH band, in insertion order.
+
+        Band collisions whose signatures agree on too few bins to plausibly
+        reach the threshold are dropped before the exact score is computed.
+        """
+        exact = self._exact.get(normalized, ())
+        seen = set(exact)
+        found = list(exact)
+        r = self.rows
+        signatures = self._signatures
+        min_matches = self.min_matches
+        for band in range(self.bands):
+            for key in self._buckets[band].get(tuple(sig[band * r:(band + 1) * r]), ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if sum(map(operator.eq, sig, signatures[key])) >= min_matches:
+                    found.append(key)
+        found.sort(key=self._order.__getitem__)
+        return found
+
+    def _chars(self, key: Hashable) -> Counter:
+        counts = self._char_counts.get(key)
+        if counts is None:
+            counts = self._char_counts[key] = Counter(self._texts[key])
+        return counts
+
+    def _verify(self, normalized: str, other: Hashable, counts: Optional[Counter] = None) -> float:
+        """Exact score, rejecting early on length and character-overlap upper bounds."""
+        other_text = self._texts[other]
+        if normalized == other_text:
+            return 1.0
+        if self.scorer is not sequence_similarity:
+            return self.scorer(normalized, other_text)
+        total = len(normalized) + len(other_text)
+        if 2.0 * min(len(normalized), len(other_text)) / total < self.threshold:
+            return 0.0
+        if counts is None:
+            counts = Counter(normalized)
+        if _char_overlap_bound(counts, self._chars(other), total) < self.threshold:
+            return 0.0
+        return sequence_similarity(normalized, other_text)
+
+    def query(self, text: str, exclude: Optional[Hashable] = None) -> List[Tuple[Hashable, float]]:
+        """Indexed keys whose verified similarity to text meets the threshold, best first."""
+        normalized = normalize_text(text)
+        counts = Counter(normalized)
+        matches = []
+        for key in self._candidates(normalized, self.signature(normalized)):
+            if key == exclude:
+                continue
+            score = self._verify(normalized, key, counts)
+            if score >= self.threshold:
+                matches.append((key, score))
+        matches.sort(key=lambda m: -m[1])
+        return matches
+
+    def pairs(self) -> List[Tuple[Hashable, Hashable, float]]:
+        """All verified near-duplicate pairs (earlier key first)."""
+        result = []
+        for key in self._keys:
+            normalized = self._texts[key]
+            position = self._order[key]
+            counts = self._chars(key)
+            for other in self._candidates(normalized, self._signatures[key]):
+                if self._order[other] <= position:
+                    continue
+                score = self._verify(normalized, other, counts)
+                if score >= self.threshold:
+                    result.append((key, other, score))
+        return result
+
+    def clusters(self, include_singletons: bool = False) -> List[DuplicateCluster]:
+        """
+        Group items around representatives in insertion order.
+
+        The first unassigned item becomes a representative and claims every
+        unassigned item that verifies against it, so each member's score is
+        its similarity to the representative (not a transitive chain).
+        Insert the preferred copy of each group first.
+        """
+        assigned = set()
+        result = []
+        for key in self._keys:
+            if key in assigned:
+                continue
+            assigned.add(key)
+            cluster = DuplicateCluster(representative=key, members=[key], scores={key: 1.0})
+            normalized = self._texts[key]
+            counts = self._chars(key)
+            for other in self._candidates(normalized, self._signatures[key]):
+                if other in assigned:
+                    continue
+                score = self._verify(normalized, other, counts)
+                if score >= self.threshold:
+                    assigned.add(other)
+                    cluster.members.append(other)
+                    cluster.scores[other] = score
+            if include_singletons or len(cluster.members) > 1:
+                result.append(cluster)
+        return result
+
+
+class ContainmentIndex:
+    """
+    Character q-gram inverted index for substring containment.
+
+    Answers "which indexed texts contain this string" by looking up the
+    rarest q-gram of the query and checking only the texts in its posting
+    list, so finding every truncated fragment in a corpus is near-linear
+    instead of a pairwise `short in long` scan.
+    """
+
+    def __init__(self, q: int = 8):
+        self.q = q
+        self._keys: List[Hashable] = []
+        self._order: Dict[Hashable, int] = {}
+        self._texts: Dict[Hashable, str] = {}
+        self._postings: Dict[str, List[Hashable]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Hashable, text: str) -> None:
+        """Index a text under a unique key (text is used as given, not normalized)."""
+        if key in self._texts:
+            raise KeyError(f"Duplicate key: {key!r}")
+        self._order[key] = len(self._keys)
+        self._keys.append(key)
+        self._texts[key] = text
+        q = self.q
+        for gram in {text[i:i + q] for i in range(len(text) - q + 1)}:
+            self._postings[gram].append(key)
+
+    def add_many(self, items: Iterable[Tuple[Hashable, str]]) -> None:
+        for key, text in items:
+            self.add(key, text)
+
+    def text(self, key: Hashable) -> str:
+        return self._texts[key]
+
+    def containing(self, fragment: str) -> List[Hashable]:
+        """Keys of indexed texts that contain fragment, in insertion order."""
+        q = self.q
+        if len(fragment) < q:
+            # Too short to have a q-gram: fall back to scanning (rare for real fragments)
+            return [key for key in self._keys if fragment in self._texts[key]]
+        rarest = None
+        for i in range(len(fragment) - q + 1):
+            posting = self._postings.get(fragment[i:i + q])
+            if not posting:
+                return []
+            if rarest is None or len(posting) < len(rarest):
+                rarest = posting
+        return [key for key in rarest if fragment in self._texts[key]]
+
+    def containment_pairs(self) -> List[Tuple[Hashable, Hashable]]:
+        """
+        All (short_key, long_key) pairs where one text is a strict substring of another.
+
+        Ordered like the pairwise scan over texts sorted by length: by short
+        text length, then by long text length (ties in insertion order).
+        """
+        rank = {key: i for i, key in enumerate(sorted(self._keys, key=lambda k: len(self._texts[k])))}
+        pairs = []
+        for short in sorted(self._keys, key=rank.__getitem__):
+            short_text = self._texts[short]
+            longer = [key for key in self.containing(short_text)
+                      if len(self._texts[key]) > len(short_text)]
+            longer.sort(key=rank.__getitem__)
+            pairs.extend((short, key) for key in longer)
+        return pairs
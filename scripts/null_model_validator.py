@@ -3,56 +3,43 @@
 Null Model Pearl Validator
 Finds pearls with null models and validates their content against TXT sources.
 Pearls without >80% match are marked as orphans (to be deleted).
+Sources (data/fcc_research_docs only) are looked up through a source index
+(source_index.py) kept apart from the shared one, which also covers other
+directories.
 """
 
 import json
 import os
 import re
 from pathlib import Path
-from difflib import SequenceMatcher
+
+from source_index import SourceIndex, normalize
 
 EXPORT_PATH = "/Users/jeremysamuels/Documents/study-dashboard/data/all_refined_pearls_export.json"
 TXT_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/fcc_research_docs")
+TXT_INDEX_PATH = TXT_DIR.parent / "source_index_fcc_research_docs.pkl"
 OUTPUT_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/migrations/orphan_cleanup")
 OUTPUT_DIR.mkdir(exist_ok=True)
 
-def normalize(text):
-    """Normalize text for matching"""
-    if not text:
-        return ""
-    return ' '.join(text.split()).lower()
-
-def find_best_match(content, sources, min_threshold=0.80):
+def find_best_match(content, index, min_threshold=0.80):
     """Find best matching source for content"""
     if not content or len(content) < 50:
         return None, 0.0
     
     norm_content = normalize(content)[:500]  # Use first 500 chars for matching
-    best_ratio = 0.0
-    best_source = None
     
-    for source_name, source_text in sources.items():
-        norm_source = normalize(source_text)
-        
-        # Quick check: is content substring of source?
-        if norm_content[:100] in norm_source:
-            return source_name, 1.0
-        
-        # Check sliding window matches
-        content_words = norm_content[:200]
-        if content_words in norm_source:
-            return source_name, 0.95
-        
-        # Slower: sequence matching on first 200 chars
-        if len(norm_source) > 100:
-            sample = norm_source[:10000]  # Limit source check
-            matcher = SequenceMatcher(None, content_words, sample)
-            ratio = matcher.quick_ratio()
-            if ratio > best_ratio:
-                best_ratio = ratio
-                best_source = source_name
+    # Quick check: is content substring of source?
+    found = index.find_normalized(norm_content[:100])
+    if found:
+        return index.files[found[0]].stem, 1.0
+    
+    # Check sliding window matches
+    found = index.find_normalized(norm_content[:200])
+    if found:
+        return index.files[found[0]].stem, 0.95
     
-    return best_source, best_ratio
+    # Slower: best-aligned source by shared word grams (fraction of grams matched)
+    return index.best_source(norm_content)
 
 def escape_sql(s):
     if not s:
@@ -70,16 +57,9 @@ def main():
                          and not p.get('duplicate_of')]
     print(f"Found {len(null_model_pearls)} null-model pearls to validate")
     
-    # Load TXT sources
-    print("Loading TXT sources...")
-    sources = {}
-    for txt_file in TXT_DIR.glob("*.txt"):
-        try:
-            with open(txt_file, 'r', encoding='utf-8', errors='ignore') as f:
-                sources[txt_file.stem] = f.read()
-        except:
-            pass
-    print(f"Loaded {len(sources)} source files")
+    # Load source index
+    print("Loading source index...")
+    index = SourceIndex.load_or_build([TXT_DIR], TXT_INDEX_PATH)
     
     # Validate each pearl
     validated = []
@@ -96,7 +76,7 @@ def main():
             orphans.append({'id': pid, 'reason': 'too_short', 'match': 0})
             continue
         
-        best_source, ratio = find_best_match(content, sources)
+        best_source, ratio = find_best_match(content, index)
         
         if ratio >= 0.80:
             validated.append({'id': pid, 'source': best_source, 'match': ratio})
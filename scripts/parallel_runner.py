@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Parallel Document Runner
+
+Runs a per-document extraction function over many files with a process
+pool. Results are merged back in input order regardless of which worker
+finishes first, so the output of a parallel run is identical to a serial
+run over the same (sorted) file list. A failing document is reported and
+skipped instead of aborting the batch.
+
+Usage:
+    from parallel_runner import add_workers_argument, run_parallel
+
+    add_workers_argument(parser)
+    results, failures = run_parallel(process_document, sorted(files), workers=args.workers)
+
+The function must be defined at module level (so it can be pickled) and the
+calling script must keep its `if __name__ == "__main__":` guard.
+"""
+
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+def add_workers_argument(parser) -> None:
+    """Add the shared --workers option to an argparse parser."""
+    parser.add_argument('--workers', '-j', type=int, default=1,
+                        help='Worker processes (1 = serial, 0 = one per CPU)')
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def _call(func: Callable, item: Any) -> Tuple[bool, Any]:
+    """Run func(item), turning any exception into a reportable failure."""
+    try:
+        return True, func(item)
+    except Exception:
+        return False, traceback.format_exc(limit=3)
+
+
+def _progress(done: int, total: int, failed: int, label: str, every: int) -> None:
+    if done % every == 0 or done == total:
+        suffix = f", {failed} failed" if failed else ""
+        print(f"  Processed {done}/{total} {label}{suffix}", file=sys.stderr)
+
+
+def run_parallel(func: Callable[[Any], Any], items: Sequence[Any], workers: Optional[int] = 1,
+                 label: str = "files", progress_every: int = 50,
+                 on_result: Optional[Callable[[Any, Any], None]] = None) -> Tuple[List[Any], List[Tuple[Any, str]]]:
+    """
+    Apply func to every item, serially or in a process pool.
+
+    on_result(item, value) is called in this process as each item succeeds
+    (in completion order), e.g. to cache results so an interrupted run can
+    resume where it stopped.
+
+    Returns:
+        tuple: (results aligned with items - None where the item failed,
+                list of (item, error) for every failure)
+    """
+    items = list(items)
+    total = len(items)
+    workers = min(resolve_workers(workers), total) if total else 1
+    results: List[Any] = [None] * total
+    failures: List[Tuple[int, str]] = []
+
+    if workers <= 1:
+        for i, item in enumerate(items):
+            ok, value = _call(func, item)
+            if ok:
+                results[i] = value
+                if on_result:
+                    on_result(item, value)
+            else:
+                failures.append((i, value))
+            _progress(i + 1, total, len(failures), label, progress_every)
+    else:
+        print(f"  Using {workers} worker processes", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_call, func, item): i for i, item in enumerate(items)}
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                try:
+                    ok, value = future.result()
+                except Exception as e:  # Worker crashed or result could not be pickled
+                    ok, value = False, f"{type(e).__name__}: {e}"
+                if ok:
+                    results[i] = value
+                    if on_result:
+                        on_result(items[i], value)
+                else:
+                    failures.append((i, value))
+                _progress(done, total, len(failures), label, progress_every)
+
+    failures.sort()
+    for i, error in failures:
+        print(f"  ❌ Failed: {items[i]}\n     {error.strip().splitlines()[-1]}", file=sys.stderr)
+    return results, [(items[i], error) for i, error in failures]
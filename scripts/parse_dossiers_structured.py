@@ -16,6 +16,9 @@ from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 
+from parallel_runner import add_workers_argument, run_parallel
+from text_patterns import fcc_ids as find_fcc_ids
+
 
 GDRIVE_DIR = Path(__file__).parent.parent / "data" / "gdrive_plaintext"
 OUTPUT_DIR = Path(__file__).parent.parent / "data" / "coverage_matrix"
@@ -105,9 +108,6 @@ TIME_PATTERNS = [
     (r"(\d+)\s*to\s*(\d+)\s*min", "minutes"),
 ]
 
-# FCC ID pattern
-FCC_PATTERN = r"\b(HYQ[A-Z0-9]{5,10}|M3N[A-Z0-9]{5,10}|GQ4[A-Z0-9]{5,10}|OHT[A-Z0-9]{5,10}|CWTWB[A-Z0-9]{3,8}|KR5[A-Z0-9]{5,10}|FCCID[:\s]*([A-Z0-9]{8,15}))\b"
-
 # Model normalization map
 MODEL_NORMALIZATIONS = {
     # BMW
@@ -155,7 +155,7 @@ def categorize_limitation(text: str) -> list:
                 categories.append(category)
                 break
     
-    return list(set(categories)) if categories else ["general"]
+    return categories or ["general"]
 
 
 def extract_cables(text: str) -> list:
@@ -169,7 +169,7 @@ def extract_cables(text: str) -> list:
                 cables.append(cable_name)
                 break
     
-    return list(set(cables))
+    return cables
 
 
 def extract_time_estimates(text: str) -> list:
@@ -193,16 +193,7 @@ def extract_time_estimates(text: str) -> list:
 
 def extract_fcc_ids(text: str) -> list:
     """Extract FCC IDs from text."""
-    fcc_ids = set()
-    
-    for match in re.finditer(FCC_PATTERN, text, re.IGNORECASE):
-        fcc_id = match.group(1).upper()
-        # Clean up the FCC ID
-        fcc_id = re.sub(r"FCCID[:\s]*", "", fcc_id)
-        if len(fcc_id) >= 8:
-            fcc_ids.add(fcc_id)
-    
-    return list(fcc_ids)
+    return sorted(fcc_id for fcc_id in find_fcc_ids(text) if len(fcc_id) >= 8)
 
 
 def normalize_model(model: str) -> str:
@@ -310,7 +301,7 @@ def parse_dossier_enhanced(filepath: Path) -> dict:
                     "tool": tool_name,
                     "categories": categories,
                     "cables_required": cables,
-                    "makes": list(makes),
+                    "makes": sorted(makes),
                     "years": sorted(list(years)),
                     "time_estimates": times,
                     "context": context[:400],
@@ -349,8 +340,8 @@ def parse_dossier_enhanced(filepath: Path) -> dict:
     for tool_name, data in result["tool_coverage"].items():
         data["makes"] = sorted(list(data["makes"]))
         data["years"] = sorted(list(data["years"]))
-        data["limitations"] = list(set(data["limitations"]))
-        data["cables"] = list(set(data["cables"]))
+        data["limitations"] = sorted(set(data["limitations"]))
+        data["cables"] = sorted(set(data["cables"]))
     
     result["tool_coverage"] = dict(result["tool_coverage"])
     result["cable_requirements"] = dict(result["cable_requirements"])
@@ -435,7 +426,7 @@ def aggregate_structured_data(all_results: list) -> dict:
     for fcc_id, data in fcc_database.items():
         data["makes"] = sorted(list(data["makes"]))
         data["years"] = sorted(list(data["years"]))
-        data["sources"] = list(set(data["sources"]))[:5]
+        data["sources"] = sorted(set(data["sources"]))[:5]
     
     return {
         "limitations_by_category": {k: v[:20] for k, v in limitations_by_category.items()},  # Sample
@@ -449,6 +440,12 @@ def aggregate_structured_data(all_results: list) -> dict:
 
 def main():
     """Run enhanced second pass on all dossiers."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Second pass: structured limitation extraction')
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     
     print("=" * 70)
@@ -456,23 +453,16 @@ def main():
     print("=" * 70)
     
     # Get all text files
-    dossier_files = [f for f in GDRIVE_DIR.glob("*.txt") if f.name != "download_manifest.json"]
+    dossier_files = sorted(f for f in GDRIVE_DIR.glob("*.txt") if f.name != "download_manifest.json")
     print(f"\nProcessing {len(dossier_files)} dossier files...")
     
     # Parse each file
-    all_results = []
-    total_structured_lims = 0
-    total_fcc_ids = 0
-    
-    for i, filepath in enumerate(dossier_files):
-        result = parse_dossier_enhanced(filepath)
-        all_results.append(result)
-        
-        total_structured_lims += len(result.get("structured_limitations", []))
-        total_fcc_ids += len(result.get("fcc_mappings", []))
-        
-        if (i + 1) % 50 == 0:
-            print(f"  Processed {i + 1}/{len(dossier_files)} files...")
+    results, failures = run_parallel(parse_dossier_enhanced, dossier_files, workers=args.workers)
+    errors = {filepath: error.strip().splitlines()[-1] for filepath, error in failures}
+    all_results = [result if filepath not in errors else {"error": errors[filepath], "file": filepath.name}
+                   for filepath, result in zip(dossier_files, results)]
+    total_structured_lims = sum(len(r.get("structured_limitations", [])) for r in all_results)
+    total_fcc_ids = sum(len(r.get("fcc_mappings", [])) for r in all_results)
     
     print(f"\n✅ Parsing complete!")
     print(f"   - Structured limitations extracted: {total_structured_lims}")
@@ -554,8 +544,8 @@ def main():
     for cat, lims in aggregated["limitations_by_category"].items():
         category_summary[cat] = {
             "count": len(lims),
-            "tools_affected": list(set(l["tool"] for l in lims)),
-            "makes_affected": list(set(m for l in lims for m in l.get("makes", []))),
+            "tools_affected": sorted(set(l["tool"] for l in lims)),
+            "makes_affected": sorted(set(m for l in lims for m in l.get("makes", []))),
             "sample": lims[:5]
         }
     with open(cat_output, 'w') as f:
@@ -12,6 +12,8 @@ import json
 import argparse
 from pathlib import Path
 
+from vehicle_identity import canonical_make, is_known_make
+
 try:
     import pdfplumber
 except ImportError:
@@ -20,29 +22,6 @@ except ImportError:
     sys.exit(1)
 
 
-# Make name variations to normalize
-MAKE_NAMES = {
-    'ACURA': 'Acura', 'ALFA ROMEO': 'Alfa Romeo', 'AMC': 'AMC', 'ASTON MARTIN': 'Aston Martin',
-    'AUDI': 'Audi', 'BENTLEY': 'Bentley', 'BMW': 'BMW', 'BUICK': 'Buick',
-    'CADILLAC': 'Cadillac', 'CHEVROLET': 'Chevrolet', 'CHRYSLER': 'Chrysler',
-    'CITROEN': 'Citroen', 'DAIHATSU': 'Daihatsu', 'DODGE': 'Dodge',
-    'FERRARI': 'Ferrari', 'FIAT': 'Fiat', 'FORD': 'Ford', 'GENESIS': 'Genesis',
-    'GEO': 'Geo', 'GMC': 'GMC', 'HONDA': 'Honda', 'HUMMER': 'Hummer',
-    'HYUNDAI': 'Hyundai', 'INFINITI': 'Infiniti', 'ISUZU': 'Isuzu',
-    'JAGUAR': 'Jaguar', 'JEEP': 'Jeep', 'KIA': 'Kia', 'LAMBORGHINI': 'Lamborghini',
-    'LAND ROVER': 'Land Rover', 'LEXUS': 'Lexus', 'LINCOLN': 'Lincoln',
-    'LOTUS': 'Lotus', 'MASERATI': 'Maserati', 'MAZDA': 'Mazda',
-    'MERCEDES-BENZ': 'Mercedes-Benz', 'MERCEDES': 'Mercedes-Benz', 'MERCURY': 'Mercury',
-    'MINI': 'Mini', 'MITSUBISHI': 'Mitsubishi', 'NISSAN': 'Nissan',
-    'OLDSMOBILE': 'Oldsmobile', 'PEUGEOT': 'Peugeot', 'PLYMOUTH': 'Plymouth',
-    'PONTIAC': 'Pontiac', 'PORSCHE': 'Porsche', 'RAM': 'Ram', 'RENAULT': 'Renault',
-    'ROLLS ROYCE': 'Rolls Royce', 'SAAB': 'Saab', 'SATURN': 'Saturn',
-    'SCION': 'Scion', 'SMART': 'Smart', 'SUBARU': 'Subaru', 'SUZUKI': 'Suzuki',
-    'TESLA': 'Tesla', 'TOYOTA': 'Toyota', 'VOLKSWAGEN': 'Volkswagen', 'VW': 'Volkswagen',
-    'VOLVO': 'Volvo',
-}
-
-
 def parse_year(year_str):
     """Parse a single year value."""
     if not year_str:
@@ -55,11 +34,13 @@ def parse_year(year_str):
 
 
 def normalize_make(text):
-    """Normalize make name."""
+    """Normalize make name (None if the text is not a make)."""
     if not text:
         return None
-    text = text.strip().upper()
-    return MAKE_NAMES.get(text, text.title() if text.isalpha() else None)
+    text = text.strip()
+    if is_known_make(text):
+        return canonical_make(text)
+    return text.title() if text.isalpha() else None
 
 
 def extract_make_from_footer(text):
@@ -121,8 +102,8 @@ def process_page(page, page_num, current_make=None):
     lines = text.split('\n')
     for line in lines:
         line = line.strip()
-        if line.upper() in MAKE_NAMES:
-            current_make = MAKE_NAMES[line.upper()]
+        if is_known_make(line):
+            current_make = canonical_make(line)
     
     # Extract tables
     tables = page.extract_tables() or []
@@ -146,8 +127,8 @@ def process_page(page, page_num, current_make=None):
             
             # Check for make header in row (standalone cell with make name)
             first_cell = str(row[0]).strip() if row[0] else ''
-            if first_cell.upper() in MAKE_NAMES:
-                current_make = MAKE_NAMES[first_cell.upper()]
+            if is_known_make(first_cell):
+                current_make = canonical_make(first_cell)
                 continue
             
             # Check if this is a model row with years
@@ -2,6 +2,12 @@
 """
 OBDII365 Product Page Parser
 Extracts structured data from scraped HTML product pages.
+
+Parsed pages are cached by content hash (data/cache/obdii365_products), so a
+re-run after a scrape only parses new or changed pages:
+
+    python3 scripts/parse_obdii365_products.py -j 0          # one worker per CPU
+    python3 scripts/parse_obdii365_products.py --no-cache    # re-parse everything
 """
 
 import json
@@ -13,6 +19,32 @@ from bs4 import BeautifulSoup
 from dataclasses import dataclass, asdict
 import html
 
+from parallel_runner import add_workers_argument, run_parallel
+from pipeline_cache import PipelineCache, code_version, fingerprint
+from text_patterns import PatternTable
+
+# Parsed products per page, keyed by page content and the parser code
+CACHE_DIR = Path(__file__).parent.parent / "data" / "cache" / "obdii365_products"
+CODE_FILES = [Path(__file__), Path(__file__).parent / "text_patterns.py",
+              Path(__file__).parent / "entity_scanner.py"]
+
+# Separators dropped when normalizing a spec match ("VVDI-2" -> "VVDI2")
+_SEPARATORS = re.compile(r'[- ]+')
+_GENERIC_IMMO = re.compile(r'^IMMO[IV]+$')
+_RF_FREQUENCY = re.compile(r'(\d{3})[- ]?MHZ', re.IGNORECASE)    # Remotes/fobs: 433MHz, 315MHz, 868MHz
+_BUTTON = re.compile(r'(\d)[- ]?BUTTON', re.IGNORECASE)
+_LIFETIME = re.compile(r'LIFETIME[- ]?(?:FREE|UPDATE)')
+_TOKENS = re.compile(r'TOKEN|CREDIT')
+_SUBSCRIPTION_YEARS = re.compile(r'(\d+)[- ]?YEAR')
+# Year ranges only count in a vehicle-support context, not random years
+_YEAR_CONTEXT_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
+    # Explicit ranges with connectors
+    r'(?:SUPPORT|COVER|FOR|FIT)[S]?\s+(?:\w+\s+){0,5}?(20[01][0-9])[- ]?(?:TO|-)(?:[- ]?)(20[12][0-9])',
+    r'(20[01][0-9])[- ]?(?:TO|-)(?:[- ]?)(20[12][0-9])\s+(?:MODEL|YEAR)',
+    # Explicit "up to" or "through" patterns
+    r'(?:UP[- ]?TO|THROUGH|UNTIL)\s+(20[12][0-9])',
+]]
+
 
 @dataclass
 class VehicleSupport:
@@ -270,11 +302,6 @@ class OBDII365Parser:
         r'SIP22', r'GT15', r'WT47T',
     ]
     
-    # RF Frequency patterns (for remotes/fobs)
-    RF_FREQUENCY_PATTERNS = [
-        r'(\d{3})[- ]?MHZ',  # 433MHz, 315MHz, 868MHz, etc.
-    ]
-    
     # MCU/Processor patterns (for bench/EEPROM work)
     MCU_PATTERNS = [
         r'RH850', r'V850',
@@ -441,6 +468,32 @@ class OBDII365Parser:
         r'XT27[A]?',  # Xhorse super chip
         r'VVDI[- ]?SUPER[- ]?CHIP',
     ]
+
+    # Every category above that is reported as a list of normalized matches,
+    # scanned in one pass (text_patterns.PatternTable)
+    SPEC_TABLE = PatternTable({
+        'chips': CHIP_PATTERNS,
+        'immo_modules': IMMO_MODULE_PATTERNS,
+        'protocols': PROTOCOL_PATTERNS,
+        'compatible_tools': TOOL_PATTERNS,
+        'functions': FUNCTION_PATTERNS,
+        'keyways': KEYWAY_PATTERNS,
+        'mcu_types': MCU_PATTERNS,
+        'eeprom_chips': EEPROM_PATTERNS,
+        'key_blades': KEY_BLADE_PATTERNS,
+        'connectivity': CONNECTIVITY_PATTERNS,
+        'adapters': ADAPTER_PATTERNS,
+        'key_type': KEY_TYPE_PATTERNS,
+        'key_brand': KEY_BRAND_PATTERNS,
+        'vehicle_platform': VEHICLE_PLATFORM_PATTERNS,
+        'security_gen': SECURITY_GEN_PATTERNS,
+        'emulator': EMULATOR_PATTERNS,
+        'product_type': PRODUCT_TYPE_PATTERNS,
+        'working_mode': WORKING_MODE_PATTERNS,
+        'market_focus': MARKET_FOCUS_PATTERNS,
+        'super_chip': SUPER_CHIP_PATTERNS,
+    }, re.IGNORECASE)
+
     def __init__(self, html_dir: Path, output_dir: Path):
         self.html_dir = html_dir
         self.output_dir = output_dir
@@ -468,62 +521,84 @@ class OBDII365Parser:
             "emulators": 0,
         }
 
-    def parse_all(self) -> List[ParsedProduct]:
-        """Parse all HTML files in the directory."""
-        products = []
-        html_files = list(self.html_dir.glob("*.html"))
+    def parse_all(self, workers: int = 1, use_cache: bool = True) -> List[ParsedProduct]:
+        """
+        Parse all HTML files in the directory.
+
+        Pages unchanged since the last run (same content hash, same parser
+        code) are loaded from the cache; the rest are parsed in `workers`
+        processes and cached as each one finishes, so an interrupted run
+        resumes where it stopped. Stats are counted here over every product,
+        cached or fresh, in file order.
+        """
+        html_files = sorted(self.html_dir.glob("*.html"))
         self.stats["total_files"] = len(html_files)
         
-        print(f"Parsing {len(html_files)} HTML files...")
+        cache = PipelineCache(CACHE_DIR, fingerprint(code_version(*CODE_FILES)), enabled=use_cache)
+        cached = [cache.get(html_file) for html_file in html_files]
+        misses = [i for i, entry in enumerate(cached) if entry is None]
+        print(f"Parsing {len(misses)} of {len(html_files)} HTML files ({cache.hits} unchanged)...")
         
-        for i, html_file in enumerate(html_files):
-            if (i + 1) % 100 == 0:
-                print(f"  Processed {i + 1}/{len(html_files)}...")
-            
-            try:
-                product = self.parse_file(html_file)
-                if product:
-                    products.append(product)
-                    self.stats["parsed_successfully"] += 1
-                    self.stats[f"{product.locksmith_relevance}_relevance"] += 1
-                    if product.vehicle_support:
-                        self.stats["with_vehicle_data"] += 1
-                    # Track technical specs
-                    specs = product.technical_specs
-                    if specs.get('chips'):
-                        self.stats["with_chip_data"] += 1
-                    if specs.get('immo_modules'):
-                        self.stats["with_module_data"] += 1
-                    if specs.get('compatible_tools'):
-                        self.stats["with_tool_compat"] += 1
-                    if specs.get('rf_frequencies'):
-                        self.stats["with_rf_freq"] += 1
-                    if specs.get('mcu_types'):
-                        self.stats["with_mcu_data"] += 1
-                    if specs.get('eeprom_chips'):
-                        self.stats["with_eeprom_data"] += 1
-                    if specs.get('connectivity'):
-                        self.stats["with_connectivity"] += 1
-                    if specs.get('key_type'):
-                        self.stats["with_key_type"] += 1
-                    if specs.get('key_brand'):
-                        self.stats["with_key_brand"] += 1
-                    if specs.get('vehicle_platform'):
-                        self.stats["with_platform"] += 1
-                    if specs.get('security_gen'):
-                        self.stats["with_security_gen"] += 1
-                    if specs.get('is_emulator'):
-                        self.stats["emulators"] += 1
-            except Exception as e:
-                self.stats["parse_errors"] += 1
-                self.errors.append({
-                    "file": html_file.name,
-                    "error": str(e)
-                })
+        def store(html_file: Path, product: Optional[ParsedProduct]):
+            cache.put(html_file, {"product": asdict(product) if product else None})
+        
+        results, failures = run_parallel(self.parse_file, [html_files[i] for i in misses], workers=workers,
+                                         label="pages", progress_every=100, on_result=store)
+        
+        parsed: List[Optional[ParsedProduct]] = [
+            ParsedProduct(**entry["product"]) if entry and entry["product"] else None for entry in cached
+        ]
+        for i, product in zip(misses, results):
+            parsed[i] = product
+        for html_file, error in failures:
+            self.stats["parse_errors"] += 1
+            self.errors.append({
+                "file": html_file.name,
+                "error": error.strip().splitlines()[-1]
+            })
+        
+        products = [product for product in parsed if product]
+        for product in products:
+            self._count_product(product)
+        if not failures:
+            cache.prune()
         
         print(f"Parsing complete: {self.stats['parsed_successfully']} successful, {self.stats['parse_errors']} errors")
         return products
 
+    def _count_product(self, product: ParsedProduct):
+        """Add one parsed product to the coverage stats."""
+        self.stats["parsed_successfully"] += 1
+        self.stats[f"{product.locksmith_relevance}_relevance"] += 1
+        if product.vehicle_support:
+            self.stats["with_vehicle_data"] += 1
+        # Track technical specs
+        specs = product.technical_specs
+        if specs.get('chips'):
+            self.stats["with_chip_data"] += 1
+        if specs.get('immo_modules'):
+            self.stats["with_module_data"] += 1
+        if specs.get('compatible_tools'):
+            self.stats["with_tool_compat"] += 1
+        if specs.get('rf_frequencies'):
+            self.stats["with_rf_freq"] += 1
+        if specs.get('mcu_types'):
+            self.stats["with_mcu_data"] += 1
+        if specs.get('eeprom_chips'):
+            self.stats["with_eeprom_data"] += 1
+        if specs.get('connectivity'):
+            self.stats["with_connectivity"] += 1
+        if specs.get('key_type'):
+            self.stats["with_key_type"] += 1
+        if specs.get('key_brand'):
+            self.stats["with_key_brand"] += 1
+        if specs.get('vehicle_platform'):
+            self.stats["with_platform"] += 1
+        if specs.get('security_gen'):
+            self.stats["with_security_gen"] += 1
+        if specs.get('is_emulator'):
+            self.stats["emulators"] += 1
+
     def parse_file(self, html_file: Path) -> Optional[ParsedProduct]:
         """Parse a single HTML product file."""
         with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
@@ -724,61 +799,44 @@ class OBDII365Parser:
                 pass
         return None
 
+    def _category_matches(self, text: str) -> Dict[str, List[str]]:
+        """Unique normalized matches for every SPEC_TABLE category, sorted."""
+        return {label: sorted({_SEPARATORS.sub('', value.strip().upper()) for value in values})
+                for label, values in self.SPEC_TABLE.scan(text).items()}
+
     def _extract_technical_specs(self, name: str, description: str) -> TechnicalSpecs:
         """Extract structured technical specifications from product text."""
         combined_text = f"{name} {description}".upper()
-        
-        def extract_matches(patterns: List[str], text: str) -> List[str]:
-            """Extract unique matches for a list of regex patterns."""
-            matches = set()
-            for pattern in patterns:
-                for match in re.finditer(pattern, text, re.IGNORECASE):
-                    # Normalize the match
-                    value = match.group(0).strip().upper()
-                    # Clean up common variations
-                    value = re.sub(r'[- ]+', '', value)
-                    matches.add(value)
-            return sorted(list(matches))
-        
-        def extract_groups(patterns: List[str], text: str) -> List[str]:
-            """Extract capture groups from patterns."""
-            matches = set()
-            for pattern in patterns:
-                for match in re.finditer(pattern, text, re.IGNORECASE):
-                    if match.groups():
-                        matches.add(match.group(1).upper())
-                    else:
-                        matches.add(match.group(0).upper())
-            return sorted(list(matches))
+        matches = self._category_matches(combined_text)
         
         # Extract each category
-        chips = extract_matches(self.CHIP_PATTERNS, combined_text)
-        immo_modules = extract_matches(self.IMMO_MODULE_PATTERNS, combined_text)
-        protocols = extract_matches(self.PROTOCOL_PATTERNS, combined_text)
-        compatible_tools = extract_matches(self.TOOL_PATTERNS, combined_text)
-        functions = extract_matches(self.FUNCTION_PATTERNS, combined_text)
-        keyways = extract_matches(self.KEYWAY_PATTERNS, combined_text)
+        chips = matches['chips']
+        immo_modules = matches['immo_modules']
+        protocols = matches['protocols']
+        compatible_tools = matches['compatible_tools']
+        functions = matches['functions']
+        keyways = matches['keyways']
         
         # NEW: Extract additional locksmith categories
-        rf_frequencies = extract_groups(self.RF_FREQUENCY_PATTERNS, combined_text)
+        rf_frequencies = sorted({m.group(1) for m in _RF_FREQUENCY.finditer(combined_text)})
         # Filter valid frequencies
         rf_frequencies = [f + 'MHZ' for f in rf_frequencies if f in ['315', '433', '434', '868', '902', '915', '314', '312']]
         
-        mcu_types = extract_matches(self.MCU_PATTERNS, combined_text)
-        eeprom_chips = extract_matches(self.EEPROM_PATTERNS, combined_text)
-        key_blades = extract_matches(self.KEY_BLADE_PATTERNS, combined_text)
-        connectivity = extract_matches(self.CONNECTIVITY_PATTERNS, combined_text)
-        adapters = extract_matches(self.ADAPTER_PATTERNS, combined_text)
+        mcu_types = matches['mcu_types']
+        eeprom_chips = matches['eeprom_chips']
+        key_blades = matches['key_blades']
+        connectivity = matches['connectivity']
+        adapters = matches['adapters']
         
         # Extract button count (take most common/relevant)
-        button_matches = re.findall(r'(\d)[- ]?BUTTON', combined_text, re.IGNORECASE)
-        button_count = button_matches[0] + '-BUTTON' if button_matches else None
+        button_match = _BUTTON.search(combined_text)
+        button_count = button_match.group(1) + '-BUTTON' if button_match else None
         
         
         # Filter out false positives
         # Remove generic "IMMO" if we have specific IMMO types
         if immo_modules:
-            specific_immo = [m for m in immo_modules if m != 'IMMO' and not re.match(r'^IMMO[IV]+$', m)]
+            specific_immo = [m for m in immo_modules if m != 'IMMO' and not _GENERIC_IMMO.match(m)]
             if specific_immo:
                 immo_modules = specific_immo
         
@@ -789,32 +847,31 @@ class OBDII365Parser:
         connectivity = list(set(c.replace('WIFI', 'WIFI').replace('WI-FI', 'WIFI') for c in connectivity))
         
         # NEW: Extract additional categories
-        key_type = extract_matches(self.KEY_TYPE_PATTERNS, combined_text)
-        key_brand = extract_matches(self.KEY_BRAND_PATTERNS, combined_text)
-        vehicle_platform = extract_matches(self.VEHICLE_PLATFORM_PATTERNS, combined_text)
-        security_gen = extract_matches(self.SECURITY_GEN_PATTERNS, combined_text)
+        key_type = matches['key_type']
+        key_brand = matches['key_brand']
+        vehicle_platform = matches['vehicle_platform']
+        security_gen = matches['security_gen']
         
         # Detect if this is an emulator/simulator product
-        emulator_matches = extract_matches(self.EMULATOR_PATTERNS, combined_text)
-        is_emulator = len(emulator_matches) > 0
+        is_emulator = len(matches['emulator']) > 0
         
         # Extract subscription type
         subscription_type = None
         sub_text = combined_text
-        if re.search(r'LIFETIME[- ]?(?:FREE|UPDATE)', sub_text):
+        if _LIFETIME.search(sub_text):
             subscription_type = "LIFETIME"
-        elif re.search(r'TOKEN|CREDIT', sub_text):
+        elif _TOKENS.search(sub_text):
             subscription_type = "TOKENS"
         else:
-            year_match = re.search(r'(\d+)[- ]?YEAR', sub_text)
+            year_match = _SUBSCRIPTION_YEARS.search(sub_text)
             if year_match:
                 subscription_type = f"{year_match.group(1)}-YEAR"
         
         # NEW: Extract final categories
-        product_type = extract_matches(self.PRODUCT_TYPE_PATTERNS, combined_text)
-        working_mode = extract_matches(self.WORKING_MODE_PATTERNS, combined_text)
-        market_focus = extract_matches(self.MARKET_FOCUS_PATTERNS, combined_text)
-        super_chip = extract_matches(self.SUPER_CHIP_PATTERNS, combined_text)
+        product_type = matches['product_type']
+        working_mode = matches['working_mode']
+        market_focus = matches['market_focus']
+        super_chip = matches['super_chip']
         
         # Clean up market focus (normalize terms)
         market_focus = list(set(m.replace('CAR', '').replace('VEHICLE', '').strip() for m in market_focus))
@@ -825,15 +882,8 @@ class OBDII365Parser:
         # Look for patterns like "2010-2024", "2015 to 2023", "up to 2024"
         year_coverage = None
         # Only look for years in context of vehicle support, not random years
-        year_context_patterns = [
-            # Explicit ranges with connectors
-            r'(?:SUPPORT|COVER|FOR|FIT)[S]?\s+(?:\w+\s+){0,5}?(20[01][0-9])[- ]?(?:TO|-)(?:[- ]?)(20[12][0-9])',
-            r'(20[01][0-9])[- ]?(?:TO|-)(?:[- ]?)(20[12][0-9])\s+(?:MODEL|YEAR)',
-            # Explicit "up to" or "through" patterns
-            r'(?:UP[- ]?TO|THROUGH|UNTIL)\s+(20[12][0-9])',
-        ]
-        for pattern in year_context_patterns:
-            match = re.search(pattern, combined_text, re.IGNORECASE)
+        for pattern in _YEAR_CONTEXT_PATTERNS:
+            match = pattern.search(combined_text)
             if match:
                 groups = match.groups()
                 if len(groups) >= 2:
@@ -1080,6 +1130,9 @@ def main():
                         help='Parse only N files as a sample')
     parser.add_argument('--verbose', action='store_true',
                         help='Print verbose output')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-parse every page without reading or writing the cache')
+    add_workers_argument(parser)
     
     args = parser.parse_args()
     
@@ -1089,7 +1142,7 @@ def main():
     print()
     
     parser_instance = OBDII365Parser(args.html_dir, args.output_dir)
-    products = parser_instance.parse_all()
+    products = parser_instance.parse_all(workers=args.workers, use_cache=not args.no_cache)
     
     if args.sample > 0:
         products = products[:args.sample]
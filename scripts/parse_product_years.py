@@ -8,14 +8,11 @@ Titles like:
   "Chevrolet 2023 Smart Key"              -> year_start=2023, year_end=2023
 """
 
-import re
 import json
 import sys
 from pathlib import Path
 
-# Regex to match year ranges in titles
-# Matches: 2021-2025, 2017-2018, 2023, etc.
-YEAR_RANGE_PATTERN = re.compile(r'\b(20[0-2]\d)(?:\s*[-–]\s*(20[0-2]\d))?\b')
+from text_patterns import first_year_range
 
 
 def parse_year_from_title(title: str) -> tuple[int | None, int | None]:
@@ -23,18 +20,8 @@ def parse_year_from_title(title: str) -> tuple[int | None, int | None]:
     if not title:
         return None, None
     
-    match = YEAR_RANGE_PATTERN.search(title)
-    if not match:
-        return None, None
-    
-    year_start = int(match.group(1))
-    year_end = int(match.group(2)) if match.group(2) else year_start
-    
-    # Sanity check: year_end should be >= year_start
-    if year_end < year_start:
-        year_start, year_end = year_end, year_start
-    
-    return year_start, year_end
+    # Ranges come back earliest first; "2020+" runs to the current model year
+    return first_year_range(title) or (None, None)
 
 
 def main():
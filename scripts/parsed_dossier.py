@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+Parse-Once Dossier Model
+
+Every dossier extractor used to run BeautifulSoup over the same Google Docs
+HTML export. This module parses each export once and caches a compact,
+pickled snapshot of the element tree (tag names, structure, attributes and
+text) keyed by the file's content hash, so later passes load the snapshot
+instead of re-parsing.
+
+The snapshot exposes the subset of the BeautifulSoup API the extractors
+use (find_all, find_previous, find_next, get_text, ...), so a script only
+changes how it obtains its soup:
+
+    from parsed_dossier import load_dossier
+    soup = load_dossier(filepath).root
+
+    for header in soup.find_all(["h2", "h3"]):
+        print(header.get_text().strip())
+
+Structured views (headings, paragraphs, lists, tables, links, images and
+sections) are available directly on the ParsedDossier.
+
+The tree can be built by BeautifulSoup's html.parser (the reference), lxml
+or selectolax; pick one with DOSSIER_HTML_PARSER or --parser. The fast
+backends follow HTML5 tree-building rules, so whitespace-only text and
+implied <html>/<body> elements can differ slightly -
+scripts/benchmark_html_parsers.py measures speed and equivalence.
+
+Layout:
+    data/cache/parsed_dossiers/<content_hash>.<parser>.pkl
+
+Usage:
+    python3 scripts/parsed_dossier.py                    # pre-parse all gdrive_exports HTML
+    python3 scripts/parsed_dossier.py --workers 0        # ... using every CPU
+    python3 scripts/parsed_dossier.py --parser lxml      # ... with the lxml backend
+"""
+
+import hashlib
+import os
+import pickle
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+BASE_DIR = Path(__file__).parent.parent
+GDRIVE_EXPORTS = BASE_DIR / "gdrive_exports"
+CACHE_DIR = BASE_DIR / "data" / "cache" / "parsed_dossiers"
+
+SCHEMA_VERSION = 2
+DROPPED_ATTRS = {"style"}    # Inline CSS is most of a Docs export and no extractor reads it
+HEADING_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+
+# Parser backend: "html.parser" (reference), "lxml" or "selectolax" (faster, HTML5 tree rules)
+DEFAULT_PARSER = os.environ.get("DOSSIER_HTML_PARSER", "html.parser")
+LIST_ATTRS = {"class", "rel", "rev", "accept-charset", "headers", "accesskey", "dropzone"}
+TEXTLESS_TAGS = {"script", "style", "template"}
+
+_Names = Union[None, str, Iterable[str]]
+
+
+def _name_filter(name: _Names):
+    if name is None or name is True:
+        return None
+    if isinstance(name, str):
+        return {name}
+    return set(name)
+
+
+def _attrs_match(attrs: Dict, wanted: Dict) -> bool:
+    for key, value in wanted.items():
+        actual = attrs.get(key)
+        if value is True:
+            if actual is None:
+                return False
+        elif value is False or value is None:
+            if actual is not None:
+                return False
+        elif isinstance(actual, list):
+            if value not in actual and value != " ".join(actual):
+                return False
+        elif actual != value:
+            return False
+    return True
+
+
+class DossierNode:
+    """One element of a ParsedDossier, with a BeautifulSoup-compatible read API."""
+
+    __slots__ = ("doc", "index")
+
+    def __init__(self, doc: "ParsedDossier", index: int):
+        self.doc = doc
+        self.index = index
+
+    def __repr__(self):
+        return f"<{self.name} #{self.index}>"
+
+    def __eq__(self, other):
+        return isinstance(other, DossierNode) and other.doc is self.doc and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.doc), self.index))
+
+    def __bool__(self):
+        return True
+
+    def __getattr__(self, name):
+        # soup.title / soup.body shortcut, as in BeautifulSoup
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.find(name)
+
+    # ------------------------------------------------------------------
+    # Element data
+    # ------------------------------------------------------------------
+
+    @property
+    def name(self) -> str:
+        return self.doc.names[self.index]
+
+    @property
+    def attrs(self) -> Dict:
+        return self.doc.attrs.get(self.index, {})
+
+    def get(self, key: str, default=None):
+        return self.attrs.get(key, default)
+
+    def __getitem__(self, key: str):
+        return self.attrs[key]
+
+    def has_attr(self, key: str) -> bool:
+        return key in self.attrs
+
+    @property
+    def parent(self) -> Optional["DossierNode"]:
+        parent = self.doc.parents[self.index]
+        return None if parent < 0 else DossierNode(self.doc, parent)
+
+    @property
+    def parents(self) -> List["DossierNode"]:
+        found = []
+        i = self.doc.parents[self.index]
+        while i >= 0:
+            found.append(DossierNode(self.doc, i))
+            i = self.doc.parents[i]
+        return found
+
+    @property
+    def strings(self) -> List[str]:
+        doc = self.doc
+        return doc.strings[doc.str_lo[self.index]:doc.str_hi[self.index]]
+
+    @property
+    def stripped_strings(self) -> List[str]:
+        return [s for s in (s.strip() for s in self.strings) if s]
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        return separator.join(self.stripped_strings if strip else self.strings)
+
+    getText = get_text
+
+    @property
+    def text(self) -> str:
+        return self.get_text()
+
+    @property
+    def string(self) -> Optional[str]:
+        """The only string inside this element (through single-child chains), else None."""
+        node = self
+        while True:
+            children = node.doc.child_items(node.index)
+            if len(children) != 1:
+                return None
+            kind, value = children[0]
+            if kind == "s":
+                return node.doc.strings[value]
+            node = DossierNode(node.doc, value)
+
+    # ------------------------------------------------------------------
+    # Navigation
+    # ------------------------------------------------------------------
+
+    def _select(self, indices: Iterable[int], name: _Names, attrs: Dict, limit: Optional[int]):
+        names = _name_filter(name)
+        doc = self.doc
+        found = []
+        for i in indices:
+            if names is not None and doc.names[i] not in names:
+                continue
+            if attrs and not _attrs_match(doc.attrs.get(i, {}), attrs):
+                continue
+            found.append(DossierNode(doc, i))
+            if limit and len(found) >= limit:
+                break
+        return found
+
+    def _first(self, indices: Iterable[int], name: _Names, attrs: Dict) -> Optional["DossierNode"]:
+        found = self._select(indices, name, attrs, 1)
+        return found[0] if found else None
+
+    @property
+    def children(self) -> List["DossierNode"]:
+        return [DossierNode(self.doc, i) for i in self.doc.child_elements(self.index)]
+
+    def find_all(self, name: _Names = None, recursive: bool = True, limit: Optional[int] = None,
+                 **attrs) -> List["DossierNode"]:
+        if recursive:
+            indices = range(self.index + 1, self.doc.ends[self.index])
+        else:
+            indices = self.doc.child_elements(self.index)
+        return self._select(indices, name, attrs, limit)
+
+    findAll = find_all
+    __call__ = find_all
+
+    def find(self, name: _Names = None, recursive: bool = True, **attrs) -> Optional["DossierNode"]:
+        found = self.find_all(name, recursive, 1, **attrs)
+        return found[0] if found else None
+
+    def find_all_next(self, name: _Names = None, limit: Optional[int] = None, **attrs) -> List["DossierNode"]:
+        return self._select(range(self.index + 1, len(self.doc.names)), name, attrs, limit)
+
+    def find_next(self, name: _Names = None, **attrs) -> Optional["DossierNode"]:
+        return self._first(range(self.index + 1, len(self.doc.names)), name, attrs)
+
+    def find_all_previous(self, name: _Names = None, limit: Optional[int] = None, **attrs) -> List["DossierNode"]:
+        # Document order backwards, so ancestors are included (as in BeautifulSoup)
+        return self._select(range(self.index - 1, 0, -1), name, attrs, limit)
+
+    def find_previous(self, name: _Names = None, **attrs) -> Optional["DossierNode"]:
+        return self._first(range(self.index - 1, 0, -1), name, attrs)
+
+    def find_next_sibling(self, name: _Names = None, **attrs) -> Optional["DossierNode"]:
+        siblings = self.doc.child_elements(self.doc.parents[self.index])
+        return self._first((i for i in siblings if i > self.index), name, attrs)
+
+    def find_previous_sibling(self, name: _Names = None, **attrs) -> Optional["DossierNode"]:
+        siblings = self.doc.child_elements(self.doc.parents[self.index])
+        return self._first((i for i in reversed(siblings) if i < self.index), name, attrs)
+
+    def find_parent(self, name: _Names = None, **attrs) -> Optional["DossierNode"]:
+        parents = []
+        i = self.doc.parents[self.index]
+        while i > 0:
+            parents.append(i)
+            i = self.doc.parents[i]
+        return self._first(parents, name, attrs)
+
+
+class ParsedDossier:
+    """
+    Compact snapshot of one parsed HTML export.
+
+    Elements are stored in document (pre-order) order: element i spans the
+    elements i+1 .. ends[i]-1 and the text strings str_lo[i] .. str_hi[i]-1.
+    Element 0 is the document root. Only content strings are kept (no
+    comments, and no <script>/<style> bodies), matching get_text().
+    """
+
+    def __init__(self, path: str, content_hash: str, names: List[str], parents: array, ends: array,
+                 str_lo: array, str_hi: array, attrs: Dict[int, Dict], strings: List[str],
+                 string_parents: array):
+        self.path = path
+        self.content_hash = content_hash
+        self.names = names
+        self.parents = parents
+        self.ends = ends
+        self.str_lo = str_lo
+        self.str_hi = str_hi
+        self.attrs = attrs
+        self.strings = strings
+        self.string_parents = string_parents
+        self._children = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_children"] = None
+        return state
+
+    @property
+    def root(self) -> DossierNode:
+        return DossierNode(self, 0)
+
+    def child_elements(self, index: int) -> List[int]:
+        if self._children is None:
+            children = [[] for _ in self.names]
+            for i in range(1, len(self.names)):
+                children[self.parents[i]].append(i)
+            self._children = children
+        return self._children[index]
+
+    def child_items(self, index: int) -> List[tuple]:
+        """Direct children in document order: ('e', element index) or ('s', string index)."""
+        items = [("e", i) for i in self.child_elements(index)]
+        items += [("s", s) for s in range(self.str_lo[index], self.str_hi[index])
+                  if self.string_parents[s] == index]
+        # Strings and elements interleave by where they start in the string stream
+        return sorted(items, key=lambda item: (self.str_lo[item[1]], 0) if item[0] == "e" else (item[1], 1))
+
+    # ------------------------------------------------------------------
+    # Structured views
+    # ------------------------------------------------------------------
+
+    @property
+    def full_text(self) -> str:
+        return self.root.get_text()
+
+    @property
+    def title(self) -> str:
+        for name in ("title", "h1"):
+            tag = self.root.find(name)
+            if tag:
+                text = tag.get_text().strip()
+                if text:
+                    return text
+        return Path(self.path).stem
+
+    @property
+    def headings(self) -> List[DossierNode]:
+        return self.root.find_all(HEADING_TAGS)
+
+    @property
+    def paragraphs(self) -> List[DossierNode]:
+        return self.root.find_all("p")
+
+    @property
+    def lists(self) -> List[DossierNode]:
+        return self.root.find_all(["ul", "ol"])
+
+    @property
+    def tables(self) -> List[DossierNode]:
+        return self.root.find_all("table")
+
+    @property
+    def links(self) -> List[DossierNode]:
+        return self.root.find_all("a", href=True)
+
+    @property
+    def images(self) -> List[DossierNode]:
+        return self.root.find_all("img")
+
+    def sections(self, levels: Iterable[str] = ("h2", "h3")) -> List[Dict]:
+        """Heading plus the block elements under it, for every heading of the given levels."""
+        levels = set(levels)
+        sections = [{"heading": None, "level": 0, "elements": []}]
+        for node in self.root.find_all(list(levels) + ["p", "ul", "ol", "table"]):
+            if node.name in levels:
+                sections.append({"heading": node, "level": int(node.name[1]), "elements": []})
+            elif not node.find_parent(["p", "ul", "ol", "table"]):
+                sections[-1]["elements"].append(node)
+        return sections if sections[0]["elements"] else sections[1:]
+
+
+# ============================================================
+# Building / caching
+# ============================================================
+
+class _SnapshotBuilder:
+    """Accumulates open/text/close events from a parser backend into a ParsedDossier."""
+
+    def __init__(self):
+        self.names = ["[document]"]
+        self.parents = array("i", [-1])
+        self.ends = array("I", [0])
+        self.str_lo = array("I", [0])
+        self.str_hi = array("I", [0])
+        self.attrs = {}
+        self.strings = []
+        self.string_parents = array("i")
+        self.open_stack = [0]
+
+    def open(self, name: str, attrs: Dict) -> None:
+        index = len(self.names)
+        self.names.append(name)
+        self.parents.append(self.open_stack[-1])
+        self.ends.append(0)
+        self.str_lo.append(len(self.strings))
+        self.str_hi.append(0)
+        kept = {k: v for k, v in attrs.items() if k not in DROPPED_ATTRS}
+        if kept:
+            self.attrs[index] = kept
+        self.open_stack.append(index)
+
+    def text(self, value: str) -> None:
+        if value:
+            self.strings.append(value)
+            self.string_parents.append(self.open_stack[-1])
+
+    def close(self) -> None:
+        closed = self.open_stack.pop()
+        self.ends[closed] = len(self.names)
+        self.str_hi[closed] = len(self.strings)
+
+    def build(self, path: str, content_hash: str) -> ParsedDossier:
+        while self.open_stack:
+            self.close()
+        return ParsedDossier(path, content_hash, self.names, self.parents, self.ends, self.str_lo,
+                             self.str_hi, self.attrs, self.strings, self.string_parents)
+
+
+def _split_list_attrs(attrs) -> Dict:
+    """Attribute dict in BeautifulSoup form: class/rel/... as lists, bare attributes as ''."""
+    result = {}
+    for key, value in attrs.items():
+        if value is None:
+            value = ""
+        if key in LIST_ATTRS:
+            value = value.split()
+        result[key] = value
+    return result
+
+
+def from_soup(soup, path: str = "", content_hash: str = "") -> ParsedDossier:
+    """Snapshot a BeautifulSoup tree."""
+    from bs4 import CData, NavigableString, Tag
+
+    text_types = (NavigableString, CData)
+    builder = _SnapshotBuilder()
+    index_of = {id(soup): 0}
+
+    def close_until(parent: int) -> None:
+        while builder.open_stack[-1] != parent:
+            builder.close()
+
+    for node in soup.descendants:
+        if isinstance(node, Tag):
+            close_until(index_of[id(node.parent)])
+            index_of[id(node)] = len(builder.names)
+            builder.open(node.name, node.attrs)
+        elif type(node) in text_types:
+            close_until(index_of[id(node.parent)])
+            builder.text(str(node))
+    return builder.build(path, content_hash)
+
+
+def _parse_html_parser(content: str, path: str, content_hash: str) -> ParsedDossier:
+    from bs4 import BeautifulSoup
+    return from_soup(BeautifulSoup(content, "html.parser"), path, content_hash)
+
+
+def _parse_lxml(content: str, path: str, content_hash: str) -> ParsedDossier:
+    from lxml import etree, html
+
+    builder = _SnapshotBuilder()
+    if content.strip():
+        root = html.document_fromstring(content)
+        skip_text = 0    # Depth inside <script>/<style>, whose bodies get_text() ignores
+        for event, el in etree.iterwalk(root, events=("start", "end")):
+            is_element = isinstance(el.tag, str)
+            if event == "start":
+                if is_element:
+                    builder.open(el.tag, _split_list_attrs(el.attrib))
+                    if el.tag in TEXTLESS_TAGS:
+                        skip_text += 1
+                    elif not skip_text:
+                        builder.text(el.text)
+            else:
+                if is_element:
+                    if el.tag in TEXTLESS_TAGS:
+                        skip_text -= 1
+                    builder.close()
+                if not skip_text:
+                    builder.text(el.tail)
+    return builder.build(path, content_hash)
+
+
+def _parse_selectolax(content: str, path: str, content_hash: str) -> ParsedDossier:
+    try:
+        from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    except ImportError:
+        from selectolax.parser import HTMLParser
+
+    builder = _SnapshotBuilder()
+    root = HTMLParser(content).root
+    todo = [root] if root is not None else []
+    while todo:
+        node = todo.pop()
+        if node is None:
+            builder.close()
+            continue
+        tag = node.tag
+        if tag == "-text":
+            builder.text(node.text(deep=False))
+        elif not tag.startswith(("-", "_", "!")):
+            builder.open(tag, _split_list_attrs(node.attributes))
+            todo.append(None)
+            if tag not in TEXTLESS_TAGS:
+                todo.extend(reversed(list(node.iter(include_text=True))))
+    return builder.build(path, content_hash)
+
+
+PARSER_BACKENDS = {
+    "html.parser": _parse_html_parser,
+    "lxml": _parse_lxml,
+    "selectolax": _parse_selectolax,
+}
+
+
+def parse_html(content: str, path: str = "", content_hash: str = "",
+               parser: Optional[str] = None) -> ParsedDossier:
+    """Parse HTML into a ParsedDossier with the chosen backend (default: DEFAULT_PARSER)."""
+    parser = parser or DEFAULT_PARSER
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {parser} (choose from {', '.join(PARSER_BACKENDS)})")
+    return PARSER_BACKENDS[parser](content, path, content_hash)
+
+
+# Cached as a dict of plain containers rather than the ParsedDossier itself, so an
+# entry written by `python parsed_dossier.py` (where the class lives in __main__)
+# still loads in the extractors that import this module
+_SNAPSHOT_FIELDS = ("names", "parents", "ends", "str_lo", "str_hi", "attrs", "strings", "string_parents")
+
+
+def load_dossier(path: Union[str, Path], cache_dir: Path = CACHE_DIR, use_cache: bool = True,
+                 parser: Optional[str] = None) -> ParsedDossier:
+    """Parsed snapshot of an HTML export, from the cache when its content is unchanged."""
+    parser = parser or DEFAULT_PARSER
+    with open(path, "rb") as f:
+        raw = f.read()
+    content_hash = hashlib.md5(raw).hexdigest()[:12]
+    cache_path = Path(cache_dir) / f"{content_hash}.{parser.replace('.', '_')}.pkl"
+
+    if use_cache and cache_path.exists():
+        try:
+            with open(cache_path, "rb") as f:
+                payload = pickle.load(f)
+            if payload.get("version") == SCHEMA_VERSION:
+                return ParsedDossier(str(path), content_hash, **payload["doc"])
+        except Exception:
+            pass  # Unreadable or stale entry - re-parse below
+
+    doc = parse_html(raw.decode("utf-8", errors="ignore"), str(path), content_hash, parser)
+    if use_cache:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": SCHEMA_VERSION, "doc": {k: getattr(doc, k) for k in _SNAPSHOT_FIELDS}},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    return doc
+
+
+def _warm(path: Path, parser: Optional[str] = None) -> int:
+    return len(load_dossier(path, parser=parser).names)
+
+
+def main():
+    import argparse
+    from functools import partial
+    from parallel_runner import add_workers_argument, run_parallel
+
+    parser = argparse.ArgumentParser(description='Pre-parse dossier HTML exports into the shared cache')
+    parser.add_argument('--input', '-i', default=str(GDRIVE_EXPORTS), help='Input directory')
+    parser.add_argument('--parser', '-p', choices=sorted(PARSER_BACKENDS), default=DEFAULT_PARSER,
+                        help='HTML parser backend')
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    html_files = sorted(Path(args.input).glob("**/*.html"))
+    print(f"Found {len(html_files)} HTML files")
+    results, failures = run_parallel(partial(_warm, parser=args.parser), html_files, workers=args.workers)
+    print(f"Cached {len(html_files) - len(failures)} documents "
+          f"({sum(r for r in results if r)} elements) in {CACHE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,8 @@ from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 
+from text_patterns import first_year_range
+
 INPUT_FILE = Path("data/pearl_extraction/final_pearls_v7.json")
 SOURCE_FILE = Path("data/pearl_extraction/all_pearls_v8_deduped.json")
 OUTPUT_FILE = Path("data/pearl_extraction/final_pearls_v8.json")
@@ -54,24 +56,8 @@ def map_to_vehicle_card(pearl_type: str, scenario: str, content: str) -> str:
 
 def extract_year_range(text: str) -> tuple:
     """Extract year range from section heading or content."""
-    # Pattern: (2017-2019) or (2020+) or 2017–2019
-    patterns = [
-        r'\((\d{4})[–\-](\d{4})\s*(?:Models?)?\)',
-        r'\((\d{4})\+\)',
-        r'(\d{4})[–\-](\d{4})\s+(?:Models?|vehicles?)',
-        r'(\d{4})\s*(?:and\s+)?(?:newer|later|onwards|\+)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            groups = match.groups()
-            if len(groups) == 2:
-                return (groups[0], groups[1])
-            elif len(groups) == 1:
-                return (groups[0], '2025')  # Assume current
-    
-    return (None, None)
+    # Pattern: (2017-2019) or (2020+) or 2017–2019 or 2020 and newer
+    return first_year_range(text, open_end=2025, single=False) or (None, None)  # Open ranges end at current
 
 
 def detect_scenario(section_heading: str, content: str) -> str:
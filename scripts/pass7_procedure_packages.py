@@ -15,6 +15,8 @@ from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 
+from text_patterns import first_year_range
+
 SOURCE_FILE = Path("data/pearl_extraction/all_pearls_v8_deduped.json")
 PEARLS_FILE = Path("data/pearl_extraction/final_pearls_v8.json")
 OUTPUT_FILE = Path("data/pearl_extraction/procedure_packages.json")
@@ -98,20 +100,7 @@ def detect_scenario(heading: str, content: str) -> str:
 
 def extract_year_range(text: str) -> tuple:
     """Extract year range from text."""
-    patterns = [
-        r'\((\d{4})[–\-](\d{4})\)',
-        r'(\d{4})[–\-](\d{4})',
-        r'(\d{4})\+',
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            groups = match.groups()
-            if len(groups) == 2:
-                return (groups[0], groups[1])
-            elif len(groups) == 1:
-                return (groups[0], '2025')
-    return (None, None)
+    return first_year_range(text, open_end=2025, single=False) or (None, None)
 
 
 def create_package_id(make: str, model: str, scenario: str) -> str:
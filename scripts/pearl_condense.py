@@ -13,11 +13,10 @@ Rules:
 """
 import json, re, random, html
 
-with open('data/d1_pearls_fresh.json') as f:
-    raw = json.load(f)
+from pearl_store import iter_pearls
 
-pearls = raw[0]['results']
-print(f"Total pearls: {len(pearls)}")
+# Streamed one pearl at a time out of the wrangler export
+pearls = iter_pearls('data/d1_pearls_fresh.json')
 
 def clean_html_entities(text):
     """Remove HTML entities and formatting artifacts."""
@@ -141,8 +140,10 @@ updates = []
 too_short = 0
 already_good = 0
 condensed_count = 0
+total = 0
 
 for p in pearls:
+    total += 1
     original = p['pearl_content']
     cleaned = clean_html_entities(strip_footnotes(original))
     
@@ -186,6 +187,7 @@ for p in pearls:
         })
         condensed_count += 1
 
+print(f"Total pearls: {total}")
 print(f"\nResults:")
 print(f"  Full condense: {condensed_count}")
 print(f"  HTML cleanup: {sum(1 for u in updates if u['reason'] == 'html_cleanup')}")
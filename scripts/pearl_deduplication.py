@@ -3,75 +3,78 @@
 Pearl Deduplication Script
 Generates SQL to mark duplicate pearls using the duplicate_of column.
 Keeps the first occurrence, marks subsequent ones as duplicates.
+Near-duplicates (not just identical prefixes) are found with the MinHash/LSH
+index in near_duplicates.py across the whole table, read from the local D1
+mirror (d1_mirror.py) or, failing that, the JSON export.
 """
 
-import json
 import os
 from pathlib import Path
 from collections import defaultdict
 
+from near_duplicates import NearDuplicateIndex
+from sql_writer import update_case_statements
+from d1_mirror import iter_rows
+
 EXPORT_PATH = "/Users/jeremysamuels/Documents/study-dashboard/data/all_refined_pearls_export.json"
 OUTPUT_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/migrations/deduplication")
 OUTPUT_DIR.mkdir(exist_ok=True)
+SIMILARITY_THRESHOLD = 0.9
 
 def normalize_content(text):
     """Normalize content for comparison"""
     return ' '.join(text.split()).lower()[:100]
 
-def escape_sql(s):
-    """Escape single quotes for SQL"""
-    return s.replace("'", "''")
-
 def main():
-    print("Loading pearls...")
-    with open(EXPORT_PATH, 'r') as f:
-        pearls = json.load(f)
-    print(f"  Loaded {len(pearls)} pearls")
+    print("Streaming pearls...")
     
-    # Group by normalized content
+    # Group by normalized content (only ids and previews are kept in memory)
     content_groups = defaultdict(list)
-    for p in pearls:
+    total = 0
+    for p in iter_rows('refined_pearls', fallback_export=EXPORT_PATH):
+        total += 1
         pid = p.get('id', '')
         content = p.get('content', '')
         if content:
             norm = normalize_content(content)
             content_groups[norm].append({
                 'id': pid,
+                'norm': norm,
                 'content_preview': content[:80],
                 'source_doc': p.get('source_doc', '')
             })
     
-    # Find duplicates
+    print(f"  Loaded {total} pearls")
+    
+    # Find duplicates: index in preference order so the best copy represents each cluster
+    entries = [e for group in content_groups.values() for e in group]
+    entries.sort(key=lambda x: (x.get('source_doc', '') or 'zzz'))
+    index = NearDuplicateIndex(threshold=SIMILARITY_THRESHOLD)
+    for i, entry in enumerate(entries):
+        index.add(i, entry['norm'])
+    
     duplicates = []
-    for norm_content, group in content_groups.items():
-        if len(group) > 1:
-            # Keep the first one (or the one with the best source_doc)
-            sorted_group = sorted(group, key=lambda x: (x.get('source_doc', '') or 'zzz'))
-            primary = sorted_group[0]
-            for dup in sorted_group[1:]:
-                duplicates.append({
-                    'dup_id': dup['id'],
-                    'primary_id': primary['id'],
-                    'content_preview': norm_content[:50]
-                })
+    for cluster in index.clusters():
+        primary = entries[cluster.representative]
+        for member in cluster.duplicates:
+            dup = entries[member]
+            duplicates.append({
+                'dup_id': dup['id'],
+                'primary_id': primary['id'],
+                'similarity': round(cluster.scores[member], 3),
+                'content_preview': dup['norm'][:50]
+            })
     
     print(f"\nFound {len(duplicates)} duplicate pearls to mark")
     
-    # Generate SQL batches
-    batch_size = 100
+    # Generate SQL batches: one CASE-based bulk UPDATE per file instead of one UPDATE per pearl
     batch_num = 0
-    
-    for i in range(0, len(duplicates), batch_size):
-        batch = duplicates[i:i+batch_size]
-        sql_lines = [f"-- Deduplication Batch {batch_num}\n"]
-        
-        for dup in batch:
-            sql = f"UPDATE refined_pearls SET duplicate_of = '{escape_sql(dup['primary_id'])}' WHERE id = '{escape_sql(dup['dup_id'])}';\n"
-            sql_lines.append(sql)
-        
+    pairs = ((dup['dup_id'], dup['primary_id']) for dup in duplicates)
+    for sql in update_case_statements('refined_pearls', 'id', 'duplicate_of', pairs):
         batch_file = OUTPUT_DIR / f"dedup_batch_{batch_num:03d}.sql"
         with open(batch_file, 'w') as f:
-            f.writelines(sql_lines)
+            f.write(f"-- Deduplication Batch {batch_num}\n")
+            f.write(sql + ";\n")
         
         batch_num += 1
     
@@ -90,10 +93,10 @@ def main():
     print(f"\n{'='*60}")
     print(f"SUMMARY")
     print(f"{'='*60}")
-    print(f"Total pearls: {len(pearls)}")
+    print(f"Total pearls: {total}")
     print(f"Unique content: {len(content_groups)}")
     print(f"Duplicates to mark: {len(duplicates)}")
-    print(f"After dedup: ~{len(pearls) - len(duplicates)} pearls")
+    print(f"After dedup: ~{total - len(duplicates)} pearls")
 
 if __name__ == '__main__':
     main()
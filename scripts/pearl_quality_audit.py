@@ -13,41 +13,32 @@ from pathlib import Path
 from collections import defaultdict
 from difflib import SequenceMatcher
 
+from d1_mirror import MIRROR_PATH, iter_rows
+from near_duplicates import ContainmentIndex, NearDuplicateIndex
+from source_index import SourceIndex
+
 # Paths
 EXPORT_PATH = "/Users/jeremysamuels/Documents/study-dashboard/data/all_refined_pearls_export.json"
-SOURCE_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/fcc_research_docs")
 OUTPUT_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/pearl_audit")
 OUTPUT_DIR.mkdir(exist_ok=True)
-
-def load_sources():
-    """Load all .txt source files"""
-    sources = {}
-    for f in SOURCE_DIR.glob("*.txt"):
-        try:
-            content = f.read_text(encoding='utf-8', errors='ignore')
-            sources[f.stem] = content
-        except:
-            pass
-    print(f"Loaded {len(sources)} source files")
-    return sources
+NEAR_DUPLICATE_THRESHOLD = 0.9
 
 def normalize_text(text):
     """Normalize text for comparison"""
     return ' '.join(text.split()).lower()
 
-def find_in_source(content, sources):
+def find_in_source(content, index):
     """Find pearl content in source files and return source context"""
     prefix = normalize_text(content)[:80]
     
-    for name, src_content in sources.items():
-        src_norm = normalize_text(src_content)
-        if prefix in src_norm:
-            # Find the actual position in original
-            idx = src_norm.find(prefix)
-            # Get surrounding context from source
-            start = max(0, idx - 200)
-            end = min(len(src_content), idx + len(content) + 200)
-            return name, src_content[start:end]
+    found = index.find_normalized(prefix)
+    if found:
+        file_id, idx = found
+        src_content = index.text(file_id)
+        # Get surrounding context from source
+        start = max(0, idx - 200)
+        end = min(len(src_content), idx + len(content) + 200)
+        return index.files[file_id].stem, src_content[start:end]
     return None, None
 
 def detect_formatting_issues(pearl, source_context):
@@ -96,22 +87,36 @@ def find_duplicates(pearls):
             else:
                 content_map[content] = pid
     
+    # Near duplicates (same pearl with small edits) anywhere in the export
+    index = NearDuplicateIndex(threshold=NEAR_DUPLICATE_THRESHOLD)
+    for content in content_map:
+        index.add(content, content)
+    for cluster in index.clusters():
+        for content in cluster.duplicates:
+            duplicates.append({
+                'type': 'NEAR_DUPLICATE',
+                'id1': content_map[cluster.representative],
+                'id2': content_map[content],
+                'similarity': round(cluster.scores[content], 3),
+                'content_preview': content[:60]
+            })
+    
     # Find truncated fragments (one pearl is subset of another)
-    sorted_content = sorted(content_map.keys(), key=len)
-    for i, short_content in enumerate(sorted_content):
-        for long_content in sorted_content[i+1:]:
-            if short_content in long_content:
-                duplicates.append({
-                    'type': 'TRUNCATED_FRAGMENT',
-                    'short_id': content_map[short_content],
-                    'long_id': content_map[long_content],
-                    'short_preview': short_content[:40],
-                    'long_preview': long_content[:60]
-                })
+    fragments = ContainmentIndex()
+    for content in content_map:
+        fragments.add(content, content)
+    for short_content, long_content in fragments.containment_pairs():
+        duplicates.append({
+            'type': 'TRUNCATED_FRAGMENT',
+            'short_id': content_map[short_content],
+            'long_id': content_map[long_content],
+            'short_preview': short_content[:40],
+            'long_preview': long_content[:60]
+        })
     
     return duplicates
 
-def find_split_lists(pearls, sources):
+def find_split_lists(pearls):
     """Find list items that were incorrectly split into separate pearls"""
     split_lists = []
     
@@ -148,22 +153,18 @@ def main():
     print("=" * 70)
     
     # Load sources
-    print("\nLoading source files...")
-    sources = load_sources()
+    print("\nLoading source index...")
+    index = SourceIndex.load_or_build()
     
-    # Export fresh from D1 and load
-    print("\nLoading pearls from latest export...")
+    # Load from the local D1 mirror, falling back to the latest export
+    print("\nLoading pearls from local mirror...")
     
-    # Check if we have a recent export, otherwise need to create one
-    if not Path(EXPORT_PATH).exists():
-        print(f"  Export not found at {EXPORT_PATH}")
-        print("  Run: wrangler d1 export to get fresh data")
+    if not MIRROR_PATH.exists() and not Path(EXPORT_PATH).exists():
+        print(f"  Neither the mirror ({MIRROR_PATH}) nor the export ({EXPORT_PATH}) exists")
+        print("  Run: python3 scripts/d1_mirror.py pull refined_pearls")
         return
     
-    with open(EXPORT_PATH, 'r') as f:
-        data = json.load(f)
-    
-    pearls = data if isinstance(data, list) else data.get('results', [])
+    pearls = list(iter_rows('refined_pearls', fallback_export=EXPORT_PATH))
     print(f"  Loaded {len(pearls)} pearls")
     
     # Audit: Formatting Issues
@@ -172,8 +173,8 @@ def main():
     print("=" * 70)
     
     formatting_issues = []
-    for i, p in enumerate(pearls[:2000]):  # Sample first 2000
-        source_name, source_ctx = find_in_source(p.get('content', ''), sources)
+    for i, p in enumerate(pearls):
+        source_name, source_ctx = find_in_source(p.get('content', ''), index)
         if source_ctx:
             issues = detect_formatting_issues(p, source_ctx)
             if issues:
@@ -184,7 +185,7 @@ def main():
                     'source': source_name
                 })
         if i % 500 == 0:
-            print(f"  Checked {i}/2000...")
+            print(f"  Checked {i}/{len(pearls)}...")
     
     print(f"\n  Found {len(formatting_issues)} pearls with potential formatting issues")
     
@@ -195,9 +196,11 @@ def main():
     
     duplicates = find_duplicates(pearls)
     exact_dups = [d for d in duplicates if d['type'] == 'EXACT_DUPLICATE']
+    near_dups = [d for d in duplicates if d['type'] == 'NEAR_DUPLICATE']
     truncated = [d for d in duplicates if d['type'] == 'TRUNCATED_FRAGMENT']
     
     print(f"\n  Exact duplicates: {len(exact_dups)}")
+    print(f"  Near duplicates: {len(near_dups)}")
     print(f"  Truncated fragments: {len(truncated)}")
     
     # Audit: Split Lists
@@ -205,20 +208,22 @@ def main():
     print("3. SPLIT LIST ITEMS AUDIT")
     print("=" * 70)
     
-    split_lists = find_split_lists(pearls, sources)
+    split_lists = find_split_lists(pearls)
     print(f"\n  Found {len(split_lists)} sources with potentially split list items")
     
     # Save detailed report
     report = {
         'summary': {
             'total_pearls': len(pearls),
-            'formatting_issues_sampled': len(formatting_issues),
+            'formatting_issues': len(formatting_issues),
             'exact_duplicates': len(exact_dups),
+            'near_duplicates': len(near_dups),
             'truncated_fragments': len(truncated),
             'split_list_sources': len(split_lists)
         },
         'formatting_issues': formatting_issues[:50],  # Top 50
         'exact_duplicates': exact_dups[:50],
+        'near_duplicates': near_dups[:50],
         'truncated_fragments': truncated[:50],
         'split_lists': split_lists[:20]
     }
@@ -9,14 +9,26 @@ Fixes:
 4. Improve titles using content extraction
 """
 
-import json
 import re
 import hashlib
 from pathlib import Path
-from difflib import SequenceMatcher
+from typing import Iterable, Iterator
 
-# Load current pearls from D1 export or local JSON
-INPUT_FILE = Path("data/llm_enhanced_pearls.json")
+from migration_planner import MigrationPlanner
+from near_duplicates import NearDuplicateIndex
+from pearl_store import PearlWriter, iter_pearls
+from text_patterns import year_ranges
+
+# Pearl store written by enhance_pearls_llm.py (this pass updates it in place)
+INPUT_FILE = Path("data/pearls")
+
+# vehicle_pearls has no natural primary key; this identifies a pearl across runs
+PEARL_KEY_COLUMNS = ("vehicle_key", "pearl_title", "source_doc")
+
+# "2020 4Runner" or "the 2021 model"
+MODEL_YEAR_PATTERN = re.compile(r'\b(20[1-2][0-9])\s+(?:model|4runner|camry|f-150|silverado|[A-Z][a-z]+)', re.IGNORECASE)
+# "For the 2021" or "in 2020"
+CONTEXT_YEAR_PATTERN = re.compile(r'(?:for|in|the)\s+(20[1-2][0-9])\b', re.IGNORECASE)
 
 
 def normalize_text(text: str) -> str:
@@ -24,28 +36,21 @@ def normalize_text(text: str) -> str:
     return re.sub(r'\s+', ' ', text.lower().strip())
 
 
-def similarity(a: str, b: str) -> float:
-    """Calculate similarity ratio between two strings."""
-    return SequenceMatcher(None, normalize_text(a), normalize_text(b)).ratio()
-
-
 def extract_specific_years(content: str) -> list:
     """Extract specific years mentioned in content."""
     # Look for year patterns
     years = []
     
     # Pattern: "2020-2021 models" or "2020–2021"
-    range_matches = re.findall(r'(20[1-2][0-9])[\s\-–]*(20[1-2][0-9])', content)
-    for start, end in range_matches:
-        years.extend(range(int(start), int(end) + 1))
+    for start, end in year_ranges(content):
+        if 2010 <= start and end <= 2029:
+            years.extend(range(start, end + 1))
     
     # Pattern: "2020 4Runner" or "the 2021 model"
-    single_matches = re.findall(r'\b(20[1-2][0-9])\s+(?:model|4runner|camry|f-150|silverado|[A-Z][a-z]+)', content, re.IGNORECASE)
-    years.extend([int(y) for y in single_matches])
+    years.extend(int(y) for y in MODEL_YEAR_PATTERN.findall(content))
     
     # Pattern: "For the 2021" or "in 2020"
-    context_matches = re.findall(r'(?:for|in|the)\s+(20[1-2][0-9])\b', content, re.IGNORECASE)
-    years.extend([int(y) for y in context_matches])
+    years.extend(int(y) for y in CONTEXT_YEAR_PATTERN.findall(content))
     
     return sorted(set(years))
 
@@ -85,10 +90,11 @@ def generate_better_title(content: str, max_len: int = 60) -> str:
     return words[0] + '...'
 
 
-def deduplicate_pearls(pearls: list, similarity_threshold: float = 0.85) -> list:
-    """Remove duplicate pearls based on content similarity."""
-    unique_pearls = []
+def deduplicate_pearls(pearls: Iterable[dict], similarity_threshold: float = 0.85) -> Iterator[dict]:
+    """Drop duplicate pearls based on content similarity across the whole set, keeping the first."""
     seen_hashes = set()
+    index = NearDuplicateIndex(threshold=similarity_threshold)
+    kept = 0
     
     for pearl in pearls:
         content = pearl.get("paragraph") or pearl.get("content", "")
@@ -100,44 +106,44 @@ def deduplicate_pearls(pearls: list, similarity_threshold: float = 0.85) -> list
         if content_hash in seen_hashes:
             continue
         
-        # Check similarity against recent pearls (performance optimization)
-        is_duplicate = False
-        for prev in unique_pearls[-50:]:  # Only check last 50
-            prev_content = normalize_text((prev.get("paragraph") or prev.get("content", ""))[:200])
-            if similarity(content_normalized, prev_content) > similarity_threshold:
-                is_duplicate = True
-                break
+        # Check similarity against every unique pearl kept so far (LSH candidates only);
+        # the index reports scores >= threshold, dedup drops only those strictly above
+        if any(score > similarity_threshold for _, score in index.query(content_normalized)):
+            continue
         
-        if not is_duplicate:
-            seen_hashes.add(content_hash)
-            unique_pearls.append(pearl)
-    
-    return unique_pearls
+        seen_hashes.add(content_hash)
+        index.add(kept, content_normalized)
+        kept += 1
+        yield pearl
 
 
-def process_pearls(input_path: Path, output_path: Path):
-    """Main processing function."""
-    print(f"Loading pearls from {input_path}...")
+def process_pearls(input_path: Path, output_path: Path) -> int:
+    """
+    Main processing function.
     
-    with open(input_path, 'r') as f:
-        data = json.load(f)
+    Pearls stream from input_path through dedup and the year/title fixes
+    into output_path. When both are the same pearl store the pass runs in
+    place and appends only the pearls it changed.
     
-    pearls = data.get("pearls", [])
-    print(f"Loaded {len(pearls)} pearls")
+    Returns:
+        int: Number of pearls kept
+    """
+    print(f"Streaming pearls from {input_path}...")
     
-    # Phase 1a: Deduplication
-    print("\n=== Phase 1a: Deduplication ===")
-    original_count = len(pearls)
-    pearls = deduplicate_pearls(pearls)
-    removed = original_count - len(pearls)
-    print(f"Removed {removed} duplicates ({removed/original_count*100:.1f}%)")
+    loaded = 0
     
-    # Phase 1b: Year accuracy and title improvement
-    print("\n=== Phase 1b: Year Accuracy & Title Improvement ===")
+    def loaded_pearls():
+        nonlocal loaded
+        for pearl in iter_pearls(input_path):
+            loaded += 1
+            yield pearl
+    
+    # Phase 1a: Deduplication (streamed), Phase 1b: Year accuracy and title improvement
     exact_year_count = 0
     title_improved_count = 0
+    writer = PearlWriter(output_path)
     
-    for pearl in pearls:
+    for pearl in deduplicate_pearls(loaded_pearls()):
         content = pearl.get("paragraph") or pearl.get("content", "")
         vehicle = pearl.get("vehicle", {})
         
@@ -174,80 +180,87 @@ def process_pearls(input_path: Path, output_path: Path):
             if new_title != old_title and len(new_title) > 10:
                 pearl["improved_title"] = new_title
                 title_improved_count += 1
+        
+        writer.write(pearl)
     
+    removed = loaded - writer.count
+    print(f"Loaded {loaded} pearls")
+    print("\n=== Phase 1a: Deduplication ===")
+    print(f"Removed {removed} duplicates ({removed/max(loaded, 1)*100:.1f}%)")
+    print("\n=== Phase 1b: Year Accuracy & Title Improvement ===")
     print(f"  {exact_year_count} pearls have specific years extracted")
     print(f"  {title_improved_count} titles improved")
     
     # Save output
-    output_data = {
-        "total": len(pearls),
+    writer.close(summary={
+        "total": writer.count,
         "dedup_removed": removed,
         "exact_year_count": exact_year_count,
         "title_improved": title_improved_count,
-        "pearls": pearls
-    }
-    
-    with open(output_path, 'w') as f:
-        json.dump(output_data, f, indent=2)
+    })
     
-    print(f"\nSaved {len(pearls)} quality-improved pearls to {output_path}")
-    return pearls
+    print(f"\nSaved {writer.describe()}")
+    return writer.count
 
 
-def generate_sql_migration(pearls: list, output_path: Path):
-    """Generate SQL to update vehicle_pearls with quality fixes."""
+def vehicle_pearl_row(pearl: dict) -> dict:
+    """vehicle_pearls columns for one cleaned pearl."""
+    content = pearl.get("paragraph") or pearl.get("content", "")
+    vehicle = pearl.get("vehicle", {})
     
-    def escape(text):
-        if text is None:
-            return "NULL"
-        return "'" + str(text).replace("'", "''") + "'"
+    make = vehicle.get("make") or "Unknown"
+    model = vehicle.get("model") or "General"
+    year_start = int(vehicle.get("year_start") or 2020)
+    year_end = int(vehicle.get("year_end") or 2025)
     
-    sql_lines = [
-        "-- Pearl Quality Phase 1: Dedup and Year Fixes",
-        f"-- Pearls: {len(pearls)}",
-        "",
-        "-- First, clear and re-insert cleaned data",
-        "DELETE FROM vehicle_pearls;",
-        "",
-    ]
+    # Use improved title if available
+    title = pearl.get("improved_title") or pearl.get("snippet", content[:60])
     
-    for pearl in pearls:
-        content = pearl.get("paragraph") or pearl.get("content", "")
-        vehicle = pearl.get("vehicle", {})
-        
-        make = vehicle.get("make") or "Unknown"
-        model = vehicle.get("model") or "General"
-        year_start = int(vehicle.get("year_start") or 2020)
-        year_end = int(vehicle.get("year_end") or 2025)
-        
-        # Use improved title if available
-        title = pearl.get("improved_title") or pearl.get("snippet", content[:60])
-        
-        pearl_type = pearl.get("category", "Insight")
-        is_critical = 1 if pearl.get("quality", {}).get("is_gotcha", False) else 0
-        source_doc = pearl.get("source_doc", "")
-        
-        # Generate vehicle_key
-        vehicle_key = f"{make.lower()}|{model.lower()}|{year_start}|{year_end}"
-        
-        sql = f"""INSERT INTO vehicle_pearls (vehicle_key, make, model, year_start, year_end, pearl_title, pearl_content, pearl_type, is_critical, source_doc, display_order)
-VALUES ({escape(vehicle_key)}, {escape(make)}, {escape(model)}, {year_start}, {year_end}, {escape(title[:200])}, {escape(content)}, {escape(pearl_type)}, {is_critical}, {escape(source_doc)}, 0);"""
-        
-        sql_lines.append(sql)
+    return {
+        "vehicle_key": f"{make.lower()}|{model.lower()}|{year_start}|{year_end}",
+        "make": make,
+        "model": model,
+        "year_start": year_start,
+        "year_end": year_end,
+        "pearl_title": title[:200],
+        "pearl_content": content,
+        "pearl_type": pearl.get("category", "Insight"),
+        "is_critical": 1 if pearl.get("quality", {}).get("is_gotcha", False) else 0,
+        "source_doc": pearl.get("source_doc", ""),
+        "display_order": 0,
+    }
+
+
+def generate_sql_migration(pearls: Iterable[dict], output_path: Path, total: int, full: bool = False):
+    """
+    Generate SQL to update vehicle_pearls with quality fixes.
     
-    with open(output_path, 'w') as f:
-        f.write('\n'.join(sql_lines))
+    Only pearls that changed since the last applied migration are emitted
+    (every pearl with full=True, as INSERT OR REPLACE). Only keys this
+    generator produced before are ever deleted, so rows other generators
+    keep in vehicle_pearls are left alone.
+    """
+    planner = MigrationPlanner("quality_phase1_pearls", "vehicle_pearls", PEARL_KEY_COLUMNS, full=full)
+    header = [
+        "-- Pearl Quality Phase 1: Dedup and Year Fixes",
+        f"-- Pearls: {total}",
+    ]
+    planner.write((vehicle_pearl_row(p) for p in pearls), output_path, header=header)
     
-    print(f"Generated migration: {output_path}")
+    print(f"Generated migration: {output_path} ({planner.summary()})")
 
 
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Pearl Quality Phase 1')
-    parser.add_argument('--input', '-i', default='data/llm_enhanced_pearls.json')
-    parser.add_argument('--output', '-o', default='data/quality_phase1_pearls.json')
+    parser.add_argument('--input', '-i', default='data/pearls',
+                        help='Input pearls: pearl store directory, JSONL file or JSON export')
+    parser.add_argument('--output', '-o', default='data/pearls',
+                        help='Output pearl store (the input store itself by default) or a .json export')
     parser.add_argument('--migration', '-m', default='data/migrations/quality_phase1_pearls.sql')
+    parser.add_argument('--full', action='store_true',
+                        help='Re-emit every pearl instead of only the changed ones')
     args = parser.parse_args()
     
     input_path = Path(args.input)
@@ -258,10 +271,10 @@ def main():
         print(f"Error: {input_path} not found")
         return
     
-    pearls = process_pearls(input_path, output_path)
+    total = process_pearls(input_path, output_path)
     
     migration_path.parent.mkdir(exist_ok=True)
-    generate_sql_migration(pearls, migration_path)
+    generate_sql_migration(iter_pearls(output_path), migration_path, total, full=args.full)
     
     print("\n" + "="*50)
     print("To upload to D1:")
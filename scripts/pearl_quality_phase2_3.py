@@ -13,6 +13,8 @@ import time
 from pathlib import Path
 from typing import Optional
 
+from pearl_store import iter_pearls
+
 # LLM Config
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
 MODEL = "gemini-2.0-flash"
@@ -170,10 +172,7 @@ def process_phase2_3(input_path: Path, output_path: Path, use_llm: bool = True):
     """Main processing for Phase 2-3."""
     print(f"Loading pearls from {input_path}...")
     
-    with open(input_path, 'r') as f:
-        data = json.load(f)
-    
-    pearls = data.get("pearls", [])
+    pearls = list(iter_pearls(input_path))
     print(f"Loaded {len(pearls)} pearls")
     
     # Phase 2: LLM Title Generation
@@ -268,7 +267,8 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Pearl Quality Phase 2-3')
-    parser.add_argument('--input', '-i', default='data/quality_phase1_pearls.json')
+    parser.add_argument('--input', '-i', default='data/pearls',
+                        help='Input pearls: pearl store directory, JSONL file or JSON export')
     parser.add_argument('--output', '-o', default='data/quality_phase2_3_pearls.json')
     parser.add_argument('--migration', '-m', default='data/migrations/quality_phase2_3_pearls.sql')
     parser.add_argument('--no-llm', action='store_true', help='Skip LLM, use heuristic only')
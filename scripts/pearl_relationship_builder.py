@@ -7,36 +7,39 @@ Generates relationships between pearls based on:
 3. Source document (same source_doc)
 """
 
-import json
 import os
 from collections import defaultdict
 from pathlib import Path
 
+from entity_scanner import KeywordScanner
+from d1_mirror import iter_rows
+
 EXPORT_PATH = "/Users/jeremysamuels/Documents/study-dashboard/data/all_refined_pearls_export.json"
 OUTPUT_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/migrations/relationships")
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Fields build_relationships() groups on; the pearl text itself is never needed
+RELATIONSHIP_FIELDS = ('id', 'make', 'model', 'source_doc', 'category', 'duplicate_of')
+
 def load_pearls():
-    with open(EXPORT_PATH, 'r') as f:
-        return json.load(f)
+    """Stream the mirror (or the export), keeping only the fields relationships are built from."""
+    return [{field: p[field] for field in RELATIONSHIP_FIELDS if field in p}
+            for p in iter_rows('refined_pearls', fallback_export=EXPORT_PATH)]
+
+# Common tool keywords
+TOOL_KEYWORDS = ['autel', 'xhorse', 'lonsdor', 'obdstar', 'xtool', 'topdon', 'smart pro', 'autopropad', 'im508', 'im608']
+# Common chip keywords
+CHIP_KEYWORDS = ['4d', '4c', '8a', 'dsc', 'hitag', 'megamos', 'ncf', 'pcf', 'texas instruments', 'id46', 'id48']
+# Common procedure keywords
+PROCEDURE_KEYWORDS = ['akl', 'add key', 'eeprom', 'obd', 'pin code', 'isn', 'sync', 'reflash']
+
+KEYWORD_SCANNER = KeywordScanner(TOOL_KEYWORDS + CHIP_KEYWORDS + PROCEDURE_KEYWORDS)
 
 def extract_keywords(content):
     """Extract key terms from content"""
     if not content:
         return set()
-    # Common tool keywords
-    tools = ['autel', 'xhorse', 'lonsdor', 'obdstar', 'xtool', 'topdon', 'smart pro', 'autopropad', 'im508', 'im608']
-    # Common chip keywords  
-    chips = ['4d', '4c', '8a', 'dsc', 'hitag', 'megamos', 'ncf', 'pcf', 'texas instruments', 'id46', 'id48']
-    # Common procedure keywords
-    procs = ['akl', 'add key', 'eeprom', 'obd', 'pin code', 'isn', 'sync', 'reflash']
-    
-    content_lower = content.lower()
-    found = set()
-    for kw in tools + chips + procs:
-        if kw in content_lower:
-            found.add(kw)
-    return found
+    return KEYWORD_SCANNER.found(content)
 
 def build_relationships(pearls):
     """Build relationship graph"""
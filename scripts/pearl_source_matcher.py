@@ -4,8 +4,8 @@ Comprehensive Pearl Content Matcher
 Matches all pearls against source .txt files to find and fix formatting issues.
 
 Strategy:
-1. Load all source .txt files with their original formatting
-2. For each pearl, extract unique phrases and search for them in sources
+1. Load the shared source index (source_index.py) over all dossier .txt files
+2. For each pearl, extract unique phrases and look them up in the index
 3. When found, compare the pearl content vs source content
 4. Detect formatting degradation (lost line breaks, concatenated columns)
 5. Generate SQL corrections with properly formatted content
@@ -17,36 +17,14 @@ import os
 from pathlib import Path
 from difflib import SequenceMatcher
 
+from source_index import SourceIndex
+
 # Paths
 DATA_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data")
-SOURCE_DIRS = [
-    DATA_DIR / "fcc_research_docs",
-    DATA_DIR / "exports",
-    DATA_DIR / "doc_notes",
-]
 EXPORT_FILE = DATA_DIR / "all_refined_pearls_export.json"
 OUTPUT_REPORT = DATA_DIR / "pearl_match_report.json"
 OUTPUT_CORRECTIONS = DATA_DIR / "pearl_corrections.sql"
 
-def load_sources():
-    """Load all .txt source files with their formatting preserved."""
-    sources = {}
-    for source_dir in SOURCE_DIRS:
-        if not source_dir.exists():
-            continue
-        for txt_file in source_dir.glob("*.txt"):
-            try:
-                with open(txt_file, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    sources[txt_file.name] = {
-                        'path': str(txt_file),
-                        'content': content,
-                        'lines': content.split('\n')
-                    }
-            except Exception as e:
-                print(f"Error reading {txt_file}: {e}")
-    return sources
-
 def load_pearls():
     """Load exported pearls from D1."""
     with open(EXPORT_FILE, 'r', encoding='utf-8') as f:
@@ -82,28 +60,27 @@ def extract_key_phrases(content, min_len=20, max_len=50):
     
     return phrases
 
-def find_in_sources(phrases, sources):
+def find_in_sources(phrases, index):
     """Find matching source file for given phrases."""
     for phrase in phrases:
-        # Escape regex special chars
-        pattern = re.escape(phrase)
-        
-        for filename, source in sources.items():
-            if re.search(pattern, source['content'], re.IGNORECASE):
-                # Find exact position
-                match = re.search(pattern, source['content'], re.IGNORECASE)
-                if match:
-                    # Get surrounding context (500 chars before and after)
-                    start = max(0, match.start() - 200)
-                    end = min(len(source['content']), match.end() + 500)
-                    context = source['content'][start:end]
-                    
-                    return {
-                        'filename': filename,
-                        'path': source['path'],
-                        'match_position': match.start(),
-                        'context': context
-                    }
+        # Index narrows to files sharing the phrase's word grams, then regex confirms
+        found = index.find_phrase(phrase)
+        if found:
+            file_id, match = found
+            source = index.files[file_id]
+            content = index.text(file_id)
+            
+            # Get surrounding context (500 chars before and after)
+            start = max(0, match.start() - 200)
+            end = min(len(content), match.end() + 500)
+            context = content[start:end]
+            
+            return {
+                'filename': source.name,
+                'path': source.path,
+                'match_position': match.start(),
+                'context': context
+            }
     
     return None
 
@@ -192,9 +169,8 @@ def reconstruct_bdc_table(content):
     return '\n'.join(table_lines)
 
 def main():
-    print("Loading sources...")
-    sources = load_sources()
-    print(f"Loaded {len(sources)} source files")
+    print("Loading source index...")
+    index = SourceIndex.load_or_build()
     
     print("Loading pearls...")
     pearls = load_pearls()
@@ -218,7 +194,7 @@ def main():
             continue
         
         # Find in sources
-        match = find_in_sources(phrases, sources)
+        match = find_in_sources(phrases, index)
         
         if match:
             matches.append({
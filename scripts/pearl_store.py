@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Streaming Pearl Store
+
+Append-only JSONL segments plus a key -> offset index, so pearl passes read
+one pearl at a time instead of json.load-ing the whole export, and chained
+passes append only the pearls they changed instead of writing another
+pretty-printed copy of the corpus.
+
+Layout (one directory per store):
+    <store>/segment-00001.jsonl   one {"key": ..., "pearl": {...}} or {"key": ..., "deleted": true} per line
+    <store>/index.json            key -> [segment, offset] of each live pearl, plus the segment sizes it covers
+    <store>/meta.json             summary left by the last pass that wrote the store
+
+A put or patch appends the new version and repoints the key; the old line
+stays in its segment until compact() rewrites the live pearls. Segment data
+is the source of truth: an index that is missing or behind the segments is
+brought up to date from them on open, so an interrupted pass loses only the
+lines it never finished appending.
+
+Pearls are keyed by their "id", or by a hash of their normalized text when
+they have none (the same hash enhance_pearls_llm deduplicates on).
+
+Usage:
+    from pearl_store import PearlStore, PearlWriter, iter_pearls
+
+    # Any pearl source: a store directory, a .jsonl file or a legacy JSON export
+    for pearl in iter_pearls("data/final_curated_pearls.json"):
+        ...
+
+    with PearlStore("data/pearls") as store:
+        for pearl in store.scan(category="procedure"):
+            ...
+        store.patch(key, {"improved_title": title})
+
+    # Output of a pass: unchanged pearls are not rewritten, missing ones are dropped.
+    # A .json path writes the legacy export instead (JsonExportWriter).
+    writer = PearlWriter("data/pearls")
+    for pearl in pearls:
+        writer.write(pearl)
+    writer.close(summary={"total": writer.count})
+
+    python3 scripts/pearl_store.py data/pearls              # summary
+    python3 scripts/pearl_store.py data/pearls --compact     # drop superseded lines
+    python3 scripts/pearl_store.py data/pearls --import data/llm_enhanced_pearls.json
+    python3 scripts/pearl_store.py data/pearls --export data/pearls.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, Optional, Tuple, Union
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+# wrangler d1 execute --json output: [{"results": [...], "success": true, "meta": {...}}]
+_D1_EXPORT = re.compile(rb'^\[\s*\{\s*"results"\s*:')
+
+
+def pearl_key(pearl: dict) -> str:
+    """The pearl's id, or a hash of its normalized text for pearls without one."""
+    if pearl.get('id'):
+        return str(pearl['id'])
+    text = pearl.get('paragraph') or pearl.get('content') or pearl.get('pearl_content') or ''
+    normalized = ' '.join(text.lower().split())
+    return hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+def _write_json(path: Path, data: Any) -> None:
+    """Write via a temp file so an interrupted run never leaves a truncated file."""
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class PearlStore:
+    """Append-only JSONL pearl store with a key -> (segment, offset) index."""
+
+    INDEX_FILE = "index.json"
+    META_FILE = "meta.json"
+
+    def __init__(self, directory: Union[str, Path], key: Callable[[dict], str] = pearl_key,
+                 readonly: bool = False, segment_bytes: int = SEGMENT_BYTES):
+        self.directory = Path(directory)
+        self.key = key
+        self.readonly = readonly
+        self.segment_bytes = segment_bytes
+        self.written = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._sizes: Dict[int, int] = {}
+        self._readers: Dict[int, IO[bytes]] = {}
+        self._writer: Optional[IO[bytes]] = None
+        self._writer_segment = 0
+        self._dirty = False
+        if readonly:
+            if not self.directory.is_dir():
+                raise FileNotFoundError(f"No pearl store at {self.directory}")
+        else:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    # ------------------------------------------------------------------
+    # Segments and index
+    # ------------------------------------------------------------------
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"segment-{segment:05d}.jsonl"
+
+    def _segments(self) -> list:
+        return sorted(int(p.stem.split('-')[1]) for p in self.directory.glob("segment-*.jsonl"))
+
+    def _load_index(self) -> None:
+        index_path = self.directory / self.INDEX_FILE
+        if index_path.exists():
+            with open(index_path, 'r') as f:
+                data = json.load(f)
+            self._index = {key: (loc[0], loc[1]) for key, loc in data['keys'].items()}
+            self._sizes = {int(segment): size for segment, size in data['segments'].items()}
+
+        segments = self._segments()
+        on_disk = {segment: self._segment_path(segment).stat().st_size for segment in segments}
+        stale = any(segment not in on_disk or on_disk[segment] < size
+                    for segment, size in self._sizes.items())
+        if stale:
+            # Segments were rewritten or removed behind the index: start over from the data
+            self._index, self._sizes = {}, {}
+        for segment in segments:
+            covered = self._sizes.get(segment, 0)
+            if on_disk[segment] > covered:
+                self._replay(segment, covered)
+        self._dirty = stale or any(on_disk[s] > self._sizes.get(s, 0) for s in segments)
+
+    def _replay(self, segment: int, start: int) -> None:
+        """Apply segment lines from byte offset start onwards to the index."""
+        offset = start
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # partial line from an interrupted write
+                entry = json.loads(line)
+                if entry.get('deleted'):
+                    self._index.pop(entry['key'], None)
+                else:
+                    self._index[entry['key']] = (segment, offset)
+                offset += len(line)
+        if not self.readonly and offset < self._segment_path(segment).stat().st_size:
+            os.truncate(self._segment_path(segment), offset)
+        self._sizes[segment] = offset
+
+    def _append(self, entry: dict) -> Tuple[int, int]:
+        if self.readonly:
+            raise PermissionError(f"Pearl store opened read-only: {self.directory}")
+        line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+        if self._writer is None:
+            self._writer_segment = max(self._sizes, default=1)
+        if self._sizes.get(self._writer_segment, 0) >= self.segment_bytes:
+            self._close_writer()
+            self._writer_segment += 1
+        if self._writer is None:
+            self._writer = open(self._segment_path(self._writer_segment), 'ab')
+        segment = self._writer_segment
+        offset = self._sizes.get(segment, 0)
+        self._writer.write(line)
+        self._sizes[segment] = offset + len(line)
+        self._dirty = True
+        return segment, offset
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _read(self, loc: Tuple[int, int]) -> dict:
+        segment, offset = loc
+        if self._writer is not None and segment == self._writer_segment:
+            self._writer.flush()
+        reader = self._readers.get(segment)
+        if reader is None:
+            reader = self._readers[segment] = open(self._segment_path(segment), 'rb')
+        reader.seek(offset)
+        return json.loads(reader.readline())['pearl']
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self) -> list:
+        """Keys of the live pearls, in the order they were first added."""
+        return list(self._index)
+
+    def get(self, key: str, default: Optional[dict] = None) -> Optional[dict]:
+        loc = self._index.get(key)
+        return default if loc is None else self._read(loc)
+
+    def items(self) -> Iterator[Tuple[str, dict]]:
+        """(key, pearl) for every live pearl, one at a time, in the order they were first added."""
+        for key in list(self._index):
+            loc = self._index.get(key)
+            if loc is not None:
+                yield key, self._read(loc)
+
+    def __iter__(self) -> Iterator[dict]:
+        for _, pearl in self.items():
+            yield pearl
+
+    def scan(self, predicate: Optional[Callable[[dict], bool]] = None, **fields: Any) -> Iterator[dict]:
+        """Pearls matching the predicate and/or equal to every given field value."""
+        for pearl in self:
+            if predicate is not None and not predicate(pearl):
+                continue
+            if all(pearl.get(name) == value for name, value in fields.items()):
+                yield pearl
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def put(self, pearl: dict, key: Optional[str] = None) -> str:
+        """Store a pearl under its key. Pearls identical to the stored version are not rewritten."""
+        key = key or self.key(pearl)
+        if key in self._index and self.get(key) == pearl:
+            self.unchanged += 1
+            return key
+        self._index[key] = self._append({'key': key, 'pearl': pearl})
+        self.written += 1
+        return key
+
+    def extend(self, pearls: Iterable[dict]) -> int:
+        count = 0
+        for pearl in pearls:
+            self.put(pearl)
+            count += 1
+        return count
+
+    def patch(self, key: str, changes: Dict[str, Any]) -> bool:
+        """Merge changes into the stored pearl's fields. False if the key is unknown or nothing changed."""
+        pearl = self.get(key)
+        if pearl is None:
+            return False
+        updated = {**pearl, **changes}
+        if updated == pearl:
+            self.unchanged += 1
+            return False
+        self._index[key] = self._append({'key': key, 'pearl': updated})
+        self.written += 1
+        return True
+
+    def delete(self, key: str) -> bool:
+        if key not in self._index:
+            return False
+        self._append({'key': key, 'deleted': True})
+        del self._index[key]
+        self.deleted += 1
+        return True
+
+    def meta(self) -> dict:
+        meta_path = self.directory / self.META_FILE
+        if not meta_path.exists():
+            return {}
+        with open(meta_path, 'r') as f:
+            return json.load(f)
+
+    def set_meta(self, meta: dict) -> None:
+        _write_json(self.directory / self.META_FILE, meta)
+
+    def compact(self) -> Tuple[int, int]:
+        """
+        Rewrite the live pearls into fresh segments and remove the old ones.
+
+        Returns:
+            (bytes before, bytes after)
+        """
+        self.flush()
+        old_segments = sorted(self._sizes)
+        before = sum(self._sizes.values())
+        self._close_writer()
+        self._writer_segment = max(old_segments, default=0) + 1
+        self._writer = open(self._segment_path(self._writer_segment), 'ab')
+        for key in list(self._index):
+            self._index[key] = self._append({'key': key, 'pearl': self._read(self._index[key])})
+        self.flush()
+        for reader in self._readers.values():
+            reader.close()
+        self._readers = {}
+        for segment in old_segments:
+            if segment >= self._writer_segment:
+                continue
+            self._sizes.pop(segment, None)
+            self._segment_path(segment).unlink()
+        self._dirty = True
+        self.flush()
+        return before, sum(self._sizes.values())
+
+    def disk_usage(self) -> Tuple[int, int]:
+        """(segment count, total segment bytes), superseded lines included."""
+        segments = self._segments()
+        return len(segments), sum(self._segment_path(s).stat().st_size for s in segments)
+
+    def flush(self) -> None:
+        """Flush appended lines and write the index."""
+        if self._writer is not None:
+            self._writer.flush()
+        if self.readonly or not self._dirty:
+            return
+        _write_json(self.directory / self.INDEX_FILE, {
+            'segments': {str(segment): size for segment, size in sorted(self._sizes.items())},
+            'keys': {key: list(loc) for key, loc in self._index.items()},
+        })
+        self._dirty = False
+
+    def close(self) -> None:
+        self.flush()
+        self._close_writer()
+        for reader in self._readers.values():
+            reader.close()
+        self._readers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_json_items(path: Union[str, Path], field: str = 'pearls') -> Iterator[Any]:
+    """
+    Records of a JSON export, one at a time.
+
+    Handles a bare list, {field: [...]} and wrangler's [{"results": [...]}]
+    output. Streams with ijson when it is installed, otherwise falls back to
+    json.load.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(4096).lstrip()
+        f.seek(0)
+        if _D1_EXPORT.match(head):
+            prefix = 'item.results.item'
+        elif head.startswith(b'['):
+            prefix = 'item'
+        else:
+            prefix = f'{field}.item'
+        if ijson is not None:
+            yield from ijson.items(f, prefix, use_float=True)
+            return
+        data = json.load(f)
+
+    if prefix == 'item.results.item':
+        for part in data:
+            yield from part.get('results', [])
+    elif prefix == 'item':
+        yield from data
+    else:
+        yield from data.get(field, [])
+
+
+def read_json_field(path: Union[str, Path], name: str, default: Any = None) -> Any:
+    """One top-level field of a JSON export, without loading the rest when ijson is installed."""
+    with open(path, 'rb') as f:
+        if ijson is not None:
+            return next(ijson.items(f, name, use_float=True), default)
+        data = json.load(f)
+    return data.get(name, default) if isinstance(data, dict) else default
+
+
+def iter_pearls(path: Union[str, Path], field: str = 'pearls') -> Iterator[dict]:
+    """Pearls from a store directory, a .jsonl file or a JSON export, one at a time."""
+    path = Path(path)
+    if path.is_dir():
+        with PearlStore(path, readonly=True) as store:
+            yield from store
+    elif path.suffix == '.jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from iter_json_items(path, field)
+
+
+class JsonExportWriter:
+    """
+    Streams a legacy JSON export, {field: [...], <summary>}, one record per
+    line instead of building the whole document and dumping it with indent=2.
+    The summary fields go after the list, since they are usually counts
+    known only once every record is written.
+    """
+
+    def __init__(self, path: Union[str, Path], field: str = 'pearls'):
+        self.path = Path(path)
+        self.count = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+        self._file.write('{' + json.dumps(field) + ': [')
+
+    def write(self, record: Any) -> None:
+        self._file.write(',\n' if self.count else '\n')
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self.count += 1
+
+    def close(self, summary: Optional[dict] = None) -> None:
+        self._file.write('\n]')
+        for name, value in (summary or {}).items():
+            self._file.write(f',\n{json.dumps(name)}: {json.dumps(value, ensure_ascii=False)}')
+        self._file.write('}\n')
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+
+class PearlWriter:
+    """
+    Output of a pearl pass: a store directory, or a legacy .json export.
+
+    Into a store, pearls identical to the stored version are skipped and, on
+    close, pearls this pass did not write are deleted, so a re-run appends
+    only what changed. The pass may read from the same store it writes to.
+    A .json path gets the old {"pearls": [...], <summary>} layout through
+    JsonExportWriter.
+    """
+
+    def __init__(self, path: Union[str, Path], key: Callable[[dict], str] = pearl_key, sync: bool = True):
+        self.path = Path(path)
+        self.count = 0
+        self.store = None
+        self.export = None
+        if self.path.suffix == '.json':
+            self.export = JsonExportWriter(self.path)
+        else:
+            self.store = PearlStore(self.path, key=key)
+            self._seen = set() if sync else None
+
+    def write(self, pearl: dict) -> None:
+        if self.store is not None:
+            key = self.store.put(pearl)
+            if self._seen is not None:
+                self._seen.add(key)
+        else:
+            self.export.write(pearl)
+        self.count += 1
+
+    def close(self, summary: Optional[dict] = None) -> None:
+        if self.store is None:
+            self.export.close(summary)
+            return
+        if self._seen is not None:
+            for key in self.store.keys():
+                if key not in self._seen:
+                    self.store.delete(key)
+        if summary is not None:
+            self.store.set_meta(summary)
+        self.store.close()
+
+    def describe(self) -> str:
+        """What the pass wrote, for its closing log line."""
+        if self.store is None:
+            return f"{self.count} pearls to {self.path}"
+        return (f"{self.count} pearls to {self.path} ({self.store.written} written, "
+                f"{self.store.unchanged} unchanged, {self.store.deleted} removed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and maintain a pearl store')
+    parser.add_argument('store', help='Store directory')
+    parser.add_argument('--import', dest='import_path', help='Load pearls from a JSON/JSONL export or another store')
+    parser.add_argument('--export', help='Write the live pearls to a .json or .jsonl file')
+    parser.add_argument('--compact', action='store_true', help='Rewrite live pearls and drop superseded lines')
+    args = parser.parse_args()
+
+    with PearlStore(args.store) as store:
+        if args.import_path:
+            count = store.extend(iter_pearls(args.import_path))
+            print(f"Imported {count} pearls ({store.written} written, {store.unchanged} unchanged)")
+        if args.compact:
+            before, after = store.compact()
+            print(f"Compacted {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+        if args.export:
+            export_path = Path(args.export)
+            if export_path.suffix == '.jsonl':
+                with open(export_path, 'w', encoding='utf-8') as f:
+                    for pearl in store:
+                        f.write(json.dumps(pearl, ensure_ascii=False) + '\n')
+            else:
+                writer = PearlWriter(export_path)
+                for pearl in store:
+                    writer.write(pearl)
+                writer.close(summary={'total': writer.count})
+            print(f"Exported {len(store)} pearls to {export_path}")
+
+        segments, size = store.disk_usage()
+        print(f"{store.directory}: {len(store)} pearls, {segments} segments, {size / 1e6:.1f} MB")
+        for name, value in store.meta().items():
+            print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Content-Hash Pipeline Cache
+
+On-disk cache of per-document pass outputs keyed by the document's content
+hash plus a fingerprint of everything else that shapes the output (config,
+code version). Re-runs load unchanged documents from the cache instead of
+re-parsing them. Which rows changed since the last migration is tracked by
+migration_planner.py.
+
+Layout (one directory per pipeline):
+    <cache_dir>/<content_hash>-<fingerprint>.json   pass outputs for one document
+
+Usage:
+    cache = PipelineCache(CACHE_DIR, fingerprint(config, code_version(__file__)))
+    entries = cache.get(path)
+    if entries is None:
+        entries = process(path)
+        cache.put(path, entries)
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+from dossier_processor import file_hash
+
+
+def fingerprint(*parts: Any) -> str:
+    """Short stable hash of JSON-serializable parts (config dicts, versions)."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode()).hexdigest()[:12]
+
+
+def code_version(*paths: str) -> str:
+    """Hash of the given source files, so editing the pipeline invalidates its cache."""
+    return fingerprint(*(file_hash(p) for p in paths))
+
+
+def row_hash(row: dict) -> str:
+    """Content hash of one output row (used by migration snapshots)."""
+    return fingerprint(row)
+
+
+def _write_json(path: Path, data: Any) -> None:
+    """Write via a temp file so an interrupted run never leaves a truncated entry."""
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class PipelineCache:
+    """Per-document pass-output cache."""
+
+    def __init__(self, cache_dir: Path, fingerprint: str, enabled: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.fingerprint = fingerprint
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._used = set()
+        if enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, path: Path) -> str:
+        return f"{file_hash(str(path))}-{self.fingerprint}"
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, path: Path) -> Optional[Any]:
+        """Cached output for the document, or None if it changed / was never processed."""
+        if not self.enabled:
+            self.misses += 1
+            return None
+        key = self.key(path)
+        self._used.add(key)
+        entry_path = self._entry_path(key)
+        if not entry_path.exists():
+            self.misses += 1
+            return None
+        try:
+            with open(entry_path, 'r') as f:
+                value = json.load(f)['value']
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, path: Path, value: Any) -> None:
+        if not self.enabled:
+            return
+        key = self.key(path)
+        self._used.add(key)
+        _write_json(self._entry_path(key), {'source': str(path), 'value': value})
+
+    def prune(self) -> int:
+        """Delete cache entries not touched this run (old versions of changed documents)."""
+        if not self.enabled:
+            return 0
+        removed = 0
+        for entry_path in self.cache_dir.glob("*.json"):
+            if entry_path.stem in self._used:
+                continue
+            entry_path.unlink()
+            removed += 1
+        return removed
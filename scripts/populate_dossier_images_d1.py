@@ -3,7 +3,7 @@
 Populate dossier_images in D1 from the enriched image manifest.
 
 Creates a SQL file with CREATE TABLE + INSERT statements,
-then runs it via wrangler d1 execute.
+then runs it through the batched D1 client.
 
 Table schema:
   dossier_images (
@@ -20,10 +20,10 @@ Table schema:
 """
 
 import json
-import os
-import subprocess
 from pathlib import Path
 
+from d1_client import connect
+
 BASE_DIR = Path(__file__).parent.parent
 MANIFEST_PATH = BASE_DIR / "gdrive_exports" / "image_manifest.json"
 SQL_OUTPUT = BASE_DIR / "scripts" / "dossier_images.sql"
@@ -119,30 +119,19 @@ CREATE TABLE dossier_images (
     print(f"✅ Generated SQL with {inserted} image rows → {SQL_OUTPUT}")
     print(f"   File size: {len(sql_content):,} bytes")
     
-    # Execute via wrangler
+    # Execute via the batched D1 client (DDL first, then the inserts, in order)
     print(f"\n☁️  Executing SQL against D1 ({D1_DB_NAME})...")
-    try:
-        result = subprocess.run(
-            ["npx", "wrangler", "d1", "execute", D1_DB_NAME, "--file", str(SQL_OUTPUT), "--remote"],
-            cwd=str(BASE_DIR),
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        if result.returncode == 0:
-            print("✅ D1 table populated successfully!")
-            print(result.stdout[-500:] if len(result.stdout) > 500 else result.stdout)
-        else:
-            print(f"❌ D1 execution failed (exit code {result.returncode})")
-            print(f"stderr: {result.stderr[-500:]}")
-            print(f"stdout: {result.stdout[-500:]}")
-    except subprocess.TimeoutExpired:
-        print("⏰ D1 execution timed out (>120s). Try running manually:")
+    d1 = connect(database=D1_DB_NAME)
+    _, failures = d1.execute_many(sql_lines)
+    if not failures:
+        print(f"✅ D1 table populated successfully! ({d1.round_trips} round trips)")
+    else:
+        print(f"❌ {len(failures)}/{len(sql_lines)} statements failed")
+        for sql, error in failures[:5]:
+            print(f"   {sql.strip()[:80]}")
+            print(f"     {error[-300:]}")
+        print("   Re-run, or apply the file manually:")
         print(f"   npx wrangler d1 execute {D1_DB_NAME} --file scripts/dossier_images.sql --remote")
-    except FileNotFoundError:
-        print("⚠️  wrangler not found. Run manually:")
-        print(f"   npx wrangler d1 execute {D1_DB_NAME} --file scripts/dossier_images.sql --remote")
-
 
 if __name__ == '__main__':
     main()
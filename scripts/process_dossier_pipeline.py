@@ -6,21 +6,46 @@ Three-pass architecture for extracting pearls from Google Drive documents:
   Pass 1 (LLM/Heuristic): Initial extraction and parsing
   Pass 2 (Validation): Type taxonomy, critical flagging, cross-reference
   Pass 3 (Expansion): Multi-vehicle propagation for platform documents
+
+Pass outputs are cached per document (content hash + config + code version)
+in data/cache/dossier_pipeline, so unchanged exports are not re-parsed, and
+the generated SQL only inserts, updates or deletes pearls that changed since
+the last run (migration_planner.py). Use --full to re-emit every pearl and
+--no-cache to bypass the cache.
+
+Usage:
+    python3 scripts/process_dossier_pipeline.py [TARGET] [--full] [--no-cache] [--workers N]
+    python3 scripts/process_dossier_pipeline.py --self-test    # migration round-trip through SQLite
 """
 
 import os
 import json
 import re
-import sys
 from datetime import datetime
-from bs4 import BeautifulSoup
+from functools import partial
 from pathlib import Path
 
+from entity_scanner import KeywordScanner
+from parallel_runner import add_workers_argument, run_parallel
+from parsed_dossier import DEFAULT_PARSER, load_dossier
+from migration_planner import SNAPSHOT_DIR, MigrationPlanner, mark_applied
+from pipeline_cache import PipelineCache, code_version, fingerprint
+from text_patterns import first_year_range
+
 # Paths
 BASE_DIR = Path(__file__).parent.parent
 GDRIVE_EXPORTS = BASE_DIR / "gdrive_exports"
 CONFIG_PATH = BASE_DIR / "data" / "config" / "vehicle_overrides.json"
 OUTPUT_DIR = BASE_DIR / "data" / "migrations"
+CACHE_DIR = BASE_DIR / "data" / "cache" / "dossier_pipeline"
+
+# Sources whose edits change what process_document returns for the same document
+SCRIPT_DIR = Path(__file__).parent
+CODE_FILES = [Path(__file__), SCRIPT_DIR / "parsed_dossier.py", SCRIPT_DIR / "entity_scanner.py",
+              SCRIPT_DIR / "entity_vocabulary.json", SCRIPT_DIR / "text_patterns.py"]
+
+# Natural key of a vehicle_pearls row (matches deduplicate_entries)
+PEARL_KEY_COLUMNS = ('make', 'model', 'year_start', 'year_end', 'pearl_title')
 
 # Pearl type taxonomy (matches existing schema)
 PEARL_TYPES = {
@@ -57,6 +82,25 @@ CRITICAL_KEYWORDS = [
     'will fail', 'restricted', 'authorization required', 'server'
 ]
 
+# Pearl type detection keywords, checked in order (first type present wins)
+PEARL_TYPE_KEYWORDS = {
+    "FCC Registry": ["fcc", "registry", "fcc id", "remote frequency"],
+    "AKL Procedure": ["all keys lost", "akl", "no working key"],
+    "Add Key Procedure": ["add key", "spare key", "additional key"],
+    "Tool Alert": ["autel", "smart pro", "vvdi", "techstream", "ids", "ista"],
+    "Mechanical": ["mechanical", "blade", "keyway", "key blank", "bitting"],
+    "Electronic": ["electronic", "frequency", "transponder", "chip", "mhz"],
+    "Alert": ["alert", "warning", "risk", "forensic", "trap", "caution"],
+    "System Info": ["platform", "architecture", "module", "bdc", "fem", "cas"],
+    "Procedure": ["procedure", "programming", "bypass", "step", "process"],
+}
+
+# A tool mention is only a Tool Alert together with one of these
+TOOL_ALERT_ACTIONS = ["required", "recommend", "use", "needed"]
+
+PEARL_TYPE_SCANNER = KeywordScanner({**PEARL_TYPE_KEYWORDS, "tool_action": TOOL_ALERT_ACTIONS})
+CRITICAL_SCANNER = KeywordScanner(CRITICAL_KEYWORDS)
+
 
 def load_config():
     """Load vehicle overrides configuration."""
@@ -68,73 +112,33 @@ def load_config():
 
 def get_pearl_type(header_text: str, content_text: str = "") -> str:
     """Enhanced pearl type detection with full taxonomy."""
-    header = header_text.lower()
-    content = content_text.lower() if content_text else ""
-    combined = header + " " + content
-    
-    # FCC/Key Registry
-    if any(kw in combined for kw in ["fcc", "registry", "fcc id", "remote frequency"]):
-        return "FCC Registry"
-    # All Keys Lost
-    elif any(kw in combined for kw in ["all keys lost", "akl", "no working key"]):
-        return "AKL Procedure"
-    # Add Key
-    elif any(kw in combined for kw in ["add key", "spare key", "additional key"]):
-        return "Add Key Procedure"
-    # Tool-specific
-    elif any(tool in combined for tool in ["autel", "smart pro", "vvdi", "techstream", "ids", "ista"]):
-        if any(action in combined for action in ["required", "recommend", "use", "needed"]):
-            return "Tool Alert"
-    # Mechanical
-    elif any(kw in combined for kw in ["mechanical", "blade", "keyway", "key blank", "bitting"]):
-        return "Mechanical"
-    # Electronic
-    elif any(kw in combined for kw in ["electronic", "frequency", "transponder", "chip", "mhz"]):
-        return "Electronic"
-    # Alerts/Warnings
-    elif any(kw in combined for kw in ["alert", "warning", "risk", "forensic", "trap", "caution"]):
-        return "Alert"
-    # Platform/Architecture
-    elif any(kw in combined for kw in ["platform", "architecture", "module", "bdc", "fem", "cas"]):
-        return "System Info"
-    # Procedures
-    elif any(kw in combined for kw in ["procedure", "programming", "bypass", "step", "process"]):
-        return "Procedure"
+    found = set(PEARL_TYPE_SCANNER.labels(header_text + " " + (content_text or "")))
+    
+    for pearl_type in PEARL_TYPE_KEYWORDS:
+        if pearl_type in found:
+            # A tool mention without an action word ends the search
+            if pearl_type == "Tool Alert" and "tool_action" not in found:
+                break
+            return pearl_type
     
     return "System Info"
 
 
 def is_critical_content(title: str, content: str) -> bool:
     """Detect critical content requiring prominent display."""
-    combined = (title + " " + content).lower()
-    return any(kw in combined for kw in CRITICAL_KEYWORDS)
+    return bool(CRITICAL_SCANNER.found(title + " " + content))
 
 
 def clean_text(text: str) -> str:
-    """Clean text for SQL insertion."""
+    """Replace control characters; quoting is left to sql_writer.sql_literal."""
     text = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', text)
-    text = text.replace("'", "''")
-    text = text.replace("\\", "\\\\")
     return text.strip()
 
 
 def extract_year_range(text: str) -> tuple:
     """Extract year range from text."""
-    # Match patterns like "2019-Present", "2017-2023", "2016–Present"
-    range_match = re.search(r'(20\d\d)\s*[-–]\s*(20\d\d|Present)', text, re.IGNORECASE)
-    if range_match:
-        start = int(range_match.group(1))
-        end_str = range_match.group(2)
-        end = 2026 if end_str.lower() == 'present' else int(end_str)
-        return (start, end)
-    
-    # Single year
-    single_match = re.search(r'(20\d\d)', text)
-    if single_match:
-        year = int(single_match.group(1))
-        return (year, year)
-    
-    return (2015, 2026)  # Default
+    # Patterns like "2019-Present", "2017-2023", "2016–Present", "2020+", else a single year
+    return first_year_range(text) or (2015, 2026)  # Default
 
 
 # ============================================================
@@ -154,14 +158,11 @@ def pass1_extract_from_html(filepath: Path) -> dict:
         return None
     
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+        soup = load_dossier(filepath).root
     except Exception as e:
         print(f"  ❌ Error reading {filepath}: {e}")
         return None
     
-    soup = BeautifulSoup(content, 'html.parser')
-    
     # Extract document title
     title_tag = soup.find('h1')
     doc_title = title_tag.get_text().strip() if title_tag else filename
@@ -371,14 +372,8 @@ def pass3_expand_to_vehicles(validated: dict, config: dict) -> list:
 # SQL Generation
 # ============================================================
 
-def generate_sql(entries: list, output_file: Path) -> None:
-    """Generate SQL INSERT statements for vehicle_pearls table with deduplication."""
-    
-    if not entries:
-        print("  ⚠️  No entries to generate SQL for")
-        return
-    
-    # Deduplicate by unique (make, model, year_start, year_end, pearl_title)
+def deduplicate_entries(entries: list) -> tuple:
+    """Deduplicate by unique (make, model, year_start, year_end, pearl_title)."""
     seen = set()
     unique_entries = []
     duplicates_skipped = 0
@@ -398,47 +393,52 @@ def generate_sql(entries: list, output_file: Path) -> None:
         else:
             duplicates_skipped += 1
     
+    return unique_entries, duplicates_skipped
+
+
+def pearl_row(entry: dict) -> dict:
+    """vehicle_pearls columns for one pipeline entry."""
+    return {
+        'vehicle_key': entry.get('vehicle_key', ''),
+        'make': entry.get('make', ''),
+        'model': entry.get('model', ''),
+        'year_start': entry.get('year_start', 2015),
+        'year_end': entry.get('year_end', 2026),
+        'pearl_title': entry.get('pearl_title', ''),
+        'pearl_content': entry.get('pearl_content', ''),
+        'pearl_type': entry.get('pearl_type', 'System Info'),
+        'target_section': entry.get('target_section', 'troubleshooting'),
+        'is_critical': 1 if entry.get('is_critical') else 0,
+        'reference_url': entry.get('reference_url') or None,
+        'display_order': entry.get('display_order', 99),
+        'source_doc': entry.get('source_doc', ''),
+    }
+
+
+def generate_sql(entries: list, output_file: Path, full: bool = False, complete: bool = True,
+                 snapshot_dir: Path = SNAPSHOT_DIR):
+    """
+    Generate a vehicle_pearls migration containing only pearls that changed
+    since the last generated migration (all of them with full=True).
+
+    complete=False (a filtered run) never deletes pearls it did not see.
+    Returns the planner counts.
+    """
+    unique_entries, duplicates_skipped = deduplicate_entries(entries)
+    
     print(f"  🔄 Deduplicated: {duplicates_skipped} duplicates removed, {len(unique_entries)} unique pearls")
     
-    sql_lines = [
+    planner = MigrationPlanner("dossier_pipeline", "vehicle_pearls", PEARL_KEY_COLUMNS, full=full,
+                               insert_defaults={'created_at': "datetime('now')"}, snapshot_dir=snapshot_dir)
+    header = [
         "-- Auto-generated by process_dossier_pipeline.py",
         f"-- Generated: {datetime.now().isoformat()}",
-        f"-- Total unique pearls: {len(unique_entries)} (skipped {duplicates_skipped} duplicates)",
-        "",
-        "BEGIN TRANSACTION;",
-        ""
+        f"-- Unique pearls: {len(unique_entries)} (skipped {duplicates_skipped} duplicates)",
     ]
-    
-    for entry in unique_entries:
-        sql = f"""INSERT OR REPLACE INTO vehicle_pearls (
-    vehicle_key, make, model, year_start, year_end,
-    pearl_title, pearl_content, pearl_type, target_section,
-    is_critical, reference_url, display_order, source_doc, created_at
-) VALUES (
-    '{entry.get('vehicle_key', '')}',
-    '{entry.get('make', '')}',
-    '{entry.get('model', '')}',
-    {entry.get('year_start', 2015)},
-    {entry.get('year_end', 2026)},
-    '{entry.get('pearl_title', '')}',
-    '{entry.get('pearl_content', '')}',
-    '{entry.get('pearl_type', 'System Info')}',
-    '{entry.get('target_section', 'troubleshooting')}',
-    {1 if entry.get('is_critical') else 0},
-    {f"'{entry.get('reference_url')}'" if entry.get('reference_url') else 'NULL'},
-    {entry.get('display_order', 99)},
-    '{entry.get('source_doc', '')}',
-    datetime('now')
-);"""
-        sql_lines.append(sql)
-        sql_lines.append("")
-    
-    sql_lines.append("COMMIT;")
-    
-    with open(output_file, 'w') as f:
-        f.write("\n".join(sql_lines))
-    
-    print(f"  ✅ Generated SQL: {output_file}")
+    counts = planner.write((pearl_row(e) for e in unique_entries), output_file,
+                           header=header, complete=complete)
+    print(f"  🧮 {planner.summary()}")
+    return counts
 
 
 # ============================================================
@@ -468,8 +468,56 @@ def process_document(filepath: Path, config: dict) -> list:
     return entries
 
 
+def self_test() -> bool:
+    """Load a generated migration into SQLite and check the pearl text survives unchanged."""
+    import sqlite3
+    import tempfile
+
+    title = "Don't skip the C:\\path step"
+    content = "Quotes ' and '' and backslashes \\ and \\\\ must reach D1 as written.\tTabs become spaces."
+    extracted = {'make': 'Ford', 'model': 'F-150', 'doc_title': 'F-150', 'year_start': 2021, 'year_end': 2024,
+                 'source_doc': 'self_test.html', 'raw_pearls': [{'title': title, 'content': content}]}
+    entries = pass3_expand_to_vehicles(pass2_validate_and_classify(extracted), {})
+    checks = []
+
+    def check(name: str, ok: bool) -> None:
+        checks.append(ok)
+        print(f"  {'✓' if ok else '✗'} {name}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        migration = Path(tmp) / "pearls.sql"
+        generate_sql(entries, migration, snapshot_dir=Path(tmp))
+        conn = sqlite3.connect(":memory:")
+        conn.execute(f"CREATE TABLE vehicle_pearls (id INTEGER PRIMARY KEY, created_at TEXT, "
+                     f"{', '.join(pearl_row({}))})")
+        conn.executescript(migration.read_text())
+        stored = conn.execute("SELECT pearl_title, pearl_content FROM vehicle_pearls").fetchall()
+        check("migration loads one pearl", len(stored) == 1)
+        check("quotes and backslashes read back as written",
+              stored == [(title, content.replace("\t", " "))])
+        mark_applied("dossier_pipeline", tmp)
+        counts = generate_sql(entries, Path(tmp) / "rerun.sql", snapshot_dir=Path(tmp))
+        check("re-run against the applied snapshot emits nothing",
+              not counts['insert'] and not counts['update'] and not counts['delete'])
+    print(f"{sum(checks)}/{len(checks)} checks passed")
+    return all(checks)
+
+
 def main():
     """Main pipeline entry point."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Multi-pass vehicle dossier processing pipeline')
+    parser.add_argument('target', nargs='?', help='Only process files whose path contains this string')
+    parser.add_argument('--full', action='store_true', help='Emit SQL for every pearl, not just changed ones')
+    parser.add_argument('--no-cache', action='store_true', help='Re-run all passes without reading or writing the cache')
+    parser.add_argument('--self-test', action='store_true',
+                        help='Load a generated migration into SQLite and check the stored text')
+    add_workers_argument(parser)
+    args = parser.parse_args()
+    if args.self_test:
+        parser.exit(0 if self_test() else 1)
+    
     print("\n" + "="*60)
     print("🚀 Multi-Pass Vehicle Dossier Processing Pipeline")
     print("="*60)
@@ -479,32 +527,56 @@ def main():
     print(f"\n📁 Config loaded: {len(config.get('platform_mappings', {}))} make mappings")
     
     # Find documents to process
-    html_files = list(GDRIVE_EXPORTS.glob("**/*.html"))
+    html_files = sorted(GDRIVE_EXPORTS.glob("**/*.html"))
     print(f"📂 Found {len(html_files)} HTML files in {GDRIVE_EXPORTS}")
     
     # Process specific file if provided as argument
-    if len(sys.argv) > 1:
-        target = sys.argv[1]
-        html_files = [f for f in html_files if target in str(f)]
-        print(f"🎯 Filtering to files matching: {target}")
+    if args.target:
+        html_files = [f for f in html_files if args.target in str(f)]
+        print(f"🎯 Filtering to files matching: {args.target}")
+    
+    # Cache key covers document content, config, the code and vocabulary behind
+    # process_document, and the HTML parser backend
+    cache = PipelineCache(CACHE_DIR, fingerprint(config, code_version(*CODE_FILES), DEFAULT_PARSER),
+                          enabled=not args.no_cache)
     
-    all_entries = []
+    per_file = [cache.get(filepath) for filepath in html_files]
     
-    for filepath in html_files:
-        entries = process_document(filepath, config)
-        all_entries.extend(entries)
+    # Cache misses go through the process pool; results are merged back in file order
+    misses = [i for i, entries in enumerate(per_file) if entries is None]
+    results, failures = run_parallel(partial(process_document, config=config),
+                                     [html_files[i] for i in misses], workers=args.workers)
+    for i, entries in zip(misses, results):
+        if entries is not None:  # Failed documents stay uncached so the next run retries them
+            cache.put(html_files[i], entries)
+        per_file[i] = entries or []
     
-    # Generate SQL
+    all_entries = [entry for entries in per_file for entry in entries]
+    
+    print(f"\n💾 Cache: {cache.hits} unchanged, {cache.misses} processed, {len(failures)} failed")
+    
+    # Only emit pearls that changed since the last generated migration
     if all_entries:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = OUTPUT_DIR / f"import_pipeline_pearls_{timestamp}.sql"
-        generate_sql(all_entries, output_file)
+        # A filtered run only saw part of the corpus, and a failed document's
+        # pearls are unknown this run, so neither may delete what it did not see
+        counts = generate_sql(all_entries, output_file, full=args.full,
+                              complete=not args.target and not failures)
+        changed = counts['insert'] + counts['update'] + counts['delete']
         
-        print(f"\n✅ Pipeline complete!")
-        print(f"   Total pearls generated: {len(all_entries)}")
-        print(f"   Output file: {output_file}")
+        if changed:
+            print(f"\n✅ Pipeline complete!")
+            print(f"   Statements generated: {changed}")
+            print(f"   Output file: {output_file}")
+        else:
+            output_file.unlink()
+            print("\n✅ No changed pearls - nothing to emit")
     else:
         print("\n⚠️  No pearls generated")
+    
+    if not args.target:
+        cache.prune()
 
 
 if __name__ == "__main__":
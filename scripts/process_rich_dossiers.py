@@ -1,8 +1,9 @@
 import os
 import glob
-from bs4 import BeautifulSoup
 import re
 
+from parsed_dossier import load_dossier
+
 # Source directory
 HTML_DIR = "/Users/jeremysamuels/Documents/study-dashboard/gdrive_exports/html"
 # Output file
@@ -82,14 +83,11 @@ def process_file(filepath):
     
     # Try to find year in text
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+        soup = load_dossier(filepath).root
     except Exception as e:
         print(f"Error reading {filepath}: {e}")
         return {'pearls': [], 'source_doc': filename}
     
-    soup = BeautifulSoup(content, 'html.parser')
-    
     # Try to extract actual title from h1
     title_tag = soup.find('h1')
     doc_title = title_tag.get_text().strip() if title_tag else filename
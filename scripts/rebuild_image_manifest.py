@@ -8,7 +8,8 @@ import os
 import json
 import re
 from pathlib import Path
-from bs4 import BeautifulSoup
+
+from parsed_dossier import load_dossier
 
 PROJECT_ROOT = Path(__file__).parent.parent
 GDRIVE_EXPORTS = PROJECT_ROOT / "gdrive_exports"
@@ -20,9 +21,8 @@ def extract_context_from_html(html_path, image_filename):
         return ""
     
     try:
-        with open(html_path, 'r', encoding='utf-8') as f:
-            soup = BeautifulSoup(f, 'html.parser')
-            
+        soup = load_dossier(html_path).root
+        
         img_tags = soup.find_all('img')
         for img in img_tags:
             src = img.get('src', '')
@@ -7,46 +7,38 @@ This script:
 2. Fixes conflicting platform assignments (e.g., 2016 F30 should be FEM not CAS4+)
 3. Adds platform_insight text with transition notes, option codes, dealer constraints
 4. Generates SQL that can be reviewed before execution
+
+Run with D1_BACKEND=sqlite to reconcile against the local mirror
+(d1_mirror.py pull) and push the result with `d1_mirror.py push`.
 """
 
-import subprocess
-import json
 import sys
-import os
 
-API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+from coverage_index import CoverageIndex
+from d1_client import D1Error, connect
+from vehicle_identity import canonical_make, get_resolver, parse_model
+
+# Batched client: many statements per wrangler call instead of one process each
+D1 = connect()
 
-def run_d1(sql, as_json=True):
+def run_d1(sql):
     """Execute a D1 query and return results"""
-    args = ['npx', 'wrangler', 'd1', 'execute', 'locksmith-db', '--remote']
-    if as_json:
-        args.append('--json')
-    args.extend(['--command', sql])
-    
-    result = subprocess.run(args, cwd=API_DIR, capture_output=True, text=True, timeout=30)
-    if result.returncode != 0:
-        print(f"  ERROR: {result.stderr[-300:]}", file=sys.stderr)
+    try:
+        return D1.query(sql)
+    except D1Error as e:
+        print(f"  ERROR: {str(e)[-300:]}", file=sys.stderr)
         return None
-    
-    if as_json:
-        try:
-            data = json.loads(result.stdout)
-            return data[0]['results'] if data else []
-        except:
-            return []
-    return result.stdout
 
 def run_d1_write(sql):
     """Execute a D1 write command"""
-    result = subprocess.run(
-        ['npx', 'wrangler', 'd1', 'execute', 'locksmith-db', '--remote', '--command', sql],
-        cwd=API_DIR, capture_output=True, text=True, timeout=30
-    )
-    if result.returncode != 0:
-        err = result.stderr[-200:] if result.stderr else 'unknown'
-        print(f"  WRITE ERROR: {err}", file=sys.stderr)
-        return False
-    return True
+    return D1.execute(sql)
+
+def run_d1_many(statements):
+    """Execute many statements in batched round trips; rows per statement (None = failed)"""
+    results, failures = D1.execute_many(statements)
+    for sql, error in failures:
+        print(f"  ERROR: {error[-200:]}\n    in: {sql[:100]}", file=sys.stderr)
+    return results
 
 
 # ============================================================
@@ -92,17 +84,26 @@ def get_vpm_records():
 # ============================================================
 # Step 3: Get current VI records for European makes
 # ============================================================
-def get_vi_records(make):
-    """Get VI records for a make"""
-    records = run_d1(f"""
+def vi_records_sql(make):
+    """SQL for the VI records of a make"""
+    return f"""
         SELECT id, make, model, year_start, year_end, platform, architecture, 
                platform_insight, chassis_code, chip_type, fcc_ids
         FROM vehicle_intelligence 
         WHERE make = '{make}' AND vehicle_type = 'car'
         ORDER BY model, year_start
-    """)
+    """
+
+def get_vi_records(make):
+    """Get VI records for a make"""
+    records = run_d1(vi_records_sql(make))
     return records or []
 
+def get_vi_records_by_make(makes):
+    """Get VI records for several makes in one batched round trip"""
+    results = run_d1_many([vi_records_sql(make) for make in makes])
+    return {make: records or [] for make, records in zip(makes, results)}
+
 
 # ============================================================
 # Step 4: Build insight text from VPM data
@@ -137,39 +138,20 @@ def build_insight(vpm):
 # ============================================================
 # Step 5: Match VPM records to VI records
 # ============================================================
-def normalize_model(model):
-    """Normalize model name for matching"""
-    m = model.lower().strip()
-    # Remove common suffixes
-    for suffix in [' pre-fl', ' fl mixed', ' late', ' early', ' mixed', ' trans', 
-                   ' gen1', ' gen2', ' lci', ' facelift']:
-        m = m.replace(suffix, '')
-    return m.strip()
-
-def find_vi_matches(vpm_rec, vi_records):
-    """Find VI records that overlap with a VPM record"""
-    vpm_model = normalize_model(vpm_rec['model'])
-    vpm_start = vpm_rec['year_start']
-    vpm_end = vpm_rec['year_end']
-    
-    matches = []
-    for vi in vi_records:
-        vi_model = normalize_model(vi['model'])
-        # Check model match
-        if vpm_model not in vi_model and vi_model not in vpm_model:
-            # Try partial: "3 series" in "3-series"
-            vpm_clean = vpm_model.replace('-', ' ').replace('/', ' ')
-            vi_clean = vi_model.replace('-', ' ').replace('/', ' ')
-            if vpm_clean not in vi_clean and vi_clean not in vpm_clean:
-                continue
-        
-        # Check year overlap
-        vi_start = vi['year_start']
-        vi_end = vi['year_end']
-        if vi_start <= vpm_end and vi_end >= vpm_start:
-            matches.append(vi)
-    
-    return matches
+def normalize_model(model, make=''):
+    """Match key for a model: canonical model with generation/chassis/years split off, '-' and '/' read as spaces"""
+    return parse_model(canonical_make(make), model).key
+
+def build_vi_index(vi_records, make=''):
+    """Interval-tree index over one make's VI records (make is not re-checked)"""
+    return CoverageIndex((('', vi) for vi in vi_records),
+                         make_key=lambda _: '', model_key=lambda model: normalize_model(model, make))
+
+def find_vi_matches(vpm_rec, vi_index):
+    """Find VI records that overlap with a VPM record (accepts a VI list or build_vi_index result)"""
+    if not isinstance(vi_index, CoverageIndex):
+        vi_index = build_vi_index(vi_index, vpm_rec['make'])
+    return vi_index.coverage('', '', [vpm_rec['model']], vpm_rec['year_start'], vpm_rec['year_end'])
 
 
 # ============================================================
@@ -181,10 +163,15 @@ def generate_corrections(vpm_records, vi_records_by_make):
     inserts = []  # (sql, description)
     insights = [] # (sql, description)
     
+    # VI indexes keyed by make id, so VPM and VI spellings of a make meet on one key
+    resolver = get_resolver()
+    vi_index_by_make = {resolver.resolve(make): build_vi_index(recs, make)
+                        for make, recs in vi_records_by_make.items()}
+    empty_index = build_vi_index([])
+    
     for vpm in vpm_records:
         make = vpm['make']
-        vi_recs = vi_records_by_make.get(make, [])
-        matches = find_vi_matches(vpm, vi_recs)
+        matches = find_vi_matches(vpm, vi_index_by_make.get(resolver.resolve(make), empty_index))
         
         insight_text = build_insight(vpm)
         chassis = vpm.get('chassis_code', '')
@@ -421,11 +408,9 @@ def main():
     
     # Step 3: Get VI records for European makes
     euro_makes = ['BMW', 'Mercedes-Benz', 'Audi', 'Volkswagen', 'Volvo', 'Porsche']
-    vi_records_by_make = {}
+    vi_records_by_make = get_vi_records_by_make(euro_makes)
     for make in euro_makes:
-        vi_recs = get_vi_records(make)
-        vi_records_by_make[make] = vi_recs
-        print(f"  {make}: {len(vi_recs)} VI records")
+        print(f"  {make}: {len(vi_records_by_make[make])} VI records")
     
     # Step 4: Generate matching corrections
     print("\nGenerating corrections from VPM→VI matching...")
@@ -439,17 +424,16 @@ def main():
     print("\nGenerating gap fills for missing years...")
     gap_fills = get_known_gap_fills()
     
-    # Step 7: Check which gap fills are actually needed
-    needed_gaps = []
-    for make, model, ys, ye, plat, arch, chassis, insight in gap_fills:
-        # Check if VI already has coverage for this range
-        existing = run_d1(f"""
+    # Step 7: Check which gap fills are actually needed (one batched round trip)
+    coverage = run_d1_many([f"""
             SELECT COUNT(*) as cnt FROM vehicle_intelligence 
             WHERE make = '{make}' AND model = '{model}' 
             AND year_start <= {ys} AND year_end >= {ye}
-        """)
+        """ for make, model, ys, ye, *_ in gap_fills])
+    needed_gaps = []
+    for gap, existing in zip(gap_fills, coverage):
         if existing and existing[0]['cnt'] == 0:
-            needed_gaps.append((make, model, ys, ye, plat, arch, chassis, insight))
+            needed_gaps.append(gap)
     
     print(f"\n{'='*60}")
     print(f"RESULTS:")
@@ -458,41 +442,50 @@ def main():
     print(f"  Gap fills needed (missing years): {len(needed_gaps)}")
     print(f"{'='*60}")
     
-    # Execute known fixes first
-    print(f"\n--- Executing {len(known_fixes)} known fixes ---")
-    for sql, desc in known_fixes:
+    # Build every write up front so fixes, updates and gap fills go out in as
+    # few batched round trips as possible (in that order)
+    gap_writes = []
+    for make, model, ys, ye, plat, arch, chassis, insight in needed_gaps:
+        insight_escaped = insight.replace("'", "''")
+        arch_escaped = arch.replace("'", "''")
+        sql = (f"INSERT INTO vehicle_intelligence (make, model, year_start, year_end, "
+               f"platform, architecture, chassis_code, platform_insight, vehicle_type) VALUES "
+               f"('{make}', '{model}', {ys}, {ye}, "
+               f"'{plat}', '{arch_escaped}', '{chassis}', '{insight_escaped}', 'car')")
+        gap_writes.append((sql, f"GAP: {make} {model} {ys}-{ye} → {plat} ({chassis})"))
+    
+    writes = known_fixes + updates + gap_writes
+    trips_before = D1.round_trips
+    results = run_d1_many([sql for sql, _ in writes])
+    fix_results = results[:len(known_fixes)]
+    update_results = results[len(known_fixes):len(known_fixes) + len(updates)]
+    gap_results = results[len(known_fixes) + len(updates):]
+    print(f"\n{len(writes)} writes sent in {D1.round_trips - trips_before} D1 round trip(s)")
+    
+    print(f"\n--- Executed {len(known_fixes)} known fixes ---")
+    for (sql, desc), result in zip(known_fixes, fix_results):
         print(f"  {desc}")
-        ok = run_d1_write(sql)
-        if ok:
+        if result is not None:
             print(f"    ✓ Applied")
         else:
             print(f"    ✗ Failed")
     
-    # Execute VPM-matched updates
-    print(f"\n--- Executing {len(updates)} VPM→VI updates ---")
+    print(f"\n--- Executed {len(updates)} VPM→VI updates ---")
     for i, (sql, desc) in enumerate(updates):
         if i < 5:  # Show first 5
             print(f"  {desc}")
         elif i == 5:
             print(f"  ... and {len(updates) - 5} more")
-        ok = run_d1_write(sql)
-        if not ok:
+    for (sql, desc), result in zip(updates, update_results):
+        if result is None:
             print(f"    ✗ Failed: {desc[:60]}")
-    print(f"  ✓ {len(updates)} updates applied")
+    applied = sum(1 for result in update_results if result is not None)
+    print(f"  ✓ {applied} updates applied")
     
-    # Execute gap fills
-    print(f"\n--- Executing {len(needed_gaps)} gap fills ---")
-    for make, model, ys, ye, plat, arch, chassis, insight in needed_gaps:
-        insight_escaped = insight.replace("'", "''")
-        arch_escaped = arch.replace("'", "''")
-        sql = (f"INSERT INTO vehicle_intelligence (make, model, year_start, year_end, "
-               f"platform, architecture, chassis_code, platform_insight, vehicle_type) VALUES "
-               f"('{make}', '{model}', {ys}, {ye}, "
-               f"'{plat}', '{arch_escaped}', '{chassis}', '{insight_escaped}', 'car')")
-        
-        print(f"  GAP: {make} {model} {ys}-{ye} → {plat} ({chassis})")
-        ok = run_d1_write(sql)
-        if ok:
+    print(f"\n--- Executed {len(gap_writes)} gap fills ---")
+    for (sql, desc), result in zip(gap_writes, gap_results):
+        print(f"  {desc}")
+        if result is not None:
             print(f"    ✓ Created")
         else:
             print(f"    ✗ Failed")
@@ -502,11 +495,20 @@ def main():
     print("VERIFICATION")
     print(f"{'='*60}")
     
-    total = run_d1("SELECT COUNT(*) as cnt FROM vehicle_intelligence WHERE vehicle_type = 'car'")
-    with_platform = run_d1("SELECT COUNT(*) as cnt FROM vehicle_intelligence WHERE platform IS NOT NULL AND vehicle_type = 'car'")
-    with_insight = run_d1("SELECT COUNT(*) as cnt FROM vehicle_intelligence WHERE platform_insight IS NOT NULL AND vehicle_type = 'car'")
-    with_chassis = run_d1("SELECT COUNT(*) as cnt FROM vehicle_intelligence WHERE chassis_code IS NOT NULL AND vehicle_type = 'car'")
-    recent = run_d1("SELECT COUNT(*) as cnt FROM vehicle_intelligence WHERE year_end >= 2022 AND vehicle_type = 'car'")
+    total, with_platform, with_insight, with_chassis, recent, bmw3 = run_d1_many([
+        "SELECT COUNT(*) as cnt FROM vehicle_intelligence WHERE vehicle_type = 'car'",
+        "SELECT COUNT(*) as cnt FROM vehicle_intelligence WHERE platform IS NOT NULL AND vehicle_type = 'car'",
+        "SELECT COUNT(*) as cnt FROM vehicle_intelligence WHERE platform_insight IS NOT NULL AND vehicle_type = 'car'",
+        "SELECT COUNT(*) as cnt FROM vehicle_intelligence WHERE chassis_code IS NOT NULL AND vehicle_type = 'car'",
+        "SELECT COUNT(*) as cnt FROM vehicle_intelligence WHERE year_end >= 2022 AND vehicle_type = 'car'",
+        """
+        SELECT year_start, year_end, platform, chassis_code, 
+               SUBSTR(platform_insight, 1, 80) as insight_preview
+        FROM vehicle_intelligence 
+        WHERE make = 'BMW' AND model = '3-Series' AND vehicle_type = 'car'
+        ORDER BY year_start
+    """,
+    ])
     
     print(f"  Total car VI records: {total[0]['cnt']}")
     print(f"  With platform: {with_platform[0]['cnt']}")
@@ -516,19 +518,12 @@ def main():
     
     # Show BMW 3-Series as example
     print(f"\n--- BMW 3-Series verification ---")
-    bmw3 = run_d1("""
-        SELECT year_start, year_end, platform, chassis_code, 
-               SUBSTR(platform_insight, 1, 80) as insight_preview
-        FROM vehicle_intelligence 
-        WHERE make = 'BMW' AND model = '3-Series' AND vehicle_type = 'car'
-        ORDER BY year_start
-    """)
     for r in bmw3:
         pi = r.get('insight_preview') or ''
         ch = r.get('chassis_code') or ''
         print(f"  {r['year_start']}-{r['year_end']}  {str(r.get('platform','')):12s}  {ch:8s}  {pi}")
 
-    print(f"\nDone!")
+    print(f"\nDone! ({D1.round_trips} D1 round trips)")
 
 
 if __name__ == '__main__':
@@ -4,18 +4,31 @@ OBDII365 Multi-Category Scraper
 Scrapes products from multiple category pages on obdii365.com
 Downloads HTML for each product page for later parsing.
 Handles deduplication across categories.
+
+Listing and product pages are fetched concurrently by async_crawler under a
+per-host token bucket (--rate requests/second, the same budget as the old
+sleep between requests). Every URL, its state and its ETag/Last-Modified
+live in crawl_frontier.db next to the HTML, so an interrupted crawl resumes
+where it stopped and listing pages are revalidated with conditional GETs.
+
+Usage:
+    python3 scripts/scrape_obdii365_multi.py
+    python3 scripts/scrape_obdii365_multi.py --rate 2 --concurrency 8
+    python3 scripts/scrape_obdii365_multi.py --refresh                  # revalidate downloaded products too
+    python3 scripts/scrape_obdii365_multi.py --base-url http://127.0.0.1:8000 --output-dir /tmp/obdii365
 """
 
-import os
+import argparse
+import asyncio
 import re
 import json
-import time
-import requests
 from pathlib import Path
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit
 from datetime import datetime
 
+from async_crawler import CrawlFrontier, CrawlItem, Crawler
+
 # Configuration
 BASE_URL = "https://www.obdii365.com"
 OUTPUT_DIR = Path("/Users/jeremysamuels/Documents/study-dashboard/data/obdii365_scraped")
@@ -72,6 +85,10 @@ CATEGORIES = [
 
 MAX_PAGES_PER_CATEGORY = 50  # Safety limit
 
+# Politeness budget: requests per second to the site, and requests in flight
+REQUESTS_PER_SECOND = 2.0
+CONCURRENCY = 4
+
 # Headers to mimic Safari browser
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
@@ -80,24 +97,21 @@ HEADERS = {
     "Accept-Encoding": "gzip, deflate, br",
     "Connection": "keep-alive",
 }
+# httpx negotiates encodings it can decode and manages connections itself
+CRAWLER_HEADERS = {k: v for k, v in HEADERS.items() if k not in ("Accept-Encoding", "Connection")}
 
-def ensure_output_dir():
+def ensure_output_dir(output_dir: Path = OUTPUT_DIR):
     """Create output directories if they don't exist."""
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    (OUTPUT_DIR / "html").mkdir(exist_ok=True)
-    (OUTPUT_DIR / "parsed").mkdir(exist_ok=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / "html").mkdir(exist_ok=True)
+    (output_dir / "parsed").mkdir(exist_ok=True)
 
-def fetch_page(url: str, session: requests.Session) -> str:
-    """Fetch a page and return its HTML content."""
-    try:
-        response = session.get(url, headers=HEADERS, timeout=30)
-        response.raise_for_status()
-        return response.text
-    except requests.RequestException as e:
-        print(f"  Error fetching {url}: {e}")
-        return None
+def product_filename(url: str) -> str:
+    """Safe HTML filename for a product URL."""
+    filename = url.split('/')[-1].replace('.html', '') + '.html'
+    return re.sub(r'[^\w\-.]', '_', filename)
 
-def extract_product_links(html: str, category_slug: str) -> list:
+def extract_product_links(html: str, category_slug: str, base_url: str = BASE_URL) -> list:
     """Extract product links from a listing page."""
     soup = BeautifulSoup(html, 'html.parser')
     links = []
@@ -108,7 +122,7 @@ def extract_product_links(html: str, category_slug: str) -> list:
     for container in product_containers:
         link = container.find('a', href=True)
         if link and '/wholesale/' in link['href']:
-            full_url = urljoin(BASE_URL, link['href'])
+            full_url = urljoin(base_url, link['href'])
             # Exclude category pages themselves
             if full_url not in links and '.html' in full_url:
                 links.append(full_url)
@@ -119,7 +133,7 @@ def extract_product_links(html: str, category_slug: str) -> list:
         for link in all_links:
             href = link['href']
             if '/wholesale/' in href and '.html' in href:
-                full_url = urljoin(BASE_URL, href)
+                full_url = urljoin(base_url, href)
                 if full_url not in links:
                     links.append(full_url)
     
@@ -148,92 +162,37 @@ def get_total_pages(html: str) -> int:
     
     return min(max_page, MAX_PAGES_PER_CATEGORY)
 
-def scrape_category(category: dict, session: requests.Session, existing_urls: set) -> tuple:
-    """Scrape all product URLs from a category."""
-    name = category["name"]
-    base_url = category["url"]
-    all_urls = []
-    category_urls = []
-    
-    print(f"\n{'='*60}")
-    print(f"Scraping category: {name}")
-    print(f"URL: {base_url}")
-    print(f"{'='*60}")
-    
-    # Fetch first page to determine total pages
-    html = fetch_page(base_url, session)
-    if not html:
-        print(f"  Failed to fetch category page")
-        return [], {}
-    
-    total_pages = get_total_pages(html)
-    print(f"  Detected {total_pages} pages")
-    
-    # Process first page
-    links = extract_product_links(html, name)
-    new_links = [l for l in links if l not in existing_urls]
-    category_urls.extend(new_links)
-    print(f"  Page 1: Found {len(links)} products, {len(new_links)} new")
-    
-    time.sleep(1)
-    
-    # Process remaining pages
-    for page_num in range(2, total_pages + 1):
-        page_url = f"{base_url}p{page_num}/"
-        print(f"  Fetching page {page_num}/{total_pages}...")
-        
-        html = fetch_page(page_url, session)
-        if html:
-            links = extract_product_links(html, name)
-            new_links = [l for l in links if l not in existing_urls and l not in category_urls]
-            category_urls.extend(new_links)
-            print(f"  Page {page_num}: Found {len(links)} products, {len(new_links)} new")
-        else:
-            print(f"  Page {page_num}: Failed to fetch")
-        
-        time.sleep(1)
-    
-    print(f"  Category total: {len(category_urls)} new unique products")
-    return category_urls, {name: len(category_urls)}
+def listing_item(category: dict, page_num: int, html_dir: Path) -> CrawlItem:
+    """Crawl item for one page of a category listing (page 1 is the category URL)."""
+    url = category["url"] if page_num == 1 else f"{category['url']}p{page_num}/"
+    return CrawlItem(url, "listing", path=str(html_dir / f"listing_{category['name']}_p{page_num}.html"),
+                     data={"category": category["name"], "page": page_num, "category_url": category["url"]})
 
-def download_product_pages(urls: list, session: requests.Session, existing_files: set) -> dict:
-    """Download HTML for each product page."""
-    results = {}
-    total = len(urls)
-    
-    for i, url in enumerate(urls, 1):
-        # Create safe filename from URL
-        filename = url.split('/')[-1].replace('.html', '') + '.html'
-        filename = re.sub(r'[^\w\-.]', '_', filename)
-        
-        # Skip if already downloaded
-        if filename in existing_files:
-            print(f"  [{i}/{total}] Skipping (exists): {filename}")
-            results[url] = str(OUTPUT_DIR / "html" / filename)
-            continue
-        
-        print(f"  [{i}/{total}] Downloading: {filename}")
-        
-        html = fetch_page(url, session)
-        if html:
-            filepath = OUTPUT_DIR / "html" / filename
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(html)
-            results[url] = str(filepath)
-        else:
-            results[url] = None
-        
-        time.sleep(0.5)
-    
-    return results
+def make_handler(html_dir: Path, base_url: str):
+    """Crawl handler: listing pages yield their products (and page 1 the other listing pages)."""
+    def handle(entry, body: str, changed: bool) -> list:
+        if entry.kind != "listing":
+            return []
+        name = entry.data["category"]
+        links = extract_product_links(body, name, base_url)
+        items = [CrawlItem(url, "product", path=str(html_dir / product_filename(url)),
+                           data={"category": name}, priority=1)
+                 for url in links]
+        if entry.data["page"] == 1:
+            total_pages = get_total_pages(body)
+            category = {"name": name, "url": entry.data["category_url"]}
+            items += [listing_item(category, n, html_dir) for n in range(2, total_pages + 1)]
+            print(f"  {name}: {total_pages} pages, {len(links)} products on page 1")
+        return items
+    return handle
 
-def load_existing_data() -> tuple:
+def load_existing_data(output_dir: Path = OUTPUT_DIR) -> tuple:
     """Load existing URLs and files to avoid re-downloading."""
     existing_urls = set()
     existing_files = set()
     
     # Load existing URLs from summary
-    summary_file = OUTPUT_DIR / "scrape_summary.json"
+    summary_file = output_dir / "scrape_summary.json"
     if summary_file.exists():
         with open(summary_file, 'r') as f:
             data = json.load(f)
@@ -241,71 +200,100 @@ def load_existing_data() -> tuple:
             print(f"Loaded {len(existing_urls)} existing URLs from summary")
     
     # Get existing HTML files
-    html_dir = OUTPUT_DIR / "html"
+    html_dir = output_dir / "html"
     if html_dir.exists():
         existing_files = set(f.name for f in html_dir.glob("*.html") if not f.name.startswith("listing_"))
         print(f"Found {len(existing_files)} existing HTML files")
     
     return existing_urls, existing_files
 
+def seed_frontier(frontier: CrawlFrontier, html_dir: Path, existing_urls: set, existing_files: set):
+    """Record pages downloaded before the crawl frontier existed, so they are not fetched again."""
+    seeded = 0
+    for url in existing_urls:
+        filename = product_filename(url)
+        if filename in existing_files:
+            seeded += frontier.add(CrawlItem(url, "product", path=str(html_dir / filename), priority=1), state="done")
+    if seeded:
+        print(f"Seeded crawl frontier with {seeded} previously downloaded products")
+
 def main():
     """Main function to run the multi-category scraper."""
+    parser = argparse.ArgumentParser(description='Scrape OBDII365 category listings and product pages')
+    parser.add_argument('--output-dir', type=Path, default=OUTPUT_DIR, help='Output directory')
+    parser.add_argument('--base-url', default=BASE_URL,
+                        help='Site origin (point at a local fixture server to test the crawl)')
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help='Requests per second')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='Requests in flight at once')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Revalidate already downloaded product pages (conditional GET)')
+    parser.add_argument('--max-requests', type=int, help='Stop after N requests (resume on the next run)')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("OBDII365 Multi-Category Scraper")
     print(f"Started at: {datetime.now().isoformat()}")
     print("=" * 60)
     
-    ensure_output_dir()
-    session = requests.Session()
-    
-    # Load existing data
-    existing_urls, existing_files = load_existing_data()
-    
-    # Track all new URLs and category stats
-    all_new_urls = []
-    category_stats = {}
-    
-    # Scrape each category
-    print(f"\nScraping {len(CATEGORIES)} categories...")
-    for category in CATEGORIES:
-        new_urls, stats = scrape_category(category, session, existing_urls | set(all_new_urls))
-        all_new_urls.extend(new_urls)
-        category_stats.update(stats)
-    
-    print(f"\n{'='*60}")
-    print(f"Category Summary:")
-    for cat, count in category_stats.items():
-        print(f"  {cat}: {count} new products")
-    print(f"Total new unique products: {len(all_new_urls)}")
-    print(f"{'='*60}")
-    
-    if not all_new_urls:
-        print("\nNo new products to download!")
-        return
-    
-    # Download new product pages
-    print(f"\nDownloading {len(all_new_urls)} new product pages...")
-    download_results = download_product_pages(all_new_urls, session, existing_files)
-    
-    # Merge with existing results
+    output_dir = args.output_dir
+    html_dir = output_dir / "html"
+    base_url = args.base_url.rstrip('/')
+    categories = [{"name": c["name"], "url": base_url + urlsplit(c["url"]).path} for c in CATEGORIES]
+    ensure_output_dir(output_dir)
+    
+    frontier = CrawlFrontier(output_dir / "crawl_frontier.db")
+    if frontier.run == 0:
+        seed_frontier(frontier, html_dir, *load_existing_data(output_dir))
+    
+    # Listings are re-read every run to find new products; products only with --refresh
+    resumed = frontier.begin_run(requeue_kinds=["listing", "product"] if args.refresh else ["listing"])
+    if resumed:
+        print(f"\nResuming interrupted crawl (run {frontier.run}): {frontier.counts()}")
+    else:
+        for category in categories:
+            frontier.add(listing_item(category, 1, html_dir))
+    
+    print(f"\nCrawling {len(categories)} categories at {args.rate:g} req/s, {args.concurrency} in flight...")
+    crawler = Crawler(frontier, make_handler(html_dir, base_url), rate=args.rate,
+                      concurrency=args.concurrency, headers=CRAWLER_HEADERS, max_requests=args.max_requests)
+    stats = asyncio.run(crawler.run())
+    
+    # Products first discovered in this run, by the category that found them
+    category_stats = {c["name"]: 0 for c in categories}
     all_results = {}
-    summary_file = OUTPUT_DIR / "scrape_summary.json"
+    summary_file = output_dir / "scrape_summary.json"
     if summary_file.exists():
         with open(summary_file, 'r') as f:
             old_data = json.load(f)
             all_results = old_data.get("results", {})
+    new_this_run = 0
+    for row in frontier.entries("product"):
+        if row["state"] in ("done", "failed"):  # Pending ones are picked up when the crawl resumes
+            all_results[row["url"]] = row["path"] if row["state"] == "done" else None
+        category = json.loads(row["data"]).get("category")
+        if row["run"] == frontier.run and category:
+            category_stats[category] = category_stats.get(category, 0) + 1
+            new_this_run += 1
     
-    all_results.update(download_results)
+    print(f"\n{'='*60}")
+    print(f"Category Summary:")
+    for cat, count in category_stats.items():
+        print(f"  {cat}: {count} new products")
+    print(f"Total new unique products: {new_this_run}")
+    print(f"Requests: {stats['requests']} ({stats['fetched']} downloaded, {stats['not_modified']} unchanged, "
+          f"{stats['failed']} failed, {stats['retried']} retried)")
+    print(f"{'='*60}")
     
     # Save updated summary
     summary = {
         "scraped_at": datetime.now().isoformat(),
-        "categories_scraped": [c["name"] for c in CATEGORIES],
+        "categories_scraped": [c["name"] for c in categories],
         "category_stats": category_stats,
         "total_products": len(all_results),
-        "new_products_this_run": len(all_new_urls),
+        "new_products_this_run": new_this_run,
         "successful_downloads": sum(1 for v in all_results.values() if v),
         "failed_downloads": sum(1 for v in all_results.values() if not v),
+        "crawl_finished": bool(stats["finished"]),
         "results": all_results
     }
     
@@ -313,21 +301,22 @@ def main():
         json.dump(summary, f, indent=2)
     
     # Also save URLs list
-    urls_file = OUTPUT_DIR / "product_urls.json"
+    urls_file = output_dir / "product_urls.json"
     with open(urls_file, 'w', encoding='utf-8') as f:
         json.dump({
             "scraped_at": datetime.now().isoformat(),
             "total_urls": len(all_results),
             "urls": list(all_results.keys())
         }, f, indent=2)
+    frontier.close()
     
     print(f"\n{'='*60}")
-    print("Scraping Complete!")
+    print("Scraping Complete!" if stats["finished"] else "Crawl interrupted - run again to resume")
     print(f"Total products in corpus: {summary['total_products']}")
     print(f"New products this run: {summary['new_products_this_run']}")
     print(f"Successful downloads: {summary['successful_downloads']}")
     print(f"Failed downloads: {summary['failed_downloads']}")
-    print(f"Output directory: {OUTPUT_DIR}")
+    print(f"Output directory: {output_dir}")
     print(f"{'='*60}")
 
 if __name__ == "__main__":
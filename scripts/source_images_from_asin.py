@@ -1,14 +1,16 @@
 import json
 import os
-import requests
 import subprocess
 import time
 
+from http_cache import shared_cache
+
 # Configuration
 JSON_FILE = 'asin_based_affiliate_products.json'
 R2_BUCKET = 'euro-keys-assets'
 DATABASE_NAME = 'locksmith-db'
 TEMP_DIR = 'temp_images'
+IMAGE_TTL = 30 * 86400  # Amazon image URLs never change content, so skip revalidating for a month
 
 def get_high_res_url(image_url):
     """
@@ -31,11 +33,10 @@ def get_high_res_url(image_url):
 
 def download_image(url, save_path):
     try:
-        response = requests.get(url, stream=True)
+        response = shared_cache().get(url, ttl=IMAGE_TTL)
         if response.status_code == 200:
             with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
+                f.write(response.content)
             return True
     except Exception as e:
         print(f"Error downloading {url}: {e}")
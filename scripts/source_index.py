@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Shared Source Index
+
+Word 3-gram inverted index over every dossier .txt source, persisted to
+data/source_index.pkl so pearl attribution no longer rescans the corpus
+per pearl. Each posting maps a gram to (file, token position), and token
+positions map back to character offsets in the original file.
+
+Queries:
+- candidates(text): files that contain every informative gram of text
+- find_phrase(phrase): first case-insensitive literal match (regex semantics)
+- find_normalized(fragment): first file whose normalized text contains fragment
+- locate(text) / best_source(text): best-aligned file, span and coverage score
+
+The index is rebuilt incrementally: files whose size/mtime are unchanged
+reuse their cached tokens, so refreshing after a sync only tokenizes new
+or edited documents.
+
+Usage:
+    python3 scripts/source_index.py            # build / refresh the index
+    python3 scripts/source_index.py --rebuild  # ignore the cached index
+
+    from source_index import SourceIndex
+    index = SourceIndex.load_or_build()
+    match = index.locate(pearl['content'])
+"""
+
+import os
+import pickle
+import re
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data"
+SOURCE_DIRS = [
+    DATA_DIR / "gdrive_plaintext",
+    DATA_DIR / "fcc_research_docs",
+    DATA_DIR / "exports",
+    DATA_DIR / "doc_notes",
+]
+INDEX_PATH = DATA_DIR / "source_index.pkl"
+
+SCHEMA_VERSION = 2
+GRAM_SIZE = 3          # Words per indexed gram
+MAX_POSTINGS = 500     # Grams more common than this are treated as stopword-like
+
+_WORD_RE = re.compile(r'\w+')
+_MASK64 = (1 << 64) - 1
+_POS_BITS = 32
+_POS_MASK = (1 << _POS_BITS) - 1
+
+
+def normalize(text: str) -> str:
+    """Collapse whitespace and lowercase (the matching form used by the audits)."""
+    if not text:
+        return ""
+    return ' '.join(text.split()).lower()
+
+
+def tokenize(text: str) -> Tuple[List[int], array]:
+    """Word hashes and character start offsets for every word in text."""
+    hashes = []
+    offsets = array('I')
+    for m in _WORD_RE.finditer(text):
+        hashes.append(zlib.crc32(m.group().lower().encode()))
+        offsets.append(m.start())
+    return hashes, offsets
+
+
+def gram_hashes(word_hashes: List[int]) -> List[int]:
+    """Stable 64-bit hash of each run of GRAM_SIZE (3) consecutive words."""
+    return [((a * 0x9E3779B97F4A7C15) ^ (b * 0xC2B2AE3D27D4EB4F) ^ c) & _MASK64
+            for a, b, c in zip(word_hashes, word_hashes[1:], word_hashes[2:])]
+
+
+@dataclass
+class SourceFile:
+    """One indexed source document."""
+    name: str          # File name, e.g. "BMW_FEM.txt"
+    stem: str          # File name without extension
+    path: str
+    size: int
+    mtime: float
+    offsets: array     # Character offset of each word
+
+
+@dataclass
+class SourceMatch:
+    """Where a pearl sits in its best-matching source."""
+    file_id: int
+    name: str
+    path: str
+    start: int         # Character span in the original source text
+    end: int
+    score: float       # Fraction of the query's informative grams found in alignment
+
+
+class SourceIndex:
+    """Persisted word-gram index over the dossier .txt sources."""
+
+    def __init__(self, files: List[SourceFile], grams: List[array],
+                 postings: Optional[Tuple[array, array]] = None):
+        self.files = files
+        self._file_grams = grams
+        self._texts: Dict[int, str] = {}
+        self._normalized: Dict[int, str] = {}
+        if postings is None:
+            self._build_postings()
+        else:
+            self._keys, self._postings = postings
+
+    # ------------------------------------------------------------------
+    # Building / persistence
+    # ------------------------------------------------------------------
+
+    def _build_postings(self) -> None:
+        """Sort every (gram, file, position) into parallel arrays for bisect lookups."""
+        keys = array('Q')
+        postings = array('Q')
+        for file_id, grams in enumerate(self._file_grams):
+            keys.extend(grams)
+            base = file_id << _POS_BITS
+            postings.extend(base | pos for pos in range(len(grams)))
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._keys = array('Q', (keys[i] for i in order))
+        self._postings = array('Q', (postings[i] for i in order))
+
+    @classmethod
+    def load_or_build(cls, source_dirs: Iterable[Path] = SOURCE_DIRS, index_path: Path = INDEX_PATH,
+                      rebuild: bool = False, verbose: bool = True) -> "SourceIndex":
+        """Load the persisted index, re-tokenizing only new or changed files."""
+        cached = {}
+        payload = {}
+        if index_path.exists() and not rebuild:
+            try:
+                with open(index_path, 'rb') as f:
+                    payload = pickle.load(f)
+                if payload.get('version') == SCHEMA_VERSION:
+                    # Plain tuples, so the cache unpickles whether it was written by
+                    # `python source_index.py` (__main__) or by an importing script
+                    cached = {entry[2]: (SourceFile(*entry[:-1]), entry[-1]) for entry in payload['files']}
+            except Exception as e:
+                print(f"  Ignoring unreadable source index ({e})")
+
+        files = []
+        grams = []
+        reused = 0
+        for source_dir in source_dirs:
+            source_dir = Path(source_dir)
+            if not source_dir.exists():
+                continue
+            for txt_file in sorted(source_dir.glob("*.txt")):
+                stat = txt_file.stat()
+                entry = cached.get(str(txt_file))
+                if entry and entry[0].size == stat.st_size and entry[0].mtime == stat.st_mtime:
+                    files.append(entry[0])
+                    grams.append(entry[1])
+                    reused += 1
+                    continue
+                try:
+                    text = txt_file.read_text(encoding='utf-8', errors='ignore')
+                except OSError as e:
+                    print(f"  Error reading {txt_file}: {e}")
+                    continue
+                word_hashes, offsets = tokenize(text)
+                files.append(SourceFile(txt_file.name, txt_file.stem, str(txt_file),
+                                        stat.st_size, stat.st_mtime, offsets))
+                grams.append(array('Q', gram_hashes(word_hashes)))
+
+        unchanged = bool(cached) and reused == len(files) == len(cached)
+        if unchanged and [f.path for f in files] == [e[2] for e in payload['files']]:
+            index = cls(files, grams, postings=(payload['keys'], payload['postings']))
+        else:
+            index = cls(files, grams)
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = index_path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': SCHEMA_VERSION,
+                             'files': [(f.name, f.stem, f.path, f.size, f.mtime, f.offsets, g)
+                                       for f, g in zip(files, grams)],
+                             'keys': index._keys, 'postings': index._postings},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, index_path)
+        if verbose:
+            print(f"Source index: {len(files)} files ({len(files) - reused} re-tokenized), "
+                  f"{len(index._keys)} grams")
+        return index
+
+    # ------------------------------------------------------------------
+    # Source text access
+    # ------------------------------------------------------------------
+
+    def text(self, file_id: int) -> str:
+        """Original source text (read lazily and cached)."""
+        text = self._texts.get(file_id)
+        if text is None:
+            with open(self.files[file_id].path, 'r', encoding='utf-8', errors='ignore') as f:
+                text = self._texts[file_id] = f.read()
+        return text
+
+    def normalized(self, file_id: int) -> str:
+        text = self._normalized.get(file_id)
+        if text is None:
+            text = self._normalized[file_id] = normalize(self.text(file_id))
+        return text
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _lookup(self, gram: int) -> Tuple[int, int]:
+        lo = bisect_left(self._keys, gram)
+        return lo, bisect_right(self._keys, gram, lo)
+
+    def _informative_grams(self, text: str, trim: bool) -> Tuple[List[Tuple[int, int, int]], int]:
+        """
+        (query position, lo, hi) posting ranges for the informative grams of
+        text, plus the query's total gram count (stopword-like grams included).
+        """
+        word_hashes, _ = tokenize(text)
+        if trim:
+            # A literal match may start/end mid-word in the source, so edge words can't be trusted
+            word_hashes = word_hashes[1:-1]
+        grams = []
+        query_grams = gram_hashes(word_hashes)
+        for qpos, gram in enumerate(query_grams):
+            lo, hi = self._lookup(gram)
+            if hi - lo <= MAX_POSTINGS:
+                grams.append((qpos, lo, hi))
+        return grams, len(query_grams)
+
+    def candidates(self, text: str, trim: bool = True) -> Optional[List[int]]:
+        """
+        File ids that contain every informative gram of text, in index order.
+
+        Returns None when text is too short (or too generic) to narrow the
+        search; callers should then fall back to scanning every file.
+        """
+        grams, _ = self._informative_grams(text, trim)
+        if not grams:
+            return None
+        result = None
+        for _, lo, hi in sorted(grams, key=lambda g: g[2] - g[1]):
+            files = {self._postings[i] >> _POS_BITS for i in range(lo, hi)}
+            result = files if result is None else result & files
+            if not result:
+                return []
+        return sorted(result)
+
+    def _search_order(self, text: str) -> List[int]:
+        found = self.candidates(text)
+        return list(range(len(self.files))) if found is None else found
+
+    def find_phrase(self, phrase: str) -> Optional[Tuple[int, "re.Match"]]:
+        """First file (in index order) containing phrase case-insensitively."""
+        pattern = re.compile(re.escape(phrase), re.IGNORECASE)
+        for file_id in self._search_order(phrase):
+            match = pattern.search(self.text(file_id))
+            if match:
+                return file_id, match
+        return None
+
+    def find_normalized(self, fragment: str) -> Optional[Tuple[int, int]]:
+        """First file whose normalized text contains the (normalized) fragment, and the offset."""
+        for file_id in self._search_order(fragment):
+            idx = self.normalized(file_id).find(fragment)
+            if idx != -1:
+                return file_id, idx
+        return None
+
+    def locate(self, text: str) -> Optional[SourceMatch]:
+        """
+        Best-aligned source for text.
+
+        Each shared gram votes for (file, source position - query position);
+        the winning alignment gives the file, the character span and a
+        coverage score. Tolerates small edits since only aligned runs count.
+        """
+        grams, total = self._informative_grams(text, trim=False)
+        if not grams:
+            return None
+        votes = Counter()
+        for qpos, lo, hi in grams:
+            for i in range(lo, hi):
+                posting = self._postings[i]
+                votes[(posting >> _POS_BITS, (posting & _POS_MASK) - qpos)] += 1
+        if not votes:
+            return None
+
+        # Merge neighbouring diagonals so insertions/deletions don't split the vote
+        by_file = defaultdict(Counter)
+        for (file_id, diagonal), count in votes.items():
+            by_file[file_id][diagonal] += count
+        best = None
+        for file_id, diagonals in by_file.items():
+            for diagonal in diagonals:
+                count = sum(diagonals.get(diagonal + d, 0) for d in range(-3, 4))
+                key = (count, -file_id)
+                if best is None or key > best[0]:
+                    best = (key, file_id, diagonal)
+        (count, _), file_id, diagonal = best
+
+        source = self.files[file_id]
+        # Span and score cover the whole query, not just its informative grams
+        n_words = total + GRAM_SIZE - 1
+        first = max(0, diagonal)
+        last = min(len(source.offsets) - 1, diagonal + n_words - 1)
+        start = source.offsets[first]
+        text_len = len(self.text(file_id))
+        end = source.offsets[last + 1] if last + 1 < len(source.offsets) else text_len
+        return SourceMatch(file_id, source.name, source.path, start, end,
+                           min(1.0, count / total))
+
+    def best_source(self, text: str) -> Tuple[Optional[str], float]:
+        """(file stem, coverage score) of the best-aligned source."""
+        match = self.locate(text)
+        if match is None:
+            return None, 0.0
+        return self.files[match.file_id].stem, match.score
+
+    def locate_many(self, texts: Iterable[str]) -> List[Optional[SourceMatch]]:
+        """Bulk attribution: one locate per text against the shared index."""
+        return [self.locate(text) for text in texts]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or refresh the shared dossier source index')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the cached index')
+    args = parser.parse_args()
+
+    SourceIndex.load_or_build(rebuild=args.rebuild)
+    print(f"Saved: {INDEX_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,416 @@
+#!/usr/bin/env python3
+"""
+Migration Splitter
 
-import os
+Splits any SQL migration into chunks that each fit one D1 payload and
+applies them with resume. The file is streamed, and statements are
+parsed with quotes, comments and trigger bodies respected, so a `;` inside
+a string never splits a statement.
 
-INPUT_SQL = "/Users/jeremysamuels/Documents/study-dashboard/data/migrations/populate_normalized_unsafe.sql"
-OUT_PRODUCTS = "/Users/jeremysamuels/Documents/study-dashboard/data/migrations/split_products.sql"
-OUT_CONFIGS = "/Users/jeremysamuels/Documents/study-dashboard/data/migrations/split_configs.sql"
+Statements are grouped before chunking:
+  - Schema statements (and PRAGMA reads) form serial segments that run
+    alone, in file order, between the data segments around them.
+  - In a data segment, tables linked by a foreign key or used together in
+    one statement (INSERT ... SELECT, subqueries) share a lane. Lanes
+    touch disjoint tables, so they run concurrently. Within a lane,
+    statements keep file order.
 
-def main():
-    print("Splitting SQL file...")
-    with open(INPUT_SQL, 'r') as f:
-        lines = f.readlines()
-    
-    products_lines = ["PRAGMA foreign_keys = OFF;\n"]
-    configs_lines = ["PRAGMA foreign_keys = OFF;\n"]
-    
-    phase = "HEAD" # HEAD, PRODUCTS, CONFIGS
-    
+Foreign keys come from CREATE TABLE statements in the migration and, when
+present, from the local D1 mirror's schema (d1_mirror.py).
+
+Applying records a `.done` marker per chunk, so an interrupted reseed
+continues where it stopped. Statements D1 rejects are isolated by
+d1_client and saved next to their chunk as `<chunk>.failed.sql` instead
+of aborting the run. Transaction control (BEGIN/COMMIT) is dropped,
+because D1 rejects it.
+
+PRAGMA settings only last for the payload they are sent in, so settings in
+the source (`PRAGMA foreign_keys = OFF`, as make_sql_unsafe.py writes) are
+lifted out of the statement stream into a prefix that heads every chunk,
+the first setting of each pragma winning. --defer-foreign-keys adds
+`PRAGMA defer_foreign_keys = true` (the D1 form of foreign_keys = OFF) to
+it. The prefix counts against each chunk's budget, and applying re-sends it
+with every payload d1_client sends, including bisected retries.
+
+A migration written by migration_planner.py advances its generator's
+snapshot once every chunk applied without a failed statement.
+
+Usage:
+    python3 scripts/split_migration.py data/migrations/populate_normalized_data.sql
+    python3 scripts/split_migration.py data/migrations/populate_normalized_data.sql --apply -j 4
+    python3 scripts/split_migration.py big.sql --max-bytes 50000 --max-statements 100 --apply
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import shutil
+import sqlite3
+import sys
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from d1_client import MAX_BATCH_BYTES, MAX_BATCH_STATEMENTS, connect
+from migration_planner import mark_migration_applied
+from parallel_runner import add_workers_argument, run_parallel
+
+BASE_DIR = Path(__file__).parent.parent
+CHUNKS_DIR = BASE_DIR / "data" / "migrations" / "chunks"
+MANIFEST_FILE = "manifest.json"
+
+# Start of a string/identifier/comment, or a statement terminator
+SPECIAL_PATTERN = re.compile(r"['\"`\[;]|--|/\*")
+CLOSING = {"'": "'", '"': '"', '`': '`', '[': ']'}
+TRIGGER_PATTERN = re.compile(r"^\s*CREATE\s+(?:TEMP(?:ORARY)?\s+)?TRIGGER\b", re.IGNORECASE)
+END_PATTERN = re.compile(r"\bEND$", re.IGNORECASE)
+TRANSACTION_PATTERN = re.compile(r"^(?:BEGIN|COMMIT|END|ROLLBACK)(?:\s+(?:DEFERRED|IMMEDIATE|EXCLUSIVE))?"
+                                 r"(?:\s+TRANSACTION)?$", re.IGNORECASE)
+
+NAME = r'("[^"]+"|`[^`]+`|\[[^\]]+\]|[\w.]+)'
+DATA_PATTERN = re.compile(r"^\s*(?:INSERT|REPLACE|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+TABLE_REF_PATTERN = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE|REFERENCES)\s+" + NAME, re.IGNORECASE)
+CREATE_TABLE_PATTERN = re.compile(r"^\s*CREATE\s+(?:TEMP(?:ORARY)?\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?" + NAME,
+                                  re.IGNORECASE)
+REFERENCES_PATTERN = re.compile(r"\bREFERENCES\s+" + NAME, re.IGNORECASE)
+STRING_PATTERN = re.compile(r"'[^']*(?:''[^']*)*'")
+PRAGMA_SETTING_PATTERN = re.compile(r"^\s*PRAGMA\s+(?:\w+\.)?(\w+)\s*=", re.IGNORECASE)
+
+
+def iter_statements(lines: Iterable[str]) -> Iterator[str]:
+    """
+    SQL statements from a stream of lines, without comments or the
+    terminating semicolon. Semicolons inside strings, quoted identifiers
+    and CREATE TRIGGER ... END bodies do not end a statement.
+    """
+    parts: List[str] = []
+    state: Optional[str] = None  # closing quote we are inside, or '*/' in a block comment
     for line in lines:
-        if line.startswith("DELETE FROM"):
-             products_lines.append(line)
-        elif line.startswith("INSERT INTO products"):
-            phase = "PRODUCTS"
-            products_lines.append(line)
-        elif line.startswith("INSERT INTO vehicle_configs") or line.startswith("INSERT INTO config_key_blanks") or line.startswith("INSERT INTO product_vehicle_links") or line.startswith("INSERT OR IGNORE INTO product_vehicle_links"):
-            phase = "CONFIGS"
-            configs_lines.append(line)
-        elif line.startswith("COMMIT"):
-             pass # Skip commit, D1 batch handles it
-        else:
-            # Other lines (PRAGMA, Comments, whitespace)
-            if phase == "HEAD" or phase == "PRODUCTS":
-                products_lines.append(line)
+        i, n = 0, len(line)
+        while i < n:
+            if state == '*/':
+                j = line.find('*/', i)
+                if j < 0:
+                    break
+                parts.append(' ')
+                i, state = j + 2, None
+            elif state is not None:
+                j = line.find(state, i)
+                if j < 0:
+                    parts.append(line[i:])
+                    break
+                # A doubled quote re-opens the string on the next pass
+                parts.append(line[i:j + 1])
+                i, state = j + 1, None
             else:
-                configs_lines.append(line)
-
-    with open(OUT_PRODUCTS, 'w') as f:
-        f.write("".join(products_lines))
-        
-    with open(OUT_CONFIGS, 'w') as f:
-        f.write("".join(configs_lines))
-        
-    print(f"Created {OUT_PRODUCTS} ({len(products_lines)} lines)")
-    print(f"Created {OUT_CONFIGS} ({len(configs_lines)} lines)")
+                m = SPECIAL_PATTERN.search(line, i)
+                if not m:
+                    parts.append(line[i:])
+                    break
+                parts.append(line[i:m.start()])
+                token = m.group()
+                i = m.end()
+                if token == ';':
+                    statement = ''.join(parts).strip()
+                    if TRIGGER_PATTERN.match(statement) and not END_PATTERN.search(statement):
+                        parts.append(';')
+                        continue
+                    parts = []
+                    if statement:
+                        yield statement
+                elif token == '--':
+                    parts.append('\n')
+                    break
+                elif token == '/*':
+                    state = '*/'
+                else:
+                    parts.append(token)
+                    state = CLOSING[token]
+    statement = ''.join(parts).strip()
+    if statement:
+        yield statement
+
+
+def _table_name(raw: str) -> str:
+    name = raw.strip('"`[]').lower()
+    return name[5:] if name.startswith('main.') else name
+
+
+def statement_tables(statement: str) -> Optional[Set[str]]:
+    """Tables a data statement touches, or None for schema/PRAGMA/other statements."""
+    if not DATA_PATTERN.match(statement):
+        return None
+    code = STRING_PATTERN.sub("''", statement)
+    return {_table_name(m.group(1)) for m in TABLE_REF_PATTERN.finditer(code)}
+
+
+def mirror_foreign_keys() -> List[Tuple[str, str]]:
+    """(child, parent) table pairs from the local D1 mirror, if one has been pulled."""
+    try:
+        from d1_mirror import MIRROR_PATH, mirrored_tables, open_mirror
+        if not MIRROR_PATH.exists():
+            return []
+        conn = open_mirror(MIRROR_PATH, readonly=True)
+    except Exception:
+        return []
+    try:
+        pairs = []
+        for table in mirrored_tables(conn):
+            for fk in conn.execute(f"PRAGMA foreign_key_list(\"{table}\")"):
+                pairs.append((table.lower(), fk['table'].lower()))
+        return pairs
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
+
+
+class _Lanes:
+    """Union-find over table names."""
+
+    def __init__(self):
+        self.parent: Dict[str, str] = {}
+
+    def find(self, table: str) -> str:
+        self.parent.setdefault(table, table)
+        while self.parent[table] != table:
+            self.parent[table] = self.parent[self.parent[table]]
+            table = self.parent[table]
+        return table
+
+    def union(self, tables: Iterable[str]) -> None:
+        tables = list(tables)
+        for other in tables[1:]:
+            self.parent[self.find(other)] = self.find(tables[0])
+
+
+def _segments(path: Path, lanes: _Lanes) -> Iterator[Tuple[int, Optional[str], str]]:
+    """(segment, lane root or None for serial statements, statement) in file order."""
+    segment, previous_kind = -1, None
+    with open(path, 'r', encoding='utf-8') as f:
+        for statement in iter_statements(f):
+            if TRANSACTION_PATTERN.match(statement) or PRAGMA_SETTING_PATTERN.match(statement):
+                continue  # PRAGMA settings head every chunk instead (see split_migration)
+            tables = statement_tables(statement)
+            kind = 'data' if tables else 'serial'
+            if kind != previous_kind:
+                segment += 1
+                previous_kind = kind
+            yield segment, lanes.find(sorted(tables)[0]) if tables else None, statement
+
+
+def _source_hash(path: Path) -> str:
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def split_migration(path: Union[str, Path], out_dir: Union[str, Path],
+                    max_bytes: int = MAX_BATCH_BYTES, max_statements: int = MAX_BATCH_STATEMENTS,
+                    defer_foreign_keys: bool = False) -> dict:
+    """
+    Split a migration into chunk files plus a manifest.
+
+    Two streaming passes: the first links tables into lanes and collects
+    PRAGMA settings, the second writes each lane's statements into chunks
+    budgeted with room for the PRAGMA prefix.
+    """
+    path, out_dir = Path(path), Path(out_dir)
+    lanes = _Lanes()
+    pragmas: Dict[str, str] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for statement in iter_statements(f):
+            setting = PRAGMA_SETTING_PATTERN.match(statement)
+            if setting:
+                pragmas.setdefault(setting.group(1).lower(), statement)
+                continue
+            create = CREATE_TABLE_PATTERN.match(statement)
+            if create:
+                code = STRING_PATTERN.sub("''", statement)
+                lanes.union([_table_name(create.group(1))] +
+                             [_table_name(m.group(1)) for m in REFERENCES_PATTERN.finditer(code)])
+                continue
+            tables = statement_tables(statement)
+            if tables:
+                lanes.union(sorted(tables))
+    for child, parent in mirror_foreign_keys():
+        lanes.union([child, parent])
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+    if defer_foreign_keys:
+        pragmas.setdefault('defer_foreign_keys', "PRAGMA defer_foreign_keys = true")
+    prefix = list(pragmas.values())
+    max_bytes -= sum(len(sql.encode('utf-8')) + 2 for sql in prefix)
+    max_statements = max(1, max_statements - len(prefix))
+
+    chunks: List[dict] = []
+    open_chunks: Dict[Tuple[int, int], dict] = {}
+    lane_numbers: Dict[Tuple[int, Optional[str]], int] = {}
+    lanes_in_segment: Dict[int, int] = {}
+    chunks_in_lane: Dict[Tuple[int, int], int] = {}
+    handles = {}
+
+    def close(key):
+        chunk = open_chunks.pop(key)
+        handles.pop(chunk['file']).close()
+
+    current_segment = None
+    for segment, root, statement in _segments(path, lanes):
+        if segment != current_segment:
+            for key in list(open_chunks):
+                close(key)
+            current_segment = segment
+        if (segment, root) not in lane_numbers:
+            lane_numbers[(segment, root)] = lanes_in_segment.get(segment, 0)
+            lanes_in_segment[segment] = lane_numbers[(segment, root)] + 1
+        lane = lane_numbers[(segment, root)]
+        key = (segment, lane)
+        length = len(statement.encode('utf-8')) + 2
+        chunk = open_chunks.get(key)
+        if chunk and (chunk['bytes'] + length > max_bytes or chunk['statements'] >= max_statements):
+            close(key)
+            chunk = None
+        if chunk is None:
+            number = chunks_in_lane.get(key, 0)
+            chunks_in_lane[key] = number + 1
+            chunk = {'file': f"{segment:03d}-{lane:03d}-{number:04d}.sql", 'segment': segment,
+                     'lane': lane, 'serial': root is None, 'statements': 0, 'bytes': 0}
+            chunks.append(chunk)
+            open_chunks[key] = chunk
+            handles[chunk['file']] = open(out_dir / chunk['file'], 'w', encoding='utf-8')
+            handles[chunk['file']].write(''.join(sql + ';\n' for sql in prefix))
+        handles[chunk['file']].write(statement + ';\n')
+        chunk['statements'] += 1
+        chunk['bytes'] += length
+    for key in list(open_chunks):
+        close(key)
+
+    manifest = {'source': str(path), 'source_hash': _source_hash(path),
+                'options': {'max_bytes': max_bytes, 'max_statements': max_statements,
+                            'defer_foreign_keys': defer_foreign_keys},
+                'prefix': prefix, 'chunks': chunks}
+    with open(out_dir / MANIFEST_FILE, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_manifest(out_dir: Union[str, Path]) -> Optional[dict]:
+    manifest_path = Path(out_dir) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+
+def _apply_lane(chunk_files: List[str], out_dir: str, backend: Optional[str], remote: bool,
+                prefix: List[str]) -> Tuple[int, int]:
+    """Apply one lane's chunks in order, skipping those already done. Returns (applied, failed statements)."""
+    client = connect(backend, remote=remote)
+    applied = failed = 0
+    for name in chunk_files:
+        chunk_path = Path(out_dir) / name
+        done_path = chunk_path.with_suffix('.done')
+        if done_path.exists():
+            continue
+        with open(chunk_path, 'r', encoding='utf-8') as f:
+            statements = list(iter_statements(f))[len(prefix):]
+        results, failures = client.execute_many(statements, prefix=prefix)
+        if failures:
+            with open(chunk_path.with_suffix('.failed.sql'), 'w', encoding='utf-8') as f:
+                for sql, error in failures:
+                    reason = (error.strip().splitlines() or ['failed'])[-1][:300]
+                    f.write(f"-- {reason}\n{sql};\n")
+        failed += len(failures)
+        applied += len(statements) - len(failures)
+        done_path.touch()
+    return applied, failed
+
+
+def apply_chunks(out_dir: Union[str, Path], backend: Optional[str] = None, remote: bool = True,
+                 workers: Optional[int] = 1) -> Tuple[int, int]:
+    """
+    Apply a split migration segment by segment, lanes concurrently.
+
+    Returns:
+        tuple: (statements applied, statements failed)
+    """
+    out_dir = Path(out_dir)
+    manifest = load_manifest(out_dir)
+    segments: Dict[int, Dict[int, List[str]]] = {}
+    for chunk in manifest['chunks']:
+        segments.setdefault(chunk['segment'], {}).setdefault(chunk['lane'], []).append(chunk['file'])
+
+    applied = failed = 0
+    run_lane = partial(_apply_lane, out_dir=str(out_dir), backend=backend, remote=remote,
+                       prefix=manifest.get('prefix', []))
+    for segment in sorted(segments):
+        lanes = [segments[segment][lane] for lane in sorted(segments[segment])]
+        results, errors = run_parallel(run_lane, lanes, workers=workers, label="lanes", progress_every=10)
+        for result in results:
+            if result:
+                applied += result[0]
+                failed += result[1]
+        if errors:
+            raise RuntimeError(f"Segment {segment}: {len(errors)} lanes stopped; re-run with --apply to resume")
+    return applied, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Split a SQL migration into D1-sized chunks and apply them')
+    parser.add_argument('migration', help='SQL migration file')
+    parser.add_argument('--out', help='Chunk directory (default: data/migrations/chunks/<name>)')
+    parser.add_argument('--max-bytes', type=int, default=MAX_BATCH_BYTES, help='Byte budget per chunk')
+    parser.add_argument('--max-statements', type=int, default=MAX_BATCH_STATEMENTS,
+                        help='Statement budget per chunk')
+    parser.add_argument('--defer-foreign-keys', action='store_true',
+                        help='Head each chunk (and payload) with PRAGMA defer_foreign_keys = true')
+    parser.add_argument('--apply', action='store_true', help='Apply the chunks (resumes a previous run)')
+    parser.add_argument('--backend', choices=['wrangler', 'sqlite'], help='D1 backend (default: D1_BACKEND)')
+    parser.add_argument('--local', action='store_true', help='Use the local wrangler D1 instead of --remote')
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    source = Path(args.migration)
+    out_dir = Path(args.out) if args.out else CHUNKS_DIR / source.stem
+    options = {'max_bytes': args.max_bytes, 'max_statements': args.max_statements,
+               'defer_foreign_keys': args.defer_foreign_keys}
+
+    # Keep an existing split (and its progress markers) if the source and options are unchanged
+    manifest = load_manifest(out_dir)
+    if manifest and 'prefix' in manifest and manifest['source_hash'] == _source_hash(source) \
+            and manifest['options'] == options:
+        print(f"Reusing split in {out_dir}")
+    else:
+        manifest = split_migration(source, out_dir, **options)
+    chunks = manifest['chunks']
+    segments = sorted({c['segment'] for c in chunks})
+    lanes = {(c['segment'], c['lane']) for c in chunks}
+    print(f"{sum(c['statements'] for c in chunks)} statements -> {len(chunks)} chunks "
+          f"in {len(segments)} segments, {len(lanes)} lanes ({out_dir})")
+
+    if args.apply:
+        done = sum(1 for c in chunks if (out_dir / c['file']).with_suffix('.done').exists())
+        if done:
+            print(f"Resuming: {done}/{len(chunks)} chunks already applied")
+        try:
+            applied, failed = apply_chunks(out_dir, backend=args.backend, remote=not args.local,
+                                           workers=args.workers)
+        except RuntimeError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"✅ Applied {applied} statements ({failed} failed)")
+        if failed:
+            print(f"   Failed statements: {out_dir}/*.failed.sql")
+        else:
+            # A generator's snapshot only advances once its migration is fully in D1
+            for name in mark_migration_applied(source):
+                print(f"   Snapshot advanced: {name}")
+
 
 if __name__ == "__main__":
     main()
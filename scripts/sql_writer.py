@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Bulk SQL Writer
+
+One place that renders values into SQL for D1 migrations, so every
+generator escapes the same way, and packs rows into as few statements as
+D1 allows:
+
+    INSERT OR REPLACE INTO t (a, b) VALUES (...), (...), ...     many rows per INSERT
+    UPDATE t SET c = CASE id WHEN 'x' THEN ... END WHERE id IN (...)   many rows per UPDATE
+    DELETE FROM t WHERE id IN (...)                               many rows per DELETE
+
+Every statement stays under MAX_STATEMENT_BYTES and MAX_STATEMENT_ROWS.
+MigrationFile writes statements in `-- Batch N` blocks under d1_client's
+payload caps, so each block can be sent to D1 as one request.
+
+Migrations are applied with `wrangler d1 execute --file`, which has no bind
+parameters, so values are rendered as literals by sql_literal() rather than
+passed as parameters.
+
+Usage:
+    with MigrationFile(path, header=["-- Import"]) as out:
+        out.write_all(insert_statements("refined_pearls", columns, rows))
+        out.write_all(update_case_statements("refined_pearls", "id", "duplicate_of", pairs))
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from d1_client import MAX_BATCH_BYTES, MAX_BATCH_STATEMENTS
+
+# D1 rejects statements over 100 KB; leave room for the statement head
+MAX_STATEMENT_BYTES = 90_000
+# Rows per multi-row statement (keeps a failed statement cheap to find and retry)
+MAX_STATEMENT_ROWS = 500
+
+
+def sql_literal(value: Any) -> str:
+    """SQLite literal for a Python value (strings quoted with '' escaping)."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, bytes):
+        return "X'" + value.hex() + "'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _groups(items: Iterable[Any], size: Callable[[Any], int], fixed: int,
+            max_bytes: int = MAX_STATEMENT_BYTES, max_rows: int = MAX_STATEMENT_ROWS) -> Iterator[List[Any]]:
+    """Group items so fixed + the sum of their sizes stays under the caps."""
+    group: List[Any] = []
+    total = fixed
+    for item in items:
+        length = size(item)
+        if group and (total + length > max_bytes or len(group) >= max_rows):
+            yield group
+            group, total = [], fixed
+        group.append(item)
+        total += length
+    if group:
+        yield group
+
+
+def _bytes(text: str) -> int:
+    return len(text.encode('utf-8'))
+
+
+def insert_statements(table: str, columns: Sequence[str], rows: Iterable[Union[Sequence[Any], Dict[str, Any]]],
+                      verb: str = "INSERT OR REPLACE", raw: Optional[Dict[str, str]] = None,
+                      max_bytes: int = MAX_STATEMENT_BYTES, max_rows: int = MAX_STATEMENT_ROWS) -> Iterator[str]:
+    """
+    Multi-row INSERTs for rows (dicts keyed by column, or value sequences in column order).
+
+    raw maps extra columns to SQL expressions repeated in every row
+    (e.g. {'created_at': "datetime('now')"}).
+    """
+    raw = raw or {}
+    head = (f"{verb} INTO {quote_identifier(table)} "
+            f"({', '.join(quote_identifier(c) for c in list(columns) + list(raw))}) VALUES\n")
+
+    def render(row):
+        values = [row.get(c) for c in columns] if isinstance(row, dict) else row
+        return "(" + ", ".join([sql_literal(v) for v in values] + list(raw.values())) + ")"
+
+    for group in _groups((render(row) for row in rows), lambda v: _bytes(v) + 2, _bytes(head),
+                         max_bytes=max_bytes, max_rows=max_rows):
+        yield head + ",\n".join(group)
+
+
+def update_case_statements(table: str, key_column: str, set_column: str, pairs: Iterable[Tuple[Any, Any]],
+                           max_bytes: int = MAX_STATEMENT_BYTES, max_rows: int = MAX_STATEMENT_ROWS) -> Iterator[str]:
+    """
+    One UPDATE per group of (key, value) pairs instead of one per key:
+    UPDATE t SET col = CASE key WHEN k1 THEN v1 ... END WHERE key IN (k1, ...)
+    """
+    key, column = quote_identifier(key_column), quote_identifier(set_column)
+    head = f"UPDATE {quote_identifier(table)} SET {column} = CASE {key}\n"
+    tail = f"\nEND WHERE {key} IN ()"
+    rendered = ((sql_literal(k), sql_literal(v)) for k, v in pairs)
+    # Each key is written twice (WHEN and IN), so both count toward the size
+    for group in _groups(rendered, lambda kv: 2 * _bytes(kv[0]) + _bytes(kv[1]) + 16, _bytes(head + tail),
+                         max_bytes=max_bytes, max_rows=max_rows):
+        whens = "\n".join(f"  WHEN {k} THEN {v}" for k, v in group)
+        yield head + whens + f"\nEND WHERE {key} IN ({', '.join(k for k, _ in group)})"
+
+
+def delete_statements(table: str, key_column: str, keys: Iterable[Any],
+                      max_bytes: int = MAX_STATEMENT_BYTES, max_rows: int = MAX_STATEMENT_ROWS) -> Iterator[str]:
+    """DELETE ... WHERE key IN (...) in groups."""
+    head = f"DELETE FROM {quote_identifier(table)} WHERE {quote_identifier(key_column)} IN ("
+    for group in _groups((sql_literal(k) for k in keys), lambda v: _bytes(v) + 2, _bytes(head) + 1,
+                         max_bytes=max_bytes, max_rows=max_rows):
+        yield head + ", ".join(group) + ")"
+
+
+class MigrationFile:
+    """Migration file written in `-- Batch N` blocks that each fit one D1 payload."""
+
+    def __init__(self, path: Union[str, Path], header: Iterable[str] = (),
+                 max_bytes: int = MAX_BATCH_BYTES, max_statements: int = MAX_BATCH_STATEMENTS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_statements = max_statements
+        self.batches = 0
+        self.statements = 0
+        self._size = 0
+        self._in_batch = 0
+        self._file = open(self.path, 'w')
+        for line in header:
+            self._file.write(line + '\n')
+
+    def write(self, sql: str) -> None:
+        length = len(sql.encode('utf-8')) + 2
+        if self._in_batch == 0 or self._size + length > self.max_bytes or self._in_batch >= self.max_statements:
+            self.batches += 1
+            self._size, self._in_batch = 0, 0
+            self._file.write(f"\n-- Batch {self.batches}\n")
+        self._file.write(sql.rstrip().rstrip(';') + ';\n')
+        self._size += length
+        self._in_batch += 1
+        self.statements += 1
+
+    def write_all(self, statements: Iterable[str]) -> None:
+        for sql in statements:
+            self.write(sql)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "MigrationFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+r"""
+Precompiled Text Extractors
+
+Model years, year ranges, FCC IDs, transponder chip types and OEM part
+numbers, compiled once at import instead of as inline re.search/findall
+calls in every extraction pass. extract_all() pulls all of them out of a
+text in a single pass with one combined pattern.
+
+FCC grantee prefixes come from the shared entity vocabulary
+(entity_vocabulary.json), so the scanner and these extractors agree on
+what counts as an FCC ID.
+
+    >>> first_year_range('Ford F-150 2015-2020 Smart Key')
+    (2015, 2020)
+    >>> first_year_range('2021+ Explorer', open_end=None)
+    (2021, None)
+    >>> first_year_range('Chevrolet 2023 Smart Key')
+    (2023, 2023)
+    >>> year_ranges('covers 2018 – Present and 2009 to 2012')
+    [(2018, 2026), (2009, 2012)]
+    >>> fcc_ids('FCC ID: HYQ14FBA, also M3N-40821302 (not HYQ)')
+    ['HYQ14FBA', 'M3N-40821302']
+    >>> chip_types('Texas 8A-BA (H chip) or ID46 / Hitag Pro')
+    ['8A-BA', 'H CHIP', 'ID46', 'HITAG PRO']
+    >>> part_numbers('Toyota 89904-0E121, GM 13-5050-1')
+    ['89904-0E121', '13-5050-1']
+    >>> extract_all('2020-2023 Tahoe: FCC HYQ1EA, ID46, 13508278 / 84-2023-12')
+    Extracted(year_ranges=[(2020, 2023)], years=[2020, 2023], fcc_ids=['HYQ1EA'], chips=['ID46'], part_numbers=['84-2023-12'])
+
+PatternTable runs labelled lists of independent patterns (the category
+tables in parse_obdii365_products.py) in one pass instead of one
+re.finditer per pattern, with the same hits:
+
+    >>> table = PatternTable({'tool': [r'VVDI[- ]?2', r'KEY[- ]?TOOL'], 'chip': [r'ID4[68]', r'ID\s*46']},
+    ...                      re.IGNORECASE)
+    >>> table.scan('VVDI2 Key Tool reads ID46 and ID 46')
+    {'tool': ['VVDI2', 'Key Tool'], 'chip': ['ID46', 'ID46', 'ID 46']}
+
+Run the examples with: python3 scripts/text_patterns.py --self-test
+"""
+
+import argparse
+import re
+import sys
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from entity_scanner import KeywordScanner, load_vocabulary
+
+try:
+    import re._constants as _sre
+    import re._parser as _sre_parser
+except ImportError:  # Python < 3.11
+    import sre_constants as _sre
+    import sre_parse as _sre_parser
+
+# "Present" / "current" / open-ended ranges resolve to this model year
+PRESENT_YEAR = 2026
+
+_YEAR = r'(?:19[89]\d|20[0-3]\d)'
+_RANGE_SEP = r'\s*(?:[-–—]|TO)\s*'
+_RANGE_END = rf'(?:{_YEAR}|PRESENT|CURRENT)'
+_OPEN_END = r'\s*(?:\+|(?:AND\s+)?(?:NEWER|LATER|ONWARDS)\b)'
+_FCC_PREFIXES = '|'.join(sorted(load_vocabulary()['fcc_prefixes']['entities'], key=len, reverse=True)).upper()
+_FCC = rf'(?:{_FCC_PREFIXES})-?[A-Z0-9]{{2,12}}\b'
+_FCC_LABEL = r'FCC\s*ID[:#\s]*'
+_FCC_LABELLED = r'[A-Z0-9][A-Z0-9-]{4,15}[A-Z0-9]\b'
+_CHIP = (r'(?:ID\s?(?:[1-9]\d|4[A-E]|8[A-E])|8A(?:-?BA)?|4[ACDE]|[HG]-?\s?CHIP|'
+         r'HITAG[\s-]?(?:PRO|AES|[23])?|(?:PCF|NCF)\d{4}[A-Z]?\d?|MEGAMOS(?:\s+(?:CRYPTO|AES))?|'
+         r'DST[\s-]?(?:40|80|AES)|TEXAS\s+CRYPTO)\b')
+_PART = r'(?:\d{5}-[0-9A-Z]{3,}(?:-[0-9A-Z]+)?|\d{2}-\d{4}-\d+)\b'
+
+# The patterns run over _prepare(text): the text uppercased, behind one
+# leading space. Each match starts on the non-word character in front of the
+# value instead of at a \b, so every pattern opens with a character class
+# and the regex engine can skip ahead rather than try each position in turn.
+_EDGE = r'[^\w]'
+
+YEAR = re.compile(rf'{_EDGE}({_YEAR})\b')
+YEAR_RANGE = re.compile(rf'{_EDGE}({_YEAR}){_RANGE_SEP}({_RANGE_END})\b')
+YEAR_OPEN = re.compile(rf'{_EDGE}({_YEAR}){_OPEN_END}')
+FCC_ID = re.compile(rf'{_EDGE}(?:{_FCC_LABEL}({_FCC_LABELLED})|({_FCC}))')
+CHIP = re.compile(rf'{_EDGE}({_CHIP})')
+PART_NUMBER = re.compile(rf'{_EDGE}({_PART})')
+_WHITESPACE = re.compile(r'\s+')
+
+# Everything at once. Alternatives are tried in order at each position, so a
+# span belongs to exactly one kind (the years of a range are not also singles).
+COMBINED = re.compile(_EDGE + '(?:' + '|'.join([
+    rf'(?P<range_start>{_YEAR}){_RANGE_SEP}(?P<range_end>{_RANGE_END})\b',
+    rf'(?P<open_start>{_YEAR}){_OPEN_END}',
+    rf'{_FCC_LABEL}(?P<fcc_labelled>{_FCC_LABELLED})',
+    rf'(?P<fcc>{_FCC})',
+    rf'(?P<part>{_PART})',
+    rf'(?P<chip>{_CHIP})',
+    rf'(?P<year>{_YEAR})\b',
+]) + ')')
+
+
+def _prepare(text: Optional[str]) -> str:
+    return ' ' + (text or '').upper()
+
+
+class Extracted(NamedTuple):
+    year_ranges: List[Tuple[int, int]]
+    years: List[int]
+    fcc_ids: List[str]
+    chips: List[str]
+    part_numbers: List[str]
+
+
+def _year_pair(start: str, end: str) -> Tuple[int, int]:
+    """(start, end) of a matched range, earliest first; "present" is PRESENT_YEAR."""
+    first = int(start)
+    last = PRESENT_YEAR if end in ('PRESENT', 'CURRENT') else int(end)
+    return (first, last) if first <= last else (last, first)
+
+
+def _ordered_unique(values) -> list:
+    return list(dict.fromkeys(values))
+
+
+def years(text: str) -> List[int]:
+    """Every model year mentioned, in order, without repeats."""
+    return _ordered_unique(int(y) for y in YEAR.findall(_prepare(text)))
+
+
+def year_ranges(text: str) -> List[Tuple[int, int]]:
+    """Explicit ranges ("2017-2019", "2019 to present"), in order, without repeats."""
+    return _ordered_unique(_year_pair(start, end) for start, end in YEAR_RANGE.findall(_prepare(text)))
+
+
+def first_year_range(text: str, open_end: Optional[int] = PRESENT_YEAR,
+                     single: bool = True) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    The year range a text is about.
+
+    An explicit range wins, then an open-ended one ("2020+", "2020 and newer")
+    ending at open_end, then (when single is set) the first lone year.
+    None when nothing matches.
+    """
+    text = _prepare(text)
+    match = YEAR_RANGE.search(text)
+    if match:
+        return _year_pair(match.group(1), match.group(2))
+    match = YEAR_OPEN.search(text)
+    if match:
+        return int(match.group(1)), open_end
+    if single:
+        match = YEAR.search(text)
+        if match:
+            return int(match.group(1)), int(match.group(1))
+    return None
+
+
+def fcc_ids(text: str) -> List[str]:
+    """FCC IDs (known grantee prefixes, or anything after "FCC ID:"), uppercased, in order."""
+    return _ordered_unique(labelled or bare for labelled, bare in FCC_ID.findall(_prepare(text)))
+
+
+def chip_types(text: str) -> List[str]:
+    """Transponder chip designations, uppercased, in order."""
+    return _ordered_unique(_WHITESPACE.sub(' ', m) for m in CHIP.findall(_prepare(text)))
+
+
+def part_numbers(text: str) -> List[str]:
+    """OEM-style part numbers (89904-0E121, 13-5050-1), uppercased, in order."""
+    return _ordered_unique(PART_NUMBER.findall(_prepare(text)))
+
+
+def extract_all(text: str, open_end: Optional[int] = PRESENT_YEAR) -> Extracted:
+    """Years, year ranges, FCC IDs, chips and part numbers in one pass over the text."""
+    ranges, all_years, fccs, chips, parts = [], [], [], [], []
+    for m in COMBINED.finditer(_prepare(text)):
+        kind = m.lastgroup
+        if kind == 'range_end':
+            ranges.append(_year_pair(m.group('range_start'), m.group('range_end')))
+            all_years.append(int(m.group('range_start')))
+            if m.group('range_end').isdigit():
+                all_years.append(int(m.group('range_end')))
+        elif kind == 'open_start':
+            start = int(m.group('open_start'))
+            ranges.append((start, open_end))
+            all_years.append(start)
+        elif kind == 'fcc_labelled' or kind == 'fcc':
+            fccs.append(m.group(kind))
+        elif kind == 'part':
+            parts.append(m.group(kind))
+        elif kind == 'chip':
+            chips.append(_WHITESPACE.sub(' ', m.group(kind)))
+        elif kind == 'year':
+            all_years.append(int(m.group(kind)))
+    return Extracted(_ordered_unique(ranges), _ordered_unique(all_years), _ordered_unique(fccs),
+                     _ordered_unique(chips), _ordered_unique(parts))
+
+
+class PatternTable:
+    """
+    Labelled pattern lists scanned in one pass, with per-pattern finditer hits.
+
+    Python's re gives each compiled pattern a fast literal-prefix search,
+    which a single alternation of all of them loses (every alternative is
+    tried at every position). So instead, the literal prefixes each pattern
+    must start with ("PCF79", "HU", "ID" / "ID " ...) go into one
+    KeywordScanner (Aho-Corasick) pass, and a pattern is only matched where
+    one of its prefixes occurs. Patterns without a usable prefix (a leading
+    digit class, optional or repeated part) keep their own finditer. A
+    pattern's hits never overlap each other, exactly as with re.finditer,
+    while hits of different patterns may.
+    """
+
+    # Characters re.IGNORECASE folds onto an ASCII letter that str.lower() doesn't
+    _CASE_FOLDS = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's'})
+    # Prefix alternatives per pattern before it falls back to its own finditer
+    MAX_PREFIXES = 64
+
+    def __init__(self, tables: Dict[str, Iterable[str]], flags: int = 0):
+        self.tables = {label: list(patterns) for label, patterns in tables.items()}
+        self.labels = list(self.tables)
+        self._entries = [(label, re.compile(pattern, flags))
+                         for label, patterns in self.tables.items() for pattern in patterns]
+        self._scanner = KeywordScanner()
+        self._unprefixed = []
+        for index, (_, compiled) in enumerate(self._entries):
+            prefixes = _literal_prefixes(compiled.pattern, flags, self.MAX_PREFIXES)
+            if prefixes:
+                for prefix in prefixes:
+                    self._scanner.add(prefix, index)
+            else:
+                self._unprefixed.append(index)
+
+    def _finditer(self, text: str, indexes: Iterable[int], found: Dict[str, List[Tuple[int, str]]]) -> None:
+        for index in indexes:
+            label, compiled = self._entries[index]
+            found[label].extend((m.start(), m.group()) for m in compiled.finditer(text))
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        """Matched text for every label, in order of position (duplicates kept)."""
+        found: Dict[str, List[Tuple[int, str]]] = {label: [] for label in self.labels}
+        folded = text.translate(self._CASE_FOLDS).lower()
+        if len(folded) != len(text):
+            # Offsets into the lowered text would not line up
+            self._finditer(text, range(len(self._entries)), found)
+        else:
+            self._finditer(text, self._unprefixed, found)
+            next_pos = [0] * len(self._entries)
+            for start, index in sorted(set(self._scanner.starts(folded))):
+                if start < next_pos[index]:
+                    continue
+                label, compiled = self._entries[index]
+                m = compiled.match(text, start)
+                if m:
+                    found[label].append((start, m.group()))
+                    next_pos[index] = m.end()
+        return {label: [value for _, value in sorted(hits, key=lambda hit: hit[0])]
+                for label, hits in found.items()}
+
+
+def _literal_prefixes(pattern: str, flags: int, limit: int) -> Optional[List[str]]:
+    """
+    Lowercased literal strings one of which starts every match of pattern,
+    or None when the pattern can start with something other than a literal.
+
+    >>> _literal_prefixes(r'\\bHU(?:66|92)[- ]?BLADE', re.IGNORECASE, 64)
+    ['hu66', 'hu92']
+    >>> _literal_prefixes(r'(\\d)[- ]?BUTTON', re.IGNORECASE, 64) is None
+    True
+    """
+    prefixes, _ = _expand(_sre_parser.parse(pattern, flags), [''], limit)
+    if not all(prefixes) or not all(p.isascii() for p in prefixes):
+        return None
+    return sorted(set(p.lower() for p in prefixes))
+
+
+def _expand(items, prefixes: List[str], limit: int) -> Tuple[List[str], bool]:
+    """Extend prefixes through the leading literal items; True if all items were consumed."""
+    for op, av in items:
+        if op is _sre.AT:
+            continue  # Zero-width (\\b, ^) at the start doesn't move the match
+        if op is _sre.LITERAL:
+            chars = [chr(av)]
+        elif op is _sre.IN and all(kind is _sre.LITERAL for kind, _ in av):
+            chars = [chr(value) for _, value in av]
+        elif op is _sre.SUBPATTERN:
+            prefixes, complete = _expand(av[-1], prefixes, limit)
+            if not complete:
+                return prefixes, False
+            continue
+        elif op is _sre.BRANCH:
+            expanded, complete = [], True
+            for branch in av[1]:
+                branch_prefixes, branch_complete = _expand(branch, prefixes, limit)
+                expanded.extend(branch_prefixes)
+                complete = complete and branch_complete
+            if len(expanded) > limit:
+                return prefixes, False
+            prefixes = expanded
+            if not complete:
+                return prefixes, False
+            continue
+        else:
+            return prefixes, False
+        if len(prefixes) * len(chars) > limit:
+            return prefixes, False
+        prefixes = [p + c for p in prefixes for c in chars]
+    return prefixes, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract years, FCC IDs, chips and part numbers from text')
+    parser.add_argument('files', nargs='*', help='Files to scan (default: stdin)')
+    parser.add_argument('--self-test', action='store_true', help='Run the documented examples')
+    args = parser.parse_args()
+
+    if args.self_test:
+        import doctest
+        failures, tests = doctest.testmod()
+        print(f"{tests - failures}/{tests} examples passed")
+        sys.exit(1 if failures else 0)
+
+    sources = [(name, open(name, encoding='utf-8', errors='replace').read()) for name in args.files]
+    if not sources:
+        sources = [('<stdin>', sys.stdin.read())]
+    for name, text in sources:
+        found = extract_all(text)
+        print(f"== {name}")
+        for field, values in found._asdict().items():
+            print(f"  {field}: {', '.join(map(str, values)) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ import subprocess
 import glob
 import json
 
+from d1_client import connect
+
 # Configuration
 R2_BUCKET = "euro-keys-assets"
 DATABASE_NAME = "locksmith-db"
@@ -34,28 +36,23 @@ def update_database(fcc_ids):
 
     print(f"Updating database for {len(fcc_ids)} FCC IDs...")
     
-    # Construct a big update statement or multiple small ones
     # For D1, we can do: UPDATE vehicles SET has_image=1 WHERE fcc_id IN (...)
-    
-    # Batch them to avoid command line length limits
+    # Keep each IN list short; the client packs the statements into a few
+    # size-capped payloads so this is a round trip or two, not one per batch
     batch_size = 50
+    statements = []
     for i in range(0, len(fcc_ids), batch_size):
         batch = fcc_ids[i:i+batch_size]
-        quoted = [f"'{fid}'" for fid in batch]
+        quoted = ["'" + fid.replace("'", "''") + "'" for fid in batch]
         in_clause = ",".join(quoted)
-        sql = f"UPDATE vehicles SET has_image=1 WHERE fcc_id IN ({in_clause});"
-        
-        try:
-            cmd = [
-                "wrangler", "d1", "execute", DATABASE_NAME,
-                "--remote",
-                f"--command={sql}"
-            ]
-            # Use cwd=api because wrangler.toml for d1 is likely there
-            subprocess.check_call(cmd, cwd="api") 
-            print(f"Updated batch {i//batch_size + 1}")
-        except subprocess.CalledProcessError as e:
-            print(f"Error updating DB batch: {e}")
+        statements.append(f"UPDATE vehicles SET has_image=1 WHERE fcc_id IN ({in_clause});")
+
+    d1 = connect(database=DATABASE_NAME)
+    _, failures = d1.execute_many(statements)
+    for sql, error in failures:
+        print(f"Error updating DB batch: {error[-200:]}")
+    print(f"Updated {len(statements) - len(failures)}/{len(statements)} batches "
+          f"in {d1.round_trips} D1 round trip(s)")
 
 def main():
     if len(sys.argv) < 2:
@@ -17,58 +17,12 @@ import boto3
 from botocore.config import Config
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from vehicle_identity import split_make
+
 # R2 Configuration
 R2_ENDPOINT = "https://3ac1a6fafce90adf6b1c8f1280dfc94d.r2.cloudflarestorage.com"
 R2_BUCKET = "euro-keys-assets"
 
-# Mapping of filename prefixes to make names
-MAKE_PREFIXES = {
-    'acura': 'Acura',
-    'alfa_romeo': 'Alfa Romeo',
-    'aston_martin': 'Aston Martin',
-    'audi': 'Audi',
-    'bentley': 'Bentley',
-    'bmw': 'BMW',
-    'buick': 'Buick',
-    'cadillac': 'Cadillac',
-    'chevrolet': 'Chevrolet',
-    'chrysler': 'Chrysler',
-    'dodge': 'Dodge',
-    'ferrari': 'Ferrari',
-    'fiat': 'Fiat',
-    'ford': 'Ford',
-    'genesis': 'Genesis',
-    'gmc': 'GMC',
-    'honda': 'Honda',
-    'hyundai': 'Hyundai',
-    'infiniti': 'Infiniti',
-    'jaguar': 'Jaguar',
-    'jeep': 'Jeep',
-    'kia': 'Kia',
-    'lamborghini': 'Lamborghini',
-    'land_rover': 'Land Rover',
-    'lexus': 'Lexus',
-    'lincoln': 'Lincoln',
-    'lucid': 'Lucid',
-    'maserati': 'Maserati',
-    'mazda': 'Mazda',
-    'mclaren': 'McLaren',
-    'mercedes': 'Mercedes-Benz',
-    'mini': 'Mini',
-    'mitsubishi': 'Mitsubishi',
-    'nissan': 'Nissan',
-    'polestar': 'Polestar',
-    'porsche': 'Porsche',
-    'ram': 'Ram',
-    'rivian': 'Rivian',
-    'rolls_royce': 'Rolls-Royce',
-    'subaru': 'Subaru',
-    'tesla': 'Tesla',
-    'toyota': 'Toyota',
-    'volkswagen': 'Volkswagen',
-    'volvo': 'Volvo',
-}
-
 def get_s3_client():
     """Create S3 client configured for R2"""
     access_key = os.environ.get("R2_ACCESS_KEY_ID")
@@ -99,13 +53,12 @@ def parse_filename(filename):
     base = re.sub(r'_\d{13}\.png$', '', filename)
     base = base.replace('.png', '')
     
-    # Try to match known prefixes
-    for prefix, make in sorted(MAKE_PREFIXES.items(), key=lambda x: -len(x[0])):
-        if base.startswith(prefix + '_') or base == prefix:
-            model = base[len(prefix)+1:] if base.startswith(prefix + '_') else ''
-            # Convert underscores to spaces and title case
-            model = model.replace('_', ' ').title() if model else ''
-            return make, model
+    # Try to match a known make prefix (longest alias wins, e.g. land_rover over land)
+    make, model = split_make(base)
+    if make:
+        # Convert underscores to spaces and title case
+        model = model.replace('_', ' ').title() if model else ''
+        return make, model
     
     # Fallback: first part is make, rest is model
     parts = base.split('_')
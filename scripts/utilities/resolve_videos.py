@@ -1,11 +1,10 @@
-import requests
-import re
-import json
-
-import requests
 import re
 import json
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_cache import shared_cache
 
 # Batch 10 Links (Infiniti/Jeep)
 links_to_process = [
@@ -114,7 +113,7 @@ for item in existing_data:
 for item in links_to_process:
     try:
         print(f"Resolving {item['url']}...")
-        response = requests.get(item['url'], timeout=10, allow_redirects=True)
+        response = shared_cache().get(item['url'], timeout=10)  # redirects followed; response.url is final
         final_url = response.url
         
         # Regex title extraction
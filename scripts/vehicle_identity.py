@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Canonical Vehicle Identity Resolver
+
+One place that turns the raw make/model strings found across the sources
+(dossier titles, FCC/AKS imports, Ilco catalogs, VPM/VI rows, image file
+names) into a canonical (make, model, generation, chassis) identity with a
+small integer id. Sources are joined on those ids instead of re-running
+regexes and lower-casing inside their inner loops.
+
+Resolution:
+    make        alias trie over folded tokens ("mercedes benz", "merc", "vw",
+                typos like "dadge") -> canonical display name
+    model       parenthetical/known chassis codes -> chassis, trailing years
+                dropped, generation qualifiers (LCI, Facelift, Gen2 ...) ->
+                generation, per-make model alias trie, one trailing trim
+                (EX, Limited, SE ...) dropped when the model is not a known one
+    id          interned per resolver; equal identities share one id
+
+Hot strings are served from an LRU cache, and resolve_many() resolves each
+distinct input once.
+
+Usage:
+    from vehicle_identity import canonical_make, get_resolver
+
+    resolver = get_resolver()
+    vid = resolver.resolve('Mercedes Benz', 'C-Class (W205)')
+    resolver.identity(vid)   # VehicleIdentity(id=0, make='Mercedes-Benz', model='C-Class', generation=None, chassis='W205')
+    ids = resolver.resolve_many([('VW', 'Atlas'), ('Chevy', 'Silverado 1500')])
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+HOT_CACHE_SIZE = 65536
+
+# Canonical make -> aliases (folded spellings, abbreviations and typos seen in the sources)
+CANONICAL_MAKES = {
+    'Acura': [], 'Alfa Romeo': ['alfa'], 'AMC': [], 'Aston Martin': [], 'Audi': [],
+    'BAIC': [], 'Bentley': [], 'BMW': [], 'Buick': [], 'BYD': [],
+    'Cadillac': [], 'Changan': [], 'Chery': [], 'Chevrolet': ['chevy'], 'Chrysler': [],
+    'Citroen': [], 'Daihatsu': [], 'Dodge': ['dadge'], 'Dongfeng': [], 'DS': [],
+    'Ferrari': [], 'Fiat': [], 'Fisker': [], 'Ford': [], 'Foton': [],
+    'GAC': [], 'Geely': [], 'Genesis': [], 'Geo': [], 'GM': ['general motors'], 'GMC': [],
+    'Great Wall': [], 'Haima': [], 'Honda': [], 'Hummer': [], 'Hyundai': [],
+    'Infiniti': [], 'Isuzu': [], 'JAC': [], 'Jaguar': [], 'Jaguar Land Rover': ['jlr'],
+    'Jeep': [], 'Kia': [], 'KTM': [], 'Lamborghini': [], 'Land Rover': ['landrover'],
+    'Lexus': [], 'Lincoln': [], 'Lotus': [], 'Lucid': [], 'MAN': [], 'Maserati': [],
+    'Mazda': [], 'McLaren': [], 'Mercedes-Benz': ['mercedes', 'benz', 'merc', 'mb'],
+    'Mercury': [], 'MG': [], 'Mini': [], 'Mitsubishi': ['mltsubishi'],
+    'Mitsubishi Fuso': [], 'Nissan': [], 'Oldsmobile': [], 'Peugeot': [],
+    'Plymouth': [], 'Polestar': [], 'Pontiac': [], 'Porsche': [], 'Ram': [],
+    'Renault': [], 'Rivian': [], 'Roewe': [], 'Rolls-Royce': [], 'SAIC': [],
+    'Saab': [], 'Saturn': [], 'Scion': [], 'Smart': [], 'Stellantis': ['fca', 'cdjr'],
+    'Subaru': [], 'Suzuki': [], 'Tesla': [], 'Toyota': [], 'VAG': [],
+    'Volkswagen': ['vw'], 'Volvo': [], 'Volvo Penta': [], 'Wuling': [],
+}
+
+# Canonical model -> aliases, per canonical make
+CANONICAL_MODELS = {
+    'Audi': {'Q7': []},
+    'BMW': {'3-Series': ['3er'], '4-Series': [], '5-Series': [], '7-Series': [],
+            'X3': [], 'X5': []},
+    'Cadillac': {'Escalade': []},
+    'Chevrolet': {'Silverado': ['silverado 1500'], 'Equinox': []},
+    'Ford': {'F-150': ['f150'], 'Bronco': [], 'Bronco Sport': []},  # U725 vs CX430: different vehicles
+    'Genesis': {'GV70': []},
+    'GMC': {'Sierra': ['sierra 1500']},
+    'Honda': {'CR-V': ['crv'], 'Civic': []},
+    'Hyundai': {'Tucson': [], 'Santa Fe': []},
+    'Jeep': {'Grand Cherokee': ['grand cherokee l']},
+    'Land Rover': {'Range Rover': [], 'Range Rover Sport': []},
+    'Lexus': {'RX 350': ['rx350']},
+    'Nissan': {'Rogue': []},
+    'Subaru': {'Outback': []},
+    'Toyota': {'Highlander': [], 'Tundra': []},
+    'Volkswagen': {'Atlas': []},
+}
+
+# Chassis / platform code -> (make, model) it identifies
+CHASSIS_CODES = {
+    'K2XL': ('Cadillac', 'Escalade'), 'T1XX': ('Chevrolet', 'Silverado'),
+    'WL': ('Jeep', 'Grand Cherokee'), 'BT': ('Subaru', 'Outback'), 'T32': ('Nissan', 'Rogue'),
+    'XU70': ('Toyota', 'Highlander'), 'L494': ('Land Rover', 'Range Rover Sport'),
+    'L405': ('Land Rover', 'Range Rover'), 'RW': ('Honda', 'CR-V'),
+    'E36': ('BMW', '3-Series'), 'E46': ('BMW', '3-Series'), 'E90': ('BMW', '3-Series'),
+    'F30': ('BMW', '3-Series'), 'G20': ('BMW', '3-Series'), 'G22': ('BMW', '4-Series'),
+    'G60': ('BMW', '5-Series'), 'G70': ('BMW', '7-Series'), 'G01': ('BMW', 'X3'),
+    'G05': ('BMW', 'X5'), 'G06': ('BMW', 'X6'), 'G07': ('BMW', 'X7'), 'G02': ('BMW', 'X4'),
+    'G80': ('BMW', 'M3'), 'G82': ('BMW', 'M4'), 'F90': ('BMW', 'M5'), 'U11': ('BMW', 'X1'),
+    'G29': ('BMW', 'Z4'), 'G26': ('BMW', 'i4'), 'I20': ('BMW', 'iX'),
+    'W204': ('Mercedes-Benz', 'C-Class'), 'W205': ('Mercedes-Benz', 'C-Class'),
+    'W212': ('Mercedes-Benz', 'E-Class'), 'W222': ('Mercedes-Benz', 'S-Class'),
+    'V295': ('Mercedes-Benz', 'EQE'), 'V297': ('Mercedes-Benz', 'EQS'),
+}
+
+# Generation qualifiers (as they trail model names) -> canonical label
+GENERATION_QUALIFIERS = {
+    'pre fl': 'Pre-FL', 'fl mixed': 'FL Mixed', 'late': 'Late', 'early': 'Early',
+    'mixed': 'Mixed', 'trans': 'Trans', 'gen1': 'Gen1', 'gen2': 'Gen2',
+    'lci': 'LCI', 'facelift': 'Facelift',
+}
+
+TRIM_SUFFIXES = ['EX', 'LX', 'Sport', 'Limited', 'SE', 'XLE', 'SR', 'SV', 'SL']
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_PAREN_RE = re.compile(r'\s*\(([^)]*)\)')
+# Plausible model years only (as text_patterns._YEAR), so "Silverado 2500" keeps its payload rating
+_YEAR = r'(?:19[89]\d|20[0-3]\d)'
+_TRAILING_YEAR_RE = re.compile(rf'\s+{_YEAR}\s*(?:[-–]\s*{_YEAR}?\s*)?$')
+# Inline chassis codes are only looked for among the resolved make's own codes
+# (Genesis "G80" and Hyundai "i20" are models, not BMW chassis codes)
+_CHASSIS_RES = {
+    make: re.compile(r'\b(?:GMT\s+)?(' + '|'.join(sorted((code for code, (m, _) in CHASSIS_CODES.items() if m == make),
+                                                         key=len, reverse=True)) + r')\b')
+    for make in {m for m, _ in CHASSIS_CODES.values()}
+}
+_CODE_RE = re.compile(r'^[A-Z0-9]{2,6}(?:/[A-Z0-9]{2,6})*$')
+_GENERATION_RE = re.compile(
+    r'[\s-]+(' + '|'.join(re.escape(q).replace(r'\ ', r'[\s-]+')
+                          for q in sorted(GENERATION_QUALIFIERS, key=len, reverse=True)) + r')\s*$',
+    re.IGNORECASE)
+_TRIM_RE = re.compile(r'\s+(' + '|'.join(TRIM_SUFFIXES) + r')$', re.IGNORECASE)
+
+
+def fold(text: str) -> str:
+    """Lower-case and strip accents (Citroën -> citroen)."""
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokens(text: str) -> Tuple[str, ...]:
+    """Folded alphanumeric tokens; '-', '_', '/' and spaces all separate."""
+    return tuple(_TOKEN_RE.findall(fold(text)))
+
+
+# ============================================================
+# Alias trie
+# ============================================================
+
+class AliasTrie:
+    """Token trie mapping alias token sequences to values."""
+
+    _END = object()
+
+    def __init__(self, aliases: Iterable[Tuple[str, object]] = ()):
+        self.root: dict = {}
+        for alias, value in aliases:
+            self.add(alias, value)
+
+    def add(self, alias: str, value: object) -> None:
+        node = self.root
+        for token in tokens(alias):
+            node = node.setdefault(token, {})
+        node.setdefault(self._END, value)
+
+    def exact(self, toks: Sequence[str]) -> Optional[object]:
+        node = self.root
+        for token in toks:
+            node = node.get(token)
+            if node is None:
+                return None
+        return node.get(self._END)
+
+    def longest_prefix(self, toks: Sequence[str], start: int = 0) -> Tuple[Optional[object], int]:
+        """(value, end) of the longest alias starting at toks[start]; (None, start) if none."""
+        node = self.root
+        best = (None, start)
+        for i in range(start, len(toks)):
+            node = node.get(toks[i])
+            if node is None:
+                break
+            if self._END in node:
+                best = (node[self._END], i + 1)
+        return best
+
+
+def _make_aliases() -> Dict[str, str]:
+    aliases = {}
+    for make, extra in CANONICAL_MAKES.items():
+        for alias in [make, make.replace('-', ' ')] + extra:
+            aliases.setdefault(' '.join(tokens(alias)), make)
+    return aliases
+
+
+# Folded alias -> canonical make (shared table for scripts that match make tokens)
+MAKE_ALIASES: Dict[str, str] = _make_aliases()
+MAKE_TRIE = AliasTrie(MAKE_ALIASES.items())
+MODEL_TRIES: Dict[str, AliasTrie] = {
+    make: AliasTrie((alias, model) for model, extra in models.items() for alias in [model] + extra)
+    for make, models in CANONICAL_MODELS.items()
+}
+ANY_MODEL_TRIE = AliasTrie((alias, model) for models in CANONICAL_MODELS.values()
+                           for model, extra in models.items() for alias in [model] + extra)
+
+
+def canonical_make(raw: str) -> str:
+    """
+    Canonical display name of a make string.
+
+    Unknown makes are returned stripped and title-cased, except short
+    all-caps acronyms which keep their case.
+    """
+    if not raw:
+        return ''
+    match = MAKE_TRIE.exact(tokens(raw))
+    if match:
+        return match
+    raw = raw.strip()
+    if raw.isupper() and len(raw) <= 4:
+        return raw
+    return raw.title()
+
+
+def is_known_make(raw: str) -> bool:
+    return bool(raw) and MAKE_TRIE.exact(tokens(raw)) is not None
+
+
+def split_make(raw: str) -> Tuple[Optional[str], str]:
+    """
+    Split a leading make off a string ("land_rover_range_rover" -> ("Land Rover", "range_rover")).
+
+    The remainder is the folded text after the make, separators kept.
+    Returns (None, raw) when the string does not start with a known make.
+    """
+    folded = fold(raw)
+    spans = list(_TOKEN_RE.finditer(folded))
+    make, end = MAKE_TRIE.longest_prefix([m.group() for m in spans])
+    if make is None:
+        return None, raw
+    return make, folded[spans[end - 1].end():].lstrip(' _-/')
+
+
+def find_make(raw: str) -> Optional[str]:
+    """First known make anywhere in a string, matched on whole tokens."""
+    toks = tokens(raw)
+    for start in range(len(toks)):
+        make, _ = MAKE_TRIE.longest_prefix(toks, start)
+        if make is not None:
+            return make
+    return None
+
+
+class ParsedModel(NamedTuple):
+    model: str
+    key: str
+    generation: Optional[str]
+    chassis: Optional[str]
+
+
+def parse_model(make: str, raw: str) -> ParsedModel:
+    """Split a raw model string into canonical model, match key, generation and chassis."""
+    if not raw:
+        return ParsedModel('', '', None, None)
+    text = raw.strip()
+    chassis = None
+    generation = None
+
+    # "(G05)", "(K2XL)", "(TNGA)" -> chassis / platform code
+    for code in _PAREN_RE.findall(text):
+        code = code.strip()
+        if chassis is None and (_CODE_RE.match(code) or code.upper() in CHASSIS_CODES):
+            chassis = code.upper()
+    text = _PAREN_RE.sub('', text).strip()
+
+    # Known chassis codes written inline ("GMT K2XL", "G05 X5")
+    chassis_re = _CHASSIS_RES.get(make)
+    inline = chassis_re.search(text.upper()) if chassis_re else None
+    if inline:
+        chassis = chassis or inline.group(1)
+        text = (text[:inline.start()] + text[inline.end():]).strip()
+
+    text = _TRAILING_YEAR_RE.sub('', text).strip()
+    while True:
+        qualifier = _GENERATION_RE.search(text)
+        if not qualifier:
+            break
+        label = GENERATION_QUALIFIERS[' '.join(tokens(qualifier.group(1)))]
+        generation = f"{label} {generation}" if generation else label
+        text = text[:qualifier.start()].strip()
+
+    trie = MODEL_TRIES.get(make, ANY_MODEL_TRIE)
+    model = trie.exact(tokens(text)) if text else None
+    if model is None and text:
+        text = _TRIM_RE.sub('', text)
+        model = trie.exact(tokens(text))
+    if model is None and not text and CHASSIS_CODES.get(chassis, (None,))[0] == make:
+        model = CHASSIS_CODES[chassis][1]
+    model = model or text
+    return ParsedModel(model, ' '.join(tokens(model)), generation, chassis)
+
+
+# ============================================================
+# Resolver
+# ============================================================
+
+class VehicleIdentity(NamedTuple):
+    id: int
+    make: str
+    model: str
+    generation: Optional[str]
+    chassis: Optional[str]
+
+    @property
+    def full_model(self) -> str:
+        """Model with generation and chassis, for display ("3-Series LCI (F30)")."""
+        parts = [self.model] + [self.generation] * bool(self.generation)
+        if self.chassis:
+            parts.append(f"({self.chassis})")
+        return ' '.join(p for p in parts if p)
+
+
+class VehicleResolver:
+    """Interns canonical (make, model, generation, chassis) identities as integer ids."""
+
+    def __init__(self, cache_size: int = HOT_CACHE_SIZE):
+        self._ids: Dict[Tuple[str, str, str, str], int] = {}
+        self._identities: List[VehicleIdentity] = []
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, make: str, model: str = '') -> int:
+        canonical = canonical_make(make)
+        parsed = parse_model(canonical, model)
+        key = (canonical.lower(), parsed.key, parsed.generation or '', parsed.chassis or '')
+        vid = self._ids.get(key)
+        if vid is None:
+            vid = len(self._identities)
+            self._ids[key] = vid
+            self._identities.append(VehicleIdentity(vid, canonical, parsed.model,
+                                                    parsed.generation, parsed.chassis))
+        return vid
+
+    def resolve_many(self, pairs: Iterable[Tuple[str, str]]) -> List[int]:
+        """Ids for many (make, model) pairs, resolving each distinct pair once."""
+        pairs = [(make or '', model or '') for make, model in pairs]
+        resolved = {pair: self.resolve(*pair) for pair in dict.fromkeys(pairs)}
+        return [resolved[pair] for pair in pairs]
+
+    def identity(self, vid: int) -> VehicleIdentity:
+        return self._identities[vid]
+
+    def sort_key(self, vid: int) -> Tuple[str, str, str, str]:
+        """Stable ordering by make, model, generation, chassis (independent of id order)."""
+        identity = self._identities[vid]
+        return (identity.make.lower(), ' '.join(tokens(identity.model)),
+                identity.generation or '', identity.chassis or '')
+
+    def __len__(self) -> int:
+        return len(self._identities)
+
+
+_default_resolver: Optional[VehicleResolver] = None
+
+
+def get_resolver() -> VehicleResolver:
+    """Process-wide resolver, so ids agree across modules in one run."""
+    global _default_resolver
+    if _default_resolver is None:
+        _default_resolver = VehicleResolver()
+    return _default_resolver
@@ -2,12 +2,15 @@ import sqlite3
 import json
 import os
 
-db_path = "/Users/jeremysamuels/Documents/study-dashboard/data/locksmith.db"
+from d1_mirror import MIRROR_PATH
+
+# Local D1 mirror (python3 scripts/d1_mirror.py pull vehicle_year_products aks_products_detail)
+db_path = str(MIRROR_PATH)
 output_path = "/tmp/vyp_orphan_audit.json"
 
 def audit():
     if not os.path.exists(db_path):
-        print(f"Error: Database not found at {db_path}")
+        print(f"Error: Database not found at {db_path} (run d1_mirror.py pull first)")
         return
 
     conn = sqlite3.connect(db_path)